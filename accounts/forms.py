@@ -48,6 +48,15 @@ class FuncionarioForm(forms.ModelForm):
         }
 
 
+class ProvisionamentoForm(forms.Form):
+    """Upload form for bulk employee provisioning"""
+    arquivo = forms.FileField(
+        label='Arquivo',
+        help_text='CSV (separado por ; ou ,) ou XLSX com os dados dos funcionários, username e, opcionalmente, senha',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'})
+    )
+
+
 class FuncionarioSearchForm(forms.Form):
     """Search form for employees"""
     search = forms.CharField(
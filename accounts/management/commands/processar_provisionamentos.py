@@ -0,0 +1,36 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.provisionamento import processar_pendentes
+
+
+class Command(BaseCommand):
+    help = 'Processa os cadastros de funcionários em lote enviados pela tela de importação'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.PROVISIONAMENTO_WORKERS,
+            help='Processos que calculam os hashes das senhas (padrão: PROVISIONAMENTO_WORKERS)'
+        )
+        parser.add_argument(
+            '--continuo', action='store_true',
+            help='Continua aguardando novos envios em vez de encerrar quando a fila esvazia'
+        )
+        parser.add_argument('--intervalo', type=float, default=5, help='Segundos entre as verificações da fila')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers deve ser maior que zero')
+
+        def progresso(resumo):
+            self.stdout.write(f"{resumo['criadas']} contas criadas ({resumo['contas_por_segundo']} contas/s)")
+
+        while True:
+            processados = processar_pendentes(options['workers'], progresso)
+            if processados:
+                self.stdout.write(self.style.SUCCESS(f'{processados} envio(s) processado(s)'))
+            if not options['continuo']:
+                break
+            time.sleep(options['intervalo'])
@@ -0,0 +1,43 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from accounts.provisionamento import TAMANHO_LOTE, provisionar_funcionarios
+from core.importacao import ArquivoInvalido
+
+
+class Command(BaseCommand):
+    help = 'Cadastra funcionários e seus usuários em lote a partir de um arquivo CSV ou XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Arquivo .csv ou .xlsx com os funcionários, username e senha (opcional)')
+        parser.add_argument(
+            '--relatorio', required=True,
+            help='Arquivo CSV que recebe as credenciais geradas e as linhas rejeitadas'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Processos que calculam os hashes das senhas (padrão: número de CPUs)'
+        )
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='Funcionários por lote')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1:
+            raise CommandError('--workers deve ser maior que zero')
+
+        def progresso(resumo):
+            self.stdout.write(f"{resumo['criadas']} contas criadas ({resumo['contas_por_segundo']} contas/s)")
+
+        try:
+            with open(options['relatorio'], 'w', encoding='utf-8-sig', newline='') as relatorio, \
+                    open(options['arquivo'], 'rb') as arquivo:
+                resumo = provisionar_funcionarios(
+                    arquivo, options['arquivo'], relatorio, options['workers'], options['lote'], progresso,
+                )
+        except ArquivoInvalido as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resumo['lidas']} linhas: {resumo['criadas']} funcionários criados, {resumo['rejeitadas']} rejeitados "
+            f"em {resumo['segundos']}s. Credenciais em {options['relatorio']}"
+        ))
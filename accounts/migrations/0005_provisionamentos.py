@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:46
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0004_campos_digitos'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ProvisionamentoFuncionarios',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome_arquivo', models.CharField(max_length=255, verbose_name='Arquivo enviado')),
+                ('arquivo', models.CharField(blank=True, max_length=255, verbose_name='Arquivo armazenado')),
+                ('relatorio', models.CharField(blank=True, max_length=255, verbose_name='Relatório')),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('PROCESSANDO', 'Processando'), ('CONCLUIDO', 'Concluído'), ('ERRO', 'Erro')], default='PENDENTE', max_length=12, verbose_name='Status')),
+                ('resumo', models.JSONField(blank=True, default=dict, verbose_name='Resumo')),
+                ('erro', models.TextField(blank=True, verbose_name='Erro')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('concluido_em', models.DateTimeField(blank=True, null=True, verbose_name='Concluído em')),
+                ('usuario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Provisionamento de Funcionários',
+                'verbose_name_plural': 'Provisionamentos de Funcionários',
+                'db_table': 'tb_provisionamentos',
+                'ordering': ['-criado_em'],
+                'indexes': [models.Index(fields=['status', 'criado_em'], name='idx_provisionamento_status')],
+            },
+        ),
+    ]
@@ -1,8 +1,10 @@
 from django.db import models
 from django.contrib.auth.models import User
 
+from core.models import CamposDigitosMixin
 
-class Funcionario(models.Model):
+
+class Funcionario(CamposDigitosMixin, models.Model):
     """
     Employee model - equivalent to model/Funcionario.java
     Maps to tb_funcionarios table
@@ -31,6 +33,16 @@ class Funcionario(models.Model):
     bairro = models.CharField('Bairro', max_length=100)
     cidade = models.CharField('Cidade', max_length=100)
     estado = models.CharField('Estado', max_length=2)
+    # Digits-only copies for indexed lookups (filled on save)
+    cpf_digitos = models.CharField('CPF (dígitos)', max_length=20, blank=True, editable=False, db_index=True)
+    telefone_digitos = models.CharField('Telefone (dígitos)', max_length=30, blank=True, editable=False, db_index=True)
+    celular_digitos = models.CharField('Celular (dígitos)', max_length=30, blank=True, editable=False, db_index=True)
+
+    campos_digitos = (
+        ('cpf', 'cpf_digitos', 11),
+        ('telefone', 'telefone_digitos', None),
+        ('celular', 'celular_digitos', None),
+    )
     
     class Meta:
         db_table = 'tb_funcionarios'
@@ -45,3 +57,43 @@ class Funcionario(models.Model):
     def endereco_completo(self):
         """Return complete address"""
         return f'{self.endereco}, {self.numero} - {self.bairro}, {self.cidade}/{self.estado}'
+
+
+class ProvisionamentoFuncionarios(models.Model):
+    """
+    A queued bulk provisioning (accounts.provisionamento). The upload waits
+    in the default storage until the processar_provisionamentos command
+    runs it; the credential report is kept there until its single download.
+    """
+    PENDENTE = 'PENDENTE'
+    PROCESSANDO = 'PROCESSANDO'
+    CONCLUIDO = 'CONCLUIDO'
+    ERRO = 'ERRO'
+    STATUS = [
+        (PENDENTE, 'Pendente'),
+        (PROCESSANDO, 'Processando'),
+        (CONCLUIDO, 'Concluído'),
+        (ERRO, 'Erro'),
+    ]
+
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name='Usuário')
+    nome_arquivo = models.CharField('Arquivo enviado', max_length=255)
+    arquivo = models.CharField('Arquivo armazenado', max_length=255, blank=True)
+    relatorio = models.CharField('Relatório', max_length=255, blank=True)
+    status = models.CharField('Status', max_length=12, choices=STATUS, default=PENDENTE)
+    resumo = models.JSONField('Resumo', default=dict, blank=True)
+    erro = models.TextField('Erro', blank=True)
+    criado_em = models.DateTimeField('Criado em', auto_now_add=True)
+    concluido_em = models.DateTimeField('Concluído em', null=True, blank=True)
+
+    class Meta:
+        db_table = 'tb_provisionamentos'
+        verbose_name = 'Provisionamento de Funcionários'
+        verbose_name_plural = 'Provisionamentos de Funcionários'
+        ordering = ['-criado_em']
+        indexes = [
+            models.Index(fields=['status', 'criado_em'], name='idx_provisionamento_status'),
+        ]
+
+    def __str__(self):
+        return f'{self.nome_arquivo} ({self.get_status_display()})'
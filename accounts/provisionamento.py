@@ -0,0 +1,303 @@
+"""
+Bulk employee provisioning: Funcionario rows plus their login User from a
+CSV or XLSX file.
+
+Rows are read and validated like the customer import (core.importacao):
+FuncionarioForm rules, CPF and username duplicates checked against
+in-memory sets, and rejected rows reported with their errors. Rows without
+a `senha` column get a random password.
+
+Password hashing (PBKDF2, the expensive part) runs in a process pool. One
+chunk is hashed while the previous chunk is written, so hashing and the
+bulk inserts overlap. Each chunk of users and employees is written with
+two bulk INSERTs in one transaction.
+
+The credential report lists, for every line, the username and the
+generated password, or the reason the line was rejected. Generated
+passwords exist only in this report.
+
+Uploads never run in the web process: enfileirar_provisionamento() stores
+the file and queues a ProvisionamentoFuncionarios, and the
+processar_provisionamentos command (the worker, where the process pool is
+safe to start) runs the queue. The upload and the report live in the
+private storage (settings.STORAGES['privado'], outside MEDIA_ROOT) under
+random names; the report is kept until the user downloads it once
+(retirar_relatorio).
+"""
+import csv
+import io
+import secrets
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.db import connections, transaction
+from django.utils import timezone
+
+from core.busca import agendar_indexacao
+from core.importacao import ArquivoInvalido, carregar_chaves, form_importacao, ler_planilha, mapear_colunas
+from core.paralelo import inicializar_django
+from core.utils import somente_digitos
+from .forms import FuncionarioForm
+from .models import Funcionario, ProvisionamentoFuncionarios
+
+
+TAMANHO_LOTE = 500
+TAMANHO_SENHA = 12
+ALFABETO_SENHA = 'abcdefghjkmnpqrstuvwxyzABCDEFGHJKLMNPQRSTUVWXYZ23456789'
+NIVEL_ADMINISTRADOR = 'Administrador'
+PASTA_PROVISIONAMENTOS = 'provisionamentos'
+
+
+def armazenamento():
+    """Storage of uploads and reports: never served by URL"""
+    return storages['privado']
+
+
+def gerar_senha(tamanho=TAMANHO_SENHA):
+    """Random password without look-alike characters (0/O, 1/l/I)"""
+    return ''.join(secrets.choice(ALFABETO_SENHA) for _ in range(tamanho))
+
+
+class _Hasher:
+    """make_password over a list, in a process pool when workers > 1"""
+
+    def __init__(self, workers):
+        self.workers = workers
+        self.executor = None
+
+    def __enter__(self):
+        if self.workers > 1:
+            # Workers must open their own database connections
+            connections.close_all()
+            self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=inicializar_django)
+        return self
+
+    def __exit__(self, *exc):
+        if self.executor:
+            self.executor.shutdown()
+
+    def iniciar(self, senhas):
+        """Start hashing; returns an iterator over the hashes, in order"""
+        if self.executor is None:
+            return iter([make_password(senha) for senha in senhas])
+        return self.executor.map(make_password, senhas, chunksize=max(1, len(senhas) // (self.workers * 4)))
+
+
+def provisionar_funcionarios(arquivo, nome_arquivo='', relatorio=None, workers=1,
+                             tamanho_lote=TAMANHO_LOTE, progresso=None):
+    """
+    Create the employees and users of a CSV or XLSX file opened in binary
+    mode. Columns: the FuncionarioForm fields, `username` (or usuario) and
+    optionally `senha`.
+
+    Args:
+        relatorio: text file that receives the credential report (CSV)
+        workers: processes hashing passwords (1 hashes in this process)
+        progresso: called with the running summary after every chunk
+
+    Raises:
+        ArquivoInvalido: unreadable file or missing required columns
+
+    Returns:
+        dict with the rows read, created and rejected, the elapsed time and
+        the throughput in accounts per second
+    """
+    form_class = form_importacao(FuncionarioForm)
+    campos = list(form_class._meta.fields)
+    cabecalhos, linhas = ler_planilha(arquivo, nome_arquivo)
+    colunas = mapear_colunas(
+        cabecalhos, Funcionario, campos + ['username', 'senha'],
+        apelidos={'usuario': 'username', 'login': 'username', 'password': 'senha'},
+    )
+    faltando = [campo for campo in ('nome', 'cpf', 'username') if campo not in colunas]
+    if faltando:
+        raise ArquivoInvalido(f'O arquivo precisa das colunas {", ".join(faltando)}')
+
+    campo_username = User._meta.get_field('username')
+    cpfs = carregar_chaves(Funcionario, 'cpf')
+    usernames = {nome.lower() for nome in User.objects.values_list('username', flat=True).iterator(chunk_size=10000)}
+    inicio = time.monotonic()
+    resumo = {'lidas': 0, 'criadas': 0, 'rejeitadas': 0, 'segundos': 0, 'contas_por_segundo': None}
+    escritor = csv.writer(relatorio, delimiter=';') if relatorio is not None else None
+    if escritor is not None:
+        escritor.writerow(['linha', 'nome', 'username', 'senha', 'situacao'])
+
+    def rejeitar(numero, dados, erro):
+        resumo['rejeitadas'] += 1
+        if escritor is not None:
+            escritor.writerow([numero, dados.get('nome', ''), dados.get('username', ''), '', erro])
+
+    def gravar(lote, hashes):
+        with transaction.atomic():
+            usuarios = []
+            for (_, funcionario, username, _, _), senha_hash in zip(lote, hashes):
+                usuarios.append(User(
+                    username=username, email=funcionario.email, first_name=funcionario.nome[:150],
+                    is_staff=funcionario.nivel_acesso == NIVEL_ADMINISTRADOR, is_active=True,
+                    password=senha_hash,
+                ))
+            User.objects.bulk_create(usuarios)
+            # MySQL does not return primary keys from bulk inserts
+            ids = dict(User.objects.filter(username__in=[u.username for u in usuarios]).values_list('username', 'pk'))
+            funcionarios = []
+            for _, funcionario, username, _, _ in lote:
+                funcionario.user_id = ids[username]
+                funcionario.preencher_digitos()
+                funcionarios.append(funcionario)
+            Funcionario.objects.bulk_create(funcionarios)
+            agendar_indexacao(Funcionario, list(Funcionario.objects.filter(
+                user_id__in=ids.values()
+            ).values_list('pk', flat=True)))
+
+        if escritor is not None:
+            for numero, funcionario, username, senha, gerada in lote:
+                escritor.writerow([numero, funcionario.nome, username, senha if gerada else '', 'criado'])
+        resumo['criadas'] += len(lote)
+        resumo['segundos'] = round(time.monotonic() - inicio, 3)
+        if resumo['segundos']:
+            resumo['contas_por_segundo'] = round(resumo['criadas'] / resumo['segundos'], 1)
+        if progresso:
+            progresso(resumo)
+
+    with _Hasher(workers) as hasher:
+        lote, anterior = [], None
+
+        def enviar():
+            # Hash this chunk in the pool, then write the previous one meanwhile
+            nonlocal lote, anterior
+            atual = (lote, hasher.iniciar([item[3] for item in lote])) if lote else None
+            if anterior:
+                gravar(*anterior)
+            anterior, lote = atual, []
+
+        for numero, linha in enumerate(linhas, start=2):
+            if not any(str(valor).strip() for valor in linha):
+                continue
+            resumo['lidas'] += 1
+            dados = {
+                campo: str(linha[indice]).strip() if indice < len(linha) else ''
+                for campo, indice in colunas.items()
+            }
+
+            form = form_class(dados)
+            erros = [] if form.is_valid() else [
+                f'{campo}: {" ".join(mensagens)}' for campo, mensagens in form.errors.items()
+            ]
+            username = dados.get('username', '')
+            try:
+                campo_username.clean(username, None)
+            except ValidationError as e:
+                erros.append(f'username: {" ".join(e.messages)}')
+            else:
+                if username.lower() in usernames:
+                    erros.append('username: já está em uso')
+            if erros:
+                rejeitar(numero, dados, '; '.join(erros))
+                continue
+
+            digitos = somente_digitos(form.cleaned_data['cpf'])
+            if digitos in cpfs:
+                rejeitar(numero, dados, 'cpf: já cadastrado')
+                continue
+
+            senha = dados.get('senha') or ''
+            gerada = not senha
+            if gerada:
+                senha = gerar_senha()
+            else:
+                try:
+                    validate_password(senha, User(username=username, email=form.cleaned_data['email']))
+                except ValidationError as e:
+                    rejeitar(numero, dados, f'senha: {" ".join(e.messages)}')
+                    continue
+
+            cpfs[digitos] = numero
+            usernames.add(username.lower())
+            lote.append((numero, form.save(commit=False), username, senha, gerada))
+            if len(lote) >= tamanho_lote:
+                enviar()
+
+        # The last chunk, then the write of the last chunk
+        enviar()
+        enviar()
+
+    resumo['segundos'] = round(time.monotonic() - inicio, 3)
+    return resumo
+
+
+def enfileirar_provisionamento(arquivo, usuario):
+    """Store an uploaded file and queue its provisioning; returns the ProvisionamentoFuncionarios"""
+    nome = armazenamento().save(
+        f'{PASTA_PROVISIONAMENTOS}/envio-{timezone.now():%Y%m%d-%H%M%S}-{secrets.token_hex(16)}', arquivo,
+    )
+    return ProvisionamentoFuncionarios.objects.create(usuario=usuario, nome_arquivo=arquivo.name, arquivo=nome)
+
+
+def processar_provisionamento(provisionamento, workers=1, progresso=None):
+    """
+    Run one queued provisioning, unless another worker already took it.
+    Returns False when it was not pending.
+    """
+    if not ProvisionamentoFuncionarios.objects.filter(
+        pk=provisionamento.pk, status=ProvisionamentoFuncionarios.PENDENTE,
+    ).update(status=ProvisionamentoFuncionarios.PROCESSANDO):
+        return False
+
+    relatorio = io.StringIO()
+    alteracoes = {'status': ProvisionamentoFuncionarios.CONCLUIDO}
+    try:
+        with armazenamento().open(provisionamento.arquivo, 'rb') as arquivo:
+            alteracoes['resumo'] = provisionar_funcionarios(
+                arquivo, provisionamento.nome_arquivo, relatorio, workers=workers, progresso=progresso,
+            )
+    except ArquivoInvalido as e:
+        alteracoes.update(status=ProvisionamentoFuncionarios.ERRO, erro=str(e))
+    except Exception as e:
+        alteracoes.update(status=ProvisionamentoFuncionarios.ERRO, erro=f'Falha inesperada: {e}')
+        raise
+    finally:
+        # Chunks written before a failure stay: their lines are in the report
+        if relatorio.tell():
+            alteracoes['relatorio'] = armazenamento().save(
+                f'{PASTA_PROVISIONAMENTOS}/credenciais-{secrets.token_hex(16)}.csv',
+                ContentFile(relatorio.getvalue().encode('utf-8-sig')),
+            )
+        # The upload may hold passwords: it is not kept after the run
+        armazenamento().delete(provisionamento.arquivo)
+        ProvisionamentoFuncionarios.objects.filter(pk=provisionamento.pk).update(
+            arquivo='', concluido_em=timezone.now(), **alteracoes,
+        )
+    return True
+
+
+def processar_pendentes(workers=1, progresso=None):
+    """Run every pending provisioning, oldest first; returns how many were run"""
+    processados = 0
+    pendentes = ProvisionamentoFuncionarios.objects.filter(
+        status=ProvisionamentoFuncionarios.PENDENTE,
+    ).order_by('criado_em')
+    for provisionamento in pendentes:
+        processados += processar_provisionamento(provisionamento, workers, progresso)
+    return processados
+
+
+def retirar_relatorio(provisionamento):
+    """
+    Contents of the credential report, deleted from the storage as it is
+    handed out; None when there is no report or it was already taken
+    """
+    nome = provisionamento.relatorio
+    if not nome or not ProvisionamentoFuncionarios.objects.filter(
+        pk=provisionamento.pk, relatorio=nome,
+    ).update(relatorio=''):
+        return None
+    with armazenamento().open(nome, 'rb') as arquivo:
+        conteudo = arquivo.read()
+    armazenamento().delete(nome)
+    return conteudo
@@ -0,0 +1,81 @@
+import csv
+import io
+import os
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from .models import Funcionario, ProvisionamentoFuncionarios
+from .provisionamento import provisionar_funcionarios
+
+
+class ProvisionamentoTestCase(TestCase):
+    """Test the bulk employee provisioning"""
+
+    CABECALHO = 'Nome;CPF;E-mail;Cargo;Nível de Acesso;Telefone;Celular;CEP;Endereço;Número;Bairro;Cidade;Estado;usuario;senha\n'
+    ENDERECO = '1140041000;11987654321;13345325;Rua A;1;Centro;Campinas;SP'
+
+    def arquivo(self, *linhas):
+        return io.BytesIO((self.CABECALHO + ''.join(f'{linha}\n' for linha in linhas)).encode())
+
+    def test_cria_usuarios_e_relatorio(self):
+        User.objects.create_user('existente')
+        relatorio = io.StringIO()
+        resumo = provisionar_funcionarios(self.arquivo(
+            f'Ana;123.456.789-01;ana@x.com;Vendedora;Usuario;{self.ENDERECO};ana;',
+            f'Bia;98765432100;bia@x.com;Gerente;Administrador;{self.ENDERECO};bia;Zq8#mPw2!vLx',
+            f'Caio;11122233344;caio@x.com;Caixa;Usuario;{self.ENDERECO};existente;',
+            f'Dani;123.456.789-01;dani@x.com;Caixa;Usuario;{self.ENDERECO};dani;',
+            f'Edu;55566677788;edu@x.com;Caixa;Usuario;{self.ENDERECO};edu;123',
+        ), 'funcionarios.csv', relatorio, tamanho_lote=1)
+
+        self.assertEqual((resumo['lidas'], resumo['criadas'], resumo['rejeitadas']), (5, 2, 3))
+        linhas = {linha['nome']: linha for linha in csv.DictReader(io.StringIO(relatorio.getvalue()), delimiter=';')}
+        self.assertIn('já está em uso', linhas['Caio']['situacao'])
+        self.assertIn('cpf: já cadastrado', linhas['Dani']['situacao'])
+        self.assertTrue(linhas['Edu']['situacao'].startswith('senha:'))
+
+        ana = Funcionario.objects.select_related('user').get(cpf_digitos='12345678901')
+        self.assertTrue(ana.user.check_password(linhas['Ana']['senha']))
+        self.assertFalse(ana.user.is_staff)
+        bia = User.objects.get(username='bia')
+        self.assertTrue(bia.check_password('Zq8#mPw2!vLx') and bia.is_staff)
+        self.assertEqual(linhas['Bia']['senha'], '')
+
+    def test_upload_enfileirado_e_relatorio_baixado_uma_vez(self):
+        self.client.force_login(User.objects.create_user('gerente'))
+        with tempfile.TemporaryDirectory() as pasta, tempfile.TemporaryDirectory() as media, override_settings(
+            MEDIA_ROOT=media, STORAGES={**settings.STORAGES, 'privado': {
+                'BACKEND': 'django.core.files.storage.FileSystemStorage', 'OPTIONS': {'location': pasta},
+            }},
+        ):
+            resposta = self.client.post(reverse('accounts:provisionar'), {'arquivo': SimpleUploadedFile(
+                'funcionarios.csv', self.arquivo(f'Ana;12345678901;ana@x.com;Vendedora;Usuario;{self.ENDERECO};ana;').read()
+            )})
+            self.assertEqual(resposta.status_code, 302)
+            # Nothing is hashed or written in the request
+            self.assertFalse(User.objects.filter(username='ana').exists())
+
+            call_command('processar_provisionamentos', workers=2, stdout=io.StringIO())
+            provisionamento = ProvisionamentoFuncionarios.objects.get()
+            self.assertEqual(provisionamento.status, ProvisionamentoFuncionarios.CONCLUIDO)
+            self.assertEqual(provisionamento.arquivo, '')
+            # Private storage, random name: nothing under MEDIA_ROOT
+            self.assertRegex(provisionamento.relatorio, r'^provisionamentos/credenciais-[0-9a-f]{32}\.csv$')
+            self.assertEqual(os.listdir(media), [])
+
+            url = reverse('accounts:provisionamento_relatorio', args=[provisionamento.pk])
+            self.assertContains(self.client.get(reverse('accounts:provisionar')), url)
+            resposta = self.client.get(url)
+            self.assertEqual(resposta['Cache-Control'], 'no-store')
+            linha = list(csv.DictReader(io.StringIO(resposta.content.decode('utf-8-sig')), delimiter=';'))[0]
+            self.assertEqual(linha['situacao'], 'criado')
+            self.assertTrue(User.objects.get(username='ana').check_password(linha['senha']))
+
+            self.assertEqual(self.client.get(url).status_code, 404)
+            self.assertEqual(os.listdir(os.path.join(pasta, 'provisionamentos')), [])
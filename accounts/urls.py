@@ -7,6 +7,8 @@ app_name = 'accounts'
 urlpatterns = [
     path('', views.FuncionarioListView.as_view(), name='list'),
     path('novo/', views.FuncionarioCreateView.as_view(), name='create'),
+    path('importar/', views.ProvisionamentoFuncionariosView.as_view(), name='provisionar'),
+    path('importar/<int:pk>/relatorio/', views.RelatorioProvisionamentoView.as_view(), name='provisionamento_relatorio'),
     path('editar/<int:pk>/', views.FuncionarioUpdateView.as_view(), name='update'),
     path('excluir/<int:pk>/', views.FuncionarioDeleteView.as_view(), name='delete'),
     path('alterar-senha/', views.AccountPasswordChangeView.as_view(), name='password_change'),
@@ -3,13 +3,19 @@ from django.contrib.auth.views import PasswordChangeView, PasswordChangeDoneView
 from django.contrib import messages
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
-from django.db.models import Q
 from django.shortcuts import render, redirect
 from django.contrib.auth.views import LoginView as DjangoLoginView, LogoutView as DjangoLogoutView
 from .forms import UserRegisterForm
 
-from .models import Funcionario
-from .forms import FuncionarioSearchForm, FuncionarioCreateForm, FuncionarioUpdateForm
+from django.http import Http404, HttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils import timezone
+from django.views import View
+
+from core.busca import filtrar_busca
+from .models import Funcionario, ProvisionamentoFuncionarios
+from .forms import FuncionarioSearchForm, FuncionarioCreateForm, FuncionarioUpdateForm, ProvisionamentoForm
+from .provisionamento import enfileirar_provisionamento, retirar_relatorio
 
 
 LIST_URL = reverse_lazy('accounts:list')
@@ -27,11 +33,9 @@ class FuncionarioListView(LoginRequiredMixin, ListView):
         search = self.request.GET.get('search')
         
         if search:
-            queryset = queryset.filter(
-                Q(nome__icontains=search) |
-                Q(cpf__icontains=search) |
-                Q(email__icontains=search)
-            )
+            # Documents and phones: exact or prefix seek on the digits columns
+            filtro = Funcionario.filtro_digitos(search)
+            queryset = queryset.filter(filtro) if filtro else filtrar_busca(queryset, search)
         
         return queryset
     
@@ -57,6 +61,54 @@ class FuncionarioCreateView(LoginRequiredMixin, CreateView):
         return response
 
 
+class ProvisionamentoFuncionariosView(LoginRequiredMixin, View):
+    """
+    Bulk employee provisioning from a CSV/XLSX upload: the file is only
+    queued here and the processar_provisionamentos worker runs it; the page
+    lists the user's uploads and their credential reports
+    """
+    template_name = 'accounts/provisionamento.html'
+
+    def contexto(self, form):
+        return {
+            'form': form,
+            'provisionamentos': ProvisionamentoFuncionarios.objects.filter(usuario=self.request.user)[:10],
+        }
+
+    def get(self, request):
+        return render(request, self.template_name, self.contexto(ProvisionamentoForm()))
+
+    def post(self, request):
+        form = ProvisionamentoForm(request.POST, request.FILES)
+        if not form.is_valid():
+            return render(request, self.template_name, self.contexto(form))
+
+        enfileirar_provisionamento(form.cleaned_data['arquivo'], request.user)
+        messages.success(
+            request,
+            'Arquivo recebido. Os funcionários serão cadastrados em segundo plano; '
+            'o relatório de credenciais ficará disponível nesta página.'
+        )
+        return redirect('accounts:provisionar')
+
+
+class RelatorioProvisionamentoView(LoginRequiredMixin, View):
+    """Download the credential report of a provisioning; it is deleted once taken"""
+
+    def get(self, request, pk):
+        provisionamento = get_object_or_404(ProvisionamentoFuncionarios, pk=pk, usuario=request.user)
+        conteudo = retirar_relatorio(provisionamento)
+        if conteudo is None:
+            raise Http404('Relatório indisponível ou já baixado')
+
+        resposta = HttpResponse(conteudo, content_type='text/csv; charset=utf-8')
+        resposta['Content-Disposition'] = (
+            f'attachment; filename="credenciais-{timezone.localtime(provisionamento.criado_em):%Y%m%d-%H%M%S}.csv"'
+        )
+        resposta['Cache-Control'] = 'no-store'
+        return resposta
+
+
 class FuncionarioUpdateView(LoginRequiredMixin, UpdateView):
     """Update employee"""
     model = Funcionario
@@ -1,5 +1,10 @@
 """
 ASGI config for Sistema de Vendas project.
+
+Serve with an ASGI server (uvicorn config.asgi:application) to stream the
+live dashboard updates (core.eventos); under WSGI the dashboard is static.
+The exports (core.exportacao) switch to async bodies under ASGI, so they
+still stream instead of being buffered by the handler.
 """
 
 import os
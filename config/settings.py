@@ -4,6 +4,7 @@ Django settings for Sistema de Vendas project.
 import pymysql
 pymysql.install_as_MySQLdb()
 import os
+import sys
 from pathlib import Path
 from decouple import config
 
@@ -67,6 +68,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'config.wsgi.application'
+ASGI_APPLICATION = 'config.asgi.application'
 
 # Database
 DATABASES = {
@@ -115,6 +117,22 @@ STATICFILES_DIRS = [BASE_DIR / 'static']
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Private files (provisioning uploads and credential reports): outside
+# MEDIA_ROOT, so no URL serves them; only the views that own them read them
+ARQUIVOS_PRIVADOS = config('ARQUIVOS_PRIVADOS', default=str(BASE_DIR / 'privado'))
+STORAGES = {
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+    'privado': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+        'OPTIONS': {
+            'location': ARQUIVOS_PRIVADOS,
+            'file_permissions_mode': 0o600,
+            'directory_permissions_mode': 0o700,
+        },
+    },
+}
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -122,6 +140,75 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CRISPY_ALLOWED_TEMPLATE_PACKS = "bootstrap5"
 CRISPY_TEMPLATE_PACK = "bootstrap5"
 
+# Cache: a per-process LRU (core.cache.CacheEmCamadas) in front of a shared
+# tier given by CACHE_COMPARTILHADO: redis://host:port/db, memcached://host:port,
+# locmem (the default: single process, no sharing) or a directory for a
+# file-based cache. The test runner always uses locmem, so runs neither
+# share cached data nor write it to disk.
+# CACHE_TTL_LOCAL bounds how long a process serves a value changed elsewhere.
+TESTANDO = sys.argv[1:2] == ['test']
+CACHE_COMPARTILHADO = 'locmem' if TESTANDO else config('CACHE_COMPARTILHADO', default='locmem')
+if CACHE_COMPARTILHADO.startswith(('redis://', 'rediss://')):
+    CACHE_BACKEND_COMPARTILHADO = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': CACHE_COMPARTILHADO,
+    }
+elif CACHE_COMPARTILHADO.startswith('memcached://'):
+    CACHE_BACKEND_COMPARTILHADO = {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': CACHE_COMPARTILHADO.removeprefix('memcached://'),
+    }
+elif CACHE_COMPARTILHADO == 'locmem':
+    CACHE_BACKEND_COMPARTILHADO = {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}
+else:
+    CACHE_BACKEND_COMPARTILHADO = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_COMPARTILHADO,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+CACHES = {
+    'default': {
+        'BACKEND': 'core.cache.CacheEmCamadas',
+        'LOCATION': 'compartilhado',
+        'OPTIONS': {
+            'TAMANHO_LOCAL': config('CACHE_TAMANHO_LOCAL', default=1000, cast=int),
+            'TTL_LOCAL': config('CACHE_TTL_LOCAL', default=5, cast=int),
+        },
+    },
+    'compartilhado': CACHE_BACKEND_COMPARTILHADO,
+}
+
+# Sessions without database queries: signed cookies by default; with
+# SESSION_ENGINE=django.contrib.sessions.backends.cache they live in the
+# shared cache tier instead (never in the per-process LRU)
+SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.signed_cookies')
+SESSION_CACHE_ALIAS = 'compartilhado'
+SESSION_COOKIE_HTTPONLY = True
+
+# Users are read through the cache (core.autenticacao), so an authenticated
+# request needs no query to identify the user
+AUTHENTICATION_BACKENDS = ['core.autenticacao.BackendEmCache']
+
+# Dashboard statistics snapshot: maximum age in seconds
+DASHBOARD_CACHE_TIMEOUT = config('DASHBOARD_CACHE_TIMEOUT', default=60, cast=int)
+
+# Live dashboard (core.eventos, ASGI only): seconds between the polls of the
+# event table, one poll per process whatever the number of open dashboards
+DASHBOARD_EVENTOS_INTERVALO = config('DASHBOARD_EVENTOS_INTERVALO', default=1, cast=float)
+
+# CEP lookups (core.cep): webservice URL ({cep} is replaced), (connect, read)
+# timeouts in seconds, days before a cached CEP is refreshed, size of the
+# per-process LRU, and the circuit breaker (failures to open, seconds open)
+CEP_URL = config('CEP_URL', default='https://viacep.com.br/ws/{cep}/json/')
+CEP_TIMEOUT = (1, config('CEP_TIMEOUT', default=3, cast=float))
+CEP_TTL_DIAS = config('CEP_TTL_DIAS', default=90, cast=int)
+CEP_CACHE_MEMORIA = config('CEP_CACHE_MEMORIA', default=10000, cast=int)
+CEP_DISJUNTOR_FALHAS = config('CEP_DISJUNTOR_FALHAS', default=5, cast=int)
+CEP_DISJUNTOR_ESPERA = config('CEP_DISJUNTOR_ESPERA', default=30, cast=int)
+
+# Processes hashing passwords in the provisioning worker (processar_provisionamentos)
+PROVISIONAMENTO_WORKERS = config('PROVISIONAMENTO_WORKERS', default=os.cpu_count() or 1, cast=int)
+
 # Login/Logout URLs
 LOGIN_URL = 'core:login'
 LOGIN_REDIRECT_URL = 'core:dashboard'
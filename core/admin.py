@@ -1,4 +1,18 @@
 from django.contrib import admin
 
-# Register your models here.
-# Core app doesn't have models, only utilities and views
+from .models import Cep, DocumentoBusca
+
+
+@admin.register(DocumentoBusca)
+class DocumentoBuscaAdmin(admin.ModelAdmin):
+    list_display = ['tipo', 'objeto_id', 'titulo', 'detalhe', 'atualizado_em']
+    list_filter = ['tipo']
+    search_fields = ['titulo']
+    readonly_fields = ['tipo', 'objeto_id', 'titulo', 'detalhe', 'atualizado_em']
+
+
+@admin.register(Cep)
+class CepAdmin(admin.ModelAdmin):
+    list_display = ['cep', 'logradouro', 'bairro', 'cidade', 'uf', 'encontrado', 'origem', 'atualizado_em']
+    list_filter = ['origem', 'encontrado', 'uf']
+    search_fields = ['cep']
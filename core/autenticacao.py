@@ -0,0 +1,67 @@
+"""
+Authentication backend that keeps users in the cache.
+
+With signed-cookie sessions the session costs no query; this backend
+removes the other per-request query, the auth_user lookup done by
+AuthenticationMiddleware. Users are cached in the `usuarios` namespace,
+which model signals (core.signals) invalidate whenever a user is saved or
+deleted, including the last_login update on every login.
+
+The password hash is never cached. The entry keeps the other columns and
+the session auth hashes (keyed HMACs of the password, which is all the
+session check needs); the rebuilt user has `password` deferred, so a
+save() does not write it and reading it costs one query.
+"""
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.db import DEFAULT_DB_ALIAS
+
+from .cache import em_cache
+
+
+CACHE_USUARIOS = 'usuarios'
+TEMPO_CACHE = 15 * 60
+
+
+def _para_cache(usuario):
+    if usuario is None:
+        return None
+    return {
+        'campos': {
+            campo.attname: getattr(usuario, campo.attname)
+            for campo in usuario._meta.concrete_fields if campo.attname != 'password'
+        },
+        'hash_sessao': usuario.get_session_auth_hash(),
+        'hashes_anteriores': list(usuario.get_session_auth_fallback_hash()),
+    }
+
+
+def _do_cache(dados):
+    campos = dados['campos']
+    usuario = get_user_model().from_db(DEFAULT_DB_ALIAS, list(campos), list(campos.values()))
+    classe = type(usuario)
+
+    # The session checks are answered without reading the password, until
+    # it is loaded or changed (set_password before update_session_auth_hash)
+    def hash_sessao():
+        if 'password' in usuario.get_deferred_fields():
+            return dados['hash_sessao']
+        return classe.get_session_auth_hash(usuario)
+
+    def hashes_anteriores():
+        if 'password' in usuario.get_deferred_fields():
+            return iter(dados['hashes_anteriores'])
+        return classe.get_session_auth_fallback_hash(usuario)
+
+    usuario.get_session_auth_hash = hash_sessao
+    usuario.get_session_auth_fallback_hash = hashes_anteriores
+    return usuario
+
+
+class BackendEmCache(ModelBackend):
+    """ModelBackend whose get_user() reads through the cache"""
+
+    def get_user(self, user_id):
+        buscar = super().get_user
+        dados = em_cache(CACHE_USUARIOS, (user_id,), lambda: _para_cache(buscar(user_id)), TEMPO_CACHE)
+        return _do_cache(dados) if dados is not None else None
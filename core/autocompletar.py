@@ -0,0 +1,111 @@
+"""
+Typeahead (autocomplete) endpoints and the select widget that uses them.
+
+Large tables are not rendered as <option> lists: the widget renders only
+the selected choice and the browser fetches the rest as the user types
+(static/js/autocompletar.js). Each search is a prefix match on an indexed
+column (LIKE 'termo%' is an index range scan on MySQL, whose default
+collation is already case-insensitive), so its cost does not depend on the
+size of the table. Results are ranked by recent sales: the most popular
+matches first, then the remaining matches in index order.
+"""
+from datetime import timedelta
+
+from django import forms
+from django.contrib.auth.mixins import LoginRequiredMixin
+from django.http import JsonResponse
+from django.utils import timezone
+from django.views import View
+
+
+class AutocompletarView(LoginRequiredMixin, View):
+    """
+    JSON typeahead endpoint: GET ?q=<termo> returns
+    {"resultados": [{"id": ..., "texto": ...}, ...]}.
+
+    Subclasses set `model` and `campo_busca` (an indexed column) and may
+    override filtrar() for other kinds of terms and populares() to rank
+    the matches by recent sales.
+    """
+    model = None
+    campo_busca = None
+    limite = 20
+    limite_maximo = 50
+    tamanho_minimo = 1
+    dias_popularidade = 90
+
+    def get_queryset(self):
+        return self.model._default_manager.all()
+
+    def filtrar(self, queryset, termo):
+        """Prefix match on `campo_busca`; returns (queryset, ordering)"""
+        return queryset.filter(**{f'{self.campo_busca}__istartswith': termo}), (self.campo_busca, 'pk')
+
+    def populares(self, queryset, desde, limite):
+        """Primary keys of the most sold matches since `desde`, best first"""
+        return []
+
+    def resultado(self, obj):
+        return {'id': obj.pk, 'texto': str(obj)}
+
+    def buscar(self, termo, limite):
+        queryset, ordem = self.filtrar(self.get_queryset(), termo)
+        desde = timezone.localdate() - timedelta(days=self.dias_popularidade)
+
+        ids = list(self.populares(queryset, desde, limite))[:limite]
+        por_id = queryset.in_bulk(ids) if ids else {}
+        objetos = [por_id[pk] for pk in ids if pk in por_id]
+
+        if len(objetos) < limite:
+            objetos += queryset.exclude(pk__in=ids).order_by(*ordem)[:limite - len(objetos)]
+        return objetos
+
+    def get(self, request):
+        termo = request.GET.get('q', '').strip()
+        try:
+            limite = min(int(request.GET.get('limite', self.limite)), self.limite_maximo)
+        except ValueError:
+            limite = self.limite
+
+        if len(termo) < self.tamanho_minimo or limite < 1:
+            return JsonResponse({'resultados': []})
+
+        return JsonResponse({
+            'resultados': [self.resultado(obj) for obj in self.buscar(termo, limite)],
+        })
+
+
+class AutocompletarSelect(forms.Select):
+    """
+    Select for a ModelChoiceField that renders only the selected option;
+    the other options are fetched from `url` (an AutocompletarView) as
+    the user types.
+    """
+
+    def __init__(self, url, attrs=None):
+        attrs = {'class': 'form-select', **(attrs or {})}
+        super().__init__(attrs)
+        self.url = url
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs']['data-autocompletar'] = str(self.url)
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        campo = self.choices.field
+        opcoes = []
+        if campo.empty_label is not None:
+            opcoes.append(self.create_option(name, '', campo.empty_label, not value, 0))
+
+        selecionados = [valor for valor in value if valor not in campo.empty_values]
+        if selecionados:
+            try:
+                objetos = campo.queryset.filter(pk__in=selecionados)
+                for objeto in objetos:
+                    opcoes.append(self.create_option(
+                        name, objeto.pk, campo.label_from_instance(objeto), True, len(opcoes)
+                    ))
+            except (TypeError, ValueError):
+                pass
+        return [(None, opcoes, 0)]
@@ -0,0 +1,405 @@
+"""
+Global search index over customers, suppliers, employees, products and sales.
+
+Every indexed object has a DocumentoBusca (what the results show) and one
+TermoBusca per distinct token of its searchable fields. Tokens are
+normalized: lowercase, accents folded ("João" -> "joao") and split on
+anything that is not a letter or digit; document numbers (CPF, CNPJ) also
+get a digits-only token. A search term is normalized the same way and each
+of its tokens must prefix-match a token of the object, so "joao sil"
+finds "João da Silva". Prefix matches are index range scans on
+(termo, tipo, objeto_id) instead of the leading-wildcard LIKE scans of
+__icontains.
+
+Results are ranked by the weight of the fields that matched (a name beats
+an e-mail) and exact token matches count double.
+
+The index is kept up to date by the model signals in core.signals: changed
+objects are queued and reindexed together, set-based, when the
+transaction commits. Bulk writes that bypass signals call
+agendar_indexacao() themselves. `manage.py reconstruir_indice_busca`
+rebuilds it from scratch.
+"""
+import threading
+import unicodedata
+from collections import defaultdict
+
+from django.apps import apps
+from django.db import connection, transaction
+from django.db.models import Case, F, IntegerField, Max, Q, Value, When
+from django.urls import reverse
+
+from .exportacao import iterar_em_lotes
+from .models import DocumentoBusca, TermoBusca
+
+
+TAMANHO_TERMO = 40
+MAX_TOKENS_BUSCA = 6
+MAX_TERMOS_TEXTO = 50
+LOTE_INDEXACAO = 1000
+SQL_INSERIR_TERMOS = 'INSERT INTO {} ({}) VALUES (%s, %s, %s, %s)'.format(
+    TermoBusca._meta.db_table,
+    ', '.join(TermoBusca._meta.get_field(campo).column for campo in ('tipo', 'objeto_id', 'termo', 'peso')),
+)
+
+
+def normalizar(texto):
+    """Lowercase, accent-folded text with only letters, digits and spaces"""
+    decomposto = unicodedata.normalize('NFKD', str(texto or ''))
+    sem_acentos = ''.join(c for c in decomposto if not unicodedata.combining(c))
+    return ''.join(c if c.isalnum() else ' ' for c in sem_acentos.lower())
+
+
+def tokens(texto):
+    """Distinct normalized tokens of `texto`, in order"""
+    return list(dict.fromkeys(token[:TAMANHO_TERMO] for token in normalizar(texto).split()))
+
+
+def digitos(texto):
+    return ''.join(c for c in str(texto or '') if c.isdigit())
+
+
+class Indexador:
+    """
+    How one model is indexed. Subclasses define the model, the result
+    title and detail, and the weighted texts to tokenize.
+
+    `dependentes` lists (tipo, campo) pairs of other indexed models whose
+    texts include this model's title: when the title changes, the objects
+    with campo in the changed ids are reindexed too.
+    """
+    tipo = None
+    nome = None
+    modelo = None
+    url = None
+    select_related = ()
+    dependentes = ()
+
+    @property
+    def model(self):
+        return apps.get_model(self.modelo)
+
+    def get_queryset(self):
+        return self.model._default_manager.select_related(*self.select_related)
+
+    def titulo(self, obj):
+        return str(obj)
+
+    def detalhe(self, obj):
+        return ''
+
+    def textos(self, obj):
+        """[(texto, peso, documento)]: documento=True adds a digits-only token"""
+        return []
+
+    def termos(self, obj):
+        """{termo: peso} of `obj`, keeping the heaviest field per token"""
+        termos = {}
+        for texto, peso, documento in self.textos(obj):
+            candidatos = tokens(texto)[:MAX_TERMOS_TEXTO]
+            if documento and len(digitos(texto)) > 1:
+                candidatos.append(digitos(texto)[:TAMANHO_TERMO])
+            for termo in candidatos:
+                termos[termo] = max(peso, termos.get(termo, 0))
+        return termos
+
+    def get_url(self, objeto_id):
+        return reverse(self.url, args=[objeto_id])
+
+
+class ClienteIndexador(Indexador):
+    tipo = 'cliente'
+    nome = 'Cliente'
+    modelo = 'customers.Cliente'
+    url = 'customers:update'
+    dependentes = (('venda', 'cliente_id'),)
+
+    def titulo(self, obj):
+        return obj.nome
+
+    def detalhe(self, obj):
+        return f'CPF {obj.cpf} - {obj.cidade}/{obj.estado}'
+
+    def textos(self, obj):
+        return [(obj.nome, 3, False), (obj.cpf, 3, True), (obj.email, 2, False), (obj.cidade, 1, False)]
+
+
+class FornecedorIndexador(Indexador):
+    tipo = 'fornecedor'
+    nome = 'Fornecedor'
+    modelo = 'suppliers.Fornecedor'
+    url = 'suppliers:update'
+    dependentes = (('produto', 'fornecedor_id'),)
+
+    def titulo(self, obj):
+        return obj.nome
+
+    def detalhe(self, obj):
+        return f'CNPJ {obj.cnpj} - {obj.cidade}/{obj.estado}'
+
+    def textos(self, obj):
+        return [(obj.nome, 3, False), (obj.cnpj, 3, True), (obj.email, 2, False), (obj.cidade, 1, False)]
+
+
+class FuncionarioIndexador(Indexador):
+    tipo = 'funcionario'
+    nome = 'Funcionário'
+    modelo = 'accounts.Funcionario'
+    url = 'accounts:update'
+
+    def titulo(self, obj):
+        return obj.nome
+
+    def detalhe(self, obj):
+        return obj.cargo
+
+    def textos(self, obj):
+        return [(obj.nome, 3, False), (obj.cpf, 3, True), (obj.email, 2, False), (obj.cargo, 1, False)]
+
+
+class ProdutoIndexador(Indexador):
+    tipo = 'produto'
+    nome = 'Produto'
+    modelo = 'inventory.Produto'
+    url = 'inventory:update'
+    select_related = ('fornecedor',)
+
+    def titulo(self, obj):
+        return obj.descricao
+
+    def detalhe(self, obj):
+        return f'R$ {obj.preco} - {obj.fornecedor.nome}'
+
+    def textos(self, obj):
+        return [(obj.descricao, 3, False), (str(obj.pk), 2, False), (obj.fornecedor.nome, 1, False)]
+
+
+class VendaIndexador(Indexador):
+    tipo = 'venda'
+    nome = 'Venda'
+    modelo = 'sales.Venda'
+    url = 'sales:detail'
+    select_related = ('cliente',)
+
+    def titulo(self, obj):
+        return f'Venda #{obj.pk}'
+
+    def detalhe(self, obj):
+        return f'{obj.cliente.nome} - {obj.data_venda:%d/%m/%Y} - R$ {obj.total_venda}'
+
+    def textos(self, obj):
+        return [(str(obj.pk), 3, False), (obj.cliente.nome, 2, False), (obj.observacoes, 1, False)]
+
+
+INDEXADORES = {
+    indexador.tipo: indexador
+    for indexador in (
+        ClienteIndexador(), FornecedorIndexador(), FuncionarioIndexador(),
+        ProdutoIndexador(), VendaIndexador(),
+    )
+}
+POR_MODELO = {indexador.modelo.lower(): indexador for indexador in INDEXADORES.values()}
+
+
+def indexador_do_modelo(model):
+    return POR_MODELO[model._meta.label_lower]
+
+
+@transaction.atomic
+def indexar(tipo, ids):
+    """
+    Bring the index of objects `ids` of `tipo` in line with the database:
+    existing objects are (re)indexed and missing ones removed, with a fixed
+    number of queries per chunk of LOTE_INDEXACAO objects.
+    Returns the number of objects indexed.
+    """
+    indexador = INDEXADORES[tipo]
+    ids = sorted({int(pk) for pk in ids})
+    total = 0
+
+    for inicio in range(0, len(ids), LOTE_INDEXACAO):
+        lote = ids[inicio:inicio + LOTE_INDEXACAO]
+        objetos = list(indexador.get_queryset().filter(pk__in=lote))
+        total += len(objetos)
+        _gravar(indexador, lote, objetos)
+
+    return total
+
+
+def _gravar(indexador, lote, objetos):
+    titulos_anteriores = dict(
+        DocumentoBusca.objects.filter(tipo=indexador.tipo, objeto_id__in=lote).values_list('objeto_id', 'titulo')
+    )
+    existentes = {obj.pk for obj in objetos}
+    removidos = [pk for pk in lote if pk not in existentes]
+    if removidos:
+        DocumentoBusca.objects.filter(tipo=indexador.tipo, objeto_id__in=removidos).delete()
+
+    TermoBusca.objects.filter(tipo=indexador.tipo, objeto_id__in=lote).delete()
+    if not objetos:
+        return
+
+    documentos = [
+        DocumentoBusca(
+            tipo=indexador.tipo, objeto_id=obj.pk,
+            titulo=indexador.titulo(obj)[:200], detalhe=indexador.detalhe(obj)[:255],
+        )
+        for obj in objetos
+    ]
+    DocumentoBusca.objects.bulk_create(
+        documentos, update_conflicts=True,
+        unique_fields=['tipo', 'objeto_id'], update_fields=['titulo', 'detalhe', 'atualizado_em'],
+    )
+    # Plain executemany: each object has a few dozen terms, and building a
+    # model instance per term costs more than the insert itself
+    # (MySQLdb sends executemany INSERTs as multi-row statements)
+    termos = [
+        (indexador.tipo, obj.pk, termo, peso)
+        for obj in objetos
+        for termo, peso in indexador.termos(obj).items()
+    ]
+    with connection.cursor() as cursor:
+        cursor.executemany(SQL_INSERIR_TERMOS, termos)
+
+    # Objects that show this one's title in their own texts
+    renomeados = [
+        documento.objeto_id for documento in documentos
+        if documento.objeto_id in titulos_anteriores and titulos_anteriores[documento.objeto_id] != documento.titulo
+    ]
+    for tipo, campo in indexador.dependentes if renomeados else ():
+        dependentes = INDEXADORES[tipo].model._default_manager.filter(**{f'{campo}__in': renomeados})
+        for lote_dependentes in iterar_em_lotes(dependentes, ['pk'], ('pk',), LOTE_INDEXACAO):
+            indexar(tipo, [linha[0] for linha in lote_dependentes])
+
+
+def reconstruir(tipo, tamanho_lote=LOTE_INDEXACAO):
+    """Drop and rebuild the whole index of `tipo`; returns the number of objects"""
+    indexador = INDEXADORES[tipo]
+    total = 0
+    with transaction.atomic():
+        TermoBusca.objects.filter(tipo=tipo).delete()
+        DocumentoBusca.objects.filter(tipo=tipo).delete()
+        for lote in iterar_em_lotes(indexador.model._default_manager.all(), ['pk'], ('pk',), tamanho_lote):
+            total += indexar(tipo, [linha[0] for linha in lote])
+    return total
+
+
+def _novo_lote():
+    """Callback that reindexes the objects queued in one transaction"""
+    pendentes = defaultdict(set)
+
+    def indexar_pendentes():
+        indexar_pendentes.executado = True
+        for tipo, ids in pendentes.items():
+            indexar(tipo, ids)
+
+    indexar_pendentes.ids = pendentes
+    indexar_pendentes.executado = False
+    return indexar_pendentes
+
+
+_local = threading.local()
+
+
+def agendar_indexacao(model, ids, using=None):
+    """
+    Queue objects of `model` to be reindexed (or removed, if they no longer
+    exist) when the current transaction commits; every object changed in
+    the same transaction is reindexed in one batch. Outside a transaction
+    they are reindexed immediately.
+    """
+    tipo = indexador_do_modelo(model).tipo
+    conexao = transaction.get_connection(using)
+    lote = getattr(_local, 'lote', None)
+
+    # A rolled back transaction discards its callbacks: start a new batch
+    if lote is None or lote.executado or not any(item[1] is lote for item in conexao.run_on_commit):
+        lote = _local.lote = _novo_lote()
+        lote.ids[tipo].update(ids)
+        transaction.on_commit(lote, using=using, robust=True)
+    else:
+        lote.ids[tipo].update(ids)
+
+
+def _filtro_tokens(lista):
+    """Per-token match score annotations and the WHERE covering all tokens"""
+    condicao = Q()
+    pontos = {}
+    for i, token in enumerate(lista):
+        # termo is stored normalized, so istartswith and startswith agree;
+        # istartswith is the plain LIKE that MySQL resolves on the index
+        condicao |= Q(termo__istartswith=token)
+        pontos[f'p{i}'] = Max(Case(
+            When(termo=token, then=F('peso') * 2),
+            When(termo__istartswith=token, then=F('peso')),
+            default=Value(0),
+            output_field=IntegerField(),
+        ))
+    return condicao, pontos
+
+
+def _correspondencias(lista, tipos=None):
+    """(tipo, objeto_id) rows matching every token, with their score"""
+    condicao, pontos = _filtro_tokens(lista)
+    consulta = TermoBusca.objects.filter(condicao)
+    if tipos:
+        consulta = consulta.filter(tipo__in=tipos)
+    return consulta.values('tipo', 'objeto_id').annotate(**pontos).filter(
+        **{f'{nome}__gt': 0 for nome in pontos}
+    ).annotate(pontos=sum((F(nome) for nome in pontos), Value(0)))
+
+
+def buscar(termo, tipos=None, limite=20):
+    """
+    Ranked results across every indexed model (or `tipos`):
+    [{'tipo', 'tipo_nome', 'id', 'titulo', 'detalhe', 'url', 'pontos'}, ...]
+    """
+    lista = tokens(termo)[:MAX_TOKENS_BUSCA]
+    if not lista:
+        return []
+
+    linhas = list(_correspondencias(lista, tipos).order_by('-pontos', 'tipo', 'objeto_id').values_list(
+        'tipo', 'objeto_id', 'pontos'
+    )[:limite])
+    if not linhas:
+        return []
+
+    por_tipo = defaultdict(list)
+    for tipo, objeto_id, _ in linhas:
+        por_tipo[tipo].append(objeto_id)
+    condicao = Q()
+    for tipo, ids in por_tipo.items():
+        condicao |= Q(tipo=tipo, objeto_id__in=ids)
+    documentos = {
+        (documento.tipo, documento.objeto_id): documento
+        for documento in DocumentoBusca.objects.filter(condicao)
+    }
+
+    resultados = []
+    for tipo, objeto_id, pontos in linhas:
+        documento = documentos.get((tipo, objeto_id))
+        if documento is None:
+            continue
+        indexador = INDEXADORES[tipo]
+        resultados.append({
+            'tipo': tipo,
+            'tipo_nome': indexador.nome,
+            'id': objeto_id,
+            'titulo': documento.titulo,
+            'detalhe': documento.detalhe,
+            'url': indexador.get_url(objeto_id),
+            'pontos': pontos,
+        })
+    return resultados
+
+
+def filtrar_busca(queryset, termo):
+    """
+    Restrict `queryset` (of an indexed model) to the objects matching
+    `termo` through the index, e.g. for the search box of a list view
+    """
+    lista = tokens(termo)[:MAX_TOKENS_BUSCA]
+    if not lista:
+        return queryset.none()
+    tipo = indexador_do_modelo(queryset.model).tipo
+    return queryset.filter(pk__in=_correspondencias(lista, [tipo]).values('objeto_id'))
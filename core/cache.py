@@ -0,0 +1,269 @@
+"""
+Two-tier cache and the versioned-key API used by the apps.
+
+CacheEmCamadas is the default cache backend (CACHES['default']). It keeps a
+small per-process LRU in front of a shared cache, which is another CACHES
+alias: Redis or Memcached in production, or a file-based cache standing in
+for them. Reads try the LRU first and only go to the shared tier on a local
+miss; writes go to both. An entry stays in the LRU for at most CACHE_TTL_LOCAL
+seconds, which bounds how long a process can serve a value that another
+process changed.
+
+Cached data is grouped in namespaces. Every key embeds the current version
+of its namespace (stored in the cache too), so invalidar() drops all keys of
+a namespace at once by starting a new version; old entries are never read
+again and expire on their own. invalidar_ao_alterar() ties a namespace to
+the post_save/post_delete signals of models.
+"""
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from django.core.cache import cache, caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+
+_AUSENTE = object()
+
+
+class CacheLRU:
+    """Thread-safe LRU of (value, expiry) pairs with a maximum size"""
+
+    def __init__(self, tamanho):
+        self.tamanho = tamanho
+        self._itens = OrderedDict()
+        self._lock = threading.Lock()
+
+    def obter(self, chave, padrao=None):
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is None:
+                return padrao
+            if item[1] < time.monotonic():
+                del self._itens[chave]
+                return padrao
+            self._itens.move_to_end(chave)
+            return item[0]
+
+    def gravar(self, chave, valor, segundos):
+        with self._lock:
+            self._itens[chave] = (valor, time.monotonic() + segundos)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho:
+                self._itens.popitem(last=False)
+
+    def remover(self, chave):
+        with self._lock:
+            self._itens.pop(chave, None)
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
+
+    def __len__(self):
+        return len(self._itens)
+
+
+class ContadorCache:
+    """Per-process cache hit/miss counters"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.acertos = 0
+        self.falhas = 0
+
+    def registrar(self, acerto):
+        with self._lock:
+            if acerto:
+                self.acertos += 1
+            else:
+                self.falhas += 1
+
+    def como_dict(self):
+        with self._lock:
+            total = self.acertos + self.falhas
+            return {
+                'acertos': self.acertos,
+                'falhas': self.falhas,
+                'taxa_acerto': round(self.acertos / total, 4) if total else None,
+            }
+
+
+class CacheEmCamadas(BaseCache):
+    """
+    Cache backend: per-process LRU in front of the cache alias in LOCATION.
+
+    OPTIONS: TAMANHO_LOCAL (entries kept in the LRU) and TTL_LOCAL (seconds
+    an entry may be served from the LRU). Values are kept pickled in the
+    LRU, so callers never share a mutable object.
+    """
+
+    def __init__(self, server, params):
+        super().__init__(params)
+        opcoes = params.get('OPTIONS', {})
+        self.alias_compartilhado = server or 'compartilhado'
+        self.local = CacheLRU(opcoes.get('TAMANHO_LOCAL', 1000))
+        self.ttl_local = opcoes.get('TTL_LOCAL', 5)
+
+    @property
+    def compartilhado(self):
+        return caches[self.alias_compartilhado]
+
+    def _lembrar(self, chave, valor, timeout=None):
+        if timeout is DEFAULT_TIMEOUT:
+            timeout = self.default_timeout
+        segundos = self.ttl_local if timeout is None else min(timeout, self.ttl_local)
+        if segundos > 0:
+            self.local.gravar(chave, pickle.dumps(valor, pickle.HIGHEST_PROTOCOL), segundos)
+        else:
+            self.local.remover(chave)
+
+    def get(self, key, default=None, version=None):
+        chave = self.make_and_validate_key(key, version)
+        dados = self.local.obter(chave)
+        if dados is not None:
+            return pickle.loads(dados)
+        valor = self.compartilhado.get(key, _AUSENTE, version=version)
+        if valor is _AUSENTE:
+            return default
+        self._lembrar(chave, valor)
+        return valor
+
+    def get_many(self, keys, version=None):
+        encontrados, faltando = {}, []
+        for key in keys:
+            dados = self.local.obter(self.make_and_validate_key(key, version))
+            if dados is None:
+                faltando.append(key)
+            else:
+                encontrados[key] = pickle.loads(dados)
+        if faltando:
+            remotos = self.compartilhado.get_many(faltando, version=version)
+            for key, valor in remotos.items():
+                self._lembrar(self.make_and_validate_key(key, version), valor)
+            encontrados.update(remotos)
+        return encontrados
+
+    def has_key(self, key, version=None):
+        if self.local.obter(self.make_and_validate_key(key, version)) is not None:
+            return True
+        return self.compartilhado.has_key(key, version=version)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        chave = self.make_and_validate_key(key, version)
+        self.compartilhado.set(key, value, timeout, version=version)
+        self._lembrar(chave, value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        falhas = self.compartilhado.set_many(data, timeout, version=version)
+        for key, value in data.items():
+            chave = self.make_and_validate_key(key, version)
+            if key in falhas:
+                self.local.remover(chave)
+            else:
+                self._lembrar(chave, value, timeout)
+        return falhas
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        chave = self.make_and_validate_key(key, version)
+        if self.local.obter(chave) is not None:
+            return False
+        adicionado = self.compartilhado.add(key, value, timeout, version=version)
+        if adicionado:
+            self._lembrar(chave, value, timeout)
+        return adicionado
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.local.remover(self.make_and_validate_key(key, version))
+        return self.compartilhado.touch(key, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        self.local.remover(self.make_and_validate_key(key, version))
+        return self.compartilhado.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self.local.remover(self.make_and_validate_key(key, version))
+        return self.compartilhado.decr(key, delta, version=version)
+
+    def delete(self, key, version=None):
+        self.local.remover(self.make_and_validate_key(key, version))
+        return self.compartilhado.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self.local.remover(self.make_and_validate_key(key, version))
+        self.compartilhado.delete_many(keys, version=version)
+
+    def clear(self):
+        self.local.limpar()
+        self.compartilhado.clear()
+
+
+def _chave_versao(namespace):
+    return f'versao:{namespace}'
+
+
+def versao(namespace):
+    """Current version of a namespace, started on first use"""
+    chave = _chave_versao(namespace)
+    atual = cache.get(chave)
+    if atual is None:
+        # Versions come from the clock, so a dropped version is never reused
+        cache.add(chave, time.time_ns(), None)
+        atual = cache.get(chave)
+    return atual
+
+
+def chave(namespace, *partes):
+    """Cache key of `partes` in the current version of `namespace`"""
+    sufixo = ':'.join(str(parte) for parte in partes)
+    if len(sufixo) > 100:
+        sufixo = hashlib.md5(sufixo.encode()).hexdigest()
+    return f'{namespace}:{versao(namespace)}:{sufixo}'
+
+
+def em_cache(namespace, partes, calcular, timeout=DEFAULT_TIMEOUT, contador=None):
+    """
+    Cached value of `partes` in `namespace`, from calcular() on a miss.
+    None results are not cached. `contador` (a ContadorCache) records the
+    hits and misses.
+    """
+    chave_valor = chave(namespace, *partes)
+    valor = cache.get(chave_valor)
+    if contador is not None:
+        contador.registrar(valor is not None)
+    if valor is None:
+        valor = calcular()
+        if valor is not None:
+            cache.set(chave_valor, valor, timeout)
+    return valor
+
+
+def invalidar(*namespaces):
+    """
+    Drop every key of the namespaces now and again once the current
+    transaction commits, so a value recomputed from the old data in
+    between is not kept either
+    """
+    chaves = [_chave_versao(namespace) for namespace in namespaces]
+    cache.delete_many(chaves)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: cache.delete_many(chaves))
+
+
+def invalidar_ao_alterar(namespace, *models):
+    """Invalidate `namespace` whenever an instance of `models` is saved or deleted"""
+    def receptor(sender, **kwargs):
+        invalidar(namespace)
+
+    for model in models:
+        for sinal in (post_save, post_delete):
+            sinal.connect(
+                receptor, sender=model, weak=False,
+                dispatch_uid=f'cache:{namespace}:{model._meta.label}',
+            )
+    return receptor
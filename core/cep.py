@@ -0,0 +1,291 @@
+"""
+CEP (postal code) lookups.
+
+A lookup goes through three tiers:
+
+1. a per-process LRU of recent answers (sub-millisecond, bounded size);
+2. the tb_ceps table, filled by earlier lookups and by the offline dataset
+   (importar_ceps command); rows older than CEP_TTL_DIAS are refreshed;
+3. the upstream webservice (ViaCEP by default, CEP_URL), through a pooled
+   keep-alive session with short timeouts.
+
+Upstream failures open a circuit breaker: for CEP_DISJUNTOR_ESPERA seconds
+misses fail fast (stale table rows are still served) instead of holding a
+worker for the whole timeout. Concurrent lookups of the same CEP in a
+process share one upstream request. "Not found" answers are cached too,
+for a shorter time, so mistyped CEPs do not hit the webservice repeatedly.
+"""
+import threading
+import time
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+from requests.adapters import HTTPAdapter
+
+from .cache import CacheLRU
+from .importacao import ArquivoInvalido, ler_planilha, mapear_colunas
+from .models import Cep
+from .utils import somente_digitos
+
+
+CAMPOS = ('logradouro', 'complemento', 'bairro', 'cidade', 'uf')
+TTL_NAO_ENCONTRADO = timedelta(days=1)
+
+
+class CepIndisponivel(Exception):
+    """The CEP is not cached and the webservice cannot be reached"""
+
+
+def normalizar_cep(cep):
+    """The 8 digits of a CEP, or None when it does not have 8 digits"""
+    digitos = somente_digitos(cep)
+    return digitos if len(digitos) == 8 else None
+
+
+class Disjuntor:
+    """
+    Circuit breaker: after `limite` consecutive failures calls are refused
+    for `espera` seconds; then a single trial call is let through, which
+    closes the breaker on success or reopens it on failure.
+    """
+
+    def __init__(self, limite, espera):
+        self.limite = limite
+        self.espera = espera
+        self.falhas = 0
+        self.aberto_ate = 0
+        self._testando = False
+        self._lock = threading.Lock()
+
+    @property
+    def aberto(self):
+        return self.falhas >= self.limite and time.monotonic() < self.aberto_ate
+
+    def permitir(self):
+        with self._lock:
+            if self.falhas < self.limite:
+                return True
+            if time.monotonic() < self.aberto_ate or self._testando:
+                return False
+            self._testando = True
+            return True
+
+    def sucesso(self):
+        with self._lock:
+            self.falhas = 0
+            self._testando = False
+
+    def falha(self):
+        with self._lock:
+            self.falhas += 1
+            self._testando = False
+            if self.falhas >= self.limite:
+                self.aberto_ate = time.monotonic() + self.espera
+
+
+def _configuracao(nome, padrao):
+    return getattr(settings, nome, padrao)
+
+
+memoria = CacheLRU(_configuracao('CEP_CACHE_MEMORIA', 10000))
+disjuntor = Disjuntor(_configuracao('CEP_DISJUNTOR_FALHAS', 5), _configuracao('CEP_DISJUNTOR_ESPERA', 30))
+
+_sessao = None
+_sessao_lock = threading.Lock()
+_em_andamento = {}
+_em_andamento_lock = threading.Lock()
+
+
+def sessao():
+    """The process-wide keep-alive HTTP session (created on first use)"""
+    global _sessao
+    if _sessao is None:
+        with _sessao_lock:
+            if _sessao is None:
+                nova = requests.Session()
+                adaptador = HTTPAdapter(pool_connections=4, pool_maxsize=_configuracao('CEP_CONEXOES', 20))
+                nova.mount('https://', adaptador)
+                nova.mount('http://', adaptador)
+                nova.headers['Accept'] = 'application/json'
+                _sessao = nova
+    return _sessao
+
+
+def consultar_webservice(cep, url=None, sessao_http=None):
+    """
+    Address of an 8-digit CEP from the webservice, {} when it does not
+    exist. Raises CepIndisponivel on timeouts, HTTP errors and bad answers.
+
+    `url` (with a {cep} placeholder) overrides CEP_URL, e.g. to point at a
+    local stand-in service; `sessao_http` overrides the shared session.
+    """
+    url = (url or _configuracao('CEP_URL', 'https://viacep.com.br/ws/{cep}/json/')).format(cep=cep)
+    try:
+        resposta = (sessao_http or sessao()).get(url, timeout=_configuracao('CEP_TIMEOUT', (1, 3)))
+        if resposta.status_code in (400, 404):
+            return {}
+        resposta.raise_for_status()
+        dados = resposta.json()
+    except (requests.RequestException, ValueError) as e:
+        raise CepIndisponivel(f'Serviço de CEP indisponível: {e}') from e
+
+    if not isinstance(dados, dict) or dados.get('erro'):
+        return {}
+    return {
+        'logradouro': dados.get('logradouro', ''),
+        'complemento': dados.get('complemento', ''),
+        'bairro': dados.get('bairro', ''),
+        'cidade': dados.get('localidade', dados.get('cidade', '')),
+        'uf': dados.get('uf', ''),
+    }
+
+
+def filtro_vigentes():
+    """Q of the tb_ceps rows that do not need to be looked up again"""
+    agora = timezone.now()
+    return (
+        Q(origem=Cep.ORIGEM_BASE)
+        | Q(encontrado=True, atualizado_em__gt=agora - timedelta(days=_configuracao('CEP_TTL_DIAS', 90)))
+        | Q(encontrado=False, atualizado_em__gt=agora - TTL_NAO_ENCONTRADO)
+    )
+
+
+def _segundos_memoria(endereco):
+    return _configuracao('CEP_TTL_MEMORIA', 3600) if endereco else TTL_NAO_ENCONTRADO.total_seconds()
+
+
+def _validade(registro):
+    ttl = timedelta(days=_configuracao('CEP_TTL_DIAS', 90)) if registro.encontrado else TTL_NAO_ENCONTRADO
+    return registro.atualizado_em + ttl
+
+
+def gravar_ceps(enderecos, origem):
+    """
+    Upsert {cep: address} into tb_ceps in one statement; an empty address
+    records a CEP that does not exist. Returns the number of CEPs written.
+    """
+    tamanhos = {campo: Cep._meta.get_field(campo).max_length for campo in CAMPOS}
+    agora = timezone.now()
+    Cep.objects.bulk_create(
+        [
+            Cep(
+                cep=cep, encontrado=bool(endereco), origem=origem, atualizado_em=agora,
+                **{campo: (endereco.get(campo) or '')[:tamanhos[campo]] for campo in CAMPOS},
+            )
+            for cep, endereco in enderecos.items()
+        ],
+        update_conflicts=True, unique_fields=['cep'],
+        update_fields=list(CAMPOS) + ['encontrado', 'origem', 'atualizado_em'],
+    )
+    return len(enderecos)
+
+
+def _buscar_remoto(cep, antigo):
+    if not disjuntor.permitir():
+        if antigo is not None:
+            return antigo
+        raise CepIndisponivel('Serviço de CEP temporariamente indisponível')
+    try:
+        endereco = consultar_webservice(cep)
+    except CepIndisponivel:
+        disjuntor.falha()
+        if antigo is not None:
+            # A stale answer beats no answer while the webservice is down
+            return antigo
+        raise
+    disjuntor.sucesso()
+    gravar_ceps({cep: endereco}, Cep.ORIGEM_WEBSERVICE)
+    return endereco
+
+
+def consultar_cep(cep, remoto=True):
+    """
+    Address of a CEP as a dict (logradouro, complemento, bairro, cidade,
+    uf), {} when the CEP is invalid or does not exist.
+
+    Args:
+        remoto: query the webservice on a miss; when False only the caches
+            and the offline dataset are used and a miss returns None
+
+    Raises:
+        CepIndisponivel: miss while the webservice is down or failing
+    """
+    cep = normalizar_cep(cep)
+    if cep is None:
+        return {}
+
+    endereco = memoria.obter(cep)
+    if endereco is not None:
+        return endereco
+
+    registro = Cep.objects.filter(cep=cep).first()
+    antigo = None
+    if registro is not None:
+        antigo = registro.endereco()
+        if _validade(registro) > timezone.now() or registro.origem == Cep.ORIGEM_BASE:
+            memoria.gravar(cep, antigo, _segundos_memoria(antigo))
+            return antigo
+    if not remoto:
+        return antigo
+
+    # Single flight: one upstream request per CEP, other threads wait for it
+    with _em_andamento_lock:
+        evento = _em_andamento.get(cep)
+        lider = evento is None
+        if lider:
+            evento = _em_andamento[cep] = threading.Event()
+    if not lider:
+        evento.wait(sum(_configuracao('CEP_TIMEOUT', (1, 3))) + 1)
+        endereco = memoria.obter(cep)
+        if endereco is not None:
+            return endereco
+        return _buscar_remoto(cep, antigo)
+
+    try:
+        endereco = _buscar_remoto(cep, antigo)
+        memoria.gravar(cep, endereco, _segundos_memoria(endereco))
+        return endereco
+    finally:
+        with _em_andamento_lock:
+            del _em_andamento[cep]
+        evento.set()
+
+
+def importar_ceps(arquivo, nome_arquivo='', tamanho_lote=1000):
+    """
+    Load an offline CEP dataset (CSV or XLSX with the columns cep,
+    logradouro, complemento, bairro, cidade and uf; localidade is accepted
+    for cidade) into tb_ceps, upserting in chunks. Dataset rows never
+    expire. Returns (rows written, rows skipped for an invalid CEP).
+    """
+    cabecalhos, linhas = ler_planilha(arquivo, nome_arquivo)
+    colunas = mapear_colunas(
+        cabecalhos, Cep, ('cep',) + CAMPOS,
+        apelidos={'localidade': 'cidade', 'estado': 'uf', 'endereco': 'logradouro'},
+    )
+    if 'cep' not in colunas:
+        raise ArquivoInvalido('O arquivo precisa da coluna cep')
+
+    gravadas = ignoradas = 0
+    lote = {}
+
+    for linha in linhas:
+        valor = linha[colunas['cep']] if colunas['cep'] < len(linha) else ''
+        cep = normalizar_cep(valor)
+        if cep is None:
+            ignoradas += 1
+            continue
+        lote[cep] = {
+            campo: str(linha[indice]).strip()
+            for campo, indice in colunas.items() if campo != 'cep' and indice < len(linha)
+        }
+        if len(lote) >= tamanho_lote:
+            gravadas += gravar_ceps(lote, Cep.ORIGEM_BASE)
+            lote.clear()
+    if lote:
+        gravadas += gravar_ceps(lote, Cep.ORIGEM_BASE)
+    memoria.limpar()
+    return gravadas, ignoradas
@@ -0,0 +1,267 @@
+"""
+Bulk validation of the customer, supplier and employee addresses against
+the CEP cache (core.cep).
+
+The job runs in two phases:
+
+1. Resolve: the distinct CEPs of the selected tables are collected and the
+   ones not already in tb_ceps (or expired) are resolved concurrently by a
+   thread pool, under a shared rate limit. Answers are saved to tb_ceps
+   after every chunk, so an interrupted run resumes where it stopped.
+2. Correct: each table is read in primary-key chunks; rows whose city or
+   state differ from their CEP (or whose street/district are blank) are
+   fixed with one bulk update per chunk. The last primary key done per
+   table is written to a checkpoint file after every chunk.
+
+Only phase 1 talks to the network and only the main thread touches the
+database. The resolver is any callable taking 8 CEP digits and returning
+the address, {} for an unknown CEP, or raising CepIndisponivel.
+"""
+import csv
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.apps import apps
+from django.db import transaction
+from requests.adapters import HTTPAdapter
+
+from .busca import agendar_indexacao, normalizar
+from .cep import CepIndisponivel, Disjuntor, consultar_webservice, filtro_vigentes, gravar_ceps, memoria, normalizar_cep
+from .exportacao import iterar_em_lotes
+from .models import Cep
+from .utils import formatar_cep
+
+
+MODELOS = {
+    'cliente': 'customers.Cliente',
+    'fornecedor': 'suppliers.Fornecedor',
+    'funcionario': 'accounts.Funcionario',
+}
+
+TAMANHO_LOTE = 1000
+CAMPOS_ENDERECO = ['cep', 'endereco', 'bairro', 'cidade', 'estado']
+
+
+class LimiteTaxa:
+    """Token bucket shared by the worker threads: at most `por_segundo` calls per second"""
+
+    def __init__(self, por_segundo):
+        self.intervalo = 1 / por_segundo if por_segundo else 0
+        self.proximo = time.monotonic()
+        self._lock = threading.Lock()
+
+    def aguardar(self):
+        if not self.intervalo:
+            return
+        with self._lock:
+            agora = time.monotonic()
+            espera = self.proximo - agora
+            self.proximo = max(self.proximo, agora) + self.intervalo
+        if espera > 0:
+            time.sleep(espera)
+
+
+def resolvedor_webservice(url=None, conexoes=10):
+    """Resolver calling the CEP webservice (CEP_URL or `url`) with its own connection pool"""
+    sessao_http = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=conexoes)
+    sessao_http.mount('https://', adaptador)
+    sessao_http.mount('http://', adaptador)
+
+    def resolver(cep):
+        return consultar_webservice(cep, url=url, sessao_http=sessao_http)
+    return resolver
+
+
+class Checkpoint:
+    """
+    Progress of the correction phase in a JSON file ({table: last primary
+    key done}); a missing `caminho` keeps it in memory only
+    """
+
+    def __init__(self, caminho=None):
+        self.caminho = caminho
+        self.ultimo_pk = {}
+        if caminho and os.path.exists(caminho):
+            with open(caminho, encoding='utf-8') as arquivo:
+                self.ultimo_pk = json.load(arquivo).get('ultimo_pk', {})
+
+    def salvar(self, nome, pk):
+        self.ultimo_pk[nome] = pk
+        if not self.caminho:
+            return
+        temporario = f'{self.caminho}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump({'ultimo_pk': self.ultimo_pk}, arquivo)
+        os.replace(temporario, self.caminho)
+
+    def remover(self):
+        if self.caminho and os.path.exists(self.caminho):
+            os.remove(self.caminho)
+
+
+def ceps_distintos(nomes):
+    """Set of the valid CEPs (8 digits) used by the given tables"""
+    ceps = set()
+    for nome in nomes:
+        valores = apps.get_model(MODELOS[nome])._default_manager.values_list('cep', flat=True).distinct()
+        for valor in valores.iterator(chunk_size=10000):
+            cep = normalizar_cep(valor)
+            if cep:
+                ceps.add(cep)
+    return ceps
+
+
+def resolver_ceps(ceps, resolvedor, concorrencia=8, por_segundo=0, tamanho_lote=TAMANHO_LOTE, progresso=None):
+    """
+    Resolve the CEPs missing from tb_ceps with `concorrencia` threads and
+    save the answers. A run of failures opens a circuit breaker and raises
+    CepIndisponivel after saving what was resolved, so the job can resume.
+
+    Returns a dict with the CEPs already known, resolved and not found.
+    """
+    conhecidos = set()
+    ordenados = sorted(ceps)
+    for inicio in range(0, len(ordenados), tamanho_lote):
+        conhecidos.update(Cep.objects.filter(filtro_vigentes(), cep__in=ordenados[inicio:inicio + tamanho_lote])
+                          .values_list('cep', flat=True))
+    pendentes = [cep for cep in ordenados if cep not in conhecidos]
+    resumo = {'conhecidos': len(conhecidos), 'resolvidos': 0, 'nao_encontrados': 0, 'pendentes': len(pendentes)}
+
+    limite = LimiteTaxa(por_segundo)
+    disjuntor = Disjuntor(limite=max(5, concorrencia * 2), espera=60)
+
+    def tentar(cep):
+        if not disjuntor.permitir():
+            return cep, None
+        limite.aguardar()
+        try:
+            endereco = resolvedor(cep)
+        except CepIndisponivel:
+            disjuntor.falha()
+            return cep, None
+        disjuntor.sucesso()
+        return cep, endereco
+
+    with ThreadPoolExecutor(max_workers=concorrencia) as executor:
+        for inicio in range(0, len(pendentes), tamanho_lote):
+            respostas = {
+                cep: endereco
+                for cep, endereco in executor.map(tentar, pendentes[inicio:inicio + tamanho_lote])
+                if endereco is not None
+            }
+            if respostas:
+                gravar_ceps(respostas, Cep.ORIGEM_WEBSERVICE)
+            resumo['resolvidos'] += sum(1 for endereco in respostas.values() if endereco)
+            resumo['nao_encontrados'] += sum(1 for endereco in respostas.values() if not endereco)
+            resumo['pendentes'] -= len(respostas)
+            if progresso:
+                progresso(resumo)
+            if disjuntor.aberto:
+                raise CepIndisponivel(
+                    f"Serviço de CEP falhando; {resumo['pendentes']} CEP(s) pendente(s). Execute novamente para retomar."
+                )
+    memoria.limpar()
+    return resumo
+
+
+def _mesmo_texto(a, b):
+    return normalizar(a) == normalizar(b)
+
+
+def correcoes(linha, endereco):
+    """{field: corrected value} for a row given the address of its CEP"""
+    _, cep, logradouro, bairro, cidade, estado = linha
+    alteracoes = {}
+    if endereco.get('cidade') and not _mesmo_texto(cidade, endereco['cidade']):
+        alteracoes['cidade'] = endereco['cidade']
+    if endereco.get('uf') and (estado or '').upper() != endereco['uf'].upper():
+        alteracoes['estado'] = endereco['uf'].upper()
+    if endereco.get('bairro') and not (bairro or '').strip():
+        alteracoes['bairro'] = endereco['bairro']
+    if endereco.get('logradouro') and not (logradouro or '').strip():
+        alteracoes['endereco'] = endereco['logradouro']
+    if cep != formatar_cep(cep):
+        alteracoes['cep'] = formatar_cep(cep)
+    return alteracoes
+
+
+def corrigir_enderecos(nome, checkpoint, simular=False, tamanho_lote=TAMANHO_LOTE, relatorio=None, progresso=None):
+    """
+    Fix the addresses of one table from the CEPs in tb_ceps, resuming
+    after the primary key in `checkpoint`. Rows whose CEP is invalid or
+    does not exist go to `relatorio` (a csv writer).
+
+    Returns a dict with the rows read, corrected, invalid and pending
+    (CEP not resolved yet).
+    """
+    model = apps.get_model(MODELOS[nome])
+    tamanhos = {campo: model._meta.get_field(campo).max_length for campo in CAMPOS_ENDERECO}
+    resumo = {'lidas': 0, 'corrigidas': 0, 'invalidas': 0, 'pendentes': 0}
+    queryset = model._default_manager.filter(pk__gt=checkpoint.ultimo_pk.get(nome, 0))
+
+    for lote in iterar_em_lotes(queryset, ['pk'] + CAMPOS_ENDERECO, ('pk',), tamanho_lote):
+        ceps = {normalizar_cep(linha[1]) for linha in lote} - {None}
+        enderecos = {
+            registro.cep: registro.endereco() for registro in Cep.objects.filter(cep__in=ceps)
+        }
+
+        alterados, campos = [], set()
+        for linha in lote:
+            cep = normalizar_cep(linha[1])
+            if cep is not None and cep not in enderecos:
+                resumo['pendentes'] += 1
+                continue
+            if cep is None or not enderecos[cep]:
+                resumo['invalidas'] += 1
+                if relatorio is not None:
+                    relatorio.writerow([nome, linha[0], linha[1], 'CEP inválido' if cep is None else 'CEP não encontrado'])
+                continue
+            alteracoes = correcoes(linha, enderecos[cep])
+            if alteracoes:
+                alterados.append(model(pk=linha[0], **{
+                    campo: valor[:tamanhos[campo]] for campo, valor in alteracoes.items()
+                }))
+                campos.update(alteracoes)
+
+        if alterados and not simular:
+            with transaction.atomic():
+                model._default_manager.bulk_update(alterados, sorted(campos))
+                agendar_indexacao(model, [obj.pk for obj in alterados])
+        resumo['lidas'] += len(lote)
+        resumo['corrigidas'] += len(alterados)
+        if not simular:
+            checkpoint.salvar(nome, lote[-1][0])
+        if progresso:
+            progresso(nome, resumo)
+    return resumo
+
+
+def validar_enderecos(nomes=None, resolvedor=None, concorrencia=8, por_segundo=0, checkpoint=None,
+                      simular=False, tamanho_lote=TAMANHO_LOTE, relatorio=None, progresso=None):
+    """
+    Run both phases over `nomes` (default: every table). `resolvedor` None
+    uses only the CEPs already in tb_ceps (offline dataset and cache).
+    Returns {'ceps': phase 1 summary, table: phase 2 summary, ...}.
+    """
+    nomes = list(nomes or MODELOS)
+    checkpoint = checkpoint or Checkpoint()
+    escritor = csv.writer(relatorio, delimiter=';') if relatorio is not None else None
+    if escritor is not None:
+        escritor.writerow(['cadastro', 'id', 'cep', 'motivo'])
+
+    resultado = {}
+    if resolvedor is not None:
+        resultado['ceps'] = resolver_ceps(
+            ceps_distintos(nomes), resolvedor, concorrencia, por_segundo, tamanho_lote,
+            progresso=(lambda resumo: progresso('ceps', resumo)) if progresso else None,
+        )
+    for nome in nomes:
+        resultado[nome] = corrigir_enderecos(nome, checkpoint, simular, tamanho_lote, escritor, progresso)
+    if not simular:
+        checkpoint.remover()
+    return resultado
@@ -0,0 +1,151 @@
+"""
+Dashboard statistics, one cached widget at a time.
+
+The dashboard is split into widgets (contagens, faturamento, estoque_baixo,
+vendas_recentes, grafico_vendas), each computed by its own function with a
+constant number of queries and kept in its own cache namespace
+(dashboard:<widget>, core.cache) with its own TTL. Model signals
+(core.signals) drop a widget only when a model it reads changes; the TTL
+bounds how stale it can get for changes made without signals (queryset
+updates, bulk inserts) and for date-relative numbers such as today's sales.
+
+Every cached widget carries an ETag of its data, so the widget endpoints
+answer conditional requests without rendering anything.
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import F, Q, Sum
+
+from customers.models import Cliente
+from suppliers.models import Fornecedor
+from inventory.models import AlertaEstoque, Produto
+from sales.models import ResumoVendaDiario, Venda
+from .cache import ContadorCache, em_cache, invalidar
+
+
+CACHE_DASHBOARD = 'dashboard'
+DIAS_GRAFICO = 30
+
+contador = ContadorCache()
+
+
+def calcular_contagens():
+    """Customers, suppliers and products"""
+    return {
+        'total_clientes': Cliente.objects.count(),
+        'total_fornecedores': Fornecedor.objects.count(),
+        'total_produtos': Produto.objects.count(),
+    }
+
+
+def calcular_faturamento():
+    """Sale counts and revenue, from the daily rollup"""
+    today = datetime.now().date()
+    month_start = today.replace(day=1)
+    resumo = ResumoVendaDiario.objects.aggregate(
+        total_vendas=Sum('qtd_vendas'),
+        total_vendas_valor=Sum('receita'),
+        vendas_hoje=Sum('qtd_vendas', filter=Q(data=today)),
+        vendas_mes=Sum('qtd_vendas', filter=Q(data__gte=month_start)),
+        vendas_mes_valor=Sum('receita', filter=Q(data__gte=month_start)),
+    )
+    return {campo: valor or 0 for campo, valor in resumo.items()}
+
+
+def calcular_estoque_baixo():
+    """Products below their minimum stock and the latest stock alerts"""
+    # Low stock comes from the indexed abaixo_minimo flag (each product's
+    # own estoque_minimo), so neither query scans tb_produtos
+    estoque_baixo = Produto.objects.filter(abaixo_minimo=True)
+    return {
+        'total_estoque_baixo': estoque_baixo.count(),
+        'produtos_estoque_baixo': list(
+            estoque_baixo.com_estoque_total()
+            .order_by('estoque_total')
+            .values('id', 'descricao', 'estoque_total', 'estoque_minimo')[:5]
+        ),
+        'alertas_estoque': list(
+            AlertaEstoque.objects.order_by('-data', '-id')
+            .values('id', 'data', 'tipo', 'quantidade', 'estoque_minimo', produto_descricao=F('produto__descricao'))[:5]
+        ),
+    }
+
+
+def calcular_vendas_recentes():
+    """The latest sales"""
+    return {
+        'vendas_recentes': list(
+            Venda.objects.order_by('-data_venda', '-id')
+            .values('id', 'data_venda', 'total_venda', cliente_nome=F('cliente__nome'))[:10]
+        ),
+    }
+
+
+def calcular_grafico_vendas():
+    """Sales and revenue per day over the last DIAS_GRAFICO days, oldest first"""
+    hoje = datetime.now().date()
+    inicio = hoje - timedelta(days=DIAS_GRAFICO - 1)
+    por_dia = {
+        linha['data']: linha
+        for linha in ResumoVendaDiario.objects.filter(data__gte=inicio).values('data', 'qtd_vendas', 'receita')
+    }
+    dias = []
+    for indice in range(DIAS_GRAFICO):
+        dia = inicio + timedelta(days=indice)
+        linha = por_dia.get(dia, {})
+        dias.append({'data': dia, 'qtd_vendas': linha.get('qtd_vendas', 0), 'receita': linha.get('receita', 0)})
+    maior = max(dia['receita'] for dia in dias) or 1
+    for dia in dias:
+        dia['percentual'] = round(100 * dia['receita'] / maior)
+    return {'vendas_por_dia': dias}
+
+
+# Widget name: (function, cache TTL in seconds)
+WIDGETS = {
+    'contagens': (calcular_contagens, 5 * 60),
+    'faturamento': (calcular_faturamento, None),
+    'estoque_baixo': (calcular_estoque_baixo, None),
+    'vendas_recentes': (calcular_vendas_recentes, None),
+    'grafico_vendas': (calcular_grafico_vendas, 10 * 60),
+}
+
+
+def namespace_widget(nome):
+    return f'{CACHE_DASHBOARD}:{nome}'
+
+
+def _calcular_widget(nome):
+    dados = WIDGETS[nome][0]()
+    # The ETag covers the data only, so a recomputation that finds nothing
+    # new still answers 304
+    etag = '"%s"' % hashlib.md5(json.dumps(dados, cls=DjangoJSONEncoder, sort_keys=True).encode()).hexdigest()
+    dados['atualizado_em'] = datetime.now()
+    return {'dados': dados, 'etag': etag}
+
+
+def obter_widget(nome, contador=contador):
+    """{'dados': widget data, 'etag': ETag of the data}, computed on a cache miss"""
+    tempo = WIDGETS[nome][1]
+    return em_cache(
+        namespace_widget(nome), (), lambda: _calcular_widget(nome),
+        tempo or settings.DASHBOARD_CACHE_TIMEOUT, contador=contador,
+    )
+
+
+def obter_estatisticas():
+    """Return the whole dashboard snapshot (every widget), from the cache when possible"""
+    leitura = ContadorCache()
+    snapshot = {}
+    for nome in WIDGETS:
+        snapshot.update(obter_widget(nome, leitura)['dados'])
+    contador.registrar(not leitura.falhas)
+    return snapshot
+
+
+def invalidar_estatisticas(*widgets):
+    """Drop the given widgets (default: all) now and once the current transaction commits"""
+    invalidar(*[namespace_widget(nome) for nome in widgets or WIDGETS])
@@ -0,0 +1,235 @@
+"""
+Live dashboard updates over Server-Sent Events.
+
+Writers record events in tb_eventos_dashboard inside the transaction of the
+change (publicar_vendas, publicar_estoque, publicar_atualizacao), so an
+event becomes visible exactly when its change is committed and disappears
+with a rollback.
+
+Each ASGI process runs one Difusor: a single task polls the table every
+DASHBOARD_EVENTOS_INTERVALO seconds while dashboards are connected and
+copies the new events to the queue of every connection. The database sees
+one indexed query per interval per process, however many dashboards are
+open. A connection starts with the cached statistics snapshot and then
+receives only the deltas:
+
+- venda: a sale was created (sinal 1) or cancelled (sinal -1);
+- estoque: a product crossed its estoque_minimo (abaixo True/False);
+- estatisticas: the full snapshot, after bulk changes (imports) or when a
+  connection fell too far behind.
+
+Browsers reconnect with Last-Event-ID and get the events they missed while
+they are kept (RETENCAO). Older events are deleted by the writers
+themselves, after their commit and at most once per INTERVALO_LIMPEZA in
+each process, so the table stays bounded with no dashboard open or under
+WSGI.
+"""
+import asyncio
+import json
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import close_old_connections, transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from .models import EventoDashboard
+
+
+TIPO_VENDA = 'venda'
+TIPO_ESTOQUE = 'estoque'
+TIPO_ESTATISTICAS = 'estatisticas'
+
+RETENCAO = timedelta(hours=1)
+LIMITE_CONSULTA = 500
+# Ids seen missing are looked up again for this long: a transaction that
+# got its id earlier may commit after a later one
+ESPERA_LACUNA = 10
+MAXIMO_LACUNAS = 1000
+INTERVALO_LIMPEZA = 60
+PULSO = 15
+
+_proxima_limpeza = 0
+
+
+def limpar_eventos():
+    """Delete the events older than RETENCAO; returns how many"""
+    return EventoDashboard.objects.filter(criado_em__lt=timezone.now() - RETENCAO).delete()[0]
+
+
+def _agendar_limpeza():
+    # After the commit: a range delete inside the writer's transaction
+    # would hold its locks for the rest of the checkout
+    global _proxima_limpeza
+    agora = time.monotonic()
+    if agora >= _proxima_limpeza:
+        _proxima_limpeza = agora + INTERVALO_LIMPEZA
+        transaction.on_commit(limpar_eventos, robust=True)
+
+
+def publicar_vendas(vendas, sinal=1):
+    """
+    Record sales created (sinal=1) or cancelled (sinal=-1) in the current
+    transaction; `vendas` is a list of (id, data_venda, cliente_id, total)
+    """
+    from customers.models import Cliente
+
+    if not vendas:
+        return
+    nomes = dict(Cliente.objects.filter(pk__in={venda[2] for venda in vendas}).values_list('pk', 'nome'))
+    EventoDashboard.objects.bulk_create([
+        EventoDashboard(tipo=TIPO_VENDA, dados={
+            'id': venda_id, 'data_venda': data_venda, 'cliente_nome': nomes.get(cliente_id, ''),
+            'total_venda': total, 'sinal': sinal,
+        })
+        for venda_id, data_venda, cliente_id, total in vendas
+    ])
+    _agendar_limpeza()
+
+
+def publicar_estoque(cruzamentos):
+    """
+    Record the estoque_minimo crossings of the current transaction, as
+    sent by the estoque_minimo_cruzado signal
+    """
+    EventoDashboard.objects.bulk_create([
+        EventoDashboard(tipo=TIPO_ESTOQUE, dados=cruzamento) for cruzamento in cruzamentos
+    ])
+    _agendar_limpeza()
+
+
+def publicar_atualizacao():
+    """Tell the dashboards to reload the whole snapshot (after bulk changes)"""
+    EventoDashboard.objects.create(tipo=TIPO_ESTATISTICAS, dados={})
+    _agendar_limpeza()
+
+
+def formatar(tipo, dados, evento_id=None):
+    """One SSE message"""
+    linhas = [f'id: {evento_id}'] if evento_id is not None else []
+    linhas += [f'event: {tipo}', 'data: ' + json.dumps(dados, cls=DjangoJSONEncoder, separators=(',', ':'))]
+    return '\n'.join(linhas) + '\n\n'
+
+
+def eventos_apos(evento_id):
+    """
+    Events after `evento_id` (a reconnection), or None when that event was
+    already removed or too many were missed: the client must then reload
+    the snapshot
+    """
+    close_old_connections()
+    if not EventoDashboard.objects.filter(pk=evento_id).exists():
+        return None
+    eventos = list(EventoDashboard.objects.filter(pk__gt=evento_id).order_by('pk')[:LIMITE_CONSULTA + 1])
+    return eventos if len(eventos) <= LIMITE_CONSULTA else None
+
+
+class Difusor:
+    """Fan-out of the new events to every connected dashboard of this process"""
+
+    def __init__(self, intervalo=None, tamanho_fila=256):
+        self.intervalo = intervalo
+        self.tamanho_fila = tamanho_fila
+        self.filas = set()
+        self.ultimo_id = None
+        self.lacunas = {}
+        self._tarefa = None
+
+    def assinar(self):
+        """Queue that receives the new events; starts the polling task if needed"""
+        fila = asyncio.Queue(self.tamanho_fila)
+        self.filas.add(fila)
+        if self._tarefa is None or self._tarefa.done():
+            self.ultimo_id = None
+            self.lacunas.clear()
+            self._tarefa = asyncio.get_running_loop().create_task(self._executar())
+        return fila
+
+    def cancelar(self, fila):
+        self.filas.discard(fila)
+
+    async def _executar(self):
+        intervalo = self.intervalo or getattr(settings, 'DASHBOARD_EVENTOS_INTERVALO', 1)
+        while self.filas:
+            self.distribuir(await sync_to_async(self.buscar)())
+            await asyncio.sleep(intervalo)
+
+    def buscar(self):
+        """The events committed since the last call"""
+        close_old_connections()
+        agora = time.monotonic()
+        if self.ultimo_id is None:
+            self.ultimo_id = EventoDashboard.objects.aggregate(ultimo=Max('pk'))['ultimo'] or 0
+            return []
+
+        filtro = Q(pk__gt=self.ultimo_id)
+        if self.lacunas:
+            filtro |= Q(pk__in=list(self.lacunas))
+        eventos = list(EventoDashboard.objects.filter(filtro).order_by('pk')[:LIMITE_CONSULTA])
+
+        for evento in eventos:
+            self.lacunas.pop(evento.pk, None)
+            if evento.pk > self.ultimo_id:
+                if evento.pk - self.ultimo_id - 1 <= MAXIMO_LACUNAS:
+                    self.lacunas.update(dict.fromkeys(range(self.ultimo_id + 1, evento.pk), agora))
+                self.ultimo_id = evento.pk
+        self.lacunas = {pk: desde for pk, desde in self.lacunas.items() if agora - desde < ESPERA_LACUNA}
+        return eventos
+
+    def distribuir(self, eventos):
+        """Copy the events to every queue; a full queue gets a snapshot reload instead"""
+        if not eventos:
+            return
+        for fila in list(self.filas):
+            for evento in eventos:
+                try:
+                    fila.put_nowait(evento)
+                except asyncio.QueueFull:
+                    while not fila.empty():
+                        fila.get_nowait()
+                    fila.put_nowait(None)
+                    break
+
+
+difusor = Difusor()
+
+
+async def transmitir(ultimo_evento_id=None, difusor_eventos=None):
+    """
+    SSE stream of one dashboard: the snapshot (or the events missed since
+    `ultimo_evento_id`), then the new events as they are committed
+    """
+    from .estatisticas import obter_estatisticas
+
+    difusor_eventos = difusor_eventos or difusor
+    fila = difusor_eventos.assinar()
+    try:
+        yield 'retry: 3000\n\n'
+        reenviados = set()
+        perdidos = await sync_to_async(eventos_apos)(ultimo_evento_id) if ultimo_evento_id is not None else None
+        if perdidos is None:
+            yield formatar(TIPO_ESTATISTICAS, await sync_to_async(obter_estatisticas)())
+        else:
+            for evento in perdidos:
+                reenviados.add(evento.pk)
+                yield formatar(evento.tipo, evento.dados, evento.pk)
+
+        while True:
+            try:
+                evento = await asyncio.wait_for(fila.get(), PULSO)
+            except asyncio.TimeoutError:
+                # Comment line: keeps proxies from closing an idle stream
+                yield ': pulso\n\n'
+                continue
+            if evento is None or evento.tipo == TIPO_ESTATISTICAS:
+                yield formatar(
+                    TIPO_ESTATISTICAS, await sync_to_async(obter_estatisticas)(),
+                    evento.pk if evento is not None else None,
+                )
+            elif evento.pk not in reenviados:
+                yield formatar(evento.tipo, evento.dados, evento.pk)
+    finally:
+        difusor_eventos.cancelar(fila)
@@ -0,0 +1,278 @@
+"""
+Streaming exports (CSV, JSON lines, XLSX) for list views.
+
+Rows are read in fixed-size chunks with seek queries on a unique ordering
+(the same technique as core.paginacao) and written to the response as they
+arrive, so memory use does not grow with the size of the export. QuerySet
+.iterator() alone is not enough here: MySQLdb buffers the whole result set
+on the client before the first row is returned. Under ASGI the body is an
+async iterator (iterar_async): Django reads a sync streaming body whole
+into memory before sending it there.
+"""
+import csv
+import json
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import StreamingHttpResponse
+
+from .paginacao import filtro_seek
+
+
+TAMANHO_LOTE = 2000
+_FIM = object()
+
+
+def iterar_em_lotes(queryset, campos, ordem, tamanho_lote=TAMANHO_LOTE):
+    """
+    Yield lists of value tuples (one per row, in `campos` order), fetching
+    `tamanho_lote` rows per query. `ordem` must be a unique ordering.
+    """
+    chaves = [campo.lstrip('-') for campo in ordem]
+    colunas = list(campos) + [chave for chave in chaves if chave not in campos]
+    indices = [colunas.index(chave) for chave in chaves]
+    queryset = queryset.order_by(*ordem).values_list(*colunas)
+
+    posicao = None
+    while True:
+        pagina = queryset
+        if posicao is not None:
+            pagina = pagina.filter(filtro_seek(ordem, posicao))
+        linhas = list(pagina[:tamanho_lote])
+        if not linhas:
+            return
+
+        yield [linha[:len(campos)] for linha in linhas]
+
+        if len(linhas) < tamanho_lote:
+            return
+        posicao = [linhas[-1][i] for i in indices]
+
+
+async def iterar_async(iterador):
+    """
+    Async iterator over a sync one; each step runs in the thread that holds
+    the request's database connection
+    """
+    proximo = sync_to_async(next, thread_sensitive=True)
+    while True:
+        parte = await proximo(iterador, _FIM)
+        if parte is _FIM:
+            return
+        yield parte
+
+
+class _Buffer:
+    """Write-only file object whose contents are drained by the generators"""
+
+    def __init__(self):
+        self.partes = []
+
+    def write(self, dados):
+        self.partes.append(dados)
+        return len(dados)
+
+    def flush(self):
+        pass
+
+    def drenar(self):
+        dados = b''.join(
+            parte.encode('utf-8') if isinstance(parte, str) else parte
+            for parte in self.partes
+        )
+        self.partes = []
+        return dados
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return str(valor)
+
+
+def gerar_csv(cabecalhos, lotes):
+    """CSV with ';' separator and a UTF-8 BOM, as Excel in pt-BR expects"""
+    buffer = _Buffer()
+    escritor = csv.writer(buffer, delimiter=';')
+
+    yield '\ufeff'.encode('utf-8')
+    escritor.writerow(cabecalhos)
+    for lote in lotes:
+        for linha in lote:
+            escritor.writerow([_texto(valor) for valor in linha])
+        yield buffer.drenar()
+    yield buffer.drenar()
+
+
+def gerar_jsonl(chaves, lotes):
+    """One JSON object per line"""
+    for lote in lotes:
+        yield ''.join(
+            json.dumps(dict(zip(chaves, linha)), default=_texto, ensure_ascii=False) + '\n'
+            for linha in lote
+        ).encode('utf-8')
+
+
+XLSX_ESTATICOS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '<Override PartName="/xl/styles.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.styles+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="xl/workbook.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+        '</Relationships>'
+    ),
+    'xl/workbook.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+        'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+        '<sheets><sheet name="Dados" sheetId="1" r:id="rId1"/></sheets>'
+        '</workbook>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" Target="worksheets/sheet1.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet"/>'
+        '<Relationship Id="rId2" Target="styles.xml" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/styles"/>'
+        '</Relationships>'
+    ),
+    'xl/styles.xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<styleSheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+        '<fonts count="1"><font><sz val="11"/><name val="Calibri"/></font></fonts>'
+        '<fills count="1"><fill><patternFill patternType="none"/></fill></fills>'
+        '<borders count="1"><border/></borders>'
+        '<cellStyleXfs count="1"><xf/></cellStyleXfs>'
+        '<cellXfs count="1"><xf/></cellXfs>'
+        '</styleSheet>'
+    ),
+}
+
+# Control characters are not allowed in XML 1.0
+CARACTERES_INVALIDOS = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f]')
+
+
+def _celula_xlsx(valor):
+    if isinstance(valor, bool) or valor is None:
+        valor = '' if valor is None else ('Sim' if valor else 'Não')
+    elif isinstance(valor, (int, float, Decimal)):
+        return f'<c><v>{valor}</v></c>'
+    texto = escape(CARACTERES_INVALIDOS.sub('', _texto(valor)))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{texto}</t></is></c>'
+
+
+def _linha_xlsx(valores):
+    return '<row>' + ''.join(_celula_xlsx(valor) for valor in valores) + '</row>'
+
+
+def gerar_xlsx(cabecalhos, lotes):
+    """
+    Minimal single-sheet workbook written straight into a zip stream.
+    Cells use inline strings, so no shared-string table has to be kept in
+    memory; the zip goes to an unseekable buffer, so entries use data
+    descriptors and each chunk can be sent as soon as it is compressed.
+    """
+    buffer = _Buffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as arquivo:
+        for nome, conteudo in XLSX_ESTATICOS.items():
+            arquivo.writestr(nome, conteudo)
+        yield buffer.drenar()
+
+        with arquivo.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as planilha:
+            planilha.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main">'
+                '<sheetData>' + _linha_xlsx(cabecalhos)
+            ).encode('utf-8'))
+
+            for lote in lotes:
+                planilha.write(''.join(_linha_xlsx(linha) for linha in lote).encode('utf-8'))
+                yield buffer.drenar()
+
+            planilha.write(b'</sheetData></worksheet>')
+    yield buffer.drenar()
+
+
+FORMATOS = {
+    'csv': (gerar_csv, 'text/csv; charset=utf-8'),
+    'jsonl': (gerar_jsonl, 'application/x-ndjson; charset=utf-8'),
+    'xlsx': (gerar_xlsx, 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'),
+}
+
+
+class ExportacaoMixin:
+    """
+    ListView mixin that streams the filtered queryset when the request has
+    ?exportar=csv|jsonl|xlsx.
+
+    `exportar_colunas` is a list of (lookup, header) pairs passed to
+    values_list(); `exportar_ordem` must be a unique ordering (defaults to
+    keyset_campos, then to the primary key).
+    """
+    exportar_parametro = 'exportar'
+    exportar_colunas = ()
+    exportar_ordem = None
+    exportar_nome = 'exportacao'
+    exportar_tamanho_lote = TAMANHO_LOTE
+
+    def get(self, request, *args, **kwargs):
+        formato = request.GET.get(self.exportar_parametro)
+        if formato in FORMATOS:
+            return self.exportar(formato)
+        return super().get(request, *args, **kwargs)
+
+    def get_exportar_ordem(self):
+        return self.exportar_ordem or getattr(self, 'keyset_campos', None) or ('pk',)
+
+    def get_exportar_colunas(self):
+        return list(self.exportar_colunas)
+
+    def exportar_linhas(self, lote):
+        """Hook to transform or expand each chunk of rows"""
+        return lote
+
+    def exportar(self, formato):
+        colunas = self.get_exportar_colunas()
+        lotes = (
+            self.exportar_linhas(lote)
+            for lote in iterar_em_lotes(
+                self.get_queryset(),
+                [campo for campo, _ in self.exportar_colunas],
+                self.get_exportar_ordem(),
+                self.exportar_tamanho_lote,
+            )
+        )
+
+        gerador, content_type = FORMATOS[formato]
+        if formato == 'jsonl':
+            conteudo = gerador([campo for campo, _ in colunas], lotes)
+        else:
+            conteudo = gerador([cabecalho for _, cabecalho in colunas], lotes)
+        if isinstance(self.request, ASGIRequest):
+            conteudo = iterar_async(conteudo)
+
+        response = StreamingHttpResponse(conteudo, content_type=content_type)
+        nome = f'{self.exportar_nome}_{datetime.now():%Y%m%d_%H%M}.{formato}'
+        response['Content-Disposition'] = f'attachment; filename="{nome}"'
+        return response
@@ -0,0 +1,16 @@
+from django import forms
+
+
+class ImportacaoCadastroForm(forms.Form):
+    """Upload form for a customer or supplier spreadsheet"""
+    arquivo = forms.FileField(
+        label='Arquivo',
+        help_text='CSV (separado por ; ou ,) ou XLSX, com uma linha de cabeçalho',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'})
+    )
+    atualizar = forms.BooleanField(
+        label='Atualizar cadastros existentes',
+        help_text='Linhas com CPF/CNPJ já cadastrado atualizam o cadastro em vez de serem rejeitadas',
+        required=False,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
@@ -0,0 +1,347 @@
+"""
+Bulk import of customers and suppliers from CSV or XLSX files.
+
+The file is read as a stream (CSV through a text wrapper, XLSX by parsing
+the sheet XML incrementally), so memory does not grow with the number of
+rows. Every row is validated with the rules of the app's ModelForm, except
+the per-row uniqueness query: CPF/CNPJ duplicates are detected against the
+digits of every existing document, loaded once into memory, and against
+the rows already read. Valid rows are written in chunks with bulk_create
+(upserted on the primary key for existing documents when updating is
+enabled).
+
+Rejected rows are written to a CSV file with their line number and errors,
+in the same layout as the input, so they can be fixed and imported again.
+Headers may be the field names (nome, cpf, email) or the column titles of
+the list exports (Nome, CPF, E-mail).
+"""
+import csv
+import io
+import re
+import time
+import zipfile
+from xml.etree.ElementTree import iterparse
+
+from django import forms
+from django.core.exceptions import FieldDoesNotExist
+from django.db import IntegrityError, transaction
+from django.utils.module_loading import import_string
+
+from .busca import agendar_indexacao, normalizar
+from .estatisticas import invalidar_estatisticas
+from .exportacao import iterar_em_lotes
+from .utils import somente_digitos
+
+
+TAMANHO_LOTE = 1000
+LOTE_CHAVES = 20000
+
+CADASTROS = {
+    'cliente': ('customers.forms.ClienteForm', 'cpf'),
+    'fornecedor': ('suppliers.forms.FornecedorForm', 'cnpj'),
+}
+
+XLSX_NS = '{http://schemas.openxmlformats.org/spreadsheetml/2006/main}'
+XLSX_NS_REL = '{http://schemas.openxmlformats.org/officeDocument/2006/relationships}'
+XLSX_NS_PACOTE = '{http://schemas.openxmlformats.org/package/2006/relationships}'
+
+
+class ArquivoInvalido(ValueError):
+    """The file cannot be imported at all (format or missing columns)"""
+
+
+def _chave_coluna(texto):
+    return normalizar(texto).replace(' ', '')
+
+
+def ler_csv(arquivo):
+    """(cabecalhos, linhas) of a CSV file opened in binary mode; ';' or ','"""
+    texto = io.TextIOWrapper(arquivo, encoding='utf-8-sig', newline='')
+    primeira = texto.readline()
+    delimitador = ';' if primeira.count(';') >= primeira.count(',') else ','
+    cabecalhos = next(csv.reader([primeira], delimiter=delimitador), [])
+    return cabecalhos, csv.reader(texto, delimiter=delimitador)
+
+
+def _texto_xml(elemento):
+    return ''.join(t.text or '' for t in elemento.iter(f'{XLSX_NS}t'))
+
+
+def _strings_compartilhadas(pacote):
+    if 'xl/sharedStrings.xml' not in pacote.namelist():
+        return []
+    strings = []
+    with pacote.open('xl/sharedStrings.xml') as arquivo:
+        for _, elemento in iterparse(arquivo):
+            if elemento.tag == f'{XLSX_NS}si':
+                strings.append(_texto_xml(elemento))
+                elemento.clear()
+    return strings
+
+
+def _primeira_planilha(pacote):
+    """Path of the first worksheet, from the workbook and its relationships"""
+    try:
+        with pacote.open('xl/workbook.xml') as arquivo:
+            planilha = next(
+                elemento for _, elemento in iterparse(arquivo) if elemento.tag == f'{XLSX_NS}sheet'
+            )
+        with pacote.open('xl/_rels/workbook.xml.rels') as arquivo:
+            alvos = {
+                elemento.get('Id'): elemento.get('Target')
+                for _, elemento in iterparse(arquivo) if elemento.tag == f'{XLSX_NS_PACOTE}Relationship'
+            }
+        alvo = alvos[planilha.get(f'{XLSX_NS_REL}id')]
+        return alvo.lstrip('/') if alvo.startswith('/') else f'xl/{alvo}'
+    except (KeyError, StopIteration):
+        return 'xl/worksheets/sheet1.xml'
+
+
+def _indice_coluna(referencia):
+    letras = re.match(r'[A-Z]+', referencia or '')
+    if not letras:
+        return None
+    indice = 0
+    for letra in letras.group():
+        indice = indice * 26 + ord(letra) - ord('A') + 1
+    return indice - 1
+
+
+def _valor_celula(celula, compartilhadas):
+    tipo = celula.get('t')
+    if tipo == 'inlineStr':
+        return _texto_xml(celula)
+    valor = celula.find(f'{XLSX_NS}v')
+    texto = valor.text if valor is not None and valor.text else ''
+    if tipo == 's':
+        return compartilhadas[int(texto)] if texto else ''
+    if tipo is None and texto.endswith('.0'):
+        # Whole numbers typed in numeric cells (CEP, número)
+        return texto[:-2]
+    return texto
+
+
+def _linhas_xlsx(pacote, nome_planilha, compartilhadas):
+    with pacote, pacote.open(nome_planilha) as planilha:
+        for _, elemento in iterparse(planilha):
+            if elemento.tag != f'{XLSX_NS}row':
+                continue
+            valores = {}
+            for posicao, celula in enumerate(elemento.iter(f'{XLSX_NS}c')):
+                indice = _indice_coluna(celula.get('r'))
+                valores[posicao if indice is None else indice] = _valor_celula(celula, compartilhadas)
+            yield [valores.get(i, '') for i in range(max(valores, default=-1) + 1)]
+            elemento.clear()
+
+
+def ler_xlsx(arquivo):
+    """(cabecalhos, linhas) of the first sheet of an XLSX workbook"""
+    try:
+        pacote = zipfile.ZipFile(arquivo)
+    except zipfile.BadZipFile:
+        raise ArquivoInvalido('Arquivo XLSX inválido')
+    linhas = _linhas_xlsx(pacote, _primeira_planilha(pacote), _strings_compartilhadas(pacote))
+    return next(linhas, []), linhas
+
+
+def ler_planilha(arquivo, nome_arquivo=''):
+    """(cabecalhos, linhas) of a CSV or XLSX file opened in binary mode"""
+    if nome_arquivo.lower().endswith('.xlsx'):
+        return ler_xlsx(arquivo)
+    return ler_csv(arquivo)
+
+
+def mapear_colunas(cabecalhos, model, campos, apelidos=None):
+    """
+    {field: column index} of the headers naming one of `campos`, by field
+    name or verbose name, ignoring case, accents and spaces
+    """
+    nomes = {_chave_coluna(campo): campo for campo in campos}
+    for campo in campos:
+        try:
+            nomes[_chave_coluna(model._meta.get_field(campo).verbose_name)] = campo
+        except FieldDoesNotExist:
+            pass
+    nomes.update({_chave_coluna(apelido): campo for apelido, campo in (apelidos or {}).items()})
+    colunas = {}
+    for indice, cabecalho in enumerate(cabecalhos):
+        campo = nomes.get(_chave_coluna(cabecalho))
+        if campo and campo not in colunas:
+            colunas[campo] = indice
+    return colunas
+
+
+def form_importacao(form_class):
+    """
+    The app's ModelForm without the per-row uniqueness queries and without
+    the crispy layout its __init__ builds, which only matters for rendering
+    """
+    def __init__(self, *args, **kwargs):
+        forms.ModelForm.__init__(self, *args, **kwargs)
+
+    return type(f'Importacao{form_class.__name__}', (form_class,), {
+        '__init__': __init__,
+        'validate_unique': lambda self: None,
+    })
+
+
+def carregar_chaves(model, chave):
+    """{digits of the document: pk} of every existing row"""
+    existentes = {}
+    for lote in iterar_em_lotes(model._default_manager.all(), [chave, 'pk'], ('pk',), LOTE_CHAVES):
+        for valor, pk in lote:
+            existentes.setdefault(somente_digitos(valor), pk)
+    return existentes
+
+
+class _Resumo(dict):
+
+    def __init__(self):
+        super().__init__(lidas=0, inseridas=0, atualizadas=0, rejeitadas=0, segundos=0, linhas_por_segundo=None)
+        self.inicio = time.monotonic()
+
+    def atualizar_tempo(self):
+        self['segundos'] = round(time.monotonic() - self.inicio, 3)
+        if self['segundos']:
+            self['linhas_por_segundo'] = round(self['lidas'] / self['segundos'])
+
+
+def importar_cadastros(tipo, arquivo, nome_arquivo='', atualizar=False, rejeitados=None,
+                       tamanho_lote=TAMANHO_LOTE, progresso=None):
+    """
+    Import the customers or suppliers (`tipo`: 'cliente' or 'fornecedor')
+    of a CSV or XLSX file opened in binary mode.
+
+    Args:
+        atualizar: rows whose CPF/CNPJ already exists update that record
+            instead of being rejected
+        rejeitados: text file that receives the rejected rows (CSV)
+        progresso: called with the running summary after every chunk
+
+    Raises:
+        ArquivoInvalido: unreadable file or missing required columns
+
+    Returns:
+        dict with the rows read, inserted, updated and rejected, the elapsed
+        time and the throughput in rows per second
+    """
+    caminho_form, chave = CADASTROS[tipo]
+    form_class = form_importacao(import_string(caminho_form))
+    model = form_class._meta.model
+    campos = list(form_class._meta.fields)
+    sombra_chave = next(sombra for campo, sombra, _ in model.campos_digitos if campo == chave)
+
+    cabecalhos, linhas = ler_planilha(arquivo, nome_arquivo)
+    colunas = mapear_colunas(cabecalhos, model, campos)
+    if chave not in colunas or 'nome' not in colunas:
+        raise ArquivoInvalido(f'O arquivo precisa das colunas nome e {chave}')
+
+    # An update writes only the columns the file has (and their digits-only
+    # copies): the others keep their current values
+    atualizados = [campo for campo in campos if campo in colunas]
+    atualizados += [sombra for campo, sombra, _ in model.campos_digitos if campo in colunas]
+
+    existentes = carregar_chaves(model, chave)
+    vistos = {}
+    resumo = _Resumo()
+    escritor = None
+    novos, alterados = [], []
+
+    def rejeitar(numero, linha, erro):
+        nonlocal escritor
+        resumo['rejeitadas'] += 1
+        if rejeitados is None:
+            return
+        if escritor is None:
+            escritor = csv.writer(rejeitados, delimiter=';')
+            escritor.writerow(list(cabecalhos) + ['linha', 'erro'])
+        escritor.writerow(list(linha) + [numero, erro])
+
+    @transaction.atomic
+    def escrever(a_inserir, a_atualizar):
+        for _, _, obj in a_inserir + a_atualizar:
+            obj.preencher_digitos()
+        model._default_manager.bulk_create([obj for _, _, obj in a_inserir])
+        if a_atualizar:
+            # Upsert on the primary key: one multi-row statement, where
+            # bulk_update would build a CASE per column
+            model._default_manager.bulk_create(
+                [obj for _, _, obj in a_atualizar], update_conflicts=True,
+                unique_fields=[model._meta.pk.name], update_fields=atualizados,
+            )
+        # MySQL does not return primary keys from bulk inserts
+        ids = list(model._default_manager.filter(
+            **{f'{sombra_chave}__in': [getattr(obj, sombra_chave) for _, _, obj in a_inserir]}
+        ).values_list('pk', flat=True)) if a_inserir else []
+        agendar_indexacao(model, ids + [obj.pk for _, _, obj in a_atualizar])
+
+    def escrever_linha(item, a_inserir, a_atualizar):
+        try:
+            escrever(a_inserir, a_atualizar)
+        except IntegrityError:
+            rejeitar(item[0], item[1], f'{chave}: já cadastrado')
+            return False
+        return True
+
+    def gravar():
+        try:
+            escrever(novos, alterados)
+        except IntegrityError:
+            # A document created after the keys were loaded fails the
+            # chunk: write it row by row so only the culprits are rejected
+            for item in novos:
+                resumo['inseridas'] += escrever_linha(item, [item], [])
+            for item in alterados:
+                resumo['atualizadas'] += escrever_linha(item, [], [item])
+        else:
+            resumo['inseridas'] += len(novos)
+            resumo['atualizadas'] += len(alterados)
+
+        novos.clear()
+        alterados.clear()
+        resumo.atualizar_tempo()
+        if progresso:
+            progresso(resumo)
+
+    for numero, linha in enumerate(linhas, start=2):
+        if not any(str(valor).strip() for valor in linha):
+            continue
+        resumo['lidas'] += 1
+        dados = {
+            campo: str(linha[indice]).strip() if indice < len(linha) else ''
+            for campo, indice in colunas.items()
+        }
+
+        form = form_class(dados)
+        if not form.is_valid():
+            rejeitar(numero, linha, '; '.join(
+                f'{campo}: {" ".join(mensagens)}' for campo, mensagens in form.errors.items()
+            ))
+            continue
+
+        digitos = somente_digitos(form.cleaned_data[chave])
+        if not digitos:
+            rejeitar(numero, linha, f'{chave}: informe um documento com dígitos')
+            continue
+        if digitos in vistos:
+            rejeitar(numero, linha, f'{chave}: repetido no arquivo (linha {vistos[digitos]})')
+            continue
+        vistos[digitos] = numero
+
+        obj = form.save(commit=False)
+        if digitos in existentes:
+            if not atualizar:
+                rejeitar(numero, linha, f'{chave}: já cadastrado')
+                continue
+            obj.pk = existentes[digitos]
+            alterados.append((numero, linha, obj))
+        else:
+            novos.append((numero, linha, obj))
+
+        if len(novos) + len(alterados) >= tamanho_lote:
+            gravar()
+
+    gravar()
+    if resumo['inseridas']:
+        invalidar_estatisticas()
+    return resumo
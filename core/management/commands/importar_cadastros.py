@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.importacao import CADASTROS, TAMANHO_LOTE, ArquivoInvalido, importar_cadastros
+
+
+class Command(BaseCommand):
+    help = 'Importa clientes ou fornecedores de um arquivo CSV ou XLSX'
+
+    def add_arguments(self, parser):
+        parser.add_argument('tipo', choices=sorted(CADASTROS), help='Cadastro de destino')
+        parser.add_argument('arquivo', help='Arquivo .csv ou .xlsx com linha de cabeçalho')
+        parser.add_argument(
+            '--atualizar', action='store_true',
+            help='Atualiza os cadastros cujo CPF/CNPJ já existe em vez de rejeitar a linha'
+        )
+        parser.add_argument('--rejeitados', help='Grava as linhas rejeitadas neste arquivo CSV')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='Registros por lote')
+
+    def handle(self, *args, **options):
+        ultimo = time.monotonic()
+
+        def progresso(resumo):
+            nonlocal ultimo
+            if time.monotonic() - ultimo >= 2:
+                ultimo = time.monotonic()
+                self.stdout.write(
+                    f"{resumo['lidas']} linhas lidas ({resumo['linhas_por_segundo']} linhas/s)"
+                )
+
+        rejeitados = None
+        try:
+            if options['rejeitados']:
+                rejeitados = open(options['rejeitados'], 'w', encoding='utf-8-sig', newline='')
+            with open(options['arquivo'], 'rb') as arquivo:
+                resumo = importar_cadastros(
+                    options['tipo'], arquivo, options['arquivo'],
+                    atualizar=options['atualizar'], rejeitados=rejeitados,
+                    tamanho_lote=options['lote'], progresso=progresso,
+                )
+        except ArquivoInvalido as e:
+            raise CommandError(str(e))
+        finally:
+            if rejeitados:
+                rejeitados.close()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"{resumo['lidas']} linhas: {resumo['inseridas']} inseridas, {resumo['atualizadas']} atualizadas, "
+            f"{resumo['rejeitadas']} rejeitadas em {resumo['segundos']}s ({resumo['linhas_por_segundo']} linhas/s)"
+        ))
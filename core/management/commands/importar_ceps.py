@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.cep import importar_ceps
+from core.importacao import ArquivoInvalido
+
+
+class Command(BaseCommand):
+    help = 'Carrega uma base offline de CEPs (CSV ou XLSX) no cache de CEPs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'arquivo', help='Arquivo .csv ou .xlsx com as colunas cep, logradouro, complemento, bairro, cidade e uf'
+        )
+        parser.add_argument('--lote', type=int, default=1000, help='Registros por lote')
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        try:
+            with open(options['arquivo'], 'rb') as arquivo:
+                gravadas, ignoradas = importar_ceps(arquivo, options['arquivo'], options['lote'])
+        except ArquivoInvalido as e:
+            raise CommandError(str(e))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{gravadas} CEP(s) carregado(s), {ignoradas} linha(s) ignorada(s) ({time.monotonic() - inicio:.1f}s)'
+        ))
@@ -0,0 +1,32 @@
+import time
+
+from django.apps import apps
+from django.core.management.base import BaseCommand
+
+
+MODELOS = {
+    'cliente': 'customers.Cliente',
+    'fornecedor': 'suppliers.Fornecedor',
+    'funcionario': 'accounts.Funcionario',
+}
+
+
+class Command(BaseCommand):
+    help = 'Preenche as colunas só com dígitos (CPF, CNPJ, telefones) dos registros existentes'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modelo', action='append', choices=sorted(MODELOS),
+            help='Preenche apenas o modelo informado (pode ser repetido)'
+        )
+        parser.add_argument('--lote', type=int, default=1000, help='Registros por lote')
+
+    def handle(self, *args, **options):
+        for nome in options['modelo'] or MODELOS:
+            model = apps.get_model(MODELOS[nome])
+            inicio = time.monotonic()
+            total = model.atualizar_digitos(options['lote'])
+            segundos = time.monotonic() - inicio
+            self.stdout.write(self.style.SUCCESS(
+                f'{model._meta.verbose_name_plural}: {total} registro(s) atualizado(s) ({segundos:.1f}s)'
+            ))
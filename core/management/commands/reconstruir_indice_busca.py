@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.busca import INDEXADORES, LOTE_INDEXACAO, reconstruir
+
+
+class Command(BaseCommand):
+    help = 'Reconstrói o índice da busca global (clientes, fornecedores, funcionários, produtos e vendas)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tipo', action='append', choices=sorted(INDEXADORES),
+            help='Reconstrói apenas o tipo informado (pode ser repetido)'
+        )
+        parser.add_argument('--lote', type=int, default=LOTE_INDEXACAO, help='Objetos por lote')
+
+    def handle(self, *args, **options):
+        for tipo in options['tipo'] or INDEXADORES:
+            inicio = time.monotonic()
+            total = reconstruir(tipo, options['lote'])
+            segundos = time.monotonic() - inicio
+            self.stdout.write(self.style.SUCCESS(
+                f'{INDEXADORES[tipo].nome}: {total} registro(s) indexado(s) ({segundos:.1f}s)'
+            ))
@@ -0,0 +1,80 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.cep import CepIndisponivel
+from core.enderecos import MODELOS, TAMANHO_LOTE, Checkpoint, resolvedor_webservice, validar_enderecos
+
+
+class Command(BaseCommand):
+    help = 'Valida e corrige cidade/estado/bairro/endereço de clientes, fornecedores e funcionários pelo CEP'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--modelo', action='append', choices=sorted(MODELOS),
+            help='Valida apenas o cadastro informado (pode ser repetido)'
+        )
+        parser.add_argument(
+            '--resolvedor', choices=['webservice', 'base'], default='webservice',
+            help='webservice: consulta os CEPs desconhecidos; base: usa só os CEPs já carregados (importar_ceps)'
+        )
+        parser.add_argument('--url', help='URL do serviço de CEP com {cep} (padrão: CEP_URL)')
+        parser.add_argument('--concorrencia', type=int, default=8, help='Consultas simultâneas ao serviço de CEP')
+        parser.add_argument('--taxa', type=float, default=20, help='Máximo de consultas por segundo (0: sem limite)')
+        parser.add_argument('--lote', type=int, default=TAMANHO_LOTE, help='Registros por lote')
+        parser.add_argument(
+            '--checkpoint', default='validar_enderecos.checkpoint.json',
+            help='Arquivo de progresso usado para retomar uma execução interrompida'
+        )
+        parser.add_argument('--reiniciar', action='store_true', help='Ignora o checkpoint e começa do início')
+        parser.add_argument('--simular', action='store_true', help='Apenas conta as correções, sem gravar')
+        parser.add_argument('--relatorio', help='Grava em CSV os cadastros com CEP inválido ou inexistente')
+
+    def handle(self, *args, **options):
+        checkpoint = Checkpoint(options['checkpoint'])
+        if options['reiniciar']:
+            checkpoint.remover()
+            checkpoint = Checkpoint(options['checkpoint'])
+        elif checkpoint.ultimo_pk:
+            self.stdout.write(f'Retomando do checkpoint: {checkpoint.ultimo_pk}')
+
+        resolvedor = None
+        if options['resolvedor'] == 'webservice':
+            resolvedor = resolvedor_webservice(options['url'], options['concorrencia'])
+
+        ultimo = time.monotonic()
+
+        def progresso(etapa, resumo):
+            nonlocal ultimo
+            if time.monotonic() - ultimo >= 2:
+                ultimo = time.monotonic()
+                self.stdout.write(f'{etapa}: {resumo}')
+
+        relatorio = None
+        inicio = time.monotonic()
+        try:
+            if options['relatorio']:
+                relatorio = open(options['relatorio'], 'w', encoding='utf-8-sig', newline='')
+            resultado = validar_enderecos(
+                options['modelo'], resolvedor, options['concorrencia'], options['taxa'], checkpoint,
+                options['simular'], options['lote'], relatorio, progresso,
+            )
+        except CepIndisponivel as e:
+            raise CommandError(str(e))
+        finally:
+            if relatorio:
+                relatorio.close()
+
+        if 'ceps' in resultado:
+            ceps = resultado.pop('ceps')
+            self.stdout.write(
+                f"CEPs: {ceps['conhecidos']} já conhecidos, {ceps['resolvidos']} resolvidos, "
+                f"{ceps['nao_encontrados']} não encontrados, {ceps['pendentes']} pendentes"
+            )
+        for nome, resumo in resultado.items():
+            self.stdout.write(self.style.SUCCESS(
+                f"{nome}: {resumo['lidas']} lidos, {resumo['corrigidas']} "
+                f"{'a corrigir' if options['simular'] else 'corrigidos'}, {resumo['invalidas']} com CEP inválido, "
+                f"{resumo['pendentes']} com CEP pendente"
+            ))
+        self.stdout.write(f'Tempo total: {time.monotonic() - inicio:.1f}s')
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentoBusca',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=20, verbose_name='Tipo')),
+                ('objeto_id', models.IntegerField(verbose_name='ID do Objeto')),
+                ('titulo', models.CharField(max_length=200, verbose_name='Título')),
+                ('detalhe', models.CharField(blank=True, max_length=255, verbose_name='Detalhe')),
+                ('atualizado_em', models.DateTimeField(auto_now=True, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'Documento de Busca',
+                'verbose_name_plural': 'Documentos de Busca',
+                'db_table': 'tb_busca_documentos',
+                'constraints': [models.UniqueConstraint(fields=('tipo', 'objeto_id'), name='uniq_busca_documento')],
+            },
+        ),
+        migrations.CreateModel(
+            name='TermoBusca',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=20, verbose_name='Tipo')),
+                ('objeto_id', models.IntegerField(verbose_name='ID do Objeto')),
+                ('termo', models.CharField(max_length=40, verbose_name='Termo')),
+                ('peso', models.PositiveSmallIntegerField(default=1, verbose_name='Peso')),
+            ],
+            options={
+                'verbose_name': 'Termo de Busca',
+                'verbose_name_plural': 'Termos de Busca',
+                'db_table': 'tb_busca_termos',
+                'indexes': [models.Index(fields=['termo', 'tipo', 'objeto_id'], name='tb_busca_termo_idx')],
+                'constraints': [models.UniqueConstraint(fields=('tipo', 'objeto_id', 'termo'), name='uniq_busca_termo')],
+            },
+        ),
+    ]
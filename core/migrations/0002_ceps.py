@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:13
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_indice_busca'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Cep',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cep', models.CharField(max_length=8, unique=True, verbose_name='CEP')),
+                ('logradouro', models.CharField(blank=True, max_length=200, verbose_name='Logradouro')),
+                ('complemento', models.CharField(blank=True, max_length=200, verbose_name='Complemento')),
+                ('bairro', models.CharField(blank=True, max_length=100, verbose_name='Bairro')),
+                ('cidade', models.CharField(blank=True, max_length=100, verbose_name='Cidade')),
+                ('uf', models.CharField(blank=True, max_length=2, verbose_name='UF')),
+                ('encontrado', models.BooleanField(default=True, verbose_name='Encontrado')),
+                ('origem', models.CharField(choices=[('webservice', 'Webservice'), ('base', 'Base offline')], default='webservice', max_length=10, verbose_name='Origem')),
+                ('atualizado_em', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Atualizado em')),
+            ],
+            options={
+                'verbose_name': 'CEP',
+                'verbose_name_plural': 'CEPs',
+                'db_table': 'tb_ceps',
+            },
+        ),
+    ]
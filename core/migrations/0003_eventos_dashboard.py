@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:29
+
+import django.core.serializers.json
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_ceps'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventoDashboard',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=20, verbose_name='Tipo')),
+                ('dados', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder, verbose_name='Dados')),
+                ('criado_em', models.DateTimeField(db_index=True, default=django.utils.timezone.now, verbose_name='Criado em')),
+            ],
+            options={
+                'verbose_name': 'Evento do dashboard',
+                'verbose_name_plural': 'Eventos do dashboard',
+                'db_table': 'tb_eventos_dashboard',
+            },
+        ),
+    ]
@@ -0,0 +1,190 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import models
+from django.db.models import Q
+from django.utils import timezone
+
+from .exportacao import iterar_em_lotes
+from .utils import somente_digitos
+
+
+class CamposDigitosMixin:
+    """
+    Keeps digits-only copies of formatted fields (CPF, CNPJ, phones) in
+    indexed shadow columns, filled on save with the same rules as
+    core.utils.formatar_*, so lookups are index seeks whatever mask the
+    value was typed with.
+
+    `campos_digitos` lists (field, shadow column, document length); when a
+    search has the full length of a document it is an exact match,
+    otherwise a prefix match.
+    """
+    campos_digitos = ()
+    tamanho_minimo_busca = 3
+
+    def preencher_digitos(self):
+        for campo, sombra, _ in self.campos_digitos:
+            setattr(self, sombra, somente_digitos(getattr(self, campo)))
+
+    def save(self, *args, **kwargs):
+        self.preencher_digitos()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {
+                sombra for campo, sombra, _ in self.campos_digitos if campo in update_fields
+            }
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def filtro_digitos(cls, termo):
+        """
+        Q matching `termo` against the shadow columns, or None when the term
+        is not a document or phone number (has letters or too few digits)
+        """
+        digitos = somente_digitos(termo)
+        if len(digitos) < cls.tamanho_minimo_busca or any(c.isalpha() for c in str(termo)):
+            return None
+
+        condicao = Q()
+        for _, sombra, tamanho in cls.campos_digitos:
+            if tamanho and len(digitos) > tamanho:
+                continue
+            if len(digitos) == tamanho:
+                condicao |= Q(**{sombra: digitos})
+            else:
+                # Prefix as a range ('123' <= x < '124'): an index range
+                # scan on every backend and collation, which LIKE is not
+                fim = digitos[:-1] + chr(ord(digitos[-1]) + 1)
+                condicao |= Q(**{f'{sombra}__gte': digitos, f'{sombra}__lt': fim})
+        return condicao or None
+
+    @classmethod
+    def atualizar_digitos(cls, tamanho_lote=1000):
+        """
+        Backfill the shadow columns of existing rows, one chunk of primary
+        keys at a time; only rows whose value changed are written.
+        Returns the number of rows updated.
+        """
+        campos = [campo for campo, _, _ in cls.campos_digitos]
+        sombras = [sombra for _, sombra, _ in cls.campos_digitos]
+        atualizados = 0
+        for lote in iterar_em_lotes(cls._default_manager.all(), ['pk'] + campos + sombras, ('pk',), tamanho_lote):
+            alterados = []
+            for linha in lote:
+                valores = [somente_digitos(valor) for valor in linha[1:len(campos) + 1]]
+                if valores != list(linha[len(campos) + 1:]):
+                    alterados.append(cls(pk=linha[0], **dict(zip(sombras, valores))))
+            if alterados:
+                cls._default_manager.bulk_update(alterados, sombras)
+                atualizados += len(alterados)
+        return atualizados
+
+
+class DocumentoBusca(models.Model):
+    """
+    An entry of the global search index (see core.busca): what is shown
+    for one customer, supplier, employee, product or sale in the results
+    """
+    tipo = models.CharField('Tipo', max_length=20)
+    objeto_id = models.IntegerField('ID do Objeto')
+    titulo = models.CharField('Título', max_length=200)
+    detalhe = models.CharField('Detalhe', max_length=255, blank=True)
+    atualizado_em = models.DateTimeField('Atualizado em', auto_now=True)
+
+    class Meta:
+        db_table = 'tb_busca_documentos'
+        verbose_name = 'Documento de Busca'
+        verbose_name_plural = 'Documentos de Busca'
+        constraints = [
+            models.UniqueConstraint(fields=['tipo', 'objeto_id'], name='uniq_busca_documento'),
+        ]
+
+    def __str__(self):
+        return f'{self.tipo} #{self.objeto_id} - {self.titulo}'
+
+
+class TermoBusca(models.Model):
+    """
+    One normalized (lowercase, accent-folded) token of an indexed object.
+    Searches are prefix range scans on (termo, tipo, objeto_id), which
+    also covers the columns they read.
+    """
+    tipo = models.CharField('Tipo', max_length=20)
+    objeto_id = models.IntegerField('ID do Objeto')
+    termo = models.CharField('Termo', max_length=40)
+    peso = models.PositiveSmallIntegerField('Peso', default=1)
+
+    class Meta:
+        db_table = 'tb_busca_termos'
+        verbose_name = 'Termo de Busca'
+        verbose_name_plural = 'Termos de Busca'
+        constraints = [
+            models.UniqueConstraint(fields=['tipo', 'objeto_id', 'termo'], name='uniq_busca_termo'),
+        ]
+        indexes = [
+            models.Index(fields=['termo', 'tipo', 'objeto_id'], name='tb_busca_termo_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.termo} ({self.tipo} #{self.objeto_id})'
+
+
+class Cep(models.Model):
+    """
+    A resolved CEP (see core.cep): from a webservice lookup, kept for
+    CEP_TTL_DIAS, or from the offline dataset, kept until reimported.
+    `encontrado` False records a CEP the webservice does not know.
+    """
+    ORIGEM_WEBSERVICE = 'webservice'
+    ORIGEM_BASE = 'base'
+    ORIGENS = [
+        (ORIGEM_WEBSERVICE, 'Webservice'),
+        (ORIGEM_BASE, 'Base offline'),
+    ]
+
+    cep = models.CharField('CEP', max_length=8, unique=True)
+    logradouro = models.CharField('Logradouro', max_length=200, blank=True)
+    complemento = models.CharField('Complemento', max_length=200, blank=True)
+    bairro = models.CharField('Bairro', max_length=100, blank=True)
+    cidade = models.CharField('Cidade', max_length=100, blank=True)
+    uf = models.CharField('UF', max_length=2, blank=True)
+    encontrado = models.BooleanField('Encontrado', default=True)
+    origem = models.CharField('Origem', max_length=10, choices=ORIGENS, default=ORIGEM_WEBSERVICE)
+    atualizado_em = models.DateTimeField('Atualizado em', default=timezone.now)
+
+    class Meta:
+        db_table = 'tb_ceps'
+        verbose_name = 'CEP'
+        verbose_name_plural = 'CEPs'
+
+    def __str__(self):
+        return f'{self.cep} - {self.cidade}/{self.uf}' if self.encontrado else f'{self.cep} (não encontrado)'
+
+    def endereco(self):
+        """The address as returned by core.cep.consultar_cep"""
+        if not self.encontrado:
+            return {}
+        return {
+            'logradouro': self.logradouro,
+            'complemento': self.complemento,
+            'bairro': self.bairro,
+            'cidade': self.cidade,
+            'uf': self.uf,
+        }
+
+
+class EventoDashboard(models.Model):
+    """
+    A dashboard update (see core.eventos), written in the transaction of
+    the change it describes and streamed to the open dashboards
+    """
+    tipo = models.CharField('Tipo', max_length=20)
+    dados = models.JSONField('Dados', encoder=DjangoJSONEncoder)
+    criado_em = models.DateTimeField('Criado em', default=timezone.now, db_index=True)
+
+    class Meta:
+        db_table = 'tb_eventos_dashboard'
+        verbose_name = 'Evento do dashboard'
+        verbose_name_plural = 'Eventos do dashboard'
+
+    def __str__(self):
+        return f'#{self.pk} {self.tipo}'
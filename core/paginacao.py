@@ -0,0 +1,185 @@
+"""
+Keyset (seek) pagination for list views over large tables.
+
+Instead of OFFSET/LIMIT plus a COUNT(*), each page is fetched with a
+WHERE clause that seeks past the last row shown, so every page costs the
+same index range scan however deep the user goes. Positions travel in
+opaque signed cursor tokens.
+"""
+import hashlib
+from datetime import date, datetime
+
+from django.core import signing
+from django.core.cache import cache
+from django.db.models import Q
+
+
+SALT_CURSOR = 'core.paginacao'
+
+
+class CursorInvalido(Exception):
+    """Raised when a cursor token is malformed or was tampered with"""
+
+
+def _serializar(valor):
+    if isinstance(valor, (date, datetime)):
+        return valor.isoformat()
+    return valor
+
+
+def gerar_cursor(valores, direcao):
+    """Encode a position (values of the ordering fields) and direction"""
+    return signing.dumps(
+        {'v': [_serializar(valor) for valor in valores], 'd': direcao},
+        salt=SALT_CURSOR,
+        compress=True,
+    )
+
+
+def ler_cursor(token):
+    try:
+        dados = signing.loads(token, salt=SALT_CURSOR)
+        return dados['v'], dados['d']
+    except (signing.BadSignature, KeyError, TypeError):
+        raise CursorInvalido(token)
+
+
+def filtro_seek(campos, valores, depois=True):
+    """
+    Build the seek condition for an ordering like ('-data_venda', '-id'):
+    rows strictly after (or before) the given position.
+    """
+    condicao = Q()
+    for i, campo in enumerate(campos):
+        nome = campo.lstrip('-')
+        descendente = campo.startswith('-')
+        operador = 'lt' if descendente == depois else 'gt'
+
+        termo = Q(**{f'{nome}__{operador}': valores[i]})
+        for anterior, valor in zip(campos[:i], valores[:i]):
+            termo &= Q(**{anterior.lstrip('-'): valor})
+        condicao |= termo
+    return condicao
+
+
+def inverter(campos):
+    return tuple(campo[1:] if campo.startswith('-') else f'-{campo}' for campo in campos)
+
+
+class PaginaKeyset:
+    """A page of results with the cursors needed to move around it"""
+
+    def __init__(self, itens, campos, tem_anterior, tem_proxima, request, parametro):
+        self.object_list = itens
+        self.tem_anterior = tem_anterior
+        self.tem_proxima = tem_proxima
+        self._campos = campos
+        self._request = request
+        self._parametro = parametro
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def _posicao(self, item):
+        return [getattr(item, campo.lstrip('-')) for campo in self._campos]
+
+    def _url(self, cursor):
+        parametros = self._request.GET.copy()
+        parametros.pop('page', None)
+        parametros[self._parametro] = cursor
+        return f'?{parametros.urlencode()}'
+
+    @property
+    def url_anterior(self):
+        if self.tem_anterior and self.object_list:
+            return self._url(gerar_cursor(self._posicao(self.object_list[0]), 'anterior'))
+        return None
+
+    @property
+    def url_proxima(self):
+        if self.tem_proxima and self.object_list:
+            return self._url(gerar_cursor(self._posicao(self.object_list[-1]), 'proxima'))
+        return None
+
+    @property
+    def url_primeira(self):
+        parametros = self._request.GET.copy()
+        parametros.pop(self._parametro, None)
+        parametros.pop('page', None)
+        return f'?{parametros.urlencode()}'
+
+    # Paginator-like API so templates can keep using page_obj
+    @property
+    def has_previous(self):
+        return self.tem_anterior
+
+    @property
+    def has_next(self):
+        return self.tem_proxima
+
+
+class KeysetPaginationMixin:
+    """
+    ListView mixin for keyset pagination.
+
+    Set `keyset_campos` to a unique ordering, e.g. ('-data_venda', '-id').
+    The total count is optional (?total=1) and comes from get_total_estimado(),
+    which by default caches COUNT(*) for `keyset_cache_total` seconds.
+    """
+    keyset_campos = ()
+    keyset_parametro = 'cursor'
+    keyset_cache_total = 300
+
+    def paginate_queryset(self, queryset, page_size):
+        campos = tuple(self.keyset_campos)
+        token = self.request.GET.get(self.keyset_parametro)
+        posicao, direcao = None, 'proxima'
+
+        if token:
+            try:
+                posicao, direcao = ler_cursor(token)
+            except CursorInvalido:
+                posicao = None
+
+        if direcao == 'anterior':
+            ordem = inverter(campos)
+        else:
+            ordem = campos
+
+        queryset = queryset.order_by(*ordem)
+        if posicao is not None:
+            queryset = queryset.filter(filtro_seek(campos, posicao, depois=direcao != 'anterior'))
+
+        itens = list(queryset[:page_size + 1])
+        ha_mais = len(itens) > page_size
+        itens = itens[:page_size]
+
+        if direcao == 'anterior':
+            itens.reverse()
+            tem_anterior, tem_proxima = ha_mais, True
+        else:
+            tem_anterior, tem_proxima = posicao is not None, ha_mais
+
+        pagina = PaginaKeyset(
+            itens, campos, tem_anterior, tem_proxima, self.request, self.keyset_parametro
+        )
+        return (None, pagina, itens, tem_anterior or tem_proxima)
+
+    def get_total_estimado(self):
+        """COUNT(*) of the filtered queryset, cached per filter combination"""
+        queryset = self.get_queryset().order_by()
+        chave = 'paginacao:total:' + hashlib.md5(str(queryset.query).encode()).hexdigest()
+        total = cache.get(chave)
+        if total is None:
+            total = queryset.count()
+            cache.set(chave, total, self.keyset_cache_total)
+        return total
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        if self.request.GET.get('total'):
+            context['total_registros'] = self.get_total_estimado()
+        return context
@@ -0,0 +1,30 @@
+"""
+Helpers for management commands that spread work across processes
+"""
+import os
+
+
+def inicializar_django():
+    """
+    Process pool initializer: makes Django usable inside worker processes,
+    including platforms that start workers with 'spawn' (Windows).
+    The parent must call django.db.connections.close_all() before creating
+    the pool so forked workers open their own database connections.
+    """
+    import django
+
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'config.settings')
+    django.setup()
+
+
+def dividir_periodo(data_inicio, data_fim, dias):
+    """Split [data_inicio, data_fim] into consecutive ranges of up to `dias` days"""
+    from datetime import timedelta
+
+    periodos = []
+    inicio = data_inicio
+    while inicio <= data_fim:
+        fim = min(inicio + timedelta(days=dias - 1), data_fim)
+        periodos.append((inicio, fim))
+        inicio = fim + timedelta(days=1)
+    return periodos
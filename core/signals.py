@@ -0,0 +1,50 @@
+"""
+Signal handlers that keep cached data and the search index in sync with
+the models
+"""
+from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from accounts.models import Funcionario
+from customers.models import Cliente
+from suppliers.models import Fornecedor
+from inventory.models import CACHE_PRODUTOS, Produto
+from inventory.signals import estoque_minimo_cruzado
+from sales.models import Venda
+from .autenticacao import CACHE_USUARIOS
+from .busca import agendar_indexacao
+from .cache import invalidar, invalidar_ao_alterar
+from .estatisticas import namespace_widget
+from .eventos import publicar_estoque
+
+
+# Cache namespaces dropped when the models they are computed from change
+invalidar_ao_alterar(namespace_widget('contagens'), Cliente, Fornecedor, Produto)
+invalidar_ao_alterar(namespace_widget('estoque_baixo'), Produto)
+for widget in ('faturamento', 'vendas_recentes', 'grafico_vendas'):
+    invalidar_ao_alterar(namespace_widget(widget), Venda)
+invalidar_ao_alterar(CACHE_PRODUTOS, Produto)
+invalidar_ao_alterar(CACHE_USUARIOS, User)
+
+
+@receiver(estoque_minimo_cruzado)
+def invalidar_estoque_baixo(sender, cruzamentos, **kwargs):
+    """Drop the low-stock counts and notify the dashboards when products cross their minimum"""
+    invalidar(namespace_widget('estoque_baixo'), CACHE_PRODUTOS)
+    publicar_estoque(cruzamentos)
+
+
+@receiver(post_save, sender=Cliente)
+@receiver(post_delete, sender=Cliente)
+@receiver(post_save, sender=Fornecedor)
+@receiver(post_delete, sender=Fornecedor)
+@receiver(post_save, sender=Funcionario)
+@receiver(post_delete, sender=Funcionario)
+@receiver(post_save, sender=Produto)
+@receiver(post_delete, sender=Produto)
+@receiver(post_save, sender=Venda)
+@receiver(post_delete, sender=Venda)
+def atualizar_indice_busca(sender, instance, **kwargs):
+    """Queue the object for reindexing when the transaction commits"""
+    agendar_indexacao(sender, [instance.pk])
@@ -1,4 +1,29 @@
+import asyncio
+import io
+import json
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
 from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from customers.models import Cliente
+from . import cep
+from .autenticacao import CACHE_USUARIOS
+from .cache import chave, em_cache, invalidar
+from .busca import buscar, filtrar_busca, tokens
+from .enderecos import Checkpoint, validar_enderecos
+from .eventos import Difusor, publicar_atualizacao, publicar_vendas, transmitir
+from .importacao import importar_cadastros
+from .models import DocumentoBusca, EventoDashboard, TermoBusca
+from .estatisticas import WIDGETS, contador, invalidar_estatisticas, obter_estatisticas, obter_widget
 from .utils import buscar_cep, formatar_cep, formatar_telefone, formatar_cpf, formatar_cnpj, formatar_moeda
 
 
@@ -21,3 +46,444 @@ class UtilsTestCase(TestCase):
     
     def test_formatar_moeda(self):
         self.assertEqual(formatar_moeda(1234.56), 'R$ 1.234,56')
+
+
+class DashboardCacheTestCase(TestCase):
+    """Test the cached dashboard statistics snapshot"""
+    
+    def setUp(self):
+        invalidar_estatisticas()
+    
+    def test_snapshot_em_cache_sem_consultas(self):
+        obter_estatisticas()
+        acertos = contador.acertos
+        
+        with self.assertNumQueries(0):
+            obter_estatisticas()
+        self.assertEqual(contador.acertos, acertos + 1)
+    
+    def test_sinal_invalida_snapshot(self):
+        self.assertEqual(obter_estatisticas()['total_clientes'], 0)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Cliente.objects.create(
+                nome='Cliente', cpf='12345678901', telefone='1140041000', celular='11987654321',
+                cep='13345325', endereco='Rua A', numero=1, bairro='Centro', cidade='Campinas', estado='SP',
+            )
+        
+        self.assertEqual(obter_estatisticas()['total_clientes'], 1)
+    
+    def test_dashboard_renderiza(self):
+        self.client.force_login(User.objects.create_user('gerente'))
+        response = self.client.get('/core/dashboard/')
+        self.assertEqual(response.status_code, 200)
+        # The shell page reads nothing: the widgets are separate requests
+        with self.assertNumQueries(0):
+            self.client.get('/core/dashboard/')
+        self.assertIn('acertos', self.client.get('/core/dashboard/cache/').json())
+    
+    def test_widget_com_etag(self):
+        self.client.force_login(User.objects.create_user('gerente'))
+        for nome in WIDGETS:
+            response = self.client.get(reverse('core:dashboard_widget', args=[nome]))
+            self.assertEqual(response.status_code, 200)
+            
+            with self.assertNumQueries(0):
+                response = self.client.get(
+                    reverse('core:dashboard_widget', args=[nome]), HTTP_IF_NONE_MATCH=response['ETag'],
+                )
+            self.assertEqual(response.status_code, 304)
+        
+        self.assertEqual(self.client.get(reverse('core:dashboard_widget', args=['inexistente'])).status_code, 404)
+    
+    def test_sinal_invalida_apenas_widgets_afetados(self):
+        obter_widget('grafico_vendas')
+        obter_widget('contagens')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Cliente.objects.create(
+                nome='Cliente', cpf='12345678901', telefone='1140041000', celular='11987654321',
+                cep='13345325', endereco='Rua A', numero=1, bairro='Centro', cidade='Campinas', estado='SP',
+            )
+        
+        with self.assertNumQueries(0):
+            obter_widget('grafico_vendas')
+        self.assertEqual(obter_widget('contagens')['dados']['total_clientes'], 1)
+
+
+class CacheEmCamadasTestCase(TestCase):
+    """Test the two-tier cache and the versioned namespaces"""
+
+    def test_camada_local_e_compartilhada(self):
+        cache.set('teste:valor', {'a': 1})
+        self.assertEqual(caches['compartilhado'].get('teste:valor'), {'a': 1})
+
+        caches['compartilhado'].delete('teste:valor')
+        valor = cache.get('teste:valor')
+        self.assertEqual(valor, {'a': 1})
+        valor['a'] = 2
+        self.assertEqual(cache.get('teste:valor'), {'a': 1})
+
+        cache.delete('teste:valor')
+        self.assertIsNone(cache.get('teste:valor'))
+
+    def test_invalidacao_por_namespace(self):
+        invalidar('teste')
+        calculos = []
+
+        def calcular():
+            calculos.append(1)
+            return len(calculos)
+
+        self.assertEqual(em_cache('teste', ('x',), calcular), 1)
+        self.assertEqual(em_cache('teste', ('x',), calcular), 1)
+        invalidar('teste')
+        self.assertEqual(em_cache('teste', ('x',), calcular), 2)
+
+    def test_pagina_autenticada_sem_consultas(self):
+        self.client.force_login(User.objects.create_user('gerente'))
+        self.client.get('/core/dashboard/cache/')
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/core/dashboard/cache/').status_code, 200)
+
+    def test_usuario_em_cache_sem_senha(self):
+        usuario = User.objects.create_user('gerente', password='Senha-antiga-123')
+        self.client.force_login(usuario)
+        self.client.get('/core/dashboard/cache/')
+        self.assertNotIn(usuario.password, str(cache.get(chave(CACHE_USUARIOS, usuario.pk))))
+
+        # The session stays valid across a password change
+        resposta = self.client.post(reverse('accounts:password_change'), {
+            'old_password': 'Senha-antiga-123', 'new_password1': 'Outra-senha-456', 'new_password2': 'Outra-senha-456',
+        })
+        self.assertEqual(resposta.status_code, 302)
+        self.assertEqual(self.client.get('/core/dashboard/cache/').status_code, 200)
+        self.assertTrue(User.objects.get(pk=usuario.pk).check_password('Outra-senha-456'))
+
+
+class EventosDashboardTestCase(TestCase):
+    """Test the live dashboard events"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.cliente = Cliente.objects.create(
+            nome='Cliente', cpf='12345678901', telefone='1140041000', celular='11987654321',
+            cep='13345325', endereco='Rua A', numero=1, bairro='Centro', cidade='Campinas', estado='SP',
+        )
+        cls.user = User.objects.create_user('gerente')
+
+    def test_difusao_compartilhada(self):
+        difusor_teste = Difusor(tamanho_fila=2)
+        rapida, lenta = asyncio.Queue(10), asyncio.Queue(2)
+        difusor_teste.filas.update({rapida, lenta})
+        self.assertEqual(difusor_teste.buscar(), [])
+
+        publicar_vendas([(v, date.today(), self.cliente.pk, Decimal('10.50')) for v in (1, 2, 3)])
+        with self.assertNumQueries(1):
+            eventos = difusor_teste.buscar()
+        difusor_teste.distribuir(eventos)
+
+        self.assertEqual(rapida.qsize(), 3)
+        self.assertEqual(rapida.get_nowait().dados['cliente_nome'], 'Cliente')
+        # A queue that falls behind gets a snapshot reload instead
+        self.assertEqual([lenta.get_nowait() for _ in range(lenta.qsize())], [None])
+        self.assertEqual(difusor_teste.buscar(), [])
+
+    def test_escrita_remove_eventos_antigos(self):
+        antigo = EventoDashboard.objects.create(tipo='estatisticas', dados={})
+        EventoDashboard.objects.filter(pk=antigo.pk).update(criado_em=timezone.now() - timedelta(hours=2))
+
+        with mock.patch('core.eventos._proxima_limpeza', 0), \
+                self.captureOnCommitCallbacks(execute=True) as callbacks:
+            publicar_atualizacao()
+            publicar_atualizacao()
+
+        # Once per interval: the second write scheduled no other delete
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(EventoDashboard.objects.filter(pk=antigo.pk).count(), 0)
+        self.assertEqual(EventoDashboard.objects.count(), 2)
+
+    def test_sem_asgi_ou_sem_login(self):
+        self.assertEqual(self.client.get('/core/dashboard/eventos/').status_code, 403)
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get('/core/dashboard/eventos/').status_code, 204)
+
+    async def test_stream_asgi(self):
+        await self.async_client.aforce_login(self.user)
+        resposta = await self.async_client.get('/core/dashboard/eventos/')
+        self.assertEqual(resposta['Content-Type'], 'text/event-stream')
+        self.assertEqual(resposta['Cache-Control'], 'no-cache')
+
+        difusor_teste = Difusor(intervalo=0.01)
+        stream = transmitir(difusor_eventos=difusor_teste)
+        self.assertEqual(await anext(stream), 'retry: 3000\n\n')
+        snapshot = await anext(stream)
+        self.assertTrue(snapshot.startswith('event: estatisticas\n'))
+        self.assertEqual(json.loads(snapshot.split('data: ', 1)[1])['total_clientes'], 1)
+
+        await sync_to_async(publicar_vendas)([(7, date.today(), self.cliente.pk, Decimal('5'))])
+        evento = await anext(stream)
+        self.assertIn('event: venda\n', evento)
+        self.assertEqual(json.loads(evento.split('data: ', 1)[1])['total_venda'], '5')
+
+        await stream.aclose()
+        self.assertFalse(difusor_teste.filas)
+        await asyncio.sleep(0.05)
+
+
+class BuscaTestCase(TestCase):
+    """Test the global search index"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('gerente'))
+
+    def criar_cliente(self, nome, cpf, **dados):
+        with self.captureOnCommitCallbacks(execute=True):
+            return Cliente.objects.create(
+                nome=nome, cpf=cpf, telefone='1140041000', celular='11987654321', cep='13345325',
+                endereco='Rua A', numero=1, bairro='Centro', cidade='Campinas', estado='SP', **dados,
+            )
+
+    def test_normalizacao(self):
+        self.assertEqual(tokens('João da Silva-Conceição, JOÃO'), ['joao', 'da', 'silva', 'conceicao'])
+
+    def test_busca_sem_acentos_e_ranking(self):
+        joao = self.criar_cliente('João da Silva', '123.456.789-01')
+        silvana = self.criar_cliente('Maria', '987.654.321-00', email='silvana@exemplo.com')
+
+        resultados = self.client.get('/core/busca/', {'q': 'joao sil'}).json()['resultados']
+        self.assertEqual([(r['tipo'], r['id']) for r in resultados], [('cliente', joao.pk)])
+        self.assertEqual(resultados[0]['url'], f'/clientes/editar/{joao.pk}/')
+
+        # Name matches outrank e-mail matches
+        self.assertEqual([r['id'] for r in buscar('silva')], [joao.pk, silvana.pk])
+        self.assertEqual([r['id'] for r in buscar('12345678901')], [joao.pk])
+
+    def test_atualiza_e_remove_com_sinais(self):
+        cliente = self.criar_cliente('José', '111.222.333-44')
+        with self.captureOnCommitCallbacks(execute=True):
+            cliente.nome = 'Antônio'
+            cliente.save()
+        self.assertEqual(buscar('jose'), [])
+        self.assertEqual(
+            list(filtrar_busca(Cliente.objects.all(), 'ANTONIO')), [cliente]
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            cliente.delete()
+        self.assertFalse(TermoBusca.objects.exists())
+        self.assertFalse(DocumentoBusca.objects.exists())
+
+    def test_reconstruir(self):
+        cliente = self.criar_cliente('Conceição', '555.666.777-88')
+        TermoBusca.objects.all().delete()
+        self.assertEqual(buscar('conceicao'), [])
+
+        call_command('reconstruir_indice_busca', stdout=io.StringIO())
+        self.assertEqual([r['id'] for r in buscar('conceicao')], [cliente.pk])
+
+
+class CamposDigitosTestCase(TestCase):
+    """Test the digits-only shadow columns of documents and phones"""
+
+    def criar_cliente(self, nome, cpf, telefone='(11) 4004-1000'):
+        return Cliente.objects.create(
+            nome=nome, cpf=cpf, telefone=telefone, celular='11987654321', cep='13345325',
+            endereco='Rua A', numero=1, bairro='Centro', cidade='Campinas', estado='SP',
+        )
+
+    def test_preenche_ao_salvar_e_busca_na_lista(self):
+        mascarado = self.criar_cliente('Ana', '123.456.789-01')
+        sem_mascara = self.criar_cliente('Bia', '12345000000', telefone='1133334444')
+        self.assertEqual((mascarado.cpf_digitos, mascarado.telefone_digitos), ('12345678901', '1140041000'))
+
+        self.client.force_login(User.objects.create_user('gerente'))
+
+        def buscar(termo):
+            return [c.pk for c in self.client.get('/clientes/', {'search': termo}).context['clientes']]
+
+        self.assertEqual(buscar('12345678901'), [mascarado.pk])
+        self.assertEqual(buscar('123.45'), [mascarado.pk, sem_mascara.pk])
+        self.assertEqual(buscar('(11) 3333'), [sem_mascara.pk])
+
+    def test_atualizar_digitos(self):
+        cliente = self.criar_cliente('Ana', '123.456.789-01')
+        Cliente.objects.filter(pk=cliente.pk).update(cpf='987.654.321-00', cpf_digitos='')
+
+        call_command('preencher_digitos', '--modelo', 'cliente', stdout=io.StringIO())
+        self.assertEqual(Cliente.objects.get(pk=cliente.pk).cpf_digitos, '98765432100')
+        self.assertEqual(Cliente.atualizar_digitos(), 0)
+
+
+class ImportacaoCadastrosTestCase(TestCase):
+    """Test the bulk customer/supplier import"""
+
+    CSV = (
+        'Nome;CPF;E-mail;Telefone;Celular;CEP;Endereço;Número;Bairro;Cidade;Estado\n'
+        'Ana;123.456.789-01;ana@x.com;1140041000;11987654321;13345325;Rua A;1;Centro;Campinas;SP\n'
+        'Bia;000.000.000-02;ruim;1140041000;11987654321;13345325;Rua B;2;Centro;Campinas;SP\n'
+        'Ana de novo;12345678901;;1140041000;11987654321;13345325;Rua A;1;Centro;Campinas;SP\n'
+        'Caio;98765432100;;1140041000;11987654321;13345325;Rua C;3;Centro;Campinas;SP\n'
+    )
+
+    def test_importa_csv_com_rejeitados(self):
+        rejeitados = io.StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            resumo = importar_cadastros(
+                'cliente', io.BytesIO(self.CSV.encode()), 'clientes.csv', rejeitados=rejeitados, tamanho_lote=2,
+            )
+
+        self.assertEqual((resumo['lidas'], resumo['inseridas'], resumo['rejeitadas']), (4, 2, 2))
+        self.assertEqual(
+            sorted(Cliente.objects.values_list('cpf_digitos', flat=True)), ['12345678901', '98765432100']
+        )
+        self.assertEqual([r['titulo'] for r in buscar('caio')], ['Caio'])
+        linhas = rejeitados.getvalue().splitlines()
+        self.assertTrue(linhas[0].endswith(';linha;erro'))
+        self.assertIn(';3;email:', linhas[1])
+        self.assertIn('repetido no arquivo (linha 2)', linhas[2])
+
+    def test_documento_criado_durante_a_importacao_e_rejeitado(self):
+        Cliente.objects.create(
+            nome='Caio', cpf='98765432100', telefone='1140041000', celular='11987654321',
+            cep='13345325', endereco='Rua C', numero=3, bairro='Centro', cidade='Campinas', estado='SP',
+        )
+        rejeitados = io.StringIO()
+        # Keys loaded before the concurrent insert: the chunk hits the unique CPF
+        with mock.patch('core.importacao.carregar_chaves', return_value={}):
+            resumo = importar_cadastros('cliente', io.BytesIO(self.CSV.encode()), 'clientes.csv', rejeitados=rejeitados)
+
+        self.assertEqual((resumo['inseridas'], resumo['rejeitadas']), (1, 3))
+        self.assertIn(';5;cpf: já cadastrado', rejeitados.getvalue().splitlines()[-1])
+        self.assertEqual(Cliente.objects.count(), 2)
+
+    def test_reimporta_exportacao_xlsx_atualizando(self):
+        importar_cadastros('cliente', io.BytesIO(self.CSV.encode()), 'clientes.csv')
+        Cliente.objects.filter(nome='Ana').update(nome='Ana Antiga')
+        self.client.force_login(User.objects.create_user('gerente'))
+        planilha = b''.join(self.client.get('/clientes/', {'exportar': 'xlsx'}).streaming_content)
+        Cliente.objects.filter(nome='Ana Antiga').update(nome='Ana')
+
+        resumo = importar_cadastros('cliente', io.BytesIO(planilha), 'clientes.xlsx')
+        self.assertEqual((resumo['inseridas'], resumo['rejeitadas']), (0, 2))
+
+        resumo = importar_cadastros('cliente', io.BytesIO(planilha), 'clientes.xlsx', atualizar=True)
+        self.assertEqual((resumo['inseridas'], resumo['atualizadas']), (0, 2))
+        self.assertEqual(Cliente.objects.get(cpf_digitos='12345678901').nome, 'Ana Antiga')
+        self.assertEqual(Cliente.objects.count(), 2)
+
+    def test_atualizacao_mantem_colunas_ausentes_do_arquivo(self):
+        Cliente.objects.create(
+            nome='Ana Antiga', cpf='123.456.789-01', rg='12.345.678-9', complemento='Apto 1', telefone='1130000000',
+            celular='11987654321', cep='13345325', endereco='Rua A', numero=1, bairro='Centro', cidade='Campinas',
+            estado='SP',
+        )
+
+        resumo = importar_cadastros('cliente', io.BytesIO(self.CSV.encode()), 'clientes.csv', atualizar=True)
+
+        self.assertEqual(resumo['atualizadas'], 1)
+        ana = Cliente.objects.get(cpf_digitos='12345678901')
+        self.assertEqual((ana.nome, ana.email, ana.telefone_digitos), ('Ana', 'ana@x.com', '1140041000'))
+        self.assertEqual((ana.rg, ana.complemento), ('12.345.678-9', 'Apto 1'))
+
+    def test_upload_pela_tela(self):
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        self.enterContext(self.settings(MEDIA_ROOT=pasta.name))
+
+        self.client.force_login(User.objects.create_user('gerente'))
+        resposta = self.client.post('/clientes/importar/', {
+            'arquivo': SimpleUploadedFile('clientes.csv', self.CSV.encode()),
+        })
+        self.assertEqual(Cliente.objects.count(), 2)
+        nome = resposta.context['rejeitados']
+        download = self.client.get(f'/core/importacao/rejeitados/{nome}/')
+        self.assertIn(b'repetido no arquivo', b''.join(download.streaming_content))
+        self.assertEqual(self.client.get('/core/importacao/rejeitados/..%2Fsettings.py/').status_code, 404)
+
+
+class CepTestCase(TestCase):
+    """Test the cached CEP lookups"""
+
+    ENDERECO = {'logradouro': 'Rua A', 'complemento': '', 'bairro': 'Centro', 'cidade': 'Campinas', 'uf': 'SP'}
+
+    def setUp(self):
+        cep.memoria.limpar()
+        cep.disjuntor.sucesso()
+        self.addCleanup(cep.memoria.limpar)
+        self.addCleanup(cep.disjuntor.sucesso)
+
+    def test_camadas_de_cache(self):
+        with mock.patch('core.cep.consultar_webservice', return_value=self.ENDERECO) as webservice:
+            self.assertEqual(buscar_cep('13345-325')['cidade'], 'Campinas')
+            self.assertEqual(buscar_cep('13345325')['cidade'], 'Campinas')
+            cep.memoria.limpar()
+            self.assertEqual(buscar_cep('13345325')['uf'], 'SP')
+        self.assertEqual(webservice.call_count, 1)
+        self.assertIsNone(buscar_cep('123'))
+
+    def test_disjuntor_e_base_offline(self):
+        falha = cep.CepIndisponivel('timeout')
+        with mock.patch('core.cep.consultar_webservice', side_effect=falha) as webservice:
+            for _ in range(cep.disjuntor.limite + 3):
+                self.assertIsNone(buscar_cep('01001000'))
+            self.assertEqual(webservice.call_count, cep.disjuntor.limite)
+
+            self.client.force_login(User.objects.create_user('gerente'))
+            self.assertEqual(self.client.get('/clientes/buscar-cep/', {'cep': '01001000'}).status_code, 503)
+
+            arquivo = io.BytesIO('cep;logradouro;bairro;localidade;uf\n01001-000;Praça da Sé;Sé;São Paulo;SP\n'.encode())
+            self.assertEqual(cep.importar_ceps(arquivo, 'ceps.csv'), (1, 0))
+            resposta = self.client.get('/clientes/buscar-cep/', {'cep': '01001000'})
+        self.assertEqual(resposta.json()['cidade'], 'São Paulo')
+        self.assertIn('max-age=86400', resposta['Cache-Control'])
+        self.assertEqual(webservice.call_count, cep.disjuntor.limite)
+
+
+class ValidacaoEnderecosTestCase(TestCase):
+    """Test the bulk address validation job"""
+
+    def criar_cliente(self, nome, cpf, cep, cidade, bairro='Centro'):
+        return Cliente.objects.create(
+            nome=nome, cpf=cpf, telefone='1140041000', celular='11987654321', cep=cep,
+            endereco='Rua A', numero=1, bairro=bairro, cidade=cidade, estado='RJ',
+        )
+
+    def test_resolve_e_corrige_com_checkpoint(self):
+        errado = self.criar_cliente('Ana', '12345678901', '13345325', 'Campinass', bairro='')
+        certo = self.criar_cliente('Bia', '98765432100', '13345-325', 'Campinas')
+        invalido = self.criar_cliente('Caio', '11122233344', '99999-999', 'Xyz')
+        consultados = []
+
+        def resolvedor(cep):
+            consultados.append(cep)
+            if cep == '13345325':
+                return {'logradouro': 'Rua A', 'bairro': 'Centro', 'cidade': 'Campinas', 'uf': 'SP'}
+            return {}
+
+        pasta = tempfile.TemporaryDirectory()
+        self.addCleanup(pasta.cleanup)
+        checkpoint = Checkpoint(f'{pasta.name}/checkpoint.json')
+        checkpoint.salvar('cliente', errado.pk)  # first row done by an interrupted run
+        relatorio = io.StringIO()
+
+        resultado = validar_enderecos(
+            ['cliente'], resolvedor, concorrencia=4, checkpoint=Checkpoint(checkpoint.caminho),
+            tamanho_lote=1, relatorio=relatorio,
+        )
+        self.assertEqual(sorted(consultados), ['13345325', '99999999'])
+        self.assertEqual(resultado['cliente'], {'lidas': 2, 'corrigidas': 1, 'invalidas': 1, 'pendentes': 0})
+        self.assertIn(f'cliente;{invalido.pk};99999-999;CEP não encontrado', relatorio.getvalue())
+        self.assertEqual(Cliente.objects.get(pk=errado.pk).cidade, 'Campinass')
+        certo.refresh_from_db()
+        self.assertEqual(certo.estado, 'SP')
+
+        # Second run: CEPs come from tb_ceps, the checkpoint file is gone
+        consultados.clear()
+        validar_enderecos(['cliente'], resolvedor, checkpoint=Checkpoint(checkpoint.caminho))
+        self.assertEqual(consultados, [])
+        errado.refresh_from_db()
+        self.assertEqual(
+            (errado.cidade, errado.estado, errado.bairro, errado.cep), ('Campinas', 'SP', 'Centro', '13345-325')
+        )
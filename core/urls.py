@@ -9,4 +9,9 @@ urlpatterns = [
     path('login/', views.LoginView.as_view(), name='login'),
     path('logout/', views.LogoutView.as_view(), name='logout'),
     path('dashboard/', views.DashboardView.as_view(), name='dashboard'),
+    path('dashboard/widgets/<str:nome>/', views.DashboardWidgetView.as_view(), name='dashboard_widget'),
+    path('dashboard/cache/', views.DashboardCacheStatsView.as_view(), name='dashboard_cache'),
+    path('dashboard/eventos/', views.EventosDashboardView.as_view(), name='dashboard_eventos'),
+    path('busca/', views.BuscaView.as_view(), name='busca'),
+    path('importacao/rejeitados/<str:nome>/', views.RejeitadosImportacaoView.as_view(), name='rejeitados_importacao'),
 ]
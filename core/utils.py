@@ -1,54 +1,37 @@
 """
 Utility functions - equivalent to model/Utilitarios.java and model/WebServiceCep.java
 """
-import requests
 from typing import Optional, Dict
 
 
+def somente_digitos(valor) -> str:
+    """Digits of a formatted value (123.456.789-01 -> 12345678901)"""
+    return ''.join(filter(str.isdigit, str(valor or '')))
+
+
 def buscar_cep(cep: str) -> Optional[Dict[str, str]]:
     """
-    Search for address by CEP using ViaCEP API.
+    Search for address by CEP (cached lookups, see core.cep).
     Equivalent to WebServiceCep.searchCep() from Java version.
     
     Args:
         cep: CEP string (with or without hyphen)
     
     Returns:
-        Dictionary with address data or None if not found
+        Dictionary with address data or None if not found or the
+        webservice is unavailable
     """
-    # Remove non-numeric characters
-    cep_limpo = ''.join(filter(str.isdigit, cep))
-    
-    if len(cep_limpo) != 8:
-        return None
-    
+    from .cep import CepIndisponivel, consultar_cep
+
     try:
-        # Use ViaCEP API (free Brazilian CEP webservice)
-        url = f'https://viacep.com.br/ws/{cep_limpo}/json/'
-        response = requests.get(url, timeout=5)
-        
-        if response.status_code == 200:
-            data = response.json()
-            
-            # Check if CEP was found
-            if 'erro' not in data:
-                return {
-                    'logradouro': data.get('logradouro', ''),
-                    'bairro': data.get('bairro', ''),
-                    'cidade': data.get('localidade', ''),
-                    'uf': data.get('uf', ''),
-                    'complemento': data.get('complemento', ''),
-                }
-    except Exception as e:
-        print(f"Erro ao buscar CEP: {e}")
+        return consultar_cep(cep) or None
+    except CepIndisponivel:
         return None
-    
-    return None
 
 
 def formatar_cep(cep: str) -> str:
     """Format CEP string with hyphen (12345678 -> 12345-678)"""
-    cep_limpo = ''.join(filter(str.isdigit, cep))
+    cep_limpo = somente_digitos(cep)
     if len(cep_limpo) == 8:
         return f'{cep_limpo[:5]}-{cep_limpo[5:]}'
     return cep
@@ -56,7 +39,7 @@ def formatar_cep(cep: str) -> str:
 
 def formatar_telefone(telefone: str) -> str:
     """Format phone number (11987654321 -> (11) 98765-4321)"""
-    tel_limpo = ''.join(filter(str.isdigit, telefone))
+    tel_limpo = somente_digitos(telefone)
     
     if len(tel_limpo) == 11:  # Cell phone
         return f'({tel_limpo[:2]}) {tel_limpo[2:7]}-{tel_limpo[7:]}'
@@ -68,7 +51,7 @@ def formatar_telefone(telefone: str) -> str:
 
 def formatar_cpf(cpf: str) -> str:
     """Format CPF (12345678901 -> 123.456.789-01)"""
-    cpf_limpo = ''.join(filter(str.isdigit, cpf))
+    cpf_limpo = somente_digitos(cpf)
     
     if len(cpf_limpo) == 11:
         return f'{cpf_limpo[:3]}.{cpf_limpo[3:6]}.{cpf_limpo[6:9]}-{cpf_limpo[9:]}'
@@ -78,7 +61,7 @@ def formatar_cpf(cpf: str) -> str:
 
 def formatar_cnpj(cnpj: str) -> str:
     """Format CNPJ (12345678901234 -> 12.345.678/9012-34)"""
-    cnpj_limpo = ''.join(filter(str.isdigit, cnpj))
+    cnpj_limpo = somente_digitos(cnpj)
     
     if len(cnpj_limpo) == 14:
         return f'{cnpj_limpo[:2]}.{cnpj_limpo[2:5]}.{cnpj_limpo[5:8]}/{cnpj_limpo[8:12]}-{cnpj_limpo[12:]}'
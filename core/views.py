@@ -1,15 +1,25 @@
+import io
+import re
+import time
+
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
 from django.shortcuts import render, redirect
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
 from django.views import View
 from django.contrib import messages
-from django.db.models import Sum, Count
-from datetime import datetime, timedelta
+from django.core.handlers.asgi import ASGIRequest
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 
-from customers.models import Cliente
-from suppliers.models import Fornecedor
-from inventory.models import Produto
-from sales.models import Venda
+from .busca import INDEXADORES, buscar
+from .estatisticas import WIDGETS, contador, obter_widget
+from .eventos import transmitir
+from .forms import ImportacaoCadastroForm
+from .importacao import ArquivoInvalido, importar_cadastros
 
 
 class LoginView(View):
@@ -46,50 +56,154 @@ class LogoutView(View):
 
 
 class DashboardView(LoginRequiredMixin, View):
-    """Dashboard view - equivalent to FrmMenu.java with statistics"""
+    """
+    Dashboard view - equivalent to FrmMenu.java with statistics.
+    Renders only the page shell; the browser loads every widget from
+    DashboardWidgetView in parallel.
+    """
     template_name = 'core/dashboard.html'
     
     def get(self, request):
-        # Get statistics
-        today = datetime.now().date()
-        month_start = today.replace(day=1)
-        
-        # Count records
-        total_clientes = Cliente.objects.count()
-        total_fornecedores = Fornecedor.objects.count()
-        total_produtos = Produto.objects.count()
-        total_vendas = Venda.objects.count()
-        
-        # Sales statistics
-        vendas_hoje = Venda.objects.filter(data_venda=today).count()
-        vendas_mes = Venda.objects.filter(data_venda__gte=month_start).count()
-        
-        # Revenue statistics
-        total_vendas_valor = Venda.objects.aggregate(
-            total=Sum('total_venda')
-        )['total'] or 0
-        
-        vendas_mes_valor = Venda.objects.filter(
-            data_venda__gte=month_start
-        ).aggregate(total=Sum('total_venda'))['total'] or 0
-        
-        # Low stock products
-        produtos_estoque_baixo = Produto.objects.filter(qtd_estoque__lte=10).order_by('qtd_estoque')[:5]
-        
-        # Recent sales
-        vendas_recentes = Venda.objects.select_related('cliente').order_by('-data_venda')[:10]
-        
-        context = {
-            'total_clientes': total_clientes,
-            'total_fornecedores': total_fornecedores,
-            'total_produtos': total_produtos,
-            'total_vendas': total_vendas,
-            'vendas_hoje': vendas_hoje,
-            'vendas_mes': vendas_mes,
-            'total_vendas_valor': total_vendas_valor,
-            'vendas_mes_valor': vendas_mes_valor,
-            'produtos_estoque_baixo': produtos_estoque_baixo,
-            'vendas_recentes': vendas_recentes,
+        return render(request, self.template_name)
+
+
+class DashboardWidgetView(LoginRequiredMixin, View):
+    """
+    One dashboard widget as an HTML fragment, from its own cache entry.
+    The ETag lets the browser revalidate without the fragment being
+    rendered again (304).
+    """
+    
+    def get(self, request, nome):
+        if nome not in WIDGETS:
+            raise Http404
+        widget = obter_widget(nome)
+        resposta = get_conditional_response(request, etag=widget['etag'])
+        if resposta is None:
+            resposta = render(request, f'core/widgets/{nome}.html', widget['dados'])
+        resposta['ETag'] = widget['etag']
+        # Always revalidate: live updates may have changed the widget
+        patch_cache_control(resposta, private=True, no_cache=True)
+        return resposta
+
+
+class DashboardCacheStatsView(LoginRequiredMixin, View):
+    """Expose the dashboard cache hit/miss counters of this process"""
+    
+    def get(self, request):
+        return JsonResponse(contador.como_dict())
+
+
+class EventosDashboardView(View):
+    """
+    Live dashboard updates as Server-Sent Events (core.eventos). Streams
+    only under the ASGI server; elsewhere it answers 204, which tells the
+    browser not to reconnect, and the dashboard stays a static page.
+    """
+
+    async def get(self, request):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return HttpResponse(status=403)
+        if not isinstance(request, ASGIRequest):
+            return HttpResponse(status=204)
+
+        try:
+            ultimo_evento_id = int(request.headers.get('Last-Event-ID', ''))
+        except ValueError:
+            ultimo_evento_id = None
+        resposta = StreamingHttpResponse(transmitir(ultimo_evento_id), content_type='text/event-stream')
+        resposta['Cache-Control'] = 'no-cache'
+        # Tell nginx not to buffer the stream
+        resposta['X-Accel-Buffering'] = 'no'
+        return resposta
+
+
+class BuscaView(LoginRequiredMixin, View):
+    """
+    Global search: GET ?q=<termo>[&tipo=cliente&tipo=produto...][&limite=N]
+    returns ranked results from the search index (core.busca)
+    """
+    limite = 20
+    limite_maximo = 100
+
+    def get(self, request):
+        inicio = time.monotonic()
+        tipos = [tipo for tipo in request.GET.getlist('tipo') if tipo in INDEXADORES]
+        try:
+            limite = max(1, min(int(request.GET.get('limite', self.limite)), self.limite_maximo))
+        except ValueError:
+            limite = self.limite
+
+        resultados = buscar(request.GET.get('q', ''), tipos or None, limite)
+        return JsonResponse({
+            'resultados': resultados,
+            'tempo_ms': round((time.monotonic() - inicio) * 1000, 1),
+        })
+
+
+class ImportacaoCadastroView(LoginRequiredMixin, View):
+    """
+    Import customers or suppliers from a CSV/XLSX upload (core.importacao);
+    each app routes it with as_view(tipo=..., url_lista=...)
+    """
+    template_name = 'core/importacao_cadastro.html'
+    tipo = None
+    url_lista = None
+    pasta_rejeitados = 'importacoes'
+
+    def contexto(self, form, **extra):
+        return {
+            'form': form,
+            'titulo': 'Importar Clientes' if self.tipo == 'cliente' else 'Importar Fornecedores',
+            'chave': 'cpf' if self.tipo == 'cliente' else 'cnpj',
+            'url_lista': reverse(self.url_lista),
+            **extra,
         }
-        
-        return render(request, self.template_name, context)
+
+    def get(self, request):
+        return render(request, self.template_name, self.contexto(ImportacaoCadastroForm()))
+
+    def post(self, request):
+        form = ImportacaoCadastroForm(request.POST, request.FILES)
+        if not form.is_valid():
+            return render(request, self.template_name, self.contexto(form))
+
+        arquivo = form.cleaned_data['arquivo']
+        rejeitados = io.StringIO()
+        try:
+            resumo = importar_cadastros(
+                self.tipo, arquivo, arquivo.name,
+                atualizar=form.cleaned_data['atualizar'], rejeitados=rejeitados,
+            )
+        except ArquivoInvalido as e:
+            messages.error(request, f'Arquivo inválido: {e}')
+            return render(request, self.template_name, self.contexto(form))
+
+        mensagem = (
+            f"{resumo['lidas']} linhas: {resumo['inseridas']} inseridas, {resumo['atualizadas']} atualizadas, "
+            f"{resumo['rejeitadas']} rejeitadas em {resumo['segundos']}s ({resumo['linhas_por_segundo']} linhas/s)"
+        )
+        if not resumo['rejeitadas']:
+            messages.success(request, mensagem)
+            return redirect(self.url_lista)
+
+        nome = default_storage.save(
+            f"{self.pasta_rejeitados}/rejeitados-{self.tipo}-{timezone.now():%Y%m%d-%H%M%S}.csv",
+            ContentFile(rejeitados.getvalue().encode('utf-8-sig')),
+        )
+        messages.warning(request, mensagem)
+        return render(request, self.template_name, self.contexto(
+            ImportacaoCadastroForm(), resumo=resumo, rejeitados=nome.rsplit('/', 1)[-1],
+        ))
+
+
+class RejeitadosImportacaoView(LoginRequiredMixin, View):
+    """Download the rejected rows file of an import"""
+    padrao_nome = re.compile(r'^rejeitados-[a-z]+-[\w-]+\.csv$')
+
+    def get(self, request, nome):
+        caminho = f'{ImportacaoCadastroView.pasta_rejeitados}/{nome}'
+        if not self.padrao_nome.match(nome) or not default_storage.exists(caminho):
+            raise Http404('Arquivo não encontrado')
+        return FileResponse(default_storage.open(caminho, 'rb'), as_attachment=True, filename=nome)
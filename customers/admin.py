@@ -1,5 +1,7 @@
-from django.contrib import admin
-from .models import Cliente
+from django.contrib import admin, messages
+
+from .duplicados import descartar_propostas, mesclar_clientes
+from .models import Cliente, DuplicidadeCliente
 
 
 @admin.register(Cliente)
@@ -8,3 +10,29 @@ class ClienteAdmin(admin.ModelAdmin):
     list_filter = ['estado', 'cidade']
     search_fields = ['nome', 'cpf', 'email']
     ordering = ['nome']
+
+
+@admin.register(DuplicidadeCliente)
+class DuplicidadeClienteAdmin(admin.ModelAdmin):
+    list_display = ['cliente', 'duplicado', 'pontuacao', 'similaridade_nome', 'motivos', 'status', 'criada_em']
+    list_filter = ['status']
+    list_select_related = ['cliente', 'duplicado']
+    raw_id_fields = ['cliente', 'duplicado']
+    actions = ['mesclar', 'descartar']
+
+    @admin.action(description='Mesclar o duplicado no cliente')
+    def mesclar(self, request, queryset):
+        movidas = mesclados = 0
+        for cliente_id, duplicado_id in queryset.filter(status=DuplicidadeCliente.PENDENTE).values_list(
+            'cliente_id', 'duplicado_id'
+        ):
+            # An earlier pair of this selection may have removed either side
+            if Cliente.objects.filter(pk__in=[cliente_id, duplicado_id]).count() == 2:
+                movidas += mesclar_clientes(cliente_id, [duplicado_id])
+                mesclados += 1
+        self.message_user(request, f'{mesclados} cliente(s) mesclado(s), {movidas} venda(s) transferida(s).')
+
+    @admin.action(description='Descartar (não são duplicados)')
+    def descartar(self, request, queryset):
+        total = descartar_propostas(queryset.values_list('pk', flat=True))
+        self.message_user(request, f'{total} proposta(s) descartada(s).', messages.INFO)
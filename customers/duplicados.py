@@ -0,0 +1,290 @@
+"""
+Duplicate customer detection and merge.
+
+Detection never compares every customer with every other one. Customers
+are first grouped into blocks that share a normalized CPF, a phone number,
+or a CEP plus the first word of the name. Only pairs inside a block are
+candidates, and blocks larger than `bloco_maximo` (a shared company phone,
+a placeholder CPF) are skipped.
+
+The candidates are scored with NumPy over whole arrays of pairs. Each
+name is reduced to a 512-bit signature of its character trigrams. The
+name similarity is the Dice coefficient of two signatures, computed with
+popcounts:
+
+    2 * |A & B| / (|A| + |B|)
+
+    pontuacao = 0.7 * similaridade do nome + 0.3 * evidência
+
+The evidence is 1.0 for the same CPF, 0.8 for the same e-mail, 0.6 for a
+shared phone and 0.3 for the same CEP, taking the strongest. Pairs at or
+above `limiar` become DuplicidadeCliente proposals.
+
+Merging keeps the customer with the lowest id in each group of connected
+proposals. The sales of the others move to it with one UPDATE. Their
+daily rollups are added to the kept customer's rows, blank fields of the
+kept customer are filled from the duplicates, and the duplicates are
+deleted.
+"""
+import zlib
+from collections import defaultdict
+
+import numpy as np
+from django.db import transaction
+
+from core.busca import agendar_indexacao, normalizar
+from core.exportacao import iterar_em_lotes
+from sales.models import Venda
+from sales.resumo import transferir_resumo_cliente
+from .models import Cliente, DuplicidadeCliente
+
+
+TAMANHO_LOTE = 20000
+LOTE_PARES = 500000
+BITS_ASSINATURA = 512
+PESO_NOME = 0.7
+EVIDENCIAS = (('cpf', 1.0), ('email', 0.8), ('telefone', 0.6), ('cep', 0.3))
+CAMPOS_COMPLEMENTARES = ('rg', 'email', 'telefone', 'celular', 'complemento')
+
+
+class _Codigos(dict):
+    """Maps strings to small integers; '' is always 0"""
+
+    def __missing__(self, chave):
+        codigo = self[chave] = len(self) + 1
+        return codigo
+
+    def codigo(self, valor):
+        return self[valor] if valor else 0
+
+
+def _assinaturas(nomes):
+    """(n, 8) uint64 array with the trigram signature of each name"""
+    posicoes = {}
+    buffer = bytearray()
+    for nome in nomes:
+        texto = f'  {nome} '
+        mascara = 0
+        for i in range(len(texto) - 2):
+            trigrama = texto[i:i + 3]
+            posicao = posicoes.get(trigrama)
+            if posicao is None:
+                posicao = posicoes[trigrama] = zlib.crc32(trigrama.encode()) % BITS_ASSINATURA
+            mascara |= 1 << posicao
+        buffer += mascara.to_bytes(BITS_ASSINATURA // 8, 'little')
+    return np.frombuffer(bytes(buffer), dtype=np.uint64).reshape(len(nomes), BITS_ASSINATURA // 64)
+
+
+def carregar_clientes(tamanho_lote=TAMANHO_LOTE):
+    """
+    Arrays describing every customer: ids, normalized names and integer
+    codes of the normalized CPF, e-mail, phones and CEP (0 when blank)
+    """
+    ids, nomes = [], []
+    codigos = {campo: [] for campo in ('cpf', 'email', 'telefone', 'celular', 'cep')}
+    tabela = _Codigos()
+    palavras = {}
+
+    def normalizar_nome(nome):
+        # Names repeat the same words: normalize each distinct word once
+        resultado = []
+        for palavra in str(nome or '').split():
+            normalizada = palavras.get(palavra)
+            if normalizada is None:
+                normalizada = palavras[palavra] = ' '.join(normalizar(palavra).split())
+            if normalizada:
+                resultado.append(normalizada)
+        return ' '.join(resultado)
+
+    colunas = ['pk', 'nome', 'cpf_digitos', 'email', 'telefone_digitos', 'celular_digitos', 'cep']
+    for lote in iterar_em_lotes(Cliente.objects.all(), colunas, ('pk',), tamanho_lote):
+        for pk, nome, cpf, email, telefone, celular, cep in lote:
+            ids.append(pk)
+            nomes.append(normalizar_nome(nome))
+            codigos['cpf'].append(tabela.codigo(cpf and f'cpf:{cpf}'))
+            codigos['email'].append(tabela.codigo((email or '').strip().lower() and f'email:{email.strip().lower()}'))
+            # Phones shorter than 8 digits are placeholders, not evidence
+            codigos['telefone'].append(tabela.codigo(len(telefone) >= 8 and f'tel:{telefone}'))
+            codigos['celular'].append(tabela.codigo(len(celular) >= 8 and f'tel:{celular}'))
+            digitos_cep = ''.join(filter(str.isdigit, cep or ''))
+            codigos['cep'].append(tabela.codigo(len(digitos_cep) == 8 and f'cep:{digitos_cep}'))
+    return (
+        np.array(ids, dtype=np.int64),
+        nomes,
+        {campo: np.array(valores, dtype=np.int64) for campo, valores in codigos.items()},
+    )
+
+
+def gerar_pares(nomes, codigos, bloco_maximo=200):
+    """(i, j) index arrays, i < j, of the distinct pairs sharing a block"""
+    blocos = defaultdict(list)
+    for campo, bloco in (('cpf', 'cpf'), ('telefone', 'tel'), ('celular', 'tel')):
+        # telefone and celular share codes, so they share blocks
+        for indice, codigo in enumerate(codigos[campo].tolist()):
+            if codigo:
+                blocos[(bloco, codigo)].append(indice)
+    for indice, (codigo, nome) in enumerate(zip(codigos['cep'].tolist(), nomes)):
+        if codigo and nome:
+            blocos[('cep', codigo, nome.split(' ', 1)[0])].append(indice)
+
+    esquerda, direita = [], []
+    for membros in blocos.values():
+        if 2 <= len(membros) <= bloco_maximo:
+            membros = np.array(sorted(set(membros)), dtype=np.int64)
+            i, j = np.triu_indices(len(membros), k=1)
+            esquerda.append(membros[i])
+            direita.append(membros[j])
+    if not esquerda:
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+
+    # One int64 per pair makes the deduplication a plain 1-D sort
+    total = len(nomes)
+    pares = np.unique(np.concatenate(esquerda) * total + np.concatenate(direita))
+    return pares // total, pares % total
+
+
+def pontuar(i, j, assinaturas, tamanhos, codigos):
+    """
+    Score the pairs (i[k], j[k]): arrays of scores and name similarities,
+    and {evidence: boolean array} of what the two customers share
+    """
+    comuns = np.bitwise_count(assinaturas[i] & assinaturas[j]).sum(axis=1, dtype=np.int64)
+    soma = tamanhos[i] + tamanhos[j]
+    similaridade = np.divide(2 * comuns, soma, out=np.zeros(len(i)), where=soma > 0)
+
+    def iguais(a, b):
+        return (a[i] == b[j]) & (a[i] != 0)
+
+    telefone, celular = codigos['telefone'], codigos['celular']
+    coincide = {
+        'cpf': iguais(codigos['cpf'], codigos['cpf']),
+        'email': iguais(codigos['email'], codigos['email']),
+        'telefone': (iguais(telefone, telefone) | iguais(telefone, celular)
+                     | iguais(celular, telefone) | iguais(celular, celular)),
+        'cep': iguais(codigos['cep'], codigos['cep']),
+    }
+    evidencia = np.zeros(len(i))
+    for campo, peso in EVIDENCIAS:
+        evidencia = np.maximum(evidencia, coincide[campo] * peso)
+    return PESO_NOME * similaridade + (1 - PESO_NOME) * evidencia, similaridade, coincide
+
+
+def detectar_duplicados(limiar=0.8, bloco_maximo=200, tamanho_lote=TAMANHO_LOTE):
+    """
+    Replace the pending proposals with the pairs scoring at least
+    `limiar`; discarded pairs are not proposed again.
+    Returns a dict with the customers read, candidate pairs and proposals.
+    """
+    ids, nomes, codigos = carregar_clientes(tamanho_lote)
+    i, j = gerar_pares(nomes, codigos, bloco_maximo)
+    assinaturas = _assinaturas(nomes)
+    tamanhos = np.bitwise_count(assinaturas).sum(axis=1, dtype=np.int64)
+    descartadas = set(
+        DuplicidadeCliente.objects.filter(status=DuplicidadeCliente.DESCARTADA)
+        .values_list('cliente_id', 'duplicado_id')
+    )
+
+    propostas = []
+    for inicio in range(0, len(i), LOTE_PARES):
+        a, b = i[inicio:inicio + LOTE_PARES], j[inicio:inicio + LOTE_PARES]
+        pontuacao, similaridade, coincide = pontuar(a, b, assinaturas, tamanhos, codigos)
+        for k in np.flatnonzero(pontuacao >= limiar).tolist():
+            par = (int(ids[a[k]]), int(ids[b[k]]))
+            principal, duplicado = min(par), max(par)
+            if (principal, duplicado) in descartadas:
+                continue
+            propostas.append(DuplicidadeCliente(
+                cliente_id=principal, duplicado_id=duplicado,
+                pontuacao=round(float(pontuacao[k]), 4), similaridade_nome=round(float(similaridade[k]), 4),
+                motivos=', '.join(campo for campo, _ in EVIDENCIAS if coincide[campo][k]),
+            ))
+
+    with transaction.atomic():
+        DuplicidadeCliente.objects.filter(status=DuplicidadeCliente.PENDENTE).delete()
+        DuplicidadeCliente.objects.bulk_create(propostas, batch_size=1000, ignore_conflicts=True)
+    return {'clientes': len(ids), 'pares': len(i), 'propostas': len(propostas)}
+
+
+def grupos_de_propostas(pontuacao_minima=0.0):
+    """
+    {kept customer id: [duplicate ids]} joining the pending proposals
+    transitively (a~b and b~c merge b and c into a)
+    """
+    pai = {}
+
+    def raiz(x):
+        while pai.setdefault(x, x) != x:
+            pai[x] = pai[pai[x]]
+            x = pai[x]
+        return x
+
+    pendentes = DuplicidadeCliente.objects.filter(
+        status=DuplicidadeCliente.PENDENTE, pontuacao__gte=pontuacao_minima
+    ).values_list('cliente_id', 'duplicado_id')
+    for a, b in pendentes.iterator(chunk_size=10000):
+        ra, rb = raiz(a), raiz(b)
+        if ra != rb:
+            pai[max(ra, rb)] = min(ra, rb)
+
+    grupos = defaultdict(list)
+    for cliente_id in list(pai):
+        principal = raiz(cliente_id)
+        if principal != cliente_id:
+            grupos[principal].append(cliente_id)
+    return dict(grupos)
+
+
+@transaction.atomic
+def mesclar_clientes(principal_id, duplicados_ids):
+    """
+    Merge `duplicados_ids` into customer `principal_id`: sales and
+    rollups move to it, its blank fields are filled from the duplicates
+    and the duplicates are deleted. Returns the number of sales moved.
+    """
+    duplicados_ids = [pk for pk in duplicados_ids if pk != principal_id]
+    principal = Cliente.objects.select_for_update().get(pk=principal_id)
+    duplicados = list(Cliente.objects.select_for_update().filter(pk__in=duplicados_ids).order_by('pk'))
+    if not duplicados:
+        return 0
+
+    vendas = list(Venda.objects.filter(cliente_id__in=duplicados_ids).values_list('pk', flat=True))
+    movidas = Venda.objects.filter(cliente_id__in=duplicados_ids).update(cliente_id=principal_id)
+
+    transferir_resumo_cliente(duplicados_ids, principal_id)
+
+    alterados = []
+    for campo in CAMPOS_COMPLEMENTARES:
+        if not getattr(principal, campo):
+            valor = next((getattr(d, campo) for d in duplicados if getattr(d, campo)), '')
+            if valor:
+                setattr(principal, campo, valor)
+                alterados.append(campo)
+
+    Cliente.objects.filter(pk__in=duplicados_ids).delete()
+    if alterados:
+        principal.save(update_fields=alterados)
+    agendar_indexacao(Venda, vendas)
+    return movidas
+
+
+def mesclar_propostas(pontuacao_minima=0.0, progresso=None):
+    """
+    Merge every group of pending proposals scoring at least
+    `pontuacao_minima`, one transaction per group.
+    Returns a dict with the groups merged, customers removed and sales moved.
+    """
+    resumo = {'grupos': 0, 'removidos': 0, 'vendas_movidas': 0}
+    for principal, duplicados in grupos_de_propostas(pontuacao_minima).items():
+        resumo['vendas_movidas'] += mesclar_clientes(principal, duplicados)
+        resumo['grupos'] += 1
+        resumo['removidos'] += len(duplicados)
+        if progresso:
+            progresso(resumo)
+    return resumo
+
+
+def descartar_propostas(ids):
+    """Mark proposals as not duplicates so detection does not suggest them again"""
+    return DuplicidadeCliente.objects.filter(pk__in=ids, status=DuplicidadeCliente.PENDENTE).update(
+        status=DuplicidadeCliente.DESCARTADA
+    )
@@ -0,0 +1,43 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from customers.duplicados import detectar_duplicados, mesclar_propostas
+
+
+class Command(BaseCommand):
+    help = 'Detecta clientes duplicados (nome parecido com mesmo CPF, telefone, e-mail ou CEP) e opcionalmente os mescla'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limiar', type=float, default=0.8,
+            help='Pontuação mínima (0 a 1) para propor a mesclagem de dois clientes'
+        )
+        parser.add_argument(
+            '--bloco-maximo', type=int, default=200,
+            help='Ignora grupos de candidatos maiores que isso (ex.: telefone compartilhado por uma empresa)'
+        )
+        parser.add_argument(
+            '--mesclar', action='store_true',
+            help='Mescla as propostas pendentes em vez de detectar novas'
+        )
+        parser.add_argument(
+            '--pontuacao-minima', type=float, default=0.0,
+            help='Com --mesclar, mescla apenas as propostas com pelo menos esta pontuação'
+        )
+
+    def handle(self, *args, **options):
+        inicio = time.monotonic()
+        if options['mesclar']:
+            resumo = mesclar_propostas(options['pontuacao_minima'])
+            self.stdout.write(self.style.SUCCESS(
+                f"{resumo['grupos']} grupo(s) mesclado(s): {resumo['removidos']} cliente(s) removido(s), "
+                f"{resumo['vendas_movidas']} venda(s) transferida(s) ({time.monotonic() - inicio:.1f}s)"
+            ))
+            return
+
+        resumo = detectar_duplicados(options['limiar'], options['bloco_maximo'])
+        self.stdout.write(self.style.SUCCESS(
+            f"{resumo['clientes']} clientes, {resumo['pares']} pares comparados, "
+            f"{resumo['propostas']} proposta(s) de mesclagem ({time.monotonic() - inicio:.1f}s)"
+        ))
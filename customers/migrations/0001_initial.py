@@ -0,0 +1,45 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        # tb_clientes is created by the legacy schema script (docker/mysql/init.sql);
+        # the columns and indexes Django adds come in the following migrations
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='Cliente',
+                    fields=[
+                        ('id', models.AutoField(primary_key=True, serialize=False, verbose_name='ID')),
+                        ('nome', models.CharField(max_length=100, verbose_name='Nome')),
+                        ('rg', models.CharField(blank=True, max_length=30, verbose_name='RG')),
+                        ('cpf', models.CharField(max_length=20, unique=True, verbose_name='CPF')),
+                        ('email', models.EmailField(blank=True, max_length=200, verbose_name='E-mail')),
+                        ('telefone', models.CharField(max_length=30, verbose_name='Telefone')),
+                        ('celular', models.CharField(max_length=30, verbose_name='Celular')),
+                        ('cep', models.CharField(max_length=100, verbose_name='CEP')),
+                        ('endereco', models.CharField(max_length=255, verbose_name='Endereço')),
+                        ('numero', models.IntegerField(verbose_name='Número')),
+                        ('complemento', models.CharField(blank=True, max_length=200, verbose_name='Complemento')),
+                        ('bairro', models.CharField(max_length=100, verbose_name='Bairro')),
+                        ('cidade', models.CharField(max_length=100, verbose_name='Cidade')),
+                        ('estado', models.CharField(max_length=2, verbose_name='Estado')),
+                    ],
+                    options={
+                        'verbose_name': 'Cliente',
+                        'verbose_name_plural': 'Clientes',
+                        'db_table': 'tb_clientes',
+                        'ordering': ['nome'],
+                    },
+                ),
+            ],
+        ),
+    ]
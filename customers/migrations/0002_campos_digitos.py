@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cliente',
+            name='celular_digitos',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=30, verbose_name='Celular (dígitos)'),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='cpf_digitos',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=20, verbose_name='CPF (dígitos)'),
+        ),
+        migrations.AddField(
+            model_name='cliente',
+            name='telefone_digitos',
+            field=models.CharField(blank=True, db_index=True, editable=False, max_length=30, verbose_name='Telefone (dígitos)'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 11:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '0002_campos_digitos'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DuplicidadeCliente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('pontuacao', models.FloatField(verbose_name='Pontuação')),
+                ('similaridade_nome', models.FloatField(verbose_name='Similaridade do Nome')),
+                ('motivos', models.CharField(blank=True, max_length=100, verbose_name='Motivos')),
+                ('status', models.CharField(choices=[('PENDENTE', 'Pendente'), ('DESCARTADA', 'Descartada')], default='PENDENTE', max_length=10, verbose_name='Status')),
+                ('criada_em', models.DateTimeField(auto_now_add=True, verbose_name='Criada em')),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicidades', to='customers.cliente', verbose_name='Cliente')),
+                ('duplicado', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicidades_como_duplicado', to='customers.cliente', verbose_name='Duplicado')),
+            ],
+            options={
+                'verbose_name': 'Duplicidade de Cliente',
+                'verbose_name_plural': 'Duplicidades de Clientes',
+                'db_table': 'tb_clientes_duplicidades',
+                'ordering': ['-pontuacao'],
+                'constraints': [models.UniqueConstraint(fields=('cliente', 'duplicado'), name='uniq_duplicidade_cliente')],
+            },
+        ),
+    ]
@@ -1,11 +1,15 @@
 from django.db import models
 
+from core.models import CamposDigitosMixin
 
-class Cliente(models.Model):
+
+class Cliente(CamposDigitosMixin, models.Model):
     """
     Customer model - equivalent to model/Cliente.java
     Maps to tb_clientes table
     """
+    # tb_clientes.id is an INT column (docker/mysql/init.sql): foreign keys to it must be INT too
+    id = models.AutoField('ID', primary_key=True)
     nome = models.CharField('Nome', max_length=100)
     rg = models.CharField('RG', max_length=30, blank=True)
     cpf = models.CharField('CPF', max_length=20, unique=True)
@@ -19,12 +23,26 @@ class Cliente(models.Model):
     bairro = models.CharField('Bairro', max_length=100)
     cidade = models.CharField('Cidade', max_length=100)
     estado = models.CharField('Estado', max_length=2)
+    # Digits-only copies for indexed lookups (filled on save)
+    cpf_digitos = models.CharField('CPF (dígitos)', max_length=20, blank=True, editable=False, db_index=True)
+    telefone_digitos = models.CharField('Telefone (dígitos)', max_length=30, blank=True, editable=False, db_index=True)
+    celular_digitos = models.CharField('Celular (dígitos)', max_length=30, blank=True, editable=False, db_index=True)
+
+    campos_digitos = (
+        ('cpf', 'cpf_digitos', 11),
+        ('telefone', 'telefone_digitos', None),
+        ('celular', 'celular_digitos', None),
+    )
     
     class Meta:
         db_table = 'tb_clientes'
         verbose_name = 'Cliente'
         verbose_name_plural = 'Clientes'
         ordering = ['nome']
+        indexes = [
+            # Typeahead prefix search (nome LIKE 'termo%')
+            models.Index(fields=['nome'], name='tb_clientes_nome_idx'),
+        ]
     
     def __str__(self):
         return self.nome
@@ -33,3 +51,40 @@ class Cliente(models.Model):
     def endereco_completo(self):
         """Return complete address"""
         return f'{self.endereco}, {self.numero} - {self.bairro}, {self.cidade}/{self.estado}'
+
+
+class DuplicidadeCliente(models.Model):
+    """
+    A merge proposal from the duplicate detection (customers.duplicados):
+    `duplicado` looks like the same person as `cliente`, which is kept
+    """
+    PENDENTE = 'PENDENTE'
+    DESCARTADA = 'DESCARTADA'
+    STATUS = [
+        (PENDENTE, 'Pendente'),
+        (DESCARTADA, 'Descartada'),
+    ]
+
+    cliente = models.ForeignKey(
+        Cliente, on_delete=models.CASCADE, verbose_name='Cliente', related_name='duplicidades'
+    )
+    duplicado = models.ForeignKey(
+        Cliente, on_delete=models.CASCADE, verbose_name='Duplicado', related_name='duplicidades_como_duplicado'
+    )
+    pontuacao = models.FloatField('Pontuação')
+    similaridade_nome = models.FloatField('Similaridade do Nome')
+    motivos = models.CharField('Motivos', max_length=100, blank=True)
+    status = models.CharField('Status', max_length=10, choices=STATUS, default=PENDENTE)
+    criada_em = models.DateTimeField('Criada em', auto_now_add=True)
+
+    class Meta:
+        db_table = 'tb_clientes_duplicidades'
+        verbose_name = 'Duplicidade de Cliente'
+        verbose_name_plural = 'Duplicidades de Clientes'
+        ordering = ['-pontuacao']
+        constraints = [
+            models.UniqueConstraint(fields=['cliente', 'duplicado'], name='uniq_duplicidade_cliente'),
+        ]
+
+    def __str__(self):
+        return f'{self.cliente_id} ~ {self.duplicado_id} ({self.pontuacao:.2f})'
@@ -0,0 +1,62 @@
+from datetime import date
+from decimal import Decimal
+
+from django.test import TestCase
+
+from inventory.models import Produto
+from sales.models import ResumoVendaClienteDiario, Venda
+from sales.services import registrar_venda
+from suppliers.models import Fornecedor
+from .duplicados import descartar_propostas, detectar_duplicados, mesclar_propostas
+from .models import Cliente, DuplicidadeCliente
+
+
+ENDERECO = {
+    'celular': '11987654321', 'endereco': 'Rua A', 'numero': 1,
+    'bairro': 'Centro', 'cidade': 'Campinas', 'estado': 'SP',
+}
+
+
+class DuplicadosTestCase(TestCase):
+    """Test the duplicate customer detection and merge"""
+
+    def criar_cliente(self, nome, cpf, telefone='1140041000', cep='13345325', **dados):
+        return Cliente.objects.create(nome=nome, cpf=cpf, telefone=telefone, cep=cep, **{**ENDERECO, **dados})
+
+    def test_detecta_e_mescla(self):
+        ana = self.criar_cliente('Ana Souza', '123.456.789-01')
+        ana_mascara = self.criar_cliente('Ana Sousa', '12345678901', telefone='1133334444', email='ana@x.com')
+        ana_telefone = self.criar_cliente('ANA SOUZA', '55566677788', telefone='11 4004-1000', cep='01001000')
+        outro = self.criar_cliente('Bruno Lima', '99988877766')  # same phone and CEP, other name
+
+        fornecedor = Fornecedor.objects.create(
+            nome='Fornecedor', cnpj='12345678901234', telefone='1', cep='1', **ENDERECO
+        )
+        produto = Produto.objects.create(
+            descricao='Produto', preco=Decimal('10.00'), qtd_estoque=10, fornecedor=fornecedor
+        )
+        for cliente in (ana, ana_mascara, ana_mascara):
+            registrar_venda(Venda(cliente=cliente, data_venda=date.today()), [(produto.pk, 1)])
+
+        resumo = detectar_duplicados()
+        pares = set(DuplicidadeCliente.objects.values_list('cliente_id', 'duplicado_id'))
+        self.assertEqual(pares, {(ana.pk, ana_mascara.pk), (ana.pk, ana_telefone.pk)})
+        self.assertEqual(resumo['propostas'], 2)
+
+        # A discarded pair is not proposed again
+        descartar_propostas(DuplicidadeCliente.objects.filter(duplicado=ana_telefone).values_list('pk', flat=True))
+        detectar_duplicados()
+        self.assertEqual(
+            list(DuplicidadeCliente.objects.filter(status=DuplicidadeCliente.PENDENTE)
+                 .values_list('cliente_id', 'duplicado_id')),
+            [(ana.pk, ana_mascara.pk)],
+        )
+
+        resumo = mesclar_propostas()
+        self.assertEqual(resumo, {'grupos': 1, 'removidos': 1, 'vendas_movidas': 2})
+        self.assertFalse(Cliente.objects.filter(pk=ana_mascara.pk).exists())
+        self.assertEqual(Venda.objects.filter(cliente=ana).count(), 3)
+        self.assertEqual(ResumoVendaClienteDiario.objects.get(cliente=ana).qtd_vendas, 3)
+        ana.refresh_from_db()
+        self.assertEqual(ana.email, 'ana@x.com')
+        self.assertEqual(Cliente.objects.filter(pk__in=[ana_telefone.pk, outro.pk]).count(), 2)
@@ -1,10 +1,12 @@
 from django.urls import path
+from core.views import ImportacaoCadastroView
 from . import views
 
 app_name = 'customers'
 
 urlpatterns = [
     path('', views.ClienteListView.as_view(), name='list'),
+    path('importar/', ImportacaoCadastroView.as_view(tipo='cliente', url_lista='customers:list'), name='importar'),
     path('novo/', views.ClienteCreateView.as_view(), name='create'),
     path('editar/<int:pk>/', views.ClienteUpdateView.as_view(), name='update'),
     path('excluir/<int:pk>/', views.ClienteDeleteView.as_view(), name='delete'),
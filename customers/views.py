@@ -4,13 +4,14 @@ from django.shortcuts import render, redirect, get_object_or_404
 from django.views import View
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
-from django.db.models import Q
 
+from core.busca import filtrar_busca
+from core.exportacao import ExportacaoMixin
 from .models import Cliente
 from .forms import ClienteForm, ClienteSearchForm
 
 
-class ClienteListView(LoginRequiredMixin, ListView):
+class ClienteListView(LoginRequiredMixin, ExportacaoMixin, ListView):
     """
     List all customers - equivalent to FrmCliente.java listar method
     """
@@ -18,17 +19,33 @@ class ClienteListView(LoginRequiredMixin, ListView):
     template_name = 'customers/cliente_list.html'
     context_object_name = 'clientes'
     paginate_by = 20
+    exportar_nome = 'clientes'
+    exportar_ordem = ('nome', 'id')
+    exportar_colunas = [
+        ('id', 'ID'),
+        ('nome', 'Nome'),
+        ('rg', 'RG'),
+        ('cpf', 'CPF'),
+        ('email', 'E-mail'),
+        ('telefone', 'Telefone'),
+        ('celular', 'Celular'),
+        ('cep', 'CEP'),
+        ('endereco', 'Endereço'),
+        ('numero', 'Número'),
+        ('complemento', 'Complemento'),
+        ('bairro', 'Bairro'),
+        ('cidade', 'Cidade'),
+        ('estado', 'Estado'),
+    ]
     
     def get_queryset(self):
         queryset = super().get_queryset()
         search = self.request.GET.get('search')
         
         if search:
-            queryset = queryset.filter(
-                Q(nome__icontains=search) |
-                Q(cpf__icontains=search) |
-                Q(email__icontains=search)
-            )
+            # Documents and phones: exact or prefix seek on the digits columns
+            filtro = Cliente.filtro_digitos(search)
+            queryset = queryset.filter(filtro) if filtro else filtrar_busca(queryset, search)
         
         return queryset
     
@@ -89,18 +106,30 @@ class ClienteDeleteView(LoginRequiredMixin, DeleteView):
 
 class BuscarCepView(LoginRequiredMixin, View):
     """
-    Search CEP via webservice - equivalent to WebServiceCep functionality
+    Search CEP via webservice - equivalent to WebServiceCep functionality.
+    Answers go through the CEP cache (core.cep) and are cacheable by the
+    browser; a webservice outage answers 503 at once.
     """
+    max_age_encontrado = 86400
+    max_age_nao_encontrado = 3600
+
     def get(self, request):
-        from core.utils import buscar_cep
-        import json
+        from core.cep import CepIndisponivel, consultar_cep
         from django.http import JsonResponse
-        
-        cep = request.GET.get('cep', '')
-        
-        if cep:
-            dados = buscar_cep(cep)
-            if dados:
-                return JsonResponse(dados)
-        
-        return JsonResponse({'erro': 'CEP não encontrado'}, status=404)
+        from django.utils.cache import patch_cache_control
+
+        try:
+            dados = consultar_cep(request.GET.get('cep', ''))
+        except CepIndisponivel:
+            resposta = JsonResponse({'erro': 'Serviço de CEP indisponível'}, status=503)
+            resposta['Retry-After'] = 30
+            patch_cache_control(resposta, no_store=True)
+            return resposta
+
+        if dados:
+            resposta = JsonResponse(dados)
+            patch_cache_control(resposta, private=True, max_age=self.max_age_encontrado)
+        else:
+            resposta = JsonResponse({'erro': 'CEP não encontrado'}, status=404)
+            patch_cache_control(resposta, private=True, max_age=self.max_age_nao_encontrado)
+        return resposta
@@ -1,14 +1,82 @@
-from django.contrib import admin
-from .models import Produto, MovimentacaoEstoque
+from django import forms
+from django.contrib import admin, messages
+from django.db import transaction
+from django.http import HttpResponseRedirect
+from .models import (
+    AlertaEstoque, ConflitoVersao, ContagemEstoque, Produto, MovimentacaoEstoque, SaldoEstoque, SLOTS_ESTOQUE
+)
+
+
+class ProdutoAdminForm(forms.ModelForm):
+    """Product admin form: the stock is changed only through novo_estoque"""
+    # Version the user saw, checked on save (see Produto.salvar_versionado)
+    versao_lida = forms.IntegerField(widget=forms.HiddenInput, required=False)
+    novo_estoque = forms.IntegerField(
+        label='Ajustar estoque para', min_value=0, required=False,
+        help_text='Quantidade contada; registrada como movimentação de ajuste',
+    )
+
+    class Meta:
+        model = Produto
+        fields = '__all__'
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['versao_lida'].initial = self.instance.versao
 
 
 @admin.register(Produto)
 class ProdutoAdmin(admin.ModelAdmin):
-    list_display = ['descricao', 'preco', 'qtd_estoque', 'estoque_minimo', 'fornecedor', 'estoque_baixo_display', 'valor_estoque_display']
-    list_filter = ['fornecedor']
+    form = ProdutoAdminForm
+    list_display = ['descricao', 'preco', 'estoque_display', 'estoque_minimo', 'fornecedor', 'estoque_baixo_display', 'valor_estoque_display', 'slots_estoque']
+    list_filter = ['fornecedor', 'abaixo_minimo']
     search_fields = ['descricao', 'fornecedor__nome']
     ordering = ['descricao']
-    readonly_fields = ['valor_total_estoque']
+    readonly_fields = ['valor_total_estoque', 'slots_estoque']
+    actions = ['distribuir_estoque', 'concentrar_estoque']
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).com_estoque_total()
+
+    def get_readonly_fields(self, request, obj=None):
+        campos = super().get_readonly_fields(request, obj)
+        if obj is None:
+            # No price or stock yet to value
+            return [campo for campo in campos if campo != 'valor_total_estoque']
+        # Stock and slots change only through ajustar_estoque and the
+        # distribution actions, which keep the ledger and SlotEstoque right
+        return [*campos, 'qtd_estoque', 'slots_estoque']
+
+    def get_fields(self, request, obj=None):
+        campos = super().get_fields(request, obj)
+        if obj is None:
+            return [campo for campo in campos if campo not in ('versao_lida', 'novo_estoque')]
+        return campos
+
+    def save_model(self, request, obj, form, change):
+        if not change:
+            return super().save_model(request, obj, form, change)
+
+        campos = [campo for campo in form.changed_data if campo not in ('versao_lida', 'novo_estoque')]
+        try:
+            with transaction.atomic():
+                if campos:
+                    obj.salvar_versionado(form.cleaned_data['versao_lida'], campos, usuario=request.user)
+                if form.cleaned_data['novo_estoque'] is not None:
+                    obj.ajustar_estoque(form.cleaned_data['novo_estoque'], 'Ajuste pelo admin', usuario=request.user)
+        except ConflitoVersao as e:
+            obj.conflito = str(e)
+
+    def response_change(self, request, obj):
+        if getattr(obj, 'conflito', None):
+            self.message_user(request, obj.conflito, messages.ERROR)
+            return HttpResponseRedirect(request.path)
+        return super().response_change(request, obj)
+
+    def estoque_display(self, obj):
+        return obj.estoque_atual
+    estoque_display.short_description = 'Quantidade em Estoque'
+    estoque_display.admin_order_field = 'estoque_total'
     
     def estoque_baixo_display(self, obj):
         return obj.estoque_baixo
@@ -19,6 +87,18 @@ class ProdutoAdmin(admin.ModelAdmin):
         return f'R$ {obj.valor_total_estoque:.2f}'
     valor_estoque_display.short_description = 'Valor Total'
 
+    @admin.action(description=f'Distribuir estoque em {SLOTS_ESTOQUE} slots (produtos muito vendidos)')
+    def distribuir_estoque(self, request, queryset):
+        for produto in queryset:
+            produto.distribuir_estoque()
+        self.message_user(request, f'{len(queryset)} produto(s) com estoque distribuído.', messages.SUCCESS)
+
+    @admin.action(description='Concentrar estoque distribuído')
+    def concentrar_estoque(self, request, queryset):
+        for produto in queryset.filter(slots_estoque__gt=0):
+            produto.distribuir_estoque(0)
+        self.message_user(request, 'Estoque concentrado.', messages.SUCCESS)
+
 
 @admin.register(MovimentacaoEstoque)
 class MovimentacaoEstoqueAdmin(admin.ModelAdmin):
@@ -28,3 +108,29 @@ class MovimentacaoEstoqueAdmin(admin.ModelAdmin):
     date_hierarchy = 'data_movimentacao'
     readonly_fields = ['data_movimentacao']
     ordering = ['-data_movimentacao']
+
+
+@admin.register(ContagemEstoque)
+class ContagemEstoqueAdmin(admin.ModelAdmin):
+    list_display = ['pk', 'descricao', 'status', 'criada_em', 'fechada_em', 'produtos_ajustados', 'usuario']
+    list_filter = ['status', 'criada_em']
+    search_fields = ['descricao']
+    readonly_fields = ['status', 'criada_em', 'fechada_em', 'produtos_ajustados']
+
+
+@admin.register(SaldoEstoque)
+class SaldoEstoqueAdmin(admin.ModelAdmin):
+    list_display = ['data', 'produto', 'quantidade']
+    list_filter = ['data']
+    search_fields = ['produto__descricao']
+    date_hierarchy = 'data'
+    raw_id_fields = ['produto']
+
+
+@admin.register(AlertaEstoque)
+class AlertaEstoqueAdmin(admin.ModelAdmin):
+    list_display = ['data', 'produto', 'tipo', 'quantidade', 'estoque_minimo']
+    list_filter = ['tipo', 'data']
+    search_fields = ['produto__descricao']
+    date_hierarchy = 'data'
+    raw_id_fields = ['produto']
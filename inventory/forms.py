@@ -2,7 +2,9 @@ from django import forms
 from django.core.validators import MinValueValidator
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Layout, Row, Column
-from .models import Produto, MovimentacaoEstoque
+from suppliers.models import Fornecedor
+from .models import ContagemEstoque, Produto, MovimentacaoEstoque
+from .previsao import ParametrosPrevisao
 
 
 class ProdutoForm(forms.ModelForm):
@@ -19,6 +21,23 @@ class ProdutoForm(forms.ModelForm):
             'fornecedor': forms.Select(attrs={'class': 'form-select'}),
         }
     
+    # Values the user saw, checked on save (see Produto.salvar_versionado)
+    versao = forms.IntegerField(widget=forms.HiddenInput, required=False)
+    estoque_lido = forms.IntegerField(widget=forms.HiddenInput, required=False)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['versao'].initial = self.instance.versao
+        self.fields['estoque_lido'].initial = self.instance.qtd_estoque
+
+        if self.instance.pk and self.instance.estoque_distribuido:
+            # Stock lives in SlotEstoque rows; change it through the adjustment screen
+            self.fields['qtd_estoque'].disabled = True
+            self.fields['qtd_estoque'].help_text = (
+                f'Estoque distribuído em {self.instance.slots_estoque} slots, '
+                f'total {self.instance.estoque_atual}. Use o ajuste de estoque.'
+            )
+
     def clean_preco(self):
         preco = self.cleaned_data.get('preco')
         if preco <= 0:
@@ -61,7 +80,7 @@ class MovimentacaoEstoqueForm(forms.ModelForm):
 class AjusteEstoqueForm(forms.Form):
     """Form for stock adjustment"""
     produto = forms.ModelChoiceField(
-        queryset=Produto.objects.all(),
+        queryset=Produto.objects.com_estoque_total(),
         label='Produto',
         widget=forms.Select(attrs={'class': 'form-select'})
     )
@@ -77,6 +96,75 @@ class AjusteEstoqueForm(forms.Form):
     )
 
 
+class RecebimentoForm(forms.Form):
+    """Upload form for a supplier delivery note"""
+    fornecedor = forms.ModelChoiceField(
+        queryset=Fornecedor.objects.all(),
+        label='Fornecedor',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    documento = forms.CharField(
+        label='Documento (nota fiscal)',
+        max_length=60,
+        required=False,
+        help_text='Se vazio, usa o campo "documento" do arquivo JSON',
+        widget=forms.TextInput(attrs={'class': 'form-control'})
+    )
+    arquivo = forms.FileField(
+        label='Arquivo da nota',
+        help_text='CSV com as colunas produto (ou descricao) e quantidade, ou JSON',
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.json'})
+    )
+
+
+class ContagemEstoqueForm(forms.ModelForm):
+    """Form to open an inventory count session"""
+
+    class Meta:
+        model = ContagemEstoque
+        fields = ['descricao']
+        widgets = {
+            'descricao': forms.TextInput(attrs={'class': 'form-control', 'placeholder': 'Ex.: Inventário mensal'}),
+        }
+
+
+class ItensContagemForm(forms.Form):
+    """
+    Batch of counted quantities, one "produto;quantidade" per line.
+    A line with only the product id counts one unit (scanner reads).
+    """
+    itens = forms.CharField(
+        label='Itens contados',
+        widget=forms.Textarea(attrs={'class': 'form-control font-monospace', 'rows': 8,
+                                     'placeholder': '12;40\n15;100\n15'})
+    )
+    somar = forms.BooleanField(
+        label='Somar às quantidades já contadas',
+        required=False,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+
+    def clean_itens(self):
+        itens, erros = [], []
+        for numero, linha in enumerate(self.cleaned_data['itens'].splitlines(), start=1):
+            partes = [parte.strip() for parte in linha.replace(',', ';').replace('\t', ';').split(';')]
+            if not partes[0]:
+                continue
+            try:
+                produto = int(partes[0])
+                quantidade = int(partes[1]) if len(partes) > 1 and partes[1] else 1
+                if quantidade < 0:
+                    raise ValueError
+            except ValueError:
+                erros.append(f'Linha {numero} inválida: {linha}')
+                continue
+            itens.append((produto, quantidade))
+
+        if erros:
+            raise forms.ValidationError(erros[:10])
+        return itens
+
+
 class ProdutoSearchForm(forms.Form):
     """Search form for products"""
     search = forms.CharField(
@@ -113,4 +201,69 @@ class EstoqueSearchForm(forms.Form):
         label='Apenas sem estoque',
         required=False,
         widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
-    )
\ No newline at end of file
+    )
+
+class PosicaoEstoqueForm(forms.Form):
+    """Stock position at the end of a given day"""
+    data = forms.DateField(
+        label='Posição em',
+        required=False,
+        widget=forms.DateInput(attrs={'class': 'form-control', 'type': 'date'})
+    )
+    search = forms.CharField(
+        label='Buscar',
+        required=False,
+        widget=forms.TextInput(attrs={
+            'class': 'form-control',
+            'placeholder': 'Descrição do produto...'
+        })
+    )
+
+
+class SugestaoCompraForm(forms.Form):
+    """Parameters of the demand forecast and the purchase suggestion"""
+    METODO_CHOICES = [
+        ('exponencial', 'Suavização exponencial'),
+        ('media', 'Média móvel'),
+    ]
+
+    dias_historico = forms.IntegerField(
+        label='Dias de histórico', initial=365, min_value=7, max_value=1100,
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
+    metodo = forms.ChoiceField(
+        label='Método', choices=METODO_CHOICES, initial='exponencial',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    janela = forms.IntegerField(
+        label='Janela (dias)', initial=28, min_value=2, max_value=365,
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
+    alfa = forms.FloatField(
+        label='Fator de suavização', initial=0.2, min_value=0.01, max_value=1,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.05'})
+    )
+    prazo_entrega = forms.IntegerField(
+        label='Prazo de entrega (dias)', initial=7, min_value=0, max_value=365,
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
+    cobertura = forms.IntegerField(
+        label='Cobertura do pedido (dias)', initial=14, min_value=1, max_value=365,
+        widget=forms.NumberInput(attrs={'class': 'form-control'})
+    )
+    nivel_servico = forms.FloatField(
+        label='Nível de serviço (%)', initial=95, min_value=50, max_value=99.9,
+        widget=forms.NumberInput(attrs={'class': 'form-control', 'step': '0.5'})
+    )
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if cleaned_data.get('janela') and cleaned_data.get('dias_historico'):
+            if cleaned_data['janela'] > cleaned_data['dias_historico']:
+                raise forms.ValidationError('A janela não pode ser maior que o histórico.')
+        return cleaned_data
+
+    def parametros(self):
+        dados = dict(self.cleaned_data)
+        dados['nivel_servico'] = dados['nivel_servico'] / 100
+        return ParametrosPrevisao(**dados)
@@ -0,0 +1,47 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.saldos import compactar_movimentacoes, inicio_do_dia
+
+
+class Command(BaseCommand):
+    help = (
+        'Registra o saldo de todos os produtos na data de corte e arquiva '
+        '(remove) as movimentações de estoque anteriores a ela'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('antes', type=date.fromisoformat, help='Data de corte, AAAA-MM-DD')
+        parser.add_argument('--arquivo', help='Arquivo .jsonl.gz que recebe as movimentações removidas')
+        parser.add_argument(
+            '--sem-arquivo', action='store_true',
+            help='Remove as movimentações sem gravar um arquivo'
+        )
+        parser.add_argument('--lote', type=int, default=1000, help='Linhas por lote')
+        parser.add_argument('--simular', action='store_true', help='Apenas mostra o que seria feito')
+
+    def handle(self, *args, **options):
+        if not options['arquivo'] and not options['sem_arquivo'] and not options['simular']:
+            raise CommandError('Informe --arquivo ou --sem-arquivo')
+
+        antes = inicio_do_dia(options['antes'])
+        try:
+            saldos, movimentacoes = compactar_movimentacoes(
+                antes, options['arquivo'], options['lote'], options['simular']
+            )
+        except FileExistsError:
+            raise CommandError(f'{options["arquivo"]} já existe: informe um arquivo novo')
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if options['simular']:
+            self.stdout.write(
+                f'{movimentacoes} movimentação(ões) anteriores a {options["antes"]:%d/%m/%Y} '
+                f'seriam arquivadas; {saldos} saldo(s) seriam registrados'
+            )
+            return
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{saldos} saldo(s) registrados e {movimentacoes} movimentação(ões) arquivadas'
+        ))
@@ -0,0 +1,60 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from inventory.models import Produto
+
+
+class Command(BaseCommand):
+    help = (
+        'Mede a vazão de baixas de estoque concorrentes em um mesmo produto. '
+        'Cada baixa roda em uma transação que é desfeita ao final, então o estoque não muda.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('produto', type=int, help='ID do produto')
+        parser.add_argument(
+            '--workers', type=int, nargs='+', default=[1, 2, 4, 8],
+            help='Quantidades de threads a medir'
+        )
+        parser.add_argument('--baixas', type=int, default=200, help='Baixas por thread')
+        parser.add_argument(
+            '--espera', type=float, default=5,
+            help='Milissegundos que cada transação segura o estoque (simula o restante da venda)'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            produto = Produto.objects.get(pk=options['produto'])
+        except Produto.DoesNotExist:
+            raise CommandError(f"Produto {options['produto']} não encontrado")
+
+        modo = f'{produto.slots_estoque} slots' if produto.estoque_distribuido else 'linha única'
+        self.stdout.write(f'{produto.descricao} ({modo})')
+
+        for workers in options['workers']:
+            inicio = time.monotonic()
+            threads = [
+                threading.Thread(target=self._baixas, args=(produto.pk, options['baixas'], options['espera'] / 1000))
+                for _ in range(workers)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            duracao = time.monotonic() - inicio
+
+            total = workers * options['baixas']
+            self.stdout.write(f'{workers:>3} workers: {total / duracao:8.1f} baixas/s')
+
+    def _baixas(self, produto_id, quantidade, espera):
+        try:
+            for _ in range(quantidade):
+                with transaction.atomic():
+                    Produto.remover_estoque_em_lote([(produto_id, 1, 'Medição de concorrência')])
+                    time.sleep(espera)
+                    transaction.set_rollback(True)
+        finally:
+            connection.close()
@@ -0,0 +1,45 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.recebimento import NotaInvalida, ler_nota, receber_mercadorias
+from suppliers.models import Fornecedor
+
+
+class Command(BaseCommand):
+    help = 'Lança no estoque uma nota de entrega de fornecedor (CSV ou JSON)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Arquivo .csv ou .json com os itens da nota')
+        parser.add_argument('--fornecedor', type=int, required=True, help='ID do fornecedor')
+        parser.add_argument('--documento', help='Número da nota (padrão: campo "documento" do JSON)')
+        parser.add_argument('--usuario', help='Usuário registrado nas movimentações de estoque')
+
+    def handle(self, *args, **options):
+        try:
+            fornecedor = Fornecedor.objects.get(pk=options['fornecedor'])
+        except Fornecedor.DoesNotExist:
+            raise CommandError(f"Fornecedor {options['fornecedor']} não encontrado")
+
+        usuario = None
+        if options['usuario']:
+            try:
+                usuario = User.objects.get(username=options['usuario'])
+            except User.DoesNotExist:
+                raise CommandError(f"Usuário {options['usuario']} não encontrado")
+
+        with open(options['arquivo'], 'rb') as arquivo:
+            conteudo = arquivo.read()
+
+        try:
+            documento, itens = ler_nota(conteudo, options['arquivo'])
+            resultado = receber_mercadorias(fornecedor, itens, options['documento'] or documento, usuario)
+        except NotaInvalida as e:
+            for erro in e.erros:
+                self.stderr.write(erro)
+            raise CommandError('Nota não recebida')
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Documento {resultado['documento']}: {resultado['linhas']} linhas, "
+            f"{resultado['produtos']} produtos, {resultado['unidades']} unidades "
+            f"em {resultado['segundos']}s ({resultado['linhas_por_segundo']} linhas/s)"
+        ))
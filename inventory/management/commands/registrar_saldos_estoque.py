@@ -0,0 +1,30 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from inventory.saldos import inicio_do_dia, registrar_saldos
+
+
+class Command(BaseCommand):
+    help = 'Registra o saldo de estoque de todos os produtos (fotografia para consultas por data)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--data', type=date.fromisoformat,
+            help='Saldo no início do dia informado, AAAA-MM-DD (padrão: agora)'
+        )
+        parser.add_argument('--lote', type=int, default=1000, help='Produtos por lote')
+
+    def handle(self, *args, **options):
+        data = inicio_do_dia(options['data']) if options['data'] else timezone.now()
+        inicio = timezone.now()
+        try:
+            total = registrar_saldos(data, options['lote'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        segundos = (timezone.now() - inicio).total_seconds()
+        self.stdout.write(self.style.SUCCESS(
+            f'{total} produto(s) com saldo registrado em {timezone.localtime(data):%d/%m/%Y %H:%M} ({segundos:.1f}s)'
+        ))
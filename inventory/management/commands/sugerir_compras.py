@@ -0,0 +1,78 @@
+import csv
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from inventory.previsao import (
+    FONTES, METODOS, ParametrosPrevisao, atualizar_estoque_minimo, sugestao_compra
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Prevê a demanda diária de todos os produtos e gera a lista de compras '
+        'por fornecedor (opcionalmente atualiza o estoque mínimo)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=365, help='Dias de histórico (padrão: 365)')
+        parser.add_argument('--metodo', choices=METODOS, default='exponencial')
+        parser.add_argument('--janela', type=int, default=28, help='Dias da média móvel e do desvio')
+        parser.add_argument('--alfa', type=float, default=0.2, help='Fator da suavização exponencial')
+        parser.add_argument('--prazo', type=int, default=7, help='Prazo de entrega do fornecedor, em dias')
+        parser.add_argument('--cobertura', type=int, default=14, help='Dias de demanda cobertos por pedido')
+        parser.add_argument('--nivel-servico', type=float, default=0.95, help='Ex.: 0.95')
+        parser.add_argument('--fonte', choices=FONTES, default='vendas',
+                            help='vendas (itens de venda) ou saidas (todas as saídas de estoque)')
+        parser.add_argument('--atualizar-minimo', action='store_true',
+                            help='Grava o ponto de pedido como estoque mínimo')
+        parser.add_argument('--saida', help='Arquivo CSV com a lista de compras')
+
+    def handle(self, *args, **options):
+        try:
+            parametros = ParametrosPrevisao(
+                dias_historico=options['dias'], metodo=options['metodo'], janela=options['janela'],
+                alfa=options['alfa'], prazo_entrega=options['prazo'], cobertura=options['cobertura'],
+                nivel_servico=options['nivel_servico'], fonte=options['fonte'],
+            )
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        inicio = time.monotonic()
+        if options['atualizar_minimo']:
+            alterados = atualizar_estoque_minimo(parametros)
+            self.stdout.write(self.style.SUCCESS(
+                f'Estoque mínimo atualizado em {alterados} produto(s) ({time.monotonic() - inicio:.1f}s)'
+            ))
+            inicio = time.monotonic()
+
+        grupos = sugestao_compra(parametros)
+        segundos = time.monotonic() - inicio
+
+        if options['saida']:
+            with open(options['saida'], 'w', newline='', encoding='utf-8-sig') as arquivo:
+                escritor = csv.writer(arquivo, delimiter=';')
+                escritor.writerow([
+                    'Fornecedor', 'Produto ID', 'Produto', 'Estoque', 'Estoque Mínimo',
+                    'Previsão Diária', 'Ponto de Pedido', 'Comprar',
+                ])
+                for grupo in grupos:
+                    for item in grupo['itens']:
+                        escritor.writerow([
+                            grupo['fornecedor'], item['produto_id'], item['descricao'], item['estoque'],
+                            item['estoque_minimo'], item['previsao_diaria'], item['ponto_pedido'],
+                            item['quantidade'],
+                        ])
+        else:
+            for grupo in grupos:
+                self.stdout.write(f"\n{grupo['fornecedor']} ({grupo['unidades']} unidades)")
+                for item in grupo['itens']:
+                    self.stdout.write(
+                        f"  {item['produto_id']:>8}  {item['descricao'][:40]:<40} "
+                        f"estoque {item['estoque']:>6}  comprar {item['quantidade']:>6}"
+                    )
+
+        itens = sum(len(grupo['itens']) for grupo in grupos)
+        self.stdout.write(self.style.SUCCESS(
+            f'{itens} produto(s) a comprar de {len(grupos)} fornecedor(es) ({segundos:.1f}s)'
+        ))
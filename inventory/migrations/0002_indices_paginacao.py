@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:22
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='movimentacaoestoque',
+            index=models.Index(fields=['data_movimentacao', 'id'], name='tb_moviment_data_mo_cc52f1_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='movimentacaoestoque',
+            index=models.Index(fields=['tipo', 'data_movimentacao', 'id'], name='tb_moviment_tipo_d939b6_idx'),
+        ),
+    ]
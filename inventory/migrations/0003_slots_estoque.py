@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0002_indices_paginacao'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='produto',
+            name='slots_estoque',
+            field=models.PositiveSmallIntegerField(default=0, help_text='Produtos muito vendidos podem ter o estoque distribuído em vários slots (0 = desativado)', verbose_name='Slots de Estoque'),
+        ),
+        migrations.CreateModel(
+            name='SlotEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot', models.PositiveSmallIntegerField(verbose_name='Slot')),
+                ('quantidade', models.IntegerField(default=0, verbose_name='Quantidade')),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slots', to='inventory.produto', verbose_name='Produto')),
+            ],
+            options={
+                'verbose_name': 'Slot de Estoque',
+                'verbose_name_plural': 'Slots de Estoque',
+                'db_table': 'tb_slots_estoque',
+                'constraints': [models.UniqueConstraint(fields=('produto', 'slot'), name='uniq_slot_estoque_produto')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0004_produto_versao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='movimentacaoestoque',
+            name='documento',
+            field=models.CharField(blank=True, help_text='Nota fiscal ou outro documento de origem', max_length=60, verbose_name='Documento'),
+        ),
+        migrations.AddIndex(
+            model_name='movimentacaoestoque',
+            index=models.Index(fields=['documento'], name='tb_moviment_documen_4da713_idx'),
+        ),
+    ]
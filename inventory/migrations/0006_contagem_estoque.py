@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0005_movimentacao_documento'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ContagemEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('descricao', models.CharField(max_length=100, verbose_name='Descrição')),
+                ('status', models.CharField(choices=[('ABERTA', 'Aberta'), ('FECHADA', 'Fechada'), ('CANCELADA', 'Cancelada')], default='ABERTA', max_length=10, verbose_name='Status')),
+                ('criada_em', models.DateTimeField(auto_now_add=True, verbose_name='Aberta em')),
+                ('fechada_em', models.DateTimeField(blank=True, null=True, verbose_name='Fechada em')),
+                ('produtos_ajustados', models.IntegerField(default=0, verbose_name='Produtos Ajustados')),
+                ('usuario', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='contagens_estoque', to=settings.AUTH_USER_MODEL, verbose_name='Aberta por')),
+            ],
+            options={
+                'verbose_name': 'Contagem de Estoque',
+                'verbose_name_plural': 'Contagens de Estoque',
+                'db_table': 'tb_contagens_estoque',
+                'ordering': ['-criada_em'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ItemContagem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('quantidade_contada', models.IntegerField(verbose_name='Quantidade Contada')),
+                ('contagem', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='itens', to='inventory.contagemestoque', verbose_name='Contagem')),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='contagens', to='inventory.produto', verbose_name='Produto')),
+            ],
+            options={
+                'verbose_name': 'Item de Contagem',
+                'verbose_name_plural': 'Itens de Contagem',
+                'db_table': 'tb_itens_contagem',
+                'constraints': [models.UniqueConstraint(fields=('contagem', 'produto'), name='uniq_item_contagem_produto')],
+            },
+        ),
+    ]
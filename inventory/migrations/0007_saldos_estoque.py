@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:37
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0006_contagem_estoque'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SaldoEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('data', models.DateTimeField(verbose_name='Data')),
+                ('quantidade', models.IntegerField(verbose_name='Quantidade')),
+                ('produto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='saldos', to='inventory.produto', verbose_name='Produto')),
+            ],
+            options={
+                'verbose_name': 'Saldo de Estoque',
+                'verbose_name_plural': 'Saldos de Estoque',
+                'db_table': 'tb_saldos_estoque',
+                'ordering': ['-data'],
+                'indexes': [models.Index(fields=['data'], name='tb_saldos_e_data_3b64f4_idx')],
+                'constraints': [models.UniqueConstraint(fields=('produto', 'data'), name='uniq_saldo_estoque_produto_data')],
+            },
+        ),
+    ]
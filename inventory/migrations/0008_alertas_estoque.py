@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import F, Sum
+
+
+def preencher_abaixo_minimo(apps, schema_editor):
+    Produto = apps.get_model('inventory', 'Produto')
+    Produto.objects.filter(slots_estoque=0, qtd_estoque__lte=F('estoque_minimo')).update(abaixo_minimo=True)
+
+    for produto in Produto.objects.filter(slots_estoque__gt=0).annotate(total_slots=Sum('slots__quantidade')):
+        if produto.qtd_estoque + (produto.total_slots or 0) <= produto.estoque_minimo:
+            Produto.objects.filter(pk=produto.pk).update(abaixo_minimo=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0007_saldos_estoque'),
+        ('suppliers', '__first__'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertaEstoque',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(choices=[('BAIXO', 'Estoque baixo'), ('ESGOTADO', 'Sem estoque'), ('NORMALIZADO', 'Estoque normalizado')], max_length=12, verbose_name='Tipo')),
+                ('quantidade', models.IntegerField(verbose_name='Estoque')),
+                ('estoque_minimo', models.IntegerField(verbose_name='Estoque Mínimo')),
+                ('data', models.DateTimeField(auto_now_add=True, verbose_name='Data')),
+            ],
+            options={
+                'verbose_name': 'Alerta de Estoque',
+                'verbose_name_plural': 'Alertas de Estoque',
+                'db_table': 'tb_alertas_estoque',
+                'ordering': ['-data', '-id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='produto',
+            name='abaixo_minimo',
+            field=models.BooleanField(default=False, editable=False, verbose_name='Abaixo do Mínimo'),
+        ),
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['abaixo_minimo', 'qtd_estoque'], name='tb_produtos_abaixo__9a822f_idx'),
+        ),
+        migrations.AddField(
+            model_name='alertaestoque',
+            name='produto',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alertas', to='inventory.produto', verbose_name='Produto'),
+        ),
+        migrations.AddIndex(
+            model_name='alertaestoque',
+            index=models.Index(fields=['data', 'id'], name='tb_alertas__data_f966d4_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='alertaestoque',
+            index=models.Index(fields=['tipo', 'data', 'id'], name='tb_alertas__tipo_41a8fc_idx'),
+        ),
+        migrations.RunPython(preencher_abaixo_minimo, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('inventory', '0008_alertas_estoque'),
+        ('suppliers', '__first__'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='produto',
+            index=models.Index(fields=['descricao'], name='tb_produtos_descric_50080a_idx'),
+        ),
+    ]
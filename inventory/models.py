@@ -1,6 +1,79 @@
+import random
+
 from django.db import models, transaction
-from django.db.models import F
+from django.db.models import Case, F, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from core.busca import agendar_indexacao
 from suppliers.models import Fornecedor
+from .signals import estoque_minimo_cruzado
+
+
+# Maximum number of rows handled by a single bulk statement
+LOTE_SQL = 1000
+
+# Cache namespace (core.cache) of the product list counts
+CACHE_PRODUTOS = 'produtos'
+
+# Default number of stock slots for products with distributed stock
+SLOTS_ESTOQUE = 8
+
+# Attempts of an optimistic (compare-and-swap) write before giving up
+TENTATIVAS_CAS = 5
+
+
+class ConflitoVersao(ValueError):
+    """The product changed after it was read (optimistic concurrency)"""
+
+
+class ProdutoQuerySet(models.QuerySet):
+
+    def com_estoque_total(self):
+        """
+        Annotate `estoque_total`: qtd_estoque plus, for products with
+        distributed stock, the sum of their slots
+        """
+        slots = SlotEstoque.objects.filter(produto=OuterRef('pk')).values('produto').annotate(
+            total=Sum('quantidade')
+        ).values('total')
+        return self.annotate(estoque_total=Case(
+            When(slots_estoque__gt=0, then=F('qtd_estoque') + Coalesce(Subquery(slots), 0)),
+            default=F('qtd_estoque'),
+            output_field=models.IntegerField(),
+        ))
+
+
+    def com_estoque_em(self, data):
+        """
+        Annotate `estoque_na_data`: the stock of each product at the instant
+        `data` (every movement strictly before it), from the nearest
+        snapshot (SaldoEstoque) plus the ledger rows between the two:
+
+        - latest snapshot at or before `data`, plus the later movements;
+        - otherwise the first snapshot after `data`, minus the movements
+          between `data` and it;
+        - otherwise the current stock minus every movement since `data`.
+        """
+        antes = SaldoEstoque.objects.filter(produto=OuterRef('pk'), data__lte=data).order_by('-data')
+        depois = SaldoEstoque.objects.filter(produto=OuterRef('pk'), data__gt=data).order_by('data')
+        queryset = self.com_estoque_total().annotate(
+            saldo_antes=Subquery(antes.values('quantidade')[:1]),
+            saldo_antes_data=Subquery(antes.values('data')[:1]),
+            saldo_depois=Subquery(depois.values('quantidade')[:1]),
+            saldo_depois_data=Subquery(depois.values('data')[:1]),
+        )
+        return queryset.annotate(estoque_na_data=Case(
+            When(
+                saldo_antes__isnull=False,
+                then=F('saldo_antes') + MovimentacaoEstoque.saldo_periodo(OuterRef('saldo_antes_data'), data),
+            ),
+            When(
+                saldo_depois__isnull=False,
+                then=F('saldo_depois') - MovimentacaoEstoque.saldo_periodo(data, OuterRef('saldo_depois_data')),
+            ),
+            default=F('estoque_total') - MovimentacaoEstoque.saldo_periodo(data, None),
+            output_field=models.IntegerField(),
+        ))
 
 
 class Produto(models.Model):
@@ -12,6 +85,19 @@ class Produto(models.Model):
     preco = models.DecimalField('Preço', max_digits=10, decimal_places=2)
     qtd_estoque = models.IntegerField('Quantidade em Estoque')
     estoque_minimo = models.IntegerField('Estoque Mínimo', default=10)  # NOVO
+    slots_estoque = models.PositiveSmallIntegerField(
+        'Slots de Estoque',
+        default=0,
+        help_text='Produtos muito vendidos podem ter o estoque distribuído em vários slots (0 = desativado)'
+    )
+    # Optimistic concurrency: incremented by every absolute write (edits,
+    # adjustments, stock distribution). Sales apply relative deltas and
+    # leave it alone, so they never invalidate an open edit form.
+    versao = models.PositiveIntegerField('Versão', default=0, editable=False)
+    # Maintained copy of "estoque_total <= estoque_minimo": comparing two
+    # columns cannot use an index, this flag can. Refreshed by every stock
+    # write through verificar_estoque_minimo().
+    abaixo_minimo = models.BooleanField('Abaixo do Mínimo', default=False, editable=False)
     fornecedor = models.ForeignKey(
         Fornecedor,
         on_delete=models.PROTECT,
@@ -19,6 +105,8 @@ class Produto(models.Model):
         related_name='produtos',
         db_column='for_id'
     )
+
+    objects = ProdutoQuerySet.as_manager()
     
     class Meta:
         db_table = 'tb_produtos'
@@ -27,25 +115,47 @@ class Produto(models.Model):
         ordering = ['descricao']
         indexes = [
             models.Index(fields=['qtd_estoque']),  # NOVO: índice para performance
+            models.Index(fields=['abaixo_minimo', 'qtd_estoque']),
+            # Typeahead prefix search (descricao LIKE 'termo%')
+            models.Index(fields=['descricao']),
         ]
     
     def __str__(self):
-        return f"{self.descricao} (Estoque: {self.qtd_estoque})"
+        return f"{self.descricao} (Estoque: {self.estoque_atual})"
+
+    def save(self, *args, **kwargs):
+        if not self.estoque_distribuido:
+            self.abaixo_minimo = self.qtd_estoque <= self.estoque_minimo
+        super().save(*args, **kwargs)
+
+    @property
+    def estoque_distribuido(self):
+        """Stock is spread across SlotEstoque rows"""
+        return self.slots_estoque > 0
+
+    @property
+    def estoque_atual(self):
+        """Total stock, including the slots of distributed products"""
+        if 'estoque_total' in self.__dict__:
+            return self.estoque_total
+        if not self.estoque_distribuido:
+            return self.qtd_estoque
+        return self.qtd_estoque + (self.slots.aggregate(total=Sum('quantidade'))['total'] or 0)
     
     @property
     def estoque_baixo(self):
         """Check if stock is low (less than or equal to minimum)"""
-        return self.qtd_estoque <= self.estoque_minimo
+        return self.estoque_atual <= self.estoque_minimo
     
     @property
     def estoque_disponivel(self):
         """Check if there is available stock"""
-        return self.qtd_estoque > 0
+        return self.estoque_atual > 0
     
     @property
     def valor_total_estoque(self):
         """Calculate total stock value"""
-        return self.preco * self.qtd_estoque
+        return self.preco * self.estoque_atual
     
     @transaction.atomic
     def adicionar_estoque(self, quantidade, observacao=''):
@@ -54,11 +164,16 @@ class Produto(models.Model):
         """
         if quantidade <= 0:
             raise ValueError('Quantidade deve ser maior que zero')
+
+        if self.estoque_distribuido:
+            self.adicionar_estoque_em_lote([(self.pk, quantidade, observacao)])
+            return True
         
         # Atualização atômica no banco
         Produto.objects.filter(pk=self.pk).update(
             qtd_estoque=F('qtd_estoque') + quantidade
         )
+        Produto.verificar_estoque_minimo([self.pk])
         
         # Recarregar objeto
         self.refresh_from_db()
@@ -82,6 +197,10 @@ class Produto(models.Model):
         """
         if quantidade <= 0:
             raise ValueError('Quantidade deve ser maior que zero')
+
+        if self.estoque_distribuido:
+            self.remover_estoque_em_lote([(self.pk, quantidade, observacao)])
+            return True
         
         # Bloquear linha para evitar race condition
         produto = Produto.objects.select_for_update().get(pk=self.pk)
@@ -98,6 +217,7 @@ class Produto(models.Model):
         Produto.objects.filter(pk=self.pk).update(
             qtd_estoque=F('qtd_estoque') - quantidade
         )
+        Produto.verificar_estoque_minimo([self.pk])
         
         # Recarregar objeto
         self.refresh_from_db()
@@ -111,9 +231,318 @@ class Produto(models.Model):
             quantidade_atual=self.qtd_estoque,
             observacao=observacao
         )
-        
+
         return True
 
+    @classmethod
+    def adicionar_estoque_em_lote(cls, lancamentos, usuario=None, documento=''):
+        """
+        Add stock for many products at once.
+        `lancamentos` is a list of (produto_id, quantidade, observacao) tuples.
+        """
+        return cls._movimentar_em_lote('ENTRADA', lancamentos, usuario, documento)
+
+    @classmethod
+    def remover_estoque_em_lote(cls, lancamentos, usuario=None, documento=''):
+        """
+        Remove stock for many products at once, validating availability.
+        `lancamentos` is a list of (produto_id, quantidade, observacao) tuples.
+        """
+        return cls._movimentar_em_lote('SAIDA', lancamentos, usuario, documento)
+
+    @classmethod
+    @transaction.atomic
+    def _movimentar_em_lote(cls, tipo, lancamentos, usuario=None, documento=''):
+        """
+        Apply several stock movements with a fixed number of queries:
+        one SELECT ... FOR UPDATE (in primary-key order, so concurrent
+        batches always lock rows in the same order and cannot deadlock),
+        one set-based UPDATE and one bulk INSERT into the movement ledger.
+
+        Products with distributed stock are not locked: each movement
+        updates a single SlotEstoque row (see SlotEstoque.movimentar).
+
+        Returns the products by pk, with qtd_estoque (or estoque_total, for
+        distributed products) already updated.
+        """
+        lancamentos = list(lancamentos)
+        for _, quantidade, _ in lancamentos:
+            if quantidade <= 0:
+                raise ValueError('Quantidade deve ser maior que zero')
+
+        ids = sorted({produto_id for produto_id, _, _ in lancamentos})
+        produtos = {
+            produto.pk: produto
+            for produto in cls.objects.select_for_update().filter(
+                pk__in=ids, slots_estoque=0
+            ).order_by('pk')
+        }
+        distribuidos = {}
+        if len(produtos) != len(ids):
+            distribuidos = cls.objects.in_bulk([pk for pk in ids if pk not in produtos])
+            faltando = ', '.join(str(pk) for pk in ids if pk not in produtos and pk not in distribuidos)
+            if faltando:
+                raise ValueError(f'Produto(s) não encontrado(s): {faltando}')
+
+        sinal = -1 if tipo == 'SAIDA' else 1
+        saldos = {pk: produto.qtd_estoque for pk, produto in produtos.items()}
+        movimentacoes = []
+        pendentes = []
+
+        for produto_id, quantidade, observacao in lancamentos:
+            movimentacao = MovimentacaoEstoque(
+                produto_id=produto_id,
+                tipo=tipo,
+                quantidade=quantidade,
+                observacao=observacao,
+                usuario=usuario,
+                documento=documento,
+            )
+            movimentacoes.append(movimentacao)
+
+            if produto_id in distribuidos:
+                SlotEstoque.movimentar(distribuidos[produto_id], sinal * quantidade)
+                pendentes.append(movimentacao)
+                continue
+
+            quantidade_anterior = saldos[produto_id]
+            quantidade_atual = quantidade_anterior + sinal * quantidade
+
+            if quantidade_atual < 0:
+                raise ValueError(
+                    f'Estoque insuficiente para {produtos[produto_id].descricao}. '
+                    f'Disponível: {quantidade_anterior}, Solicitado: {quantidade}'
+                )
+
+            saldos[produto_id] = quantidade_atual
+            movimentacao.quantidade_anterior = quantidade_anterior
+            movimentacao.quantidade_atual = quantidade_atual
+
+        if distribuidos:
+            # Ledger balances of distributed products come from the slot
+            # totals seen after the updates, walked back movement by movement
+            totais = dict(
+                SlotEstoque.objects.filter(produto_id__in=distribuidos)
+                .values('produto_id').annotate(total=Sum('quantidade'))
+                .values_list('produto_id', 'total')
+            )
+            for pk, produto in distribuidos.items():
+                produto.estoque_total = produto.qtd_estoque + (totais.get(pk) or 0)
+                totais[pk] = produto.estoque_total
+            for movimentacao in reversed(pendentes):
+                movimentacao.quantidade_atual = totais[movimentacao.produto_id]
+                movimentacao.quantidade_anterior = movimentacao.quantidade_atual - sinal * movimentacao.quantidade
+                totais[movimentacao.produto_id] = movimentacao.quantidade_anterior
+
+        cls._aplicar_diferencas({
+            pk: saldos[pk] - produto.qtd_estoque for pk, produto in produtos.items()
+        })
+        MovimentacaoEstoque.objects.bulk_create(movimentacoes, batch_size=LOTE_SQL)
+        cls.verificar_estoque_minimo(ids)
+
+        for pk, produto in produtos.items():
+            produto.qtd_estoque = saldos[pk]
+
+        return {**produtos, **distribuidos}
+
+    @classmethod
+    def _aplicar_diferencas(cls, diferencas):
+        """
+        Apply per-product stock deltas with a single CASE-based UPDATE
+        (one statement per LOTE_SQL products). Products sharing the same
+        delta share a WHEN branch, which keeps the statement small for
+        typical batches (many lines of one unit, full boxes, ...).
+        """
+        ids = sorted(pk for pk, diferenca in diferencas.items() if diferenca)
+
+        for inicio in range(0, len(ids), LOTE_SQL):
+            lote = ids[inicio:inicio + LOTE_SQL]
+            por_diferenca = {}
+            for pk in lote:
+                por_diferenca.setdefault(diferencas[pk], []).append(pk)
+
+            cls.objects.filter(pk__in=lote).update(
+                qtd_estoque=F('qtd_estoque') + Case(
+                    *[When(pk__in=pks, then=Value(diferenca)) for diferenca, pks in por_diferenca.items()],
+                    output_field=models.IntegerField(),
+                )
+            )
+
+    @classmethod
+    def verificar_estoque_minimo(cls, ids):
+        """
+        Refresh `abaixo_minimo` of the given products and record an
+        AlertaEstoque for each one whose stock crossed estoque_minimo.
+        Costs one SELECT per LOTE_SQL products; the UPDATEs and the INSERT
+        only run when some product actually crossed the threshold.
+
+        Returns the number of crossings.
+        """
+        ids = sorted(set(ids))
+        cruzamentos = []
+        for inicio in range(0, len(ids), LOTE_SQL):
+            cruzamentos += cls.objects.filter(pk__in=ids[inicio:inicio + LOTE_SQL]).com_estoque_total().annotate(
+                baixo=Case(
+                    When(estoque_total__lte=F('estoque_minimo'), then=Value(True)),
+                    default=Value(False),
+                    output_field=models.BooleanField(),
+                )
+            ).exclude(abaixo_minimo=F('baixo')).order_by().values_list(
+                'pk', 'baixo', 'estoque_total', 'estoque_minimo', 'descricao'
+            )
+        if not cruzamentos:
+            return 0
+
+        for baixo in (True, False):
+            pks = [pk for pk, cruzou_para, _, _, _ in cruzamentos if cruzou_para == baixo]
+            if pks:
+                cls.objects.filter(pk__in=pks).update(abaixo_minimo=baixo)
+
+        AlertaEstoque.objects.bulk_create(
+            [
+                AlertaEstoque(
+                    produto_id=pk,
+                    tipo=('ESGOTADO' if estoque <= 0 else 'BAIXO') if baixo else 'NORMALIZADO',
+                    quantidade=estoque,
+                    estoque_minimo=minimo,
+                )
+                for pk, baixo, estoque, minimo, _ in cruzamentos
+            ],
+            batch_size=LOTE_SQL,
+        )
+        estoque_minimo_cruzado.send(
+            sender=cls,
+            produtos=[pk for pk, _, _, _, _ in cruzamentos],
+            cruzamentos=[
+                {'id': pk, 'descricao': descricao, 'estoque_total': estoque, 'estoque_minimo': minimo, 'abaixo': baixo}
+                for pk, baixo, estoque, minimo, descricao in cruzamentos
+            ],
+        )
+        return len(cruzamentos)
+
+    @transaction.atomic
+    def ajustar_estoque(self, quantidade_nova, observacao='', usuario=None, documento=''):
+        """
+        Set the stock to an absolute quantity (inventory adjustment),
+        recording an AJUSTE movement. Returns the previous quantity.
+
+        No row lock is taken: the new quantity is written with a
+        compare-and-swap on the quantity just read, and retried with fresh
+        values (READ COMMITTED, Django's default on MySQL) if a sale changed
+        the stock in between. Raises ConflitoVersao after TENTATIVAS_CAS tries.
+        """
+        if quantidade_nova < 0:
+            raise ValueError('A quantidade não pode ser negativa')
+
+        for _ in range(TENTATIVAS_CAS):
+            quantidade_anterior, slots = Produto.objects.values_list(
+                'qtd_estoque', 'slots_estoque'
+            ).get(pk=self.pk)
+
+            if slots:
+                # Distributed stock: the slots are locked to set their total
+                produto = Produto.objects.select_for_update().get(pk=self.pk)
+                quantidade_anterior = produto._estoque_bloqueado()
+                produto._redistribuir(quantidade_nova, produto.slots_estoque)
+                break
+
+            atualizados = Produto.objects.filter(
+                pk=self.pk, qtd_estoque=quantidade_anterior, slots_estoque=0
+            ).update(qtd_estoque=quantidade_nova, versao=F('versao') + 1)
+            if atualizados:
+                break
+        else:
+            raise ConflitoVersao(
+                f'Não foi possível ajustar o estoque de {self.descricao}: '
+                f'o produto está sendo alterado por outras operações. Tente novamente.'
+            )
+
+        MovimentacaoEstoque.objects.create(
+            produto=self,
+            tipo='AJUSTE',
+            quantidade=abs(quantidade_nova - quantidade_anterior),
+            quantidade_anterior=quantidade_anterior,
+            quantidade_atual=quantidade_nova,
+            observacao=observacao,
+            usuario=usuario,
+            documento=documento,
+        )
+        Produto.verificar_estoque_minimo([self.pk])
+        self.refresh_from_db()
+        return quantidade_anterior
+
+    @transaction.atomic
+    def salvar_versionado(self, versao, campos, estoque_lido=None, usuario=None):
+        """
+        Write `campos` only if the row is still at `versao` (compare-and-swap).
+
+        When qtd_estoque is among the fields it must also still equal
+        `estoque_lido`, the quantity shown to the user, and the change is
+        recorded as an AJUSTE movement. Raises ConflitoVersao otherwise.
+        """
+        valores = {campo: getattr(self, campo) for campo in campos}
+        condicao = Q(pk=self.pk, versao=versao)
+        if 'qtd_estoque' in valores:
+            condicao &= Q(qtd_estoque=estoque_lido, slots_estoque=0)
+
+        if not Produto.objects.filter(condicao).update(versao=F('versao') + 1, **valores):
+            raise ConflitoVersao(
+                f'{self.descricao} foi alterado por outro usuário ou por uma venda '
+                f'enquanto você editava. Revise os dados atuais e salve novamente.'
+            )
+        self.versao = versao + 1
+        Produto.verificar_estoque_minimo([self.pk])
+        # update() sends no post_save: the search index is refreshed here
+        agendar_indexacao(Produto, [self.pk])
+
+        if 'qtd_estoque' in valores and self.qtd_estoque != estoque_lido:
+            MovimentacaoEstoque.objects.create(
+                produto=self,
+                tipo='AJUSTE',
+                quantidade=abs(self.qtd_estoque - estoque_lido),
+                quantidade_anterior=estoque_lido,
+                quantidade_atual=self.qtd_estoque,
+                observacao='Alteração no cadastro do produto',
+                usuario=usuario,
+            )
+
+    @transaction.atomic
+    def distribuir_estoque(self, slots=SLOTS_ESTOQUE):
+        """
+        Spread the stock across `slots` SlotEstoque rows so concurrent
+        checkouts do not queue on this product's row lock.
+        slots=0 moves the stock back into qtd_estoque.
+        """
+        produto = Produto.objects.select_for_update().get(pk=self.pk)
+        total = produto._estoque_bloqueado()
+        produto._redistribuir(total, slots)
+        self.refresh_from_db()
+        return total
+
+    def _estoque_bloqueado(self):
+        """Total stock with every slot row locked (call inside a transaction)"""
+        slots = SlotEstoque.objects.select_for_update().filter(produto=self).order_by('slot')
+        return self.qtd_estoque + sum(slot.quantidade for slot in slots)
+
+    def _redistribuir(self, total, slots):
+        """
+        Store `total` units spread evenly across `slots` slot rows (or in
+        qtd_estoque when slots=0). The product row and its slots must be locked.
+        """
+        SlotEstoque.objects.filter(produto=self).delete()
+        if slots:
+            base, resto = divmod(total, slots)
+            SlotEstoque.objects.bulk_create([
+                SlotEstoque(produto=self, slot=slot, quantidade=base + (1 if slot < resto else 0))
+                for slot in range(slots)
+            ])
+
+        Produto.objects.filter(pk=self.pk).update(
+            qtd_estoque=0 if slots else total,
+            slots_estoque=slots,
+            versao=F('versao') + 1,
+        )
+
 
 class MovimentacaoEstoque(models.Model):
     """
@@ -137,6 +566,12 @@ class MovimentacaoEstoque(models.Model):
     quantidade_atual = models.IntegerField('Quantidade Atual')
     data_movimentacao = models.DateTimeField('Data', auto_now_add=True)
     observacao = models.TextField('Observação', blank=True)
+    documento = models.CharField(
+        'Documento',
+        max_length=60,
+        blank=True,
+        help_text='Nota fiscal ou outro documento de origem'
+    )
     usuario = models.ForeignKey(
         'auth.User',
         on_delete=models.SET_NULL,
@@ -152,7 +587,387 @@ class MovimentacaoEstoque(models.Model):
         ordering = ['-data_movimentacao']
         indexes = [
             models.Index(fields=['produto', '-data_movimentacao']),
+            # Keyset pagination seeks on (data_movimentacao, id)
+            models.Index(fields=['data_movimentacao', 'id']),
+            models.Index(fields=['tipo', 'data_movimentacao', 'id']),
+            models.Index(fields=['documento']),
         ]
     
     def __str__(self):
-        return f"{self.get_tipo_display()} - {self.produto.descricao} - {self.quantidade}"
\ No newline at end of file
+        return f"{self.get_tipo_display()} - {self.produto.descricao} - {self.quantidade}"
+
+    @classmethod
+    def saldo_periodo(cls, inicio, fim):
+        """
+        Correlated subquery (on the product `pk` of the outer query) with the
+        net stock change of the movements in [inicio, fim); fim=None means
+        up to now. Uses the (produto, data_movimentacao) index.
+        """
+        movimentos = cls.objects.filter(produto=OuterRef('pk'), data_movimentacao__gte=inicio)
+        if fim is not None:
+            movimentos = movimentos.filter(data_movimentacao__lt=fim)
+        total = movimentos.order_by().values('produto').annotate(
+            total=Sum(F('quantidade_atual') - F('quantidade_anterior'))
+        ).values('total')
+        return Coalesce(Subquery(total, output_field=models.IntegerField()), 0)
+
+
+class AlertaEstoque(models.Model):
+    """A product's stock crossed its estoque_minimo (in either direction)"""
+    TIPO_CHOICES = [
+        ('BAIXO', 'Estoque baixo'),
+        ('ESGOTADO', 'Sem estoque'),
+        ('NORMALIZADO', 'Estoque normalizado'),
+    ]
+
+    produto = models.ForeignKey(
+        Produto,
+        on_delete=models.CASCADE,
+        related_name='alertas',
+        verbose_name='Produto'
+    )
+    tipo = models.CharField('Tipo', max_length=12, choices=TIPO_CHOICES)
+    quantidade = models.IntegerField('Estoque')
+    estoque_minimo = models.IntegerField('Estoque Mínimo')
+    data = models.DateTimeField('Data', auto_now_add=True)
+
+    class Meta:
+        db_table = 'tb_alertas_estoque'
+        verbose_name = 'Alerta de Estoque'
+        verbose_name_plural = 'Alertas de Estoque'
+        ordering = ['-data', '-id']
+        indexes = [
+            models.Index(fields=['data', 'id']),
+            models.Index(fields=['tipo', 'data', 'id']),
+        ]
+
+    def __str__(self):
+        return f"{self.get_tipo_display()} - {self.produto_id} ({self.quantidade}/{self.estoque_minimo})"
+
+
+class SaldoEstoque(models.Model):
+    """
+    Snapshot of a product's stock at an instant (every movement strictly
+    before `data`). Point-in-time queries start from the nearest snapshot
+    instead of replaying the whole ledger, and ledger rows older than a
+    snapshot can be archived (see inventory.saldos).
+    """
+    produto = models.ForeignKey(
+        Produto,
+        on_delete=models.CASCADE,
+        related_name='saldos',
+        verbose_name='Produto'
+    )
+    data = models.DateTimeField('Data')
+    quantidade = models.IntegerField('Quantidade')
+
+    class Meta:
+        db_table = 'tb_saldos_estoque'
+        verbose_name = 'Saldo de Estoque'
+        verbose_name_plural = 'Saldos de Estoque'
+        ordering = ['-data']
+        constraints = [
+            models.UniqueConstraint(fields=['produto', 'data'], name='uniq_saldo_estoque_produto_data'),
+        ]
+        indexes = [
+            models.Index(fields=['data']),
+        ]
+
+    def __str__(self):
+        return f"{self.produto_id} em {self.data:%d/%m/%Y %H:%M}: {self.quantidade}"
+
+
+class SlotEstoque(models.Model):
+    """
+    One shard of a product's stock. Products with slots_estoque > 0 keep
+    their stock in these rows; checkouts decrement a random slot, so
+    concurrent sales of the same product lock different rows.
+    """
+    produto = models.ForeignKey(
+        Produto,
+        on_delete=models.CASCADE,
+        related_name='slots',
+        verbose_name='Produto'
+    )
+    slot = models.PositiveSmallIntegerField('Slot')
+    quantidade = models.IntegerField('Quantidade', default=0)
+
+    class Meta:
+        db_table = 'tb_slots_estoque'
+        verbose_name = 'Slot de Estoque'
+        verbose_name_plural = 'Slots de Estoque'
+        constraints = [
+            models.UniqueConstraint(fields=['produto', 'slot'], name='uniq_slot_estoque_produto'),
+        ]
+
+    def __str__(self):
+        return f"{self.produto_id}#{self.slot}: {self.quantidade}"
+
+    @classmethod
+    def movimentar(cls, produto, diferenca):
+        """
+        Add (diferenca > 0) or remove stock of a distributed product.
+
+        Removals first try single conditional UPDATEs starting at a random
+        slot; only when no slot holds enough on its own are all the slots
+        locked and drained in slot order.
+        """
+        slots = produto.slots_estoque
+        inicio = random.randrange(slots)
+
+        if diferenca > 0:
+            cls.objects.filter(produto=produto, slot=inicio).update(quantidade=F('quantidade') + diferenca)
+            return
+
+        quantidade = -diferenca
+        for i in range(slots):
+            atualizados = cls.objects.filter(
+                produto=produto, slot=(inicio + i) % slots, quantidade__gte=quantidade
+            ).update(quantidade=F('quantidade') - quantidade)
+            if atualizados:
+                return
+
+        linhas = list(cls.objects.select_for_update().filter(produto=produto).order_by('slot'))
+        disponivel = sum(linha.quantidade for linha in linhas)
+        if disponivel < quantidade:
+            raise ValueError(
+                f'Estoque insuficiente para {produto.descricao}. '
+                f'Disponível: {disponivel}, Solicitado: {quantidade}'
+            )
+
+        restante = quantidade
+        for linha in linhas:
+            retirado = min(linha.quantidade, restante)
+            linha.quantidade -= retirado
+            restante -= retirado
+        cls.objects.bulk_update(linhas, ['quantidade'])
+
+
+class ContagemEstoque(models.Model):
+    """
+    Physical inventory count session. Counted quantities are submitted in
+    batches while the session is open; closing it adjusts every product
+    whose count differs from qtd_estoque in a few set-based statements.
+    """
+    STATUS_CHOICES = [
+        ('ABERTA', 'Aberta'),
+        ('FECHADA', 'Fechada'),
+        ('CANCELADA', 'Cancelada'),
+    ]
+
+    descricao = models.CharField('Descrição', max_length=100)
+    status = models.CharField('Status', max_length=10, choices=STATUS_CHOICES, default='ABERTA')
+    criada_em = models.DateTimeField('Aberta em', auto_now_add=True)
+    fechada_em = models.DateTimeField('Fechada em', null=True, blank=True)
+    usuario = models.ForeignKey(
+        'auth.User',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='contagens_estoque',
+        verbose_name='Aberta por'
+    )
+    produtos_ajustados = models.IntegerField('Produtos Ajustados', default=0)
+
+    class Meta:
+        db_table = 'tb_contagens_estoque'
+        verbose_name = 'Contagem de Estoque'
+        verbose_name_plural = 'Contagens de Estoque'
+        ordering = ['-criada_em']
+
+    def __str__(self):
+        return f"Contagem #{self.pk} - {self.descricao}"
+
+    @property
+    def aberta(self):
+        return self.status == 'ABERTA'
+
+    @property
+    def documento(self):
+        """Reference stored on the AJUSTE movements of this count"""
+        return f'Contagem #{self.pk}'
+
+    def _verificar_aberta(self):
+        if not ContagemEstoque.objects.filter(pk=self.pk, status='ABERTA').exists():
+            raise ValueError(f'A contagem #{self.pk} não está aberta')
+
+    @transaction.atomic
+    def registrar(self, itens, somar=False):
+        """
+        Record counted quantities.
+
+        Args:
+            itens: iterable of (produto_id, quantidade) pairs
+            somar: add to the quantities already counted (scanner reads)
+                instead of replacing them
+
+        Returns:
+            (number of products recorded, list of unknown product ids)
+        """
+        self._verificar_aberta()
+
+        quantidades = {}
+        for produto_id, quantidade in itens:
+            if quantidade < 0:
+                raise ValueError('Quantidade deve ser maior ou igual a zero')
+            if somar:
+                quantidades[produto_id] = quantidades.get(produto_id, 0) + quantidade
+            else:
+                quantidades[produto_id] = quantidade
+
+        existentes = set(
+            Produto.objects.filter(pk__in=quantidades).values_list('pk', flat=True)
+        )
+        desconhecidos = sorted(pk for pk in quantidades if pk not in existentes)
+        quantidades = {pk: qtd for pk, qtd in quantidades.items() if pk in existentes}
+
+        if somar:
+            ItemContagem.objects.bulk_create(
+                [ItemContagem(contagem=self, produto_id=pk, quantidade_contada=0) for pk in sorted(quantidades)],
+                ignore_conflicts=True,
+                batch_size=LOTE_SQL,
+            )
+            ids = sorted(pk for pk, qtd in quantidades.items() if qtd)
+            for inicio in range(0, len(ids), LOTE_SQL):
+                lote = ids[inicio:inicio + LOTE_SQL]
+                por_quantidade = {}
+                for pk in lote:
+                    por_quantidade.setdefault(quantidades[pk], []).append(pk)
+                ItemContagem.objects.filter(contagem=self, produto_id__in=lote).update(
+                    quantidade_contada=F('quantidade_contada') + Case(
+                        *[When(produto_id__in=pks, then=Value(qtd)) for qtd, pks in por_quantidade.items()],
+                        output_field=models.IntegerField(),
+                    )
+                )
+        else:
+            ItemContagem.objects.bulk_create(
+                [
+                    ItemContagem(contagem=self, produto_id=pk, quantidade_contada=qtd)
+                    for pk, qtd in sorted(quantidades.items())
+                ],
+                update_conflicts=True,
+                unique_fields=['contagem', 'produto'],
+                update_fields=['quantidade_contada'],
+                batch_size=LOTE_SQL,
+            )
+
+        return len(quantidades), desconhecidos
+
+    def divergencias(self):
+        """Counted items whose quantity differs from the current stock"""
+        return self.itens.com_estoque_total().exclude(quantidade_contada=F('estoque_total'))
+
+    @transaction.atomic
+    def fechar(self, usuario=None):
+        """
+        Close the count and adjust the stock of every product whose counted
+        quantity differs from qtd_estoque: one locking SELECT that computes
+        the differences, an UPDATE ... SET qtd_estoque = (counted quantity)
+        per LOTE_SQL products and a bulk INSERT of the AJUSTE movements.
+
+        Returns the number of products adjusted.
+        """
+        contagem = ContagemEstoque.objects.select_for_update().get(pk=self.pk)
+        if not contagem.aberta:
+            raise ValueError(f'A contagem #{self.pk} não está aberta')
+
+        itens = ItemContagem.objects.filter(contagem=self)
+        contado = Subquery(
+            itens.filter(produto=OuterRef('pk')).values('quantidade_contada')[:1],
+            output_field=models.IntegerField(),
+        )
+        # Products with distributed stock are adjusted one by one (slots)
+        distribuidos = list(
+            self.divergencias().filter(produto__slots_estoque__gt=0)
+            .values_list('produto_id', 'quantidade_contada')
+        )
+
+        # Locks exactly the rows that will change, in primary-key order
+        diferencas = list(
+            Produto.objects.select_for_update()
+            .filter(pk__in=itens.values('produto_id'), slots_estoque=0)
+            .exclude(qtd_estoque=contado)
+            .annotate(contado=contado)
+            .order_by('pk').values_list('pk', 'qtd_estoque', 'contado')
+        )
+        ids = [pk for pk, _, _ in diferencas]
+        for inicio in range(0, len(ids), LOTE_SQL):
+            Produto.objects.filter(pk__in=ids[inicio:inicio + LOTE_SQL]).update(
+                qtd_estoque=contado, versao=F('versao') + 1
+            )
+
+        observacao = f'Contagem de estoque: {contagem.descricao}'
+        MovimentacaoEstoque.objects.bulk_create(
+            [
+                MovimentacaoEstoque(
+                    produto_id=pk,
+                    tipo='AJUSTE',
+                    quantidade=abs(quantidade_contada - quantidade_anterior),
+                    quantidade_anterior=quantidade_anterior,
+                    quantidade_atual=quantidade_contada,
+                    observacao=observacao,
+                    documento=contagem.documento,
+                    usuario=usuario,
+                )
+                for pk, quantidade_anterior, quantidade_contada in diferencas
+            ],
+            batch_size=LOTE_SQL,
+        )
+
+        Produto.verificar_estoque_minimo(ids)
+
+        quantidades = dict(distribuidos)
+        for produto in Produto.objects.filter(pk__in=quantidades):
+            produto.ajustar_estoque(quantidades[produto.pk], observacao, usuario, documento=contagem.documento)
+
+        ajustados = len(diferencas) + len(distribuidos)
+        ContagemEstoque.objects.filter(pk=self.pk).update(
+            status='FECHADA', fechada_em=timezone.now(), produtos_ajustados=ajustados
+        )
+        self.refresh_from_db()
+        return ajustados
+
+    @transaction.atomic
+    def cancelar(self):
+        atualizadas = ContagemEstoque.objects.filter(pk=self.pk, status='ABERTA').update(status='CANCELADA')
+        if not atualizadas:
+            raise ValueError(f'A contagem #{self.pk} não está aberta')
+        self.refresh_from_db()
+
+
+class ItemContagemQuerySet(models.QuerySet):
+
+    def com_estoque_total(self):
+        """Annotate the current total stock of each counted product"""
+        estoque = Produto.objects.com_estoque_total().filter(pk=OuterRef('produto_id')).values('estoque_total')
+        return self.annotate(estoque_total=Subquery(estoque, output_field=models.IntegerField()))
+
+
+class ItemContagem(models.Model):
+    """Counted quantity of one product in a ContagemEstoque"""
+    contagem = models.ForeignKey(
+        ContagemEstoque,
+        on_delete=models.CASCADE,
+        related_name='itens',
+        verbose_name='Contagem'
+    )
+    produto = models.ForeignKey(
+        Produto,
+        on_delete=models.CASCADE,
+        related_name='contagens',
+        verbose_name='Produto'
+    )
+    quantidade_contada = models.IntegerField('Quantidade Contada')
+
+    objects = ItemContagemQuerySet.as_manager()
+
+    class Meta:
+        db_table = 'tb_itens_contagem'
+        verbose_name = 'Item de Contagem'
+        verbose_name_plural = 'Itens de Contagem'
+        constraints = [
+            models.UniqueConstraint(fields=['contagem', 'produto'], name='uniq_item_contagem_produto'),
+        ]
+
+    def __str__(self):
+        return f"{self.produto_id}: {self.quantidade_contada}"
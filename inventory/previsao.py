@@ -0,0 +1,256 @@
+"""
+Demand forecasting and reorder points.
+
+Daily demand of every product is loaded into a NumPy matrix (one row per
+product, one column per day), one chunk of products at a time, and the
+forecasts are computed for the whole chunk at once:
+
+- moving average: mean of the last `janela` days;
+- exponential smoothing: the smoothed level after the last day, computed
+  as a single matrix-vector product with the smoothing weights.
+
+From the daily forecast `d`, the standard deviation `s` of the last
+`janela` days, the supplier lead time `L` (days) and the z-score of the
+service level:
+
+    estoque de segurança = z * s * sqrt(L)
+    ponto de pedido      = d * L + estoque de segurança
+    estoque máximo       = d * (L + cobertura) + estoque de segurança
+
+The reorder point is the suggested estoque_minimo; products at or below it
+go to the purchase list with enough units to reach the maximum stock.
+"""
+import math
+from datetime import date, timedelta
+from statistics import NormalDist
+
+import numpy as np
+from django.db import connection, transaction
+from django.db.models import Case, F, Sum, Value, When
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from core.exportacao import iterar_em_lotes
+from sales.models import ItemVenda
+from .models import LOTE_SQL, MovimentacaoEstoque, Produto
+from .saldos import inicio_do_dia
+
+
+METODOS = ('exponencial', 'media')
+FONTES = ('vendas', 'saidas')
+TAMANHO_LOTE = 5000
+
+
+class ParametrosPrevisao:
+    """Forecast and replenishment settings"""
+
+    def __init__(self, dias_historico=365, metodo='exponencial', janela=28, alfa=0.2,
+                 prazo_entrega=7, cobertura=14, nivel_servico=0.95, fonte='vendas', fim=None):
+        if metodo not in METODOS:
+            raise ValueError(f'Método de previsão inválido: {metodo}')
+        if fonte not in FONTES:
+            raise ValueError(f'Fonte de demanda inválida: {fonte}')
+        if not 0 < alfa <= 1:
+            raise ValueError('O fator de suavização deve estar entre 0 e 1')
+        if not 0.5 <= nivel_servico < 1:
+            raise ValueError('O nível de serviço deve estar entre 50% e 99,9%')
+        if janela < 2 or dias_historico < janela:
+            raise ValueError('O histórico deve ter pelo menos o tamanho da janela (mínimo 2 dias)')
+
+        self.dias_historico = dias_historico
+        self.metodo = metodo
+        self.janela = janela
+        self.alfa = alfa
+        self.prazo_entrega = prazo_entrega
+        self.cobertura = cobertura
+        self.nivel_servico = nivel_servico
+        self.fonte = fonte
+        # History covers the complete days before `fim` (default: today)
+        self.fim = fim or timezone.localdate()
+        self.inicio = self.fim - timedelta(days=dias_historico)
+
+    @property
+    def z(self):
+        return NormalDist().inv_cdf(self.nivel_servico)
+
+
+def carregar_demanda(produto_ids, parametros):
+    """
+    Daily demand matrix of shape (len(produto_ids), dias_historico).
+    `produto_ids` must be sorted; demand comes from one GROUP BY query.
+    """
+    ids = np.asarray(produto_ids, dtype=np.int64)
+    demanda = np.zeros((len(ids), parametros.dias_historico), dtype=np.float64)
+    if not len(ids):
+        return demanda
+
+    if parametros.fonte == 'vendas':
+        linhas = ItemVenda.objects.filter(
+            produto_id__gte=ids[0], produto_id__lte=ids[-1],
+            venda__data_venda__gte=parametros.inicio, venda__data_venda__lt=parametros.fim,
+        ).values_list('produto_id', 'venda__data_venda').annotate(total=Sum('qtd')).order_by()
+    else:
+        linhas = MovimentacaoEstoque.objects.filter(
+            tipo='SAIDA', produto_id__gte=ids[0], produto_id__lte=ids[-1],
+            data_movimentacao__gte=inicio_do_dia(parametros.inicio),
+            data_movimentacao__lt=inicio_do_dia(parametros.fim),
+        ).annotate(dia=TruncDate('data_movimentacao')).values_list('produto_id', 'dia').annotate(
+            total=Sum('quantidade')
+        ).order_by()
+
+    # Rows are read straight from the cursor: Django's per-row value
+    # converters cost more than the query itself on millions of rows, and
+    # each distinct day (at most dias_historico of them) is parsed only once
+    sql, sql_params = linhas.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(sql, sql_params)
+        linhas = cursor.fetchall()
+    if not linhas:
+        return demanda
+
+    indices_dias = {}
+    inicio = parametros.inicio.toordinal()
+
+    def indice_dia(valor):
+        indice = indices_dias.get(valor)
+        if indice is None:
+            dia = valor if isinstance(valor, date) else date.fromisoformat(str(valor)[:10])
+            indice = indices_dias[valor] = dia.toordinal() - inicio
+        return indice
+
+    produtos = np.fromiter((linha[0] for linha in linhas), dtype=np.int64, count=len(linhas))
+    dias = np.fromiter((indice_dia(linha[1]) for linha in linhas), dtype=np.int64, count=len(linhas))
+    totais = np.fromiter((linha[2] for linha in linhas), dtype=np.float64, count=len(linhas))
+
+    # The id range may include products outside the chunk (filtered out)
+    posicoes = np.searchsorted(ids, produtos)
+    validas = (posicoes < len(ids)) & (ids[np.minimum(posicoes, len(ids) - 1)] == produtos)
+    np.add.at(
+        demanda,
+        (posicoes[validas], dias[validas]),
+        totais[validas],
+    )
+    return demanda
+
+
+def pesos_exponenciais(dias, alfa):
+    """
+    Weights w such that demanda @ w is the exponentially smoothed level
+    after the last day (level starts at the first day's demand)
+    """
+    expoentes = np.arange(dias - 1, -1, -1, dtype=np.float64)
+    pesos = alfa * (1 - alfa) ** expoentes
+    pesos[0] = (1 - alfa) ** (dias - 1)
+    return pesos
+
+
+def prever(demanda, parametros):
+    """Daily demand forecast and its standard deviation for every row"""
+    recente = demanda[:, -parametros.janela:]
+    if parametros.metodo == 'media':
+        previsao = recente.mean(axis=1)
+    else:
+        previsao = demanda @ pesos_exponenciais(demanda.shape[1], parametros.alfa)
+    return previsao, recente.std(axis=1, ddof=1)
+
+
+def ponto_de_pedido(previsao, desvio, parametros):
+    """(estoque de segurança, ponto de pedido, estoque máximo), rounded up"""
+    seguranca = parametros.z * desvio * math.sqrt(parametros.prazo_entrega)
+    ponto = previsao * parametros.prazo_entrega + seguranca
+    maximo = previsao * (parametros.prazo_entrega + parametros.cobertura) + seguranca
+    # Rounded first so float noise (4.0000000001) does not add a unit
+    return tuple(np.ceil(np.round(valores, 6)) for valores in (seguranca, ponto, maximo))
+
+
+def calcular_reposicao(parametros, produtos=None, tamanho_lote=TAMANHO_LOTE):
+    """
+    Forecast every product (or the `produtos` queryset) in chunks of
+    `tamanho_lote`. Yields, per chunk, a dict of aligned NumPy arrays and
+    the product rows (pk, descricao, fornecedor_id, fornecedor__nome,
+    estoque_total, estoque_minimo).
+    """
+    produtos = Produto.objects.all() if produtos is None else produtos
+    campos = ['pk', 'descricao', 'fornecedor_id', 'fornecedor__nome', 'estoque_total', 'estoque_minimo']
+
+    for lote in iterar_em_lotes(produtos.com_estoque_total(), campos, ('pk',), tamanho_lote):
+        demanda = carregar_demanda([linha[0] for linha in lote], parametros)
+        previsao, desvio = prever(demanda, parametros)
+        seguranca, ponto, maximo = ponto_de_pedido(previsao, desvio, parametros)
+        estoque = np.fromiter((linha[4] for linha in lote), dtype=np.float64, count=len(lote))
+
+        yield lote, {
+            'previsao': previsao,
+            'desvio': desvio,
+            'seguranca': seguranca,
+            'ponto': ponto,
+            'maximo': maximo,
+            'estoque': estoque,
+            'com_historico': demanda.any(axis=1),
+            'comprar': np.maximum(maximo - estoque, 0),
+        }
+
+
+def sugestao_compra(parametros, produtos=None, tamanho_lote=TAMANHO_LOTE):
+    """
+    Products with sales history whose stock is at or below the reorder
+    point, grouped by supplier:
+    [{'fornecedor_id', 'fornecedor', 'itens': [...], 'unidades'}, ...]
+    """
+    por_fornecedor = {}
+    for lote, resultado in calcular_reposicao(parametros, produtos, tamanho_lote):
+        repor = resultado['com_historico'] & (resultado['estoque'] <= resultado['ponto']) & (resultado['comprar'] > 0)
+        for i in np.flatnonzero(repor):
+            pk, descricao, fornecedor_id, fornecedor, estoque, minimo = lote[i]
+            grupo = por_fornecedor.setdefault(fornecedor_id, {
+                'fornecedor_id': fornecedor_id, 'fornecedor': fornecedor, 'itens': [], 'unidades': 0,
+            })
+            quantidade = int(resultado['comprar'][i])
+            grupo['itens'].append({
+                'produto_id': pk,
+                'descricao': descricao,
+                'estoque': estoque,
+                'estoque_minimo': minimo,
+                'previsao_diaria': round(float(resultado['previsao'][i]), 2),
+                'ponto_pedido': int(resultado['ponto'][i]),
+                'quantidade': quantidade,
+            })
+            grupo['unidades'] += quantidade
+
+    grupos = sorted(por_fornecedor.values(), key=lambda grupo: grupo['fornecedor'])
+    for grupo in grupos:
+        grupo['itens'].sort(key=lambda item: item['descricao'])
+    return grupos
+
+
+@transaction.atomic
+def atualizar_estoque_minimo(parametros, produtos=None, tamanho_lote=TAMANHO_LOTE):
+    """
+    Set estoque_minimo to the reorder point of every product with sales
+    history, with one CASE-based UPDATE per chunk (products sharing a value
+    share a WHEN branch). Returns the number of products changed.
+    """
+    alterados = []
+    for lote, resultado in calcular_reposicao(parametros, produtos, tamanho_lote):
+        novos = {
+            lote[i][0]: int(resultado['ponto'][i])
+            for i in np.flatnonzero(resultado['com_historico'])
+            if int(resultado['ponto'][i]) != lote[i][5]
+        }
+        ids = sorted(novos)
+        for inicio in range(0, len(ids), LOTE_SQL):
+            por_minimo = {}
+            for pk in ids[inicio:inicio + LOTE_SQL]:
+                por_minimo.setdefault(novos[pk], []).append(pk)
+
+            Produto.objects.filter(pk__in=ids[inicio:inicio + LOTE_SQL]).update(
+                estoque_minimo=Case(
+                    *[When(pk__in=pks, then=Value(minimo)) for minimo, pks in por_minimo.items()],
+                    default=F('estoque_minimo'),
+                ),
+                versao=F('versao') + 1,
+            )
+        alterados += ids
+
+    Produto.verificar_estoque_minimo(alterados)
+    return len(alterados)
@@ -0,0 +1,162 @@
+"""
+Goods receipt: posts a supplier delivery note as stock entries.
+
+A delivery note is a CSV file (columns `produto` or `descricao`, and
+`quantidade`; separated by ';' or ',') or JSON:
+
+    {"documento": "NF 123456", "itens": [{"produto": 3, "quantidade": 12}, ...]}
+
+Products are resolved with one query, every increment is applied through
+Produto.adicionar_estoque_em_lote (one set-based UPDATE per LOTE_SQL
+products and a bulk insert of the ENTRADA ledger rows), and the whole note
+is posted in a single transaction: either every line is received or none.
+"""
+import csv
+import io
+import json
+import time
+
+from django.db import transaction
+from django.db.models import Q
+
+from suppliers.models import Fornecedor
+from .models import MovimentacaoEstoque, Produto
+
+
+class NotaInvalida(ValueError):
+    """The delivery note cannot be posted; `erros` lists the problems"""
+
+    def __init__(self, erros):
+        super().__init__('; '.join(erros[:5]) + (f' (+{len(erros) - 5} erros)' if len(erros) > 5 else ''))
+        self.erros = erros
+
+
+def ler_nota(conteudo, nome_arquivo=''):
+    """
+    Parse a delivery note. Returns (documento, itens) where itens is a list
+    of dicts with `produto` or `descricao`, and `quantidade`.
+
+    Raises:
+        NotaInvalida: if the file is not UTF-8, not valid JSON or JSON
+            without a list of items
+    """
+    if isinstance(conteudo, bytes):
+        try:
+            conteudo = conteudo.decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise NotaInvalida(['O arquivo da nota não está em UTF-8'])
+    conteudo = conteudo.strip()
+    if not conteudo:
+        return '', []
+
+    if nome_arquivo.lower().endswith('.json') or conteudo[0] in '[{':
+        try:
+            dados = json.loads(conteudo)
+        except json.JSONDecodeError as e:
+            raise NotaInvalida([f'JSON inválido na linha {e.lineno}, coluna {e.colno}: {e.msg}'])
+        if isinstance(dados, list):
+            return '', dados
+        if not isinstance(dados, dict):
+            raise NotaInvalida(['O JSON da nota deve ser um objeto ou uma lista de itens'])
+        itens = dados.get('itens') or []
+        if not isinstance(itens, list):
+            raise NotaInvalida(['O campo "itens" da nota deve ser uma lista'])
+        return str(dados.get('documento') or ''), itens
+
+    delimitador = ';' if ';' in conteudo.splitlines()[0] else ','
+    leitor = csv.DictReader(io.StringIO(conteudo), delimiter=delimitador)
+    leitor.fieldnames = [campo.strip().lower() for campo in leitor.fieldnames]
+    return '', list(leitor)
+
+
+def receber_mercadorias(fornecedor, itens, documento, usuario=None):
+    """
+    Post a delivery note of `fornecedor`.
+
+    Raises:
+        NotaInvalida: if the document was already received or any line is
+            invalid (nothing is posted)
+
+    Returns:
+        dict with the number of lines, products and units received, the
+        elapsed time and the throughput in lines per second
+    """
+    inicio = time.monotonic()
+    documento = documento.strip()
+    if not documento:
+        raise NotaInvalida(['Informe o número do documento (nota fiscal)'])
+
+    lancamentos, erros = _resolver(fornecedor, itens, documento)
+    if erros:
+        raise NotaInvalida(erros)
+    if not lancamentos:
+        raise NotaInvalida(['A nota não possui itens'])
+
+    with transaction.atomic():
+        # Serialises receipts of the same supplier, so a note posted twice
+        # at the same time is still caught by the check below
+        Fornecedor.objects.select_for_update().filter(pk=fornecedor.pk).exists()
+        ja_recebida = MovimentacaoEstoque.objects.filter(
+            documento=documento, tipo='ENTRADA', produto__fornecedor=fornecedor
+        ).exists()
+        if ja_recebida:
+            raise NotaInvalida([f'O documento {documento} já foi recebido para {fornecedor.nome}'])
+
+        Produto.adicionar_estoque_em_lote(lancamentos, usuario=usuario, documento=documento)
+
+    segundos = time.monotonic() - inicio
+    return {
+        'documento': documento,
+        'linhas': len(lancamentos),
+        'produtos': len({produto_id for produto_id, _, _ in lancamentos}),
+        'unidades': sum(quantidade for _, quantidade, _ in lancamentos),
+        'segundos': round(segundos, 3),
+        'linhas_por_segundo': round(len(lancamentos) / segundos) if segundos else None,
+    }
+
+
+def _resolver(fornecedor, itens, documento):
+    """Validate the lines and resolve their products with a single query"""
+    ids, descricoes = set(), set()
+    linhas, erros = [], []
+
+    for numero, item in enumerate(itens, start=1):
+        if not isinstance(item, dict):
+            erros.append(f'Linha {numero}: formato inválido')
+            continue
+        try:
+            quantidade = int(str(item.get('quantidade', '')).strip())
+            if quantidade <= 0:
+                raise ValueError
+        except (TypeError, ValueError):
+            erros.append(f'Linha {numero}: quantidade inválida')
+            continue
+
+        produto = str(item.get('produto') or '').strip()
+        descricao = str(item.get('descricao') or '').strip()
+        if produto.isdigit():
+            ids.add(int(produto))
+            linhas.append((numero, int(produto), None, quantidade))
+        elif descricao:
+            descricoes.add(descricao)
+            linhas.append((numero, None, descricao, quantidade))
+        else:
+            erros.append(f'Linha {numero}: informe o produto ou a descrição')
+
+    encontrados, por_descricao = set(), {}
+    for pk, descricao in Produto.objects.filter(fornecedor=fornecedor).filter(
+        Q(pk__in=ids) | Q(descricao__in=descricoes)
+    ).values_list('pk', 'descricao'):
+        encontrados.add(pk)
+        por_descricao.setdefault(descricao, pk)
+
+    observacao = f'Recebimento {documento} - {fornecedor.nome}'
+    lancamentos = []
+    for numero, produto_id, descricao, quantidade in linhas:
+        pk = produto_id if produto_id in encontrados else por_descricao.get(descricao)
+        if pk is None:
+            erros.append(f'Linha {numero}: produto {produto_id or descricao} não encontrado para {fornecedor.nome}')
+            continue
+        lancamentos.append((pk, quantidade, observacao))
+
+    return lancamentos, erros
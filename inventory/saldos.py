@@ -0,0 +1,103 @@
+"""
+Stock snapshots and point-in-time stock queries.
+
+A SaldoEstoque row stores the stock of a product at an instant. The stock
+at any other instant comes from the nearest snapshot plus only the ledger
+rows between the two (ProdutoQuerySet.com_estoque_em), so a year-end report
+no longer replays the whole history of tb_movimentacoes_estoque.
+
+Snapshots also make the ledger compactable: once every product has a
+snapshot at a cutoff, the movements before it can be archived and deleted.
+Stock before the cutoff is then only exact at snapshot instants.
+"""
+import gzip
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+
+from core.exportacao import gerar_jsonl, iterar_em_lotes
+from .models import LOTE_SQL, MovimentacaoEstoque, Produto, SaldoEstoque
+
+
+def inicio_do_dia(dia):
+    """Instant at which `dia` starts in the current time zone"""
+    return timezone.make_aware(datetime.combine(dia, time.min))
+
+
+def fim_do_dia(dia):
+    """Instant right after `dia` (stock at the end of the day)"""
+    return inicio_do_dia(dia + timedelta(days=1))
+
+
+def estoque_em(produto_ids, data):
+    """Stock of the given products at the instant `data`, as {pk: quantidade}"""
+    produto_ids = list(produto_ids)
+    estoques = {}
+    for inicio in range(0, len(produto_ids), LOTE_SQL):
+        estoques.update(
+            Produto.objects.filter(pk__in=produto_ids[inicio:inicio + LOTE_SQL])
+            .com_estoque_em(data).order_by().values_list('pk', 'estoque_na_data')
+        )
+    return estoques
+
+
+def registrar_saldos(data=None, tamanho_lote=LOTE_SQL):
+    """
+    Take a snapshot of every product at the instant `data` (default: now),
+    one SELECT and one bulk INSERT per `tamanho_lote` products. Existing
+    snapshots at the same instant are kept, so the command can be re-run.
+
+    Returns the number of products processed.
+    """
+    data = data or timezone.now()
+    if data > timezone.now():
+        raise ValueError('A data do saldo não pode estar no futuro')
+
+    processados = 0
+    for lote in iterar_em_lotes(
+        Produto.objects.com_estoque_em(data), ['pk', 'estoque_na_data'], ('pk',), tamanho_lote
+    ):
+        SaldoEstoque.objects.bulk_create(
+            [SaldoEstoque(produto_id=pk, data=data, quantidade=quantidade) for pk, quantidade in lote],
+            ignore_conflicts=True,
+        )
+        processados += len(lote)
+    return processados
+
+
+COLUNAS_ARQUIVO = [
+    'id', 'produto_id', 'tipo', 'quantidade', 'quantidade_anterior', 'quantidade_atual',
+    'data_movimentacao', 'observacao', 'documento', 'usuario_id',
+]
+
+
+def compactar_movimentacoes(antes, arquivo=None, tamanho_lote=LOTE_SQL, simular=False):
+    """
+    Snapshot every product at `antes`, then move the ledger rows older than
+    it to `arquivo` (gzipped JSON lines; None only deletes them).
+
+    `arquivo` must not exist (FileExistsError): an existing archive holds
+    rows already deleted from the database, so it is never overwritten.
+
+    Returns (number of snapshots taken, number of movements archived).
+    """
+    antigas = MovimentacaoEstoque.objects.filter(data_movimentacao__lt=antes)
+    if simular:
+        return Produto.objects.count(), antigas.count()
+
+    destino = gzip.open(arquivo, 'xb') if arquivo else None
+    arquivadas = 0
+    try:
+        saldos = registrar_saldos(antes, tamanho_lote)
+        for lote in iterar_em_lotes(antigas, COLUNAS_ARQUIVO, ('data_movimentacao', 'id'), tamanho_lote):
+            if destino:
+                for dados in gerar_jsonl(COLUNAS_ARQUIVO, [lote]):
+                    destino.write(dados)
+                destino.flush()
+            MovimentacaoEstoque.objects.filter(pk__in=[linha[0] for linha in lote]).delete()
+            arquivadas += len(lote)
+    finally:
+        if destino:
+            destino.close()
+
+    return saldos, arquivadas
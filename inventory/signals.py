@@ -0,0 +1,11 @@
+"""
+Signals sent by the inventory app
+"""
+from django.dispatch import Signal
+
+
+# Sent after the stock of `produtos` (list of pks) crossed estoque_minimo;
+# `cruzamentos` has one dict per product (id, descricao, estoque_total,
+# estoque_minimo, abaixo). Stock writes are queryset updates, so post_save
+# is not sent for them.
+estoque_minimo_cruzado = Signal()
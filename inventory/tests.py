@@ -0,0 +1,478 @@
+import gzip
+import io
+import os
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+import numpy as np
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from core.busca import buscar
+from suppliers.models import Fornecedor
+from .models import AlertaEstoque, ConflitoVersao, ContagemEstoque, MovimentacaoEstoque, Produto, SaldoEstoque
+from .recebimento import NotaInvalida, ler_nota, receber_mercadorias
+from .previsao import ParametrosPrevisao, atualizar_estoque_minimo, prever, sugestao_compra
+from .saldos import compactar_movimentacoes, estoque_em, registrar_saldos
+
+
+class ProdutoVersaoTestCase(TestCase):
+    """Test optimistic concurrency on product edits and stock adjustments"""
+
+    @classmethod
+    def setUpTestData(cls):
+        # Indexed at once, so the edits below start their own index batch
+        with cls.captureOnCommitCallbacks(execute=True):
+            cls.fornecedor = Fornecedor.objects.create(
+                nome='Fornecedor', cnpj='12345678901234', telefone='1140041000', celular='11987654321',
+                cep='13345325', endereco='Rua A', numero=1, bairro='Centro', cidade='Campinas', estado='SP',
+            )
+
+    def setUp(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.produto = Produto.objects.create(
+                descricao='Caneta', preco=Decimal('2.50'), qtd_estoque=50, fornecedor=self.fornecedor
+            )
+        self.client.force_login(User.objects.create_user('estoquista'))
+
+    def dados_formulario(self, **alteracoes):
+        dados = {
+            'descricao': 'Caneta azul', 'preco': '2.50', 'qtd_estoque': 50, 'estoque_minimo': 10,
+            'fornecedor': self.fornecedor.pk, 'versao': 0, 'estoque_lido': 50,
+        }
+        dados.update(alteracoes)
+        return dados
+
+    def test_edicao_nao_sobrescreve_venda_concorrente(self):
+        # A sale happens while the form is open
+        Produto.remover_estoque_em_lote([(self.produto.pk, 5, 'Venda')])
+
+        response = self.client.post(f'/produtos/editar/{self.produto.pk}/', self.dados_formulario())
+
+        self.assertEqual(response.status_code, 302)
+        self.produto.refresh_from_db()
+        self.assertEqual((self.produto.descricao, self.produto.qtd_estoque), ('Caneta azul', 45))
+
+    def test_estoque_alterado_com_dados_antigos_gera_conflito(self):
+        Produto.remover_estoque_em_lote([(self.produto.pk, 5, 'Venda')])
+
+        response = self.client.post(
+            f'/produtos/editar/{self.produto.pk}/', self.dados_formulario(qtd_estoque=80)
+        )
+
+        self.assertEqual(response.status_code, 409)
+        self.produto.refresh_from_db()
+        self.assertEqual((self.produto.descricao, self.produto.qtd_estoque), ('Caneta', 45))
+
+    def test_edicao_concorrente_gera_conflito(self):
+        self.produto.ajustar_estoque(30)
+
+        response = self.client.post(f'/produtos/editar/{self.produto.pk}/', self.dados_formulario())
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Produto.objects.get(pk=self.produto.pk).descricao, 'Caneta')
+
+    def test_edicao_atualiza_indice_de_busca(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f'/produtos/editar/{self.produto.pk}/', self.dados_formulario(descricao='Lapis preto')
+            )
+
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual([r['id'] for r in buscar('lapis', tipos=['produto'])], [self.produto.pk])
+        self.assertEqual(buscar('caneta', tipos=['produto']), [])
+
+    def test_admin_ajusta_estoque_pelo_livro(self):
+        self.client.force_login(User.objects.create_superuser('gerente'))
+        url = f'/admin/inventory/produto/{self.produto.pk}/change/'
+        dados = {'descricao': 'Caneta azul', 'preco': '2.50', 'estoque_minimo': 10,
+                 'fornecedor': self.fornecedor.pk, 'versao_lida': 0}
+        self.assertContains(self.client.get(url), 'name="novo_estoque"')
+        self.assertNotContains(self.client.get('/admin/inventory/produto/add/'), 'name="novo_estoque"')
+        # A sale while the page is open: qtd_estoque is not in the form, so it is kept
+        Produto.remover_estoque_em_lote([(self.produto.pk, 5, 'Venda')])
+
+        self.assertEqual(self.client.post(url, {**dados, 'qtd_estoque': 999}).status_code, 302)
+        self.produto.refresh_from_db()
+        self.assertEqual((self.produto.descricao, self.produto.qtd_estoque, self.produto.versao), ('Caneta azul', 45, 1))
+
+        self.client.post(url, {**dados, 'versao_lida': 1, 'novo_estoque': 30})
+        mov = MovimentacaoEstoque.objects.get(tipo='AJUSTE')
+        self.assertEqual((mov.quantidade_anterior, mov.quantidade_atual), (45, 30))
+
+        # A stale version changes nothing
+        self.client.post(url, {**dados, 'descricao': 'Lapis', 'novo_estoque': 10})
+        self.produto.refresh_from_db()
+        self.assertEqual((self.produto.descricao, self.produto.qtd_estoque), ('Caneta azul', 30))
+
+    def test_ajuste_repete_com_valores_novos(self):
+        atualizar = Produto.objects.filter(pk=self.produto.pk).update
+
+        def venda_no_meio(*args, **kwargs):
+            # First CAS attempt loses the race against a sale
+            if not venda_no_meio.feita:
+                venda_no_meio.feita = True
+                atualizar(qtd_estoque=47)
+            return original(*args, **kwargs)
+        venda_no_meio.feita = False
+
+        original = Produto.objects.values_list
+        with mock.patch.object(Produto.objects, 'values_list', venda_no_meio):
+            anterior = self.produto.ajustar_estoque(40, 'Contagem')
+
+        self.assertEqual((anterior, self.produto.qtd_estoque), (47, 40))
+        mov = MovimentacaoEstoque.objects.get(tipo='AJUSTE')
+        self.assertEqual((mov.quantidade_anterior, mov.quantidade_atual), (47, 40))
+
+    def test_ajuste_desiste_apos_conflitos(self):
+        with mock.patch.object(Produto.objects, 'filter') as filtro:
+            filtro.return_value.update.return_value = 0
+            with self.assertRaises(ConflitoVersao):
+                self.produto.ajustar_estoque(40)
+
+
+class RecebimentoMercadoriaTestCase(TestCase):
+    """Test posting supplier delivery notes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fornecedor = Fornecedor.objects.create(
+            nome='Fornecedor', cnpj='12345678901234', telefone='1140041000', celular='11987654321',
+            cep='13345325', endereco='Rua A', numero=1, bairro='Centro', cidade='Campinas', estado='SP',
+        )
+        cls.produtos = [
+            Produto.objects.create(
+                descricao=f'Produto {i}', preco=Decimal('1.00'), qtd_estoque=0, fornecedor=cls.fornecedor
+            )
+            for i in range(30)
+        ]
+
+    def test_nota_csv_lancada_com_consultas_constantes(self):
+        linhas = ['produto;descricao;quantidade']
+        linhas += [f'{produto.pk};;{i + 1}' for i, produto in enumerate(self.produtos)]
+        linhas.append(';Produto 0;5')
+        documento, itens = ler_nota('\n'.join(linhas).encode('utf-8'), 'nota.csv')
+        self.assertEqual((documento, len(itens)), ('', 31))
+
+        with CaptureQueriesContext(connection) as consultas:
+            resultado = receber_mercadorias(self.fornecedor, itens, 'NF 100')
+
+        # Resolve, lock supplier, duplicate check, lock products, UPDATE, INSERT,
+        # then the minimum-stock check: SELECT, flag UPDATE, alert INSERT and
+        # dashboard event INSERT
+        sql = [q['sql'] for q in consultas.captured_queries if 'SAVEPOINT' not in q['sql']]
+        self.assertEqual(len(sql), 10)
+        self.assertEqual(AlertaEstoque.objects.filter(tipo='NORMALIZADO').count(), 20)
+
+        self.assertEqual((resultado['linhas'], resultado['produtos']), (31, 30))
+        self.assertEqual(Produto.objects.get(pk=self.produtos[0].pk).qtd_estoque, 6)
+        self.assertEqual(MovimentacaoEstoque.objects.filter(documento='NF 100', tipo='ENTRADA').count(), 31)
+
+    def test_nota_com_erro_ou_repetida_nao_e_lancada(self):
+        itens = [{'produto': self.produtos[0].pk, 'quantidade': 3}, {'produto': 999999, 'quantidade': 1}]
+        with self.assertRaises(NotaInvalida):
+            receber_mercadorias(self.fornecedor, itens, 'NF 200')
+        self.assertFalse(MovimentacaoEstoque.objects.exists())
+
+        receber_mercadorias(self.fornecedor, itens[:1], 'NF 200')
+        with self.assertRaises(NotaInvalida):
+            receber_mercadorias(self.fornecedor, itens[:1], 'NF 200')
+        self.assertEqual(Produto.objects.get(pk=self.produtos[0].pk).qtd_estoque, 3)
+
+    def test_comando_rejeita_json_invalido(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            arquivo = os.path.join(pasta, 'nota.json')
+            with open(arquivo, 'w') as saida:
+                saida.write('{"documento": "NF 300", "itens": [')
+            with self.assertRaisesMessage(CommandError, 'Nota não recebida'):
+                call_command('receber_mercadorias', arquivo, fornecedor=self.fornecedor.pk, stderr=io.StringIO())
+        self.assertFalse(MovimentacaoEstoque.objects.exists())
+
+    def test_json_sem_lista_de_itens_e_rejeitado(self):
+        for conteudo in (b'123', b'"NF 1"', b'{"documento": "NF 1", "itens": 5}', b'{"itens": {"produto": 1}}'):
+            with self.subTest(conteudo=conteudo), self.assertRaises(NotaInvalida):
+                ler_nota(conteudo, 'nota.json')
+
+        self.client.force_login(User.objects.create_user('estoquista'))
+        resposta = self.client.post(reverse('inventory:recebimento'), {
+            'fornecedor': self.fornecedor.pk, 'arquivo': SimpleUploadedFile('nota.json', b'{"itens": 5}'),
+        })
+        self.assertContains(resposta, 'O campo &quot;itens&quot; da nota deve ser uma lista')
+
+
+class ContagemEstoqueTestCase(TestCase):
+    """Test inventory count sessions"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fornecedor = Fornecedor.objects.create(
+            nome='Fornecedor', cnpj='12345678901234', telefone='1140041000', celular='11987654321',
+            cep='13345325', endereco='Rua A', numero=1, bairro='Centro', cidade='Campinas', estado='SP',
+        )
+        cls.produtos = [
+            Produto.objects.create(
+                descricao=f'Produto {i}', preco=Decimal('1.00'), qtd_estoque=10, fornecedor=cls.fornecedor
+            )
+            for i in range(20)
+        ]
+
+    def setUp(self):
+        self.usuario = User.objects.create_user('estoquista')
+        self.contagem = ContagemEstoque.objects.create(descricao='Inventário', usuario=self.usuario)
+
+    def test_registro_substitui_ou_soma(self):
+        a, b = self.produtos[0].pk, self.produtos[1].pk
+        self.contagem.registrar([(a, 4), (b, 7)])
+        self.contagem.registrar([(a, 6)])
+        registrados, desconhecidos = self.contagem.registrar([(a, 1), (a, 1), (b, 2), (999999, 1)], somar=True)
+
+        self.assertEqual((registrados, desconhecidos), (2, [999999]))
+        contadas = dict(self.contagem.itens.values_list('produto_id', 'quantidade_contada'))
+        self.assertEqual(contadas, {a: 8, b: 9})
+
+    def test_fechamento_ajusta_divergentes_em_lote(self):
+        # Half of the products differ; one matches the current stock
+        itens = [(produto.pk, 10 if i == 0 else i) for i, produto in enumerate(self.produtos[:10])]
+        self.contagem.registrar(itens)
+        self.assertEqual(self.contagem.divergencias().count(), 9)
+
+        with CaptureQueriesContext(connection) as consultas:
+            ajustados = self.contagem.fechar(usuario=self.usuario)
+
+        # The number of statements does not depend on the number of products
+        sql = [q['sql'] for q in consultas.captured_queries if 'SAVEPOINT' not in q['sql']]
+        self.assertLessEqual(len(sql), 8)
+
+        self.assertEqual(ajustados, 9)
+        estoques = dict(Produto.objects.filter(pk__in=[pk for pk, _ in itens]).values_list('pk', 'qtd_estoque'))
+        self.assertEqual(estoques, dict(itens))
+
+        movimentos = MovimentacaoEstoque.objects.filter(documento=self.contagem.documento, tipo='AJUSTE')
+        self.assertEqual(movimentos.count(), 9)
+        mov = movimentos.get(produto=self.produtos[3])
+        self.assertEqual((mov.quantidade_anterior, mov.quantidade_atual, mov.quantidade), (10, 3, 7))
+
+        with self.assertRaises(ValueError):
+            self.contagem.fechar()
+        with self.assertRaises(ValueError):
+            self.contagem.registrar([(self.produtos[0].pk, 1)])
+
+    def test_fechamento_com_estoque_distribuido(self):
+        produto = self.produtos[5]
+        produto.distribuir_estoque(4)
+        self.contagem.registrar([(produto.pk, 25), (self.produtos[6].pk, 2)])
+
+        self.assertEqual(self.contagem.fechar(), 2)
+        self.assertEqual(Produto.objects.com_estoque_total().get(pk=produto.pk).estoque_total, 25)
+        self.assertEqual(Produto.objects.get(pk=self.produtos[6].pk).qtd_estoque, 2)
+
+    def test_itens_via_json(self):
+        self.client.force_login(self.usuario)
+        url = f'/produtos/estoque/contagens/{self.contagem.pk}/itens/'
+
+        response = self.client.post(
+            url, {'somar': True, 'itens': [{'produto': self.produtos[0].pk, 'quantidade': 3}]},
+            content_type='application/json',
+        )
+
+        self.assertEqual(response.json(), {'registrados': 1, 'desconhecidos': []})
+        self.assertEqual(self.contagem.itens.get().quantidade_contada, 3)
+
+
+class SaldoEstoqueTestCase(TestCase):
+    """Test stock snapshots and point-in-time stock"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fornecedor = Fornecedor.objects.create(
+            nome='Fornecedor', cnpj='12345678901234', telefone='1140041000', celular='11987654321',
+            cep='13345325', endereco='Rua A', numero=1, bairro='Centro', cidade='Campinas', estado='SP',
+        )
+
+    def setUp(self):
+        self.produto = Produto.objects.create(
+            descricao='Caderno', preco=Decimal('10.00'), qtd_estoque=10, fornecedor=self.fornecedor
+        )
+        self.outro = Produto.objects.create(
+            descricao='Lápis', preco=Decimal('1.00'), qtd_estoque=3, fornecedor=self.fornecedor
+        )
+        # 10 -> 15 -> 12 -> 22, one day apart
+        self.inicio = timezone.now() - timedelta(days=10)
+        for dias, (tipo, quantidade) in enumerate([('ENTRADA', 5), ('SAIDA', 3), ('ENTRADA', 10)], start=1):
+            metodo = Produto.adicionar_estoque_em_lote if tipo == 'ENTRADA' else Produto.remover_estoque_em_lote
+            metodo([(self.produto.pk, quantidade, tipo)])
+            MovimentacaoEstoque.objects.filter(pk=MovimentacaoEstoque.objects.latest('id').pk).update(
+                data_movimentacao=self.inicio + timedelta(days=dias)
+            )
+
+    def dia(self, n):
+        return self.inicio + timedelta(days=n, hours=12)
+
+    def test_estoque_na_data_com_e_sem_saldos(self):
+        esperado = {0: 10, 1: 15, 2: 12, 3: 22}
+        for n, quantidade in esperado.items():
+            self.assertEqual(estoque_em([self.produto.pk], self.dia(n)), {self.produto.pk: quantidade})
+
+        # Snapshots before and after the instants give the same answers
+        registrar_saldos(self.dia(1))
+        registrar_saldos(self.dia(1))
+        self.assertEqual(SaldoEstoque.objects.count(), 2)
+        for n, quantidade in esperado.items():
+            self.assertEqual(estoque_em([self.produto.pk], self.dia(n))[self.produto.pk], quantidade)
+        self.assertEqual(estoque_em([self.outro.pk], self.dia(0)), {self.outro.pk: 3})
+
+    def test_compactacao_mantem_posicoes(self):
+        saldos, arquivadas = compactar_movimentacoes(self.dia(2))
+
+        self.assertEqual((saldos, arquivadas), (2, 2))
+        self.assertEqual(MovimentacaoEstoque.objects.count(), 1)
+        self.assertEqual(estoque_em([self.produto.pk], self.dia(2))[self.produto.pk], 12)
+        self.assertEqual(estoque_em([self.produto.pk], self.dia(3))[self.produto.pk], 22)
+
+    def test_compactacao_nao_sobrescreve_arquivo(self):
+        with tempfile.TemporaryDirectory() as pasta:
+            arquivo = os.path.join(pasta, 'movimentacoes.jsonl.gz')
+            compactar_movimentacoes(self.dia(2), arquivo)
+            with gzip.open(arquivo, 'rt') as entrada:
+                arquivadas = entrada.read()
+
+            with self.assertRaises(FileExistsError):
+                compactar_movimentacoes(self.dia(3), arquivo)
+            with gzip.open(arquivo, 'rt') as entrada:
+                self.assertEqual(entrada.read(), arquivadas)
+            self.assertEqual(MovimentacaoEstoque.objects.count(), 1)
+
+    def test_posicao_por_data(self):
+        self.client.force_login(User.objects.create_user('estoquista'))
+        data = timezone.localtime(self.dia(2)).date()
+
+        response = self.client.get('/produtos/estoque/posicao/', {'data': data.isoformat()})
+
+        estoques = {produto.pk: produto.estoque_na_data for produto in response.context['produtos']}
+        self.assertEqual(estoques, {self.produto.pk: 12, self.outro.pk: 3})
+
+
+class AlertaEstoqueTestCase(TestCase):
+    """Test the maintained low-stock flag and the alert feed"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fornecedor = Fornecedor.objects.create(
+            nome='Fornecedor', cnpj='12345678901234', telefone='1140041000', celular='11987654321',
+            cep='13345325', endereco='Rua A', numero=1, bairro='Centro', cidade='Campinas', estado='SP',
+        )
+
+    def setUp(self):
+        self.produto = Produto.objects.create(
+            descricao='Borracha', preco=Decimal('1.50'), qtd_estoque=12, estoque_minimo=10,
+            fornecedor=self.fornecedor
+        )
+
+    def abaixo_minimo(self):
+        return Produto.objects.values_list('abaixo_minimo', flat=True).get(pk=self.produto.pk)
+
+    def test_cruzamentos_geram_alertas(self):
+        self.assertFalse(self.abaixo_minimo())
+
+        self.produto.remover_estoque(1)  # 11: still above
+        self.assertFalse(AlertaEstoque.objects.exists())
+
+        Produto.remover_estoque_em_lote([(self.produto.pk, 11, 'Venda')])
+        self.assertTrue(self.abaixo_minimo())
+        self.produto.adicionar_estoque(5)  # 5: still below, no new alert
+        self.produto.ajustar_estoque(30)
+        self.assertFalse(self.abaixo_minimo())
+
+        tipos = list(AlertaEstoque.objects.order_by('id').values_list('tipo', 'quantidade'))
+        self.assertEqual(tipos, [('ESGOTADO', 0), ('NORMALIZADO', 30)])
+
+    def test_estoque_distribuido_e_minimo_alterado(self):
+        self.produto.distribuir_estoque(4)
+        Produto.remover_estoque_em_lote([(self.produto.pk, 3, 'Venda')])
+        self.assertTrue(self.abaixo_minimo())
+
+        self.produto.estoque_minimo = 5
+        self.produto.salvar_versionado(self.produto.versao, ['estoque_minimo'])
+        self.assertFalse(self.abaixo_minimo())
+        self.assertEqual(AlertaEstoque.objects.count(), 2)
+
+    def test_listas_usam_o_indicador(self):
+        Produto.objects.create(
+            descricao='Cola', preco=Decimal('3.00'), qtd_estoque=2, estoque_minimo=5, fornecedor=self.fornecedor
+        )
+        self.client.force_login(User.objects.create_user('estoquista'))
+
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get('/produtos/estoque/', {'estoque_baixo': 'on'})
+
+        self.assertEqual([p.descricao for p in response.context['produtos']], ['Cola'])
+        self.assertEqual(response.context['produtos_estoque_baixo'], 1)
+        # The annotated total is only shown: never sorted on or summed per page view
+        ordenacoes = [q['sql'].split('ORDER BY')[-1] for q in consultas.captured_queries if 'ORDER BY' in q['sql']]
+        self.assertTrue(ordenacoes)
+        self.assertFalse([ordem for ordem in ordenacoes if 'CASE' in ordem or 'estoque_total' in ordem])
+        with self.assertNumQueries(2):
+            response = self.client.get('/produtos/estoque/')
+        self.assertEqual([p.descricao for p in response.context['produtos']], ['Cola', 'Borracha'])
+        self.assertEqual(self.client.get('/produtos/estoque/alertas/').status_code, 200)
+
+
+class PrevisaoDemandaTestCase(TestCase):
+    """Test demand forecasting and reorder points"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fornecedor = Fornecedor.objects.create(
+            nome='Fornecedor', cnpj='12345678901234', telefone='1140041000', celular='11987654321',
+            cep='13345325', endereco='Rua A', numero=1, bairro='Centro', cidade='Campinas', estado='SP',
+        )
+        cls.parado = Produto.objects.create(
+            descricao='Sem giro', preco=Decimal('1.00'), qtd_estoque=0, estoque_minimo=3, fornecedor=cls.fornecedor
+        )
+        cls.produto = Produto.objects.create(
+            descricao='Arroz', preco=Decimal('5.00'), qtd_estoque=20, estoque_minimo=10, fornecedor=cls.fornecedor
+        )
+        # 4 units a day over the last 60 days
+        hoje = timezone.localtime().replace(hour=12)
+        for dias in range(1, 61):
+            mov = MovimentacaoEstoque.objects.create(
+                produto=cls.produto, tipo='SAIDA', quantidade=4, quantidade_anterior=0, quantidade_atual=0
+            )
+            MovimentacaoEstoque.objects.filter(pk=mov.pk).update(data_movimentacao=hoje - timedelta(days=dias))
+
+    def parametros(self, **kwargs):
+        return ParametrosPrevisao(dias_historico=90, fonte='saidas', nivel_servico=0.95, **kwargs)
+
+    def test_suavizacao_exponencial_vetorizada(self):
+        demanda = np.random.default_rng(1).poisson(3, size=(50, 40)).astype(float)
+        previsao, _ = prever(demanda, ParametrosPrevisao(dias_historico=40, alfa=0.3))
+
+        nivel = demanda[:, 0].copy()
+        for dia in range(1, 40):
+            nivel = 0.3 * demanda[:, dia] + 0.7 * nivel
+        np.testing.assert_allclose(previsao, nivel)
+
+    def test_sugestao_agrupada_por_fornecedor(self):
+        grupos = sugestao_compra(self.parametros(metodo='media', janela=28))
+
+        self.assertEqual(len(grupos), 1)
+        item, = grupos[0]['itens']
+        # Constant demand: no safety stock, reorder point 4 * 7, up to 4 * (7 + 14)
+        self.assertEqual((item['produto_id'], item['ponto_pedido'], item['quantidade']), (self.produto.pk, 28, 64))
+
+    def test_atualiza_estoque_minimo_apenas_com_historico(self):
+        self.assertEqual(atualizar_estoque_minimo(self.parametros(prazo_entrega=3)), 1)
+
+        minimos = dict(Produto.objects.values_list('pk', 'estoque_minimo'))
+        self.assertEqual(minimos, {self.produto.pk: 12, self.parado.pk: 3})
+        self.assertEqual(Produto.objects.get(pk=self.produto.pk).abaixo_minimo, False)
@@ -13,5 +13,17 @@ urlpatterns = [
     # Estoque
     path('estoque/', views.EstoqueListView.as_view(), name='estoque'),
     path('estoque/ajuste/', views.AjusteEstoqueView.as_view(), name='ajuste_estoque'),
+    path('estoque/recebimento/', views.RecebimentoMercadoriaView.as_view(), name='recebimento'),
     path('estoque/movimentacoes/', views.MovimentacaoEstoqueListView.as_view(), name='movimentacoes'),
+    path('estoque/posicao/', views.PosicaoEstoqueView.as_view(), name='posicao_estoque'),
+    path('estoque/alertas/', views.AlertaEstoqueListView.as_view(), name='alertas'),
+    path('estoque/sugestao-compra/', views.SugestaoCompraView.as_view(), name='sugestao_compra'),
+
+    # Contagem de estoque (inventário)
+    path('estoque/contagens/', views.ContagemEstoqueListView.as_view(), name='contagens'),
+    path('estoque/contagens/nova/', views.ContagemEstoqueCreateView.as_view(), name='contagem_create'),
+    path('estoque/contagens/<int:pk>/', views.ContagemEstoqueDetailView.as_view(), name='contagem_detalhe'),
+    path('estoque/contagens/<int:pk>/itens/', views.ContagemItensView.as_view(), name='contagem_itens'),
+    path('estoque/contagens/<int:pk>/fechar/', views.ContagemFecharView.as_view(), name='contagem_fechar'),
+    path('estoque/contagens/<int:pk>/cancelar/', views.ContagemCancelarView.as_view(), name='contagem_cancelar'),
 ]
\ No newline at end of file
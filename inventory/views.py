@@ -1,16 +1,29 @@
+import json
+import time
+
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
-from django.views.generic import ListView, CreateView, UpdateView, DeleteView, View
-from django.urls import reverse_lazy
-from django.db.models import Q, Sum, F, Count
+from django.views.generic import ListView, CreateView, UpdateView, DeleteView, DetailView, View
+from django.urls import reverse, reverse_lazy
+from django.db.models import Sum, F, Count
 from django.shortcuts import render, redirect, get_object_or_404
+from django.utils import timezone
+from django.http import JsonResponse
 from django.db import transaction
 
-from .models import Produto, MovimentacaoEstoque
+from core.busca import filtrar_busca
+from core.cache import em_cache
+from core.exportacao import ExportacaoMixin
+from core.paginacao import KeysetPaginationMixin
+from .models import CACHE_PRODUTOS, AlertaEstoque, ConflitoVersao, ContagemEstoque, Produto, MovimentacaoEstoque
 from .forms import (
     ProdutoForm, ProdutoSearchForm, EstoqueSearchForm,
-    MovimentacaoEstoqueForm, AjusteEstoqueForm
+    MovimentacaoEstoqueForm, AjusteEstoqueForm, RecebimentoForm,
+    ContagemEstoqueForm, ItensContagemForm, PosicaoEstoqueForm, SugestaoCompraForm
 )
+from .recebimento import NotaInvalida, ler_nota, receber_mercadorias
+from .previsao import atualizar_estoque_minimo, sugestao_compra
+from .saldos import fim_do_dia
 
 
 class ProdutoListView(LoginRequiredMixin, ListView):
@@ -19,24 +32,22 @@ class ProdutoListView(LoginRequiredMixin, ListView):
     template_name = 'inventory/produto_list.html'
     context_object_name = 'produtos'
     paginate_by = 20
+    cache_tempo_contagens = 60
     
     def get_queryset(self):
         # Otimização: select_related para evitar N+1 queries
-        queryset = Produto.objects.select_related('fornecedor').annotate(
-            valor_estoque=F('preco') * F('qtd_estoque')
+        queryset = Produto.objects.select_related('fornecedor').com_estoque_total().annotate(
+            valor_estoque=F('preco') * F('estoque_total')
         )
         
         search = self.request.GET.get('search', '').strip()
         apenas_estoque_baixo = self.request.GET.get('apenas_estoque_baixo')
         
         if search:
-            queryset = queryset.filter(
-                Q(descricao__icontains=search) | 
-                Q(fornecedor__nome__icontains=search)
-            )
+            queryset = filtrar_busca(queryset, search)
         
         if apenas_estoque_baixo:
-            queryset = queryset.filter(qtd_estoque__lte=F('estoque_minimo'))
+            queryset = queryset.filter(abaixo_minimo=True)
         
         return queryset.order_by('descricao')
     
@@ -44,15 +55,21 @@ class ProdutoListView(LoginRequiredMixin, ListView):
         context = super().get_context_data(**kwargs)
         context['search_form'] = ProdutoSearchForm(self.request.GET)
         
-        # Estatísticas
-        produtos = Produto.objects.all()
-        context['total_produtos'] = produtos.count()
-        context['produtos_estoque_baixo'] = produtos.filter(
-            qtd_estoque__lte=F('estoque_minimo')
-        ).count()
-        context['produtos_sem_estoque'] = produtos.filter(qtd_estoque=0).count()
+        # Estatísticas em cache: invalidadas quando um produto muda ou cruza o
+        # estoque mínimo; cache_tempo_contagens limita o atraso das demais
+        # mudanças de estoque
+        context.update(em_cache(CACHE_PRODUTOS, ('contagens',), self.contagens, self.cache_tempo_contagens))
         
         return context
+    
+    def contagens(self):
+        # Estoque baixo e sem estoque usam o índice de abaixo_minimo
+        estoque_baixo = Produto.objects.filter(abaixo_minimo=True)
+        return {
+            'total_produtos': Produto.objects.count(),
+            'produtos_estoque_baixo': estoque_baixo.count(),
+            'produtos_sem_estoque': estoque_baixo.com_estoque_total().filter(estoque_total=0).count(),
+        }
 
 
 class ProdutoCreateView(LoginRequiredMixin, CreateView):
@@ -79,8 +96,27 @@ class ProdutoUpdateView(LoginRequiredMixin, UpdateView):
     success_url = reverse_lazy('inventory:list')
     
     def form_valid(self, form):
+        produto = form.save(commit=False)
+        estoque_lido = form.cleaned_data['estoque_lido']
+
+        # Stock is only written when the user changed it, so concurrent
+        # sales do not turn every edit into a conflict
+        campos = [campo for campo in form._meta.fields if campo != 'qtd_estoque']
+        if not produto.estoque_distribuido and produto.qtd_estoque != estoque_lido:
+            campos.append('qtd_estoque')
+
+        try:
+            produto.salvar_versionado(
+                form.cleaned_data['versao'], campos, estoque_lido, usuario=self.request.user
+            )
+        except ConflitoVersao as e:
+            messages.error(self.request, str(e))
+            self.object = Produto.objects.get(pk=produto.pk)
+            form = self.get_form_class()(instance=self.object)
+            return self.render_to_response(self.get_context_data(form=form), status=409)
+
         messages.success(self.request, 'Produto atualizado com sucesso!')
-        return super().form_valid(form)
+        return redirect(self.get_success_url())
     
     def form_invalid(self, form):
         messages.error(self.request, 'Erro ao atualizar produto. Verifique os dados.')
@@ -108,16 +144,33 @@ class ProdutoDeleteView(LoginRequiredMixin, DeleteView):
         return super().delete(request, *args, **kwargs)
 
 
-class EstoqueListView(LoginRequiredMixin, ListView):
+class EstoqueListView(LoginRequiredMixin, ExportacaoMixin, ListView):
     """Stock view - equivalent to FrmEstoque.java"""
     model = Produto
     template_name = 'inventory/estoque_list.html'
     context_object_name = 'produtos'
     paginate_by = 50
+    exportar_nome = 'estoque'
+    exportar_colunas = [
+        ('id', 'ID'),
+        ('descricao', 'Descrição'),
+        ('fornecedor__nome', 'Fornecedor'),
+        ('preco', 'Preço'),
+        ('estoque_total', 'Estoque'),
+        ('estoque_minimo', 'Estoque Mínimo'),
+        ('valor_estoque', 'Valor em Estoque'),
+    ]
+    # Lowest stock first, on the stored column: estoque_total
+    # (a CASE over a slot subquery) would be computed for every product on
+    # each page. The list walks the qtd_estoque index and the low-stock
+    # filters the (abaixo_minimo, qtd_estoque) one. Products with distributed
+    # stock keep qtd_estoque at 0 and come first.
+    exportar_ordem = ('qtd_estoque', 'id')
+    cache_tempo_contagens = 60
     
     def get_queryset(self):
-        queryset = Produto.objects.select_related('fornecedor').annotate(
-            valor_estoque=F('preco') * F('qtd_estoque')
+        queryset = Produto.objects.select_related('fornecedor').com_estoque_total().annotate(
+            valor_estoque=F('preco') * F('estoque_total')
         )
         
         search = self.request.GET.get('search', '').strip()
@@ -125,42 +178,135 @@ class EstoqueListView(LoginRequiredMixin, ListView):
         sem_estoque = self.request.GET.get('sem_estoque')
         
         if search:
-            queryset = queryset.filter(
-                Q(descricao__icontains=search) |
-                Q(fornecedor__nome__icontains=search)
-            )
+            queryset = filtrar_busca(queryset, search)
         
         if estoque_baixo:
-            queryset = queryset.filter(qtd_estoque__lte=F('estoque_minimo'))
+            queryset = queryset.filter(abaixo_minimo=True)
         
         if sem_estoque:
-            queryset = queryset.filter(qtd_estoque=0)
+            # Out of stock implies below the minimum, so the flag narrows the scan
+            queryset = queryset.filter(abaixo_minimo=True, estoque_total=0)
         
-        return queryset.order_by('qtd_estoque', 'descricao')
+        return queryset.order_by(*self.get_exportar_ordem())
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['search_form'] = EstoqueSearchForm(self.request.GET)
         
-        # Estatísticas detalhadas
-        produtos = Produto.objects.aggregate(
-            total_produtos=Count('id'),
-            produtos_estoque_baixo=Count('id', filter=Q(qtd_estoque__lte=F('estoque_minimo'))),
-            produtos_sem_estoque=Count('id', filter=Q(qtd_estoque=0)),
-            valor_total_estoque=Sum(F('preco') * F('qtd_estoque'))
-        )
-        
-        context.update(produtos)
+        # Estatísticas em cache, como em ProdutoListView: o valor total do
+        # estoque soma todos os produtos
+        context.update(em_cache(CACHE_PRODUTOS, ('estoque',), self.estatisticas, self.cache_tempo_contagens))
         
         return context
+    
+    def estatisticas(self):
+        # Estoque baixo e sem estoque usam o índice de abaixo_minimo
+        estoque_baixo = Produto.objects.filter(abaixo_minimo=True)
+        return {
+            'total_produtos': Produto.objects.count(),
+            'produtos_estoque_baixo': estoque_baixo.count(),
+            'produtos_sem_estoque': estoque_baixo.com_estoque_total().filter(estoque_total=0).count(),
+            'valor_total_estoque': Produto.objects.com_estoque_total().aggregate(
+                total=Sum(F('preco') * F('estoque_total'))
+            )['total'],
+        }
+
+
+class PosicaoEstoqueView(LoginRequiredMixin, ExportacaoMixin, ListView):
+    """
+    Stock of every product at the end of a past day, computed from the
+    nearest stock snapshot plus the movements after it
+    """
+    model = Produto
+    template_name = 'inventory/posicao_estoque.html'
+    context_object_name = 'produtos'
+    paginate_by = 50
+    exportar_nome = 'posicao_estoque'
+    exportar_ordem = ('descricao', 'id')
+    exportar_colunas = [
+        ('id', 'ID'),
+        ('descricao', 'Descrição'),
+        ('fornecedor__nome', 'Fornecedor'),
+        ('preco', 'Preço Atual'),
+        ('estoque_na_data', 'Estoque na Data'),
+    ]
+
+    def get_data(self):
+        form = PosicaoEstoqueForm(self.request.GET)
+        if form.is_valid() and form.cleaned_data['data']:
+            return form.cleaned_data['data']
+        return timezone.localdate()
+
+    def get_queryset(self):
+        queryset = Produto.objects.select_related('fornecedor').com_estoque_em(fim_do_dia(self.get_data()))
+
+        search = self.request.GET.get('search', '').strip()
+        if search:
+            queryset = filtrar_busca(queryset, search)
+
+        return queryset.order_by('descricao', 'id')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['search_form'] = PosicaoEstoqueForm(self.request.GET or None)
+        context['data'] = self.get_data()
+        return context
+
+
+class AlertaEstoqueListView(LoginRequiredMixin, ExportacaoMixin, KeysetPaginationMixin, ListView):
+    """Feed of products crossing their minimum stock"""
+    model = AlertaEstoque
+    template_name = 'inventory/alerta_list.html'
+    context_object_name = 'alertas'
+    paginate_by = 50
+    keyset_campos = ('-data', '-id')
+    exportar_nome = 'alertas_estoque'
+    exportar_colunas = [
+        ('id', 'ID'),
+        ('data', 'Data'),
+        ('produto_id', 'Produto ID'),
+        ('produto__descricao', 'Produto'),
+        ('tipo', 'Tipo'),
+        ('quantidade', 'Estoque'),
+        ('estoque_minimo', 'Estoque Mínimo'),
+    ]
+
+    def get_queryset(self):
+        queryset = AlertaEstoque.objects.select_related('produto')
+
+        tipo = self.request.GET.get('tipo')
+        if tipo:
+            queryset = queryset.filter(tipo=tipo)
 
+        return queryset
 
-class MovimentacaoEstoqueListView(LoginRequiredMixin, ListView):
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['tipos'] = AlertaEstoque.TIPO_CHOICES
+        context['produtos_abaixo_minimo'] = Produto.objects.filter(abaixo_minimo=True).count()
+        return context
+
+
+class MovimentacaoEstoqueListView(LoginRequiredMixin, ExportacaoMixin, KeysetPaginationMixin, ListView):
     """View stock movements (NEW)"""
     model = MovimentacaoEstoque
     template_name = 'inventory/movimentacao_list.html'
     context_object_name = 'movimentacoes'
     paginate_by = 50
+    keyset_campos = ('-data_movimentacao', '-id')
+    exportar_nome = 'movimentacoes'
+    exportar_colunas = [
+        ('id', 'ID'),
+        ('data_movimentacao', 'Data'),
+        ('produto_id', 'Produto ID'),
+        ('produto__descricao', 'Produto'),
+        ('tipo', 'Tipo'),
+        ('quantidade', 'Quantidade'),
+        ('quantidade_anterior', 'Quantidade Anterior'),
+        ('quantidade_atual', 'Quantidade Atual'),
+        ('usuario__username', 'Usuário'),
+        ('observacao', 'Observação'),
+    ]
     
     def get_queryset(self):
         queryset = MovimentacaoEstoque.objects.select_related(
@@ -202,23 +348,16 @@ class AjusteEstoqueView(LoginRequiredMixin, View):
             quantidade_nova = form.cleaned_data['quantidade_nova']
             observacao = form.cleaned_data['observacao']
             
-            quantidade_anterior = produto.qtd_estoque
-            diferenca = quantidade_nova - quantidade_anterior
-            
-            # Atualizar estoque
-            produto.qtd_estoque = quantidade_nova
-            produto.save()
-            
-            # Registrar movimentação
-            MovimentacaoEstoque.objects.create(
-                produto=produto,
-                tipo='AJUSTE',
-                quantidade=abs(diferenca),
-                quantidade_anterior=quantidade_anterior,
-                quantidade_atual=quantidade_nova,
-                observacao=f"Ajuste manual: {observacao}",
-                usuario=request.user
-            )
+            # Atualizar estoque e registrar movimentação
+            try:
+                quantidade_anterior = produto.ajustar_estoque(
+                    quantidade_nova,
+                    observacao=f"Ajuste manual: {observacao}",
+                    usuario=request.user
+                )
+            except ConflitoVersao as e:
+                messages.error(request, str(e))
+                return render(request, self.template_name, {'form': form}, status=409)
             
             messages.success(
                 request,
@@ -226,4 +365,219 @@ class AjusteEstoqueView(LoginRequiredMixin, View):
             )
             return redirect('inventory:estoque')
         
-        return render(request, self.template_name, {'form': form})
\ No newline at end of file
+        return render(request, self.template_name, {'form': form})
+
+
+class SugestaoCompraView(LoginRequiredMixin, View):
+    """
+    Demand forecast for every product and the resulting purchase list,
+    grouped by supplier. POST stores the reorder points as estoque_minimo.
+    """
+    template_name = 'inventory/sugestao_compra.html'
+
+    def get(self, request):
+        if 'calcular' not in request.GET:
+            return render(request, self.template_name, {'form': SugestaoCompraForm()})
+
+        form = SugestaoCompraForm(request.GET)
+        context = {'form': form}
+        if form.is_valid():
+            inicio = time.monotonic()
+            grupos = sugestao_compra(form.parametros())
+            context.update({
+                'grupos': grupos,
+                'total_itens': sum(len(grupo['itens']) for grupo in grupos),
+                'total_unidades': sum(grupo['unidades'] for grupo in grupos),
+                'segundos': time.monotonic() - inicio,
+            })
+        return render(request, self.template_name, context)
+
+    def post(self, request):
+        form = SugestaoCompraForm(request.POST)
+        if not form.is_valid():
+            return render(request, self.template_name, {'form': form})
+
+        alterados = atualizar_estoque_minimo(form.parametros())
+        messages.success(request, f'Estoque mínimo atualizado em {alterados} produto(s).')
+        parametros = request.POST.copy()
+        parametros.pop('csrfmiddlewaretoken', None)
+        parametros['calcular'] = '1'
+        return redirect(f"{reverse('inventory:sugestao_compra')}?{parametros.urlencode()}")
+
+
+class RecebimentoMercadoriaView(LoginRequiredMixin, View):
+    """Post a supplier delivery note (CSV or JSON) as stock entries"""
+    template_name = 'inventory/recebimento.html'
+
+    def get(self, request):
+        return render(request, self.template_name, {'form': RecebimentoForm()})
+
+    def post(self, request):
+        form = RecebimentoForm(request.POST, request.FILES)
+        contexto = {'form': form}
+
+        if form.is_valid():
+            arquivo = form.cleaned_data['arquivo']
+            try:
+                documento, itens = ler_nota(arquivo.read(), arquivo.name)
+                resultado = receber_mercadorias(
+                    form.cleaned_data['fornecedor'],
+                    itens,
+                    form.cleaned_data['documento'] or documento,
+                    usuario=request.user,
+                )
+            except NotaInvalida as e:
+                contexto['erros'] = e.erros
+                messages.error(request, 'A nota não foi recebida. Corrija os erros e envie novamente.')
+            except ValueError as e:
+                messages.error(request, f'Arquivo inválido: {e}')
+            else:
+                messages.success(
+                    request,
+                    f"Documento {resultado['documento']} recebido: {resultado['linhas']} linhas, "
+                    f"{resultado['unidades']} unidades em {resultado['segundos']}s "
+                    f"({resultado['linhas_por_segundo']} linhas/s)"
+                )
+                return redirect(f"{reverse('inventory:movimentacoes')}?tipo=ENTRADA")
+
+        return render(request, self.template_name, contexto)
+
+
+class ContagemEstoqueListView(LoginRequiredMixin, ListView):
+    """Inventory count sessions"""
+    model = ContagemEstoque
+    template_name = 'inventory/contagem_list.html'
+    context_object_name = 'contagens'
+    paginate_by = 20
+
+    def get_queryset(self):
+        return ContagemEstoque.objects.select_related('usuario').annotate(
+            total_itens=Count('itens')
+        ).order_by('-criada_em', '-id')
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['form'] = ContagemEstoqueForm()
+        return context
+
+
+class ContagemEstoqueCreateView(LoginRequiredMixin, CreateView):
+    """Open an inventory count session"""
+    model = ContagemEstoque
+    form_class = ContagemEstoqueForm
+    template_name = 'inventory/contagem_list.html'
+
+    def form_valid(self, form):
+        form.instance.usuario = self.request.user
+        self.object = form.save()
+        messages.success(self.request, f'{self.object} aberta.')
+        return redirect('inventory:contagem_detalhe', pk=self.object.pk)
+
+    def form_invalid(self, form):
+        messages.error(self.request, 'Informe a descrição da contagem.')
+        return redirect('inventory:contagens')
+
+
+class ContagemEstoqueDetailView(LoginRequiredMixin, DetailView):
+    """Progress of a count session and the differences found so far"""
+    model = ContagemEstoque
+    template_name = 'inventory/contagem_detail.html'
+    context_object_name = 'contagem'
+    limite_divergencias = 100
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['form'] = ItensContagemForm()
+        context['total_itens'] = self.object.itens.count()
+
+        if self.object.aberta:
+            divergencias = self.object.divergencias()
+            context['total_divergencias'] = divergencias.count()
+            context['divergencias'] = divergencias.select_related('produto').annotate(
+                diferenca=F('quantidade_contada') - F('estoque_total')
+            ).order_by('produto__descricao')[:self.limite_divergencias]
+        return context
+
+
+class ContagemItensView(LoginRequiredMixin, View):
+    """
+    Receive a batch of counted quantities, either from the form or as JSON
+    from handheld scanners: {"somar": true, "itens": [{"produto": 3, "quantidade": 1}, ...]}
+    """
+    limite_itens = 50000
+
+    def post(self, request, pk):
+        contagem = get_object_or_404(ContagemEstoque, pk=pk)
+
+        if request.content_type == 'application/json':
+            return self._post_json(request, contagem)
+
+        form = ItensContagemForm(request.POST)
+        if not form.is_valid():
+            for erro in form.errors.get('itens', []):
+                messages.error(request, erro)
+            return redirect('inventory:contagem_detalhe', pk=pk)
+
+        try:
+            registrados, desconhecidos = contagem.registrar(
+                form.cleaned_data['itens'], somar=form.cleaned_data['somar']
+            )
+        except ValueError as e:
+            messages.error(request, str(e))
+        else:
+            messages.success(request, f'{registrados} produto(s) registrado(s) na contagem.')
+            if desconhecidos:
+                messages.warning(
+                    request, f"Produtos não encontrados: {', '.join(map(str, desconhecidos[:20]))}"
+                )
+        return redirect('inventory:contagem_detalhe', pk=pk)
+
+    def _post_json(self, request, contagem):
+        try:
+            dados = json.loads(request.body)
+            itens = [(int(item['produto']), int(item['quantidade'])) for item in dados['itens']]
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse({'erro': 'Conteúdo JSON inválido'}, status=400)
+
+        if len(itens) > self.limite_itens:
+            return JsonResponse({'erro': f'O lote excede o limite de {self.limite_itens} itens'}, status=413)
+
+        try:
+            registrados, desconhecidos = contagem.registrar(itens, somar=bool(dados.get('somar')))
+        except ValueError as e:
+            return JsonResponse({'erro': str(e)}, status=409)
+
+        return JsonResponse({'registrados': registrados, 'desconhecidos': desconhecidos})
+
+
+class ContagemFecharView(LoginRequiredMixin, View):
+    """Close a count session, adjusting the stock of every divergent product"""
+
+    def post(self, request, pk):
+        contagem = get_object_or_404(ContagemEstoque, pk=pk)
+        inicio = time.monotonic()
+
+        try:
+            ajustados = contagem.fechar(usuario=request.user)
+        except ValueError as e:
+            messages.error(request, str(e))
+        else:
+            messages.success(
+                request,
+                f'{contagem} fechada: {ajustados} produto(s) ajustado(s) em {time.monotonic() - inicio:.1f}s.'
+            )
+        return redirect('inventory:contagem_detalhe', pk=pk)
+
+
+class ContagemCancelarView(LoginRequiredMixin, View):
+    """Cancel a count session without touching the stock"""
+
+    def post(self, request, pk):
+        contagem = get_object_or_404(ContagemEstoque, pk=pk)
+        try:
+            contagem.cancelar()
+        except ValueError as e:
+            messages.error(request, str(e))
+        else:
+            messages.success(request, f'{contagem} cancelada.')
+        return redirect('inventory:contagens')
@@ -1,26 +1,77 @@
-from django.contrib import admin
-from .models import Venda, ItemVenda
+from django.contrib import admin, messages
+from .models import Venda, ItemVenda, ResumoVendaDiario, TerminalVenda
+from .services import cancelar_vendas
 
 
-class ItemVendaInline(admin.TabularInline):
+# Sales change stock and the ResumoVenda* rollups, which are kept current
+# only by sales.services: the admin never creates, edits or deletes them
+# directly, and cancelling goes through cancelar_vendas
+
+
+class SomenteLeituraMixin:
+    """ModelAdmin/inline mixin without add, change and delete"""
+
+    def has_add_permission(self, request, obj=None):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+class ItemVendaInline(SomenteLeituraMixin, admin.TabularInline):
     model = ItemVenda
-    extra = 1
     fields = ['produto', 'qtd', 'subtotal']
-    readonly_fields = ['subtotal']
 
 
 @admin.register(Venda)
 class VendaAdmin(admin.ModelAdmin):
     list_display = ['id', 'cliente', 'data_venda', 'total_venda']
     list_filter = ['data_venda']
-    search_fields = ['cliente__nome']
+    search_fields = ['cliente__nome', 'chave_idempotencia']
     date_hierarchy = 'data_venda'
     inlines = [ItemVendaInline]
-    readonly_fields = ['total_venda']
+    # Only the notes are editable: the other fields feed the rollups
+    readonly_fields = ['cliente', 'data_venda', 'total_venda', 'chave_idempotencia']
+    actions = ['cancelar_selecionadas']
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+    @admin.action(description='Cancelar vendas selecionadas (restaura o estoque)', permissions=['change'])
+    def cancelar_selecionadas(self, request, queryset):
+        canceladas = cancelar_vendas(queryset.values_list('pk', flat=True), usuario=request.user)
+        self.message_user(
+            request, f'{len(canceladas)} venda(s) cancelada(s) e estoque restaurado.', messages.SUCCESS
+        )
 
 
 @admin.register(ItemVenda)
-class ItemVendaAdmin(admin.ModelAdmin):
+class ItemVendaAdmin(SomenteLeituraMixin, admin.ModelAdmin):
     list_display = ['venda', 'produto', 'qtd', 'subtotal']
     list_filter = ['venda__data_venda']
     search_fields = ['produto__descricao', 'venda__cliente__nome']
+
+
+@admin.register(ResumoVendaDiario)
+class ResumoVendaDiarioAdmin(SomenteLeituraMixin, admin.ModelAdmin):
+    list_display = ['data', 'qtd_vendas', 'receita', 'unidades']
+    date_hierarchy = 'data'
+
+
+@admin.register(TerminalVenda)
+class TerminalVendaAdmin(admin.ModelAdmin):
+    list_display = ['nome', 'usuario', 'ativo', 'criado_em', 'ultimo_uso']
+    list_filter = ['ativo']
+    search_fields = ['nome', 'usuario__username']
+    # Terminals are created by criar_terminal_venda, which shows the token;
+    # here they can only be renamed, reassigned or deactivated
+    readonly_fields = ['criado_em', 'ultimo_uso']
+
+    def has_add_permission(self, request):
+        return False
@@ -1,8 +1,11 @@
 from django import forms
-from django.forms import inlineformset_factory
+from django.forms import BaseInlineFormSet, inlineformset_factory
+from django.urls import reverse_lazy
+from django.utils.functional import cached_property
 from crispy_forms.helper import FormHelper
 from crispy_forms.layout import Layout, Row, Column
 from .models import Venda, ItemVenda
+from core.autocompletar import AutocompletarSelect
 from customers.models import Cliente
 from inventory.models import Produto
 
@@ -14,42 +17,92 @@ class VendaForm(forms.ModelForm):
         model = Venda
         fields = ['cliente', 'data_venda', 'observacoes']
         widgets = {
-            'cliente': forms.Select(attrs={'class': 'form-select'}),
+            'cliente': AutocompletarSelect(reverse_lazy('sales:buscar_clientes')),
             'data_venda': forms.DateInput(attrs={'class': 'form-control', 'type': 'date'}),
             'observacoes': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
         }
 
 
+class ProdutoChoiceField(forms.ModelChoiceField):
+    """
+    ModelChoiceField that resolves the selected product from a dict
+    pre-loaded by the formset, instead of one query per row
+    """
+    produtos_carregados = None
+
+    def to_python(self, value):
+        if self.produtos_carregados is not None and value not in self.empty_values:
+            try:
+                return self.produtos_carregados[int(value)]
+            except (KeyError, TypeError, ValueError):
+                pass
+        return super().to_python(value)
+
+
 class ItemVendaForm(forms.ModelForm):
     """Form for ItemVenda model"""
+    produto = ProdutoChoiceField(
+        label='Produto',
+        queryset=Produto.objects.com_estoque_total(),
+        widget=AutocompletarSelect(reverse_lazy('sales:buscar_produtos'))
+    )
     
     class Meta:
         model = ItemVenda
         fields = ['produto', 'qtd']
         widgets = {
-            'produto': forms.Select(attrs={'class': 'form-select'}),
             'qtd': forms.NumberInput(attrs={'class': 'form-control', 'min': '1'}),
         }
-    
+
+    def _get_validation_exclusions(self):
+        # The product was already resolved by the form field; skip the
+        # model-level existence query that would run once per row
+        exclusions = super()._get_validation_exclusions()
+        exclusions.add('produto')
+        return exclusions
+
     def clean_qtd(self):
         """Validate stock availability"""
         qtd = self.cleaned_data.get('qtd')
         produto = self.cleaned_data.get('produto')
         
         if produto and qtd:
-            if qtd > produto.qtd_estoque:
+            if qtd > produto.estoque_atual:
                 raise forms.ValidationError(
-                    f'Quantidade indisponível. Estoque atual: {produto.qtd_estoque}'
+                    f'Quantidade indisponível. Estoque atual: {produto.estoque_atual}'
                 )
         
         return qtd
 
 
+class BaseItemVendaFormSet(BaseInlineFormSet):
+    """Item formset that loads every selected product with a single query"""
+
+    @cached_property
+    def produtos_selecionados(self):
+        if not self.is_bound:
+            return None
+
+        ids = set()
+        for i in range(self.total_form_count()):
+            valor = self.data.get(f'{self.add_prefix(i)}-produto')
+            if valor and str(valor).isdigit():
+                ids.add(int(valor))
+
+        return Produto.objects.com_estoque_total().in_bulk(ids)
+
+    def _construct_form(self, i, **kwargs):
+        form = super()._construct_form(i, **kwargs)
+        form.fields['produto'].produtos_carregados = self.produtos_selecionados
+        return form
+
+
 # Formset for managing multiple items in a sale
 ItemVendaFormSet = inlineformset_factory(
     Venda,
     ItemVenda,
     form=ItemVendaForm,
+    formset=BaseItemVendaFormSet,
     extra=1,
     can_delete=True,
     min_num=1,
@@ -73,5 +126,15 @@ class VendaSearchForm(forms.Form):
         label='Cliente',
         queryset=Cliente.objects.all(),
         required=False,
+        widget=AutocompletarSelect(reverse_lazy('sales:buscar_clientes'))
+    )
+
+
+class TotalVendaForm(VendaSearchForm):
+    """Filter form for sales totals by period"""
+    agrupamento = forms.ChoiceField(
+        label='Agrupar por',
+        choices=[('dia', 'Dia'), ('semana', 'Semana'), ('mes', 'Mês')],
+        required=False,
         widget=forms.Select(attrs={'class': 'form-select'})
     )
@@ -0,0 +1,299 @@
+"""
+Bulk sales ingestion used by the POS terminal sync endpoint and the
+importar_vendas management command.
+
+Each sale in a batch is a dict like:
+
+    {
+        "chave": "loja01-pdv02-000123",   # client-supplied idempotency key
+        "cliente": 5,
+        "data_venda": "2025-11-03",
+        "observacoes": "",
+        "itens": [{"produto": 3, "qtd": 2}, ...]
+    }
+"""
+import json
+from datetime import date
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+
+from core.busca import agendar_indexacao
+from core.estatisticas import invalidar_estatisticas
+from core.eventos import publicar_atualizacao
+from customers.models import Cliente
+from inventory.models import Produto
+from .models import ItemVenda, Venda
+from .resumo import atualizar_resumo
+
+
+# Number of sales written per transaction
+TAMANHO_LOTE = 100
+
+CRIADA = 'criada'
+DUPLICADA = 'duplicada'
+ERRO = 'erro'
+
+
+class VendaImportada:
+    """A validated sale waiting to be written"""
+
+    def __init__(self, indice, chave, cliente_id, data_venda, observacoes, itens):
+        self.indice = indice
+        self.chave = chave
+        self.cliente_id = cliente_id
+        self.data_venda = data_venda
+        self.observacoes = observacoes
+        self.itens = itens
+        self.precos = {}
+        self.total = Decimal('0')
+
+
+def ler_lote(conteudo):
+    """
+    Parse a batch given as a JSON array, a {"vendas": [...]} object or
+    JSON lines (one sale per line).
+    """
+    conteudo = conteudo.strip()
+    if not conteudo:
+        return []
+
+    try:
+        dados = json.loads(conteudo)
+    except json.JSONDecodeError:
+        dados = [json.loads(linha) for linha in conteudo.splitlines() if linha.strip()]
+
+    if isinstance(dados, dict):
+        dados = dados['vendas'] if 'vendas' in dados else [dados]
+    if not isinstance(dados, list):
+        raise ValueError('Formato de lote inválido')
+    return dados
+
+
+def _ler_venda(indice, dados):
+    """Validate the structure of one sale, raising ValueError when malformed"""
+    if not isinstance(dados, dict):
+        raise ValueError('Venda deve ser um objeto JSON')
+
+    chave = str(dados.get('chave') or '').strip()
+    if not chave or len(chave) > 64:
+        raise ValueError('Chave de idempotência ausente ou maior que 64 caracteres')
+
+    try:
+        cliente_id = int(dados['cliente'])
+        data_venda = date.fromisoformat(str(dados['data_venda']))
+    except (KeyError, TypeError, ValueError):
+        raise ValueError('Cliente ou data da venda inválidos')
+
+    itens = []
+    for item in dados.get('itens') or []:
+        try:
+            produto_id, qtd = int(item['produto']), int(item['qtd'])
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('Item de venda inválido')
+        if qtd <= 0:
+            raise ValueError('Quantidade deve ser maior que zero')
+        itens.append((produto_id, qtd))
+
+    if not itens:
+        raise ValueError('A venda deve possuir ao menos um item')
+
+    return VendaImportada(
+        indice, chave, cliente_id, data_venda,
+        str(dados.get('observacoes') or ''), itens,
+    )
+
+
+def importar_vendas(lote, usuario=None, tamanho_lote=TAMANHO_LOTE):
+    """
+    Validate and write a batch of sales.
+
+    Stock is validated for the whole batch against a single snapshot of
+    Produto, then accepted sales are written in chunked transactions.
+    Sales whose key was already imported are reported as duplicates without
+    touching stock, so retried uploads are cheap and safe.
+
+    Returns one result dict per input sale, in the same order:
+    {'chave': ..., 'status': 'criada' | 'duplicada' | 'erro', 'venda_id': ..., 'erro': ...}
+    """
+    resultados = []
+    vendas = []
+    chaves_no_lote = set()
+
+    for indice, dados in enumerate(lote):
+        chave = dados.get('chave') if isinstance(dados, dict) else None
+        resultados.append({'chave': chave, 'status': None, 'venda_id': None, 'erro': ''})
+        try:
+            venda = _ler_venda(indice, dados)
+        except ValueError as e:
+            _falhar(resultados[indice], str(e))
+            continue
+
+        if venda.chave in chaves_no_lote:
+            _falhar(resultados[indice], 'Chave repetida no lote')
+            continue
+        chaves_no_lote.add(venda.chave)
+        vendas.append(venda)
+
+    # Vendas já importadas (reenvio do terminal)
+    existentes = dict(
+        Venda.objects.filter(chave_idempotencia__in=chaves_no_lote)
+        .values_list('chave_idempotencia', 'id')
+    )
+    for venda in vendas:
+        if venda.chave in existentes:
+            resultados[venda.indice].update(status=DUPLICADA, venda_id=existentes[venda.chave])
+    vendas = [venda for venda in vendas if venda.chave not in existentes]
+
+    vendas = _validar_com_snapshot(vendas, resultados)
+
+    for inicio in range(0, len(vendas), tamanho_lote):
+        _gravar_lote(vendas[inicio:inicio + tamanho_lote], resultados, usuario)
+
+    return resultados
+
+
+def contar_resultados(resultados):
+    """Summarize import results by status"""
+    contagem = {CRIADA: 0, DUPLICADA: 0, ERRO: 0}
+    for resultado in resultados:
+        contagem[resultado['status']] += 1
+    return {'criadas': contagem[CRIADA], 'duplicadas': contagem[DUPLICADA], 'erros': contagem[ERRO]}
+
+
+def _validar_com_snapshot(vendas, resultados):
+    """Check customers and stock for the whole batch with one query per table"""
+    clientes = set(
+        Cliente.objects.filter(pk__in={venda.cliente_id for venda in vendas})
+        .values_list('pk', flat=True)
+    )
+    produtos = {
+        pk: [preco, estoque]
+        for pk, preco, estoque in Produto.objects.com_estoque_total().filter(
+            pk__in={produto_id for venda in vendas for produto_id, _ in venda.itens}
+        ).values_list('pk', 'preco', 'estoque_total')
+    }
+
+    aceitas = []
+    for venda in vendas:
+        if venda.cliente_id not in clientes:
+            _falhar(resultados[venda.indice], f'Cliente {venda.cliente_id} não encontrado')
+            continue
+
+        solicitado = {}
+        for produto_id, qtd in venda.itens:
+            solicitado[produto_id] = solicitado.get(produto_id, 0) + qtd
+
+        erro = None
+        for produto_id, qtd in solicitado.items():
+            if produto_id not in produtos:
+                erro = f'Produto {produto_id} não encontrado'
+            elif produtos[produto_id][1] < qtd:
+                erro = (
+                    f'Estoque insuficiente para o produto {produto_id}. '
+                    f'Disponível: {produtos[produto_id][1]}, Solicitado: {qtd}'
+                )
+            if erro:
+                break
+
+        if erro:
+            _falhar(resultados[venda.indice], erro)
+            continue
+
+        for produto_id, qtd in solicitado.items():
+            produtos[produto_id][1] -= qtd
+        venda.total = sum(produtos[produto_id][0] * qtd for produto_id, qtd in venda.itens)
+        venda.precos = {produto_id: produtos[produto_id][0] for produto_id in solicitado}
+        aceitas.append(venda)
+
+    return aceitas
+
+
+def _gravar_lote(vendas, resultados, usuario):
+    """
+    Write a chunk of sales in one transaction. If the chunk fails (stock
+    changed since the snapshot, or a concurrent upload of the same key),
+    fall back to writing its sales one by one so only the culprits fail.
+    """
+    try:
+        _gravar(vendas, resultados, usuario)
+    except (ValueError, IntegrityError) as e:
+        if len(vendas) == 1:
+            _tratar_falha(vendas[0], resultados, e)
+            return
+        for venda in vendas:
+            try:
+                _gravar([venda], resultados, usuario)
+            except (ValueError, IntegrityError) as erro:
+                _tratar_falha(venda, resultados, erro)
+
+
+@transaction.atomic
+def _gravar(vendas, resultados, usuario):
+    registros = [
+        Venda(
+            cliente_id=venda.cliente_id,
+            data_venda=venda.data_venda,
+            observacoes=venda.observacoes,
+            total_venda=venda.total,
+            chave_idempotencia=venda.chave,
+        )
+        for venda in vendas
+    ]
+    Venda.objects.bulk_create(registros)
+
+    # MySQL does not return primary keys from bulk inserts
+    if any(registro.pk is None for registro in registros):
+        ids = dict(
+            Venda.objects.filter(chave_idempotencia__in=[venda.chave for venda in vendas])
+            .values_list('chave_idempotencia', 'id')
+        )
+        for registro in registros:
+            registro.pk = ids[registro.chave_idempotencia]
+
+    Produto.remover_estoque_em_lote(
+        [
+            (produto_id, qtd, f'Venda #{registro.pk}')
+            for venda, registro in zip(vendas, registros)
+            for produto_id, qtd in venda.itens
+        ],
+        usuario=usuario,
+    )
+    ItemVenda.objects.bulk_create([
+        ItemVenda(
+            venda_id=registro.pk,
+            produto_id=produto_id,
+            qtd=qtd,
+            subtotal=venda.precos[produto_id] * qtd,
+        )
+        for venda, registro in zip(vendas, registros)
+        for produto_id, qtd in venda.itens
+    ])
+
+    atualizar_resumo(
+        (venda.data_venda, venda.cliente_id, venda.total, sum(qtd for _, qtd in venda.itens))
+        for venda in vendas
+    )
+    # bulk_create does not send post_save
+    invalidar_estatisticas()
+    publicar_atualizacao()
+    agendar_indexacao(Venda, [registro.pk for registro in registros])
+
+    for venda, registro in zip(vendas, registros):
+        resultados[venda.indice].update(status=CRIADA, venda_id=registro.pk)
+
+
+def _tratar_falha(venda, resultados, erro):
+    if isinstance(erro, IntegrityError):
+        venda_id = (
+            Venda.objects.filter(chave_idempotencia=venda.chave)
+            .values_list('id', flat=True).first()
+        )
+        if venda_id:
+            resultados[venda.indice].update(status=DUPLICADA, venda_id=venda_id)
+            return
+    _falhar(resultados[venda.indice], str(erro))
+
+
+def _falhar(resultado, mensagem):
+    resultado.update(status=ERRO, venda_id=None, erro=mensagem)
@@ -0,0 +1,55 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from sales.models import Venda
+from sales.services import cancelar_vendas
+
+
+class Command(BaseCommand):
+    help = 'Cancela vendas em lote, restaurando o estoque dos produtos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int, help='IDs das vendas')
+        parser.add_argument('--arquivo', help='Arquivo com um ID de venda por linha')
+        parser.add_argument('--data', help='Cancela todas as vendas desta data (AAAA-MM-DD)')
+        parser.add_argument('--cliente', type=int, help='Restringe --data às vendas deste cliente')
+        parser.add_argument('--usuario', help='Usuário registrado nas movimentações de estoque')
+        parser.add_argument(
+            '--simular', action='store_true',
+            help='Apenas mostra quantas vendas seriam canceladas'
+        )
+
+    def handle(self, *args, **options):
+        ids = set(options['ids'])
+
+        if options['arquivo']:
+            with open(options['arquivo'], encoding='utf-8') as arquivo:
+                ids.update(int(linha) for linha in arquivo if linha.strip())
+
+        if options['data']:
+            vendas = Venda.objects.filter(data_venda=options['data'])
+            if options['cliente']:
+                vendas = vendas.filter(cliente_id=options['cliente'])
+            ids.update(vendas.values_list('pk', flat=True))
+
+        if not ids:
+            raise CommandError('Informe os IDs, --arquivo ou --data')
+
+        usuario = None
+        if options['usuario']:
+            try:
+                usuario = User.objects.get(username=options['usuario'])
+            except User.DoesNotExist:
+                raise CommandError(f"Usuário {options['usuario']} não encontrado")
+
+        if options['simular']:
+            encontradas = Venda.objects.filter(pk__in=ids).count()
+            self.stdout.write(f'{encontradas} venda(s) seriam canceladas')
+            return
+
+        canceladas = cancelar_vendas(ids, usuario=usuario)
+
+        nao_encontradas = len(ids) - len(canceladas)
+        if nao_encontradas:
+            self.stdout.write(self.style.WARNING(f'{nao_encontradas} venda(s) não encontrada(s)'))
+        self.stdout.write(self.style.SUCCESS(f'{len(canceladas)} venda(s) cancelada(s)'))
@@ -0,0 +1,27 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from sales.models import TerminalVenda
+from sales.terminais import criar_terminal
+
+
+class Command(BaseCommand):
+    help = 'Cadastra um terminal de loja e mostra o token que ele usa para enviar vendas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('nome', help='Nome do terminal (ex.: loja01-pdv02)')
+        parser.add_argument('--usuario', required=True, help='Usuário em nome do qual o terminal registra as vendas')
+
+    def handle(self, *args, **options):
+        try:
+            usuario = User.objects.get(username=options['usuario'])
+        except User.DoesNotExist:
+            raise CommandError(f"Usuário {options['usuario']} não encontrado")
+        if not usuario.has_perm('sales.add_venda'):
+            raise CommandError(f'O usuário {usuario.username} não tem permissão para registrar vendas')
+        if TerminalVenda.objects.filter(nome=options['nome']).exists():
+            raise CommandError(f"Já existe um terminal chamado {options['nome']}")
+
+        terminal, chave = criar_terminal(options['nome'], usuario)
+        self.stdout.write(self.style.SUCCESS(f'Terminal {terminal.nome} cadastrado. Token (mostrado só agora):'))
+        self.stdout.write(chave)
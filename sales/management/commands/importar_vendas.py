@@ -0,0 +1,89 @@
+import json
+import time
+from itertools import islice
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from sales.importacao import TAMANHO_LOTE, contar_resultados, importar_vendas, ler_lote
+
+
+class Command(BaseCommand):
+    help = 'Importa vendas em lote (JSON ou JSON lines) enviadas pelos terminais de loja'
+
+    def add_arguments(self, parser):
+        parser.add_argument('arquivo', help='Arquivo .json ou .jsonl com as vendas')
+        parser.add_argument(
+            '--lote', type=int, default=TAMANHO_LOTE,
+            help='Quantidade de vendas gravadas por transação'
+        )
+        parser.add_argument(
+            '--leitura', type=int, default=5000,
+            help='Quantidade de vendas validadas por snapshot de estoque (arquivos JSON lines)'
+        )
+        parser.add_argument('--usuario', help='Usuário registrado nas movimentações de estoque')
+        parser.add_argument('--saida', help='Grava o resultado de cada venda neste arquivo JSON lines')
+
+    def handle(self, *args, **options):
+        usuario = None
+        if options['usuario']:
+            try:
+                usuario = User.objects.get(username=options['usuario'])
+            except User.DoesNotExist:
+                raise CommandError(f"Usuário {options['usuario']} não encontrado")
+
+        saida = open(options['saida'], 'w', encoding='utf-8') if options['saida'] else None
+        totais = {'criadas': 0, 'duplicadas': 0, 'erros': 0}
+        inicio = time.monotonic()
+
+        try:
+            for lote in self._ler_lotes(options['arquivo'], options['leitura']):
+                resultados = importar_vendas(lote, usuario=usuario, tamanho_lote=options['lote'])
+                for chave, valor in contar_resultados(resultados).items():
+                    totais[chave] += valor
+                if saida:
+                    for resultado in resultados:
+                        saida.write(json.dumps(resultado, ensure_ascii=False) + '\n')
+                self.stdout.write(
+                    f"{sum(totais.values())} vendas processadas "
+                    f"({totais['criadas']} criadas, {totais['duplicadas']} duplicadas, {totais['erros']} com erro)"
+                )
+        finally:
+            if saida:
+                saida.close()
+
+        duracao = time.monotonic() - inicio
+        self.stdout.write(self.style.SUCCESS(
+            f"Importação concluída em {duracao:.1f}s: {totais['criadas']} criadas, "
+            f"{totais['duplicadas']} duplicadas, {totais['erros']} com erro"
+        ))
+
+    def _ler_lotes(self, caminho, tamanho):
+        """Yield batches of sales, streaming JSON lines files"""
+        try:
+            arquivo = open(caminho, encoding='utf-8')
+        except OSError as e:
+            raise CommandError(f'Não foi possível abrir {caminho}: {e}')
+
+        with arquivo:
+            if caminho.endswith('.jsonl') or caminho.endswith('.ndjson'):
+                linhas = (linha for linha in arquivo if linha.strip())
+                while True:
+                    bloco = list(islice(linhas, tamanho))
+                    if not bloco:
+                        break
+                    yield [self._carregar(linha) for linha in bloco]
+            else:
+                try:
+                    lote = ler_lote(arquivo.read())
+                except (ValueError, KeyError) as e:
+                    raise CommandError(f'Arquivo JSON inválido: {e}')
+                for i in range(0, len(lote), tamanho):
+                    yield lote[i:i + tamanho]
+
+    def _carregar(self, linha):
+        try:
+            return json.loads(linha)
+        except json.JSONDecodeError:
+            # Reported as an invalid sale instead of aborting the whole file
+            return None
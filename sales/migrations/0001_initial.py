@@ -0,0 +1,51 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    initial = True
+
+    dependencies = [
+        ('customers', '__first__'),
+        ('inventory', '0001_initial'),
+    ]
+
+    operations = [
+        # tb_vendas and tb_itensvendas are created by the legacy schema script
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='Venda',
+                    fields=[
+                        ('id', models.AutoField(primary_key=True, serialize=False, verbose_name='ID')),
+                        ('data_venda', models.DateField(verbose_name='Data da Venda')),
+                        ('total_venda', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Total da Venda')),
+                        ('observacoes', models.TextField(blank=True, verbose_name='Observações')),
+                        ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='vendas', to='customers.cliente', verbose_name='Cliente')),
+                    ],
+                    options={
+                        'verbose_name': 'Venda',
+                        'verbose_name_plural': 'Vendas',
+                        'db_table': 'tb_vendas',
+                        'ordering': ['-data_venda', '-id'],
+                    },
+                ),
+                migrations.CreateModel(
+                    name='ItemVenda',
+                    fields=[
+                        ('id', models.AutoField(primary_key=True, serialize=False, verbose_name='ID')),
+                        ('qtd', models.IntegerField(verbose_name='Quantidade')),
+                        ('subtotal', models.DecimalField(decimal_places=2, max_digits=10, verbose_name='Subtotal')),
+                        ('produto', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='itens_venda', to='inventory.produto', verbose_name='Produto')),
+                        ('venda', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='itens', to='sales.venda', verbose_name='Venda')),
+                    ],
+                    options={
+                        'verbose_name': 'Item de Venda',
+                        'verbose_name_plural': 'Itens de Venda',
+                        'db_table': 'tb_itensvendas',
+                    },
+                ),
+            ],
+            database_operations=[],
+        ),
+    ]
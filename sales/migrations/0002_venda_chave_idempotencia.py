@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='venda',
+            name='chave_idempotencia',
+            field=models.CharField(blank=True, help_text='Identificador enviado pelo terminal para evitar importação duplicada', max_length=64, null=True, unique=True, verbose_name='Chave de Idempotência'),
+        ),
+    ]
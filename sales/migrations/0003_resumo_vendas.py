@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '__first__'),
+        ('sales', '0002_venda_chave_idempotencia'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResumoVendaDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qtd_vendas', models.IntegerField(default=0, verbose_name='Quantidade de Vendas')),
+                ('receita', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Receita')),
+                ('unidades', models.IntegerField(default=0, verbose_name='Unidades Vendidas')),
+                ('data', models.DateField(unique=True, verbose_name='Data')),
+            ],
+            options={
+                'verbose_name': 'Resumo Diário de Vendas',
+                'verbose_name_plural': 'Resumos Diários de Vendas',
+                'db_table': 'tb_resumo_vendas_diario',
+                'ordering': ['data'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ResumoVendaClienteDiario',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('qtd_vendas', models.IntegerField(default=0, verbose_name='Quantidade de Vendas')),
+                ('receita', models.DecimalField(decimal_places=2, default=0, max_digits=14, verbose_name='Receita')),
+                ('unidades', models.IntegerField(default=0, verbose_name='Unidades Vendidas')),
+                ('data', models.DateField(verbose_name='Data')),
+                ('cliente', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='resumos_vendas', to='customers.cliente', verbose_name='Cliente')),
+            ],
+            options={
+                'verbose_name': 'Resumo Diário de Vendas por Cliente',
+                'verbose_name_plural': 'Resumos Diários de Vendas por Cliente',
+                'db_table': 'tb_resumo_vendas_cliente_diario',
+                'ordering': ['data'],
+                'constraints': [models.UniqueConstraint(fields=('cliente', 'data'), name='uniq_resumo_cliente_data')],
+            },
+        ),
+    ]
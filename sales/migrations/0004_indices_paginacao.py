@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 10:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('customers', '__first__'),
+        ('sales', '0003_resumo_vendas'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='venda',
+            index=models.Index(fields=['data_venda', 'id'], name='tb_vendas_data_ve_b2f406_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='venda',
+            index=models.Index(fields=['cliente', 'data_venda', 'id'], name='tb_vendas_cliente_1bb2d5_idx'),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:05
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sales', '0004_indices_paginacao'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TerminalVenda',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nome', models.CharField(max_length=100, unique=True, verbose_name='Nome')),
+                ('chave_hash', models.CharField(editable=False, max_length=64, unique=True, verbose_name='Hash do Token')),
+                ('ativo', models.BooleanField(default=True, verbose_name='Ativo')),
+                ('criado_em', models.DateTimeField(auto_now_add=True, verbose_name='Criado em')),
+                ('ultimo_uso', models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Último Uso')),
+                ('usuario', models.ForeignKey(help_text='Usuário em nome do qual o terminal registra as vendas', on_delete=django.db.models.deletion.PROTECT, related_name='terminais_venda', to=settings.AUTH_USER_MODEL, verbose_name='Usuário')),
+            ],
+            options={
+                'verbose_name': 'Terminal de Venda',
+                'verbose_name_plural': 'Terminais de Venda',
+                'db_table': 'tb_terminais_venda',
+                'ordering': ['nome'],
+            },
+        ),
+    ]
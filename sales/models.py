@@ -9,6 +9,8 @@ class Venda(models.Model):
     Sale model - equivalent to model/Venda.java
     Maps to tb_vendas table
     """
+    # tb_vendas.id is an INT column (docker/mysql/init.sql): foreign keys to it must be INT too
+    id = models.AutoField('ID', primary_key=True)
     cliente = models.ForeignKey(
         Cliente,
         on_delete=models.PROTECT,
@@ -18,12 +20,25 @@ class Venda(models.Model):
     data_venda = models.DateField('Data da Venda')
     total_venda = models.DecimalField('Total da Venda', max_digits=10, decimal_places=2)
     observacoes = models.TextField('Observações', blank=True)
+    chave_idempotencia = models.CharField(
+        'Chave de Idempotência',
+        max_length=64,
+        unique=True,
+        null=True,
+        blank=True,
+        help_text='Identificador enviado pelo terminal para evitar importação duplicada'
+    )
     
     class Meta:
         db_table = 'tb_vendas'
         verbose_name = 'Venda'
         verbose_name_plural = 'Vendas'
         ordering = ['-data_venda', '-id']
+        indexes = [
+            # Keyset pagination seeks on (data_venda, id)
+            models.Index(fields=['data_venda', 'id']),
+            models.Index(fields=['cliente', 'data_venda', 'id']),
+        ]
     
     def __str__(self):
         return f'Venda #{self.id} - {self.cliente.nome} - {self.data_venda}'
@@ -40,6 +55,8 @@ class ItemVenda(models.Model):
     Sale item model - equivalent to model/ItemVenda.java
     Maps to tb_itensvendas table
     """
+    # tb_itensvendas.id is an INT column (docker/mysql/init.sql): foreign keys to it must be INT too
+    id = models.AutoField('ID', primary_key=True)
     venda = models.ForeignKey(
         Venda,
         on_delete=models.CASCADE,
@@ -67,3 +84,81 @@ class ItemVenda(models.Model):
         """Calculate subtotal before saving"""
         self.subtotal = self.produto.preco * self.qtd
         super().save(*args, **kwargs)
+
+
+class ResumoVendaBase(models.Model):
+    """Counters shared by the sales rollup tables"""
+    qtd_vendas = models.IntegerField('Quantidade de Vendas', default=0)
+    receita = models.DecimalField('Receita', max_digits=14, decimal_places=2, default=0)
+    unidades = models.IntegerField('Unidades Vendidas', default=0)
+
+    class Meta:
+        abstract = True
+
+
+class ResumoVendaDiario(ResumoVendaBase):
+    """
+    Daily sales rollup, kept up to date in the same transaction that
+    creates or deletes a sale (see sales.resumo)
+    """
+    data = models.DateField('Data', unique=True)
+
+    class Meta:
+        db_table = 'tb_resumo_vendas_diario'
+        verbose_name = 'Resumo Diário de Vendas'
+        verbose_name_plural = 'Resumos Diários de Vendas'
+        ordering = ['data']
+
+    def __str__(self):
+        return f'{self.data} - {self.qtd_vendas} vendas'
+
+
+class ResumoVendaClienteDiario(ResumoVendaBase):
+    """Daily sales rollup per customer"""
+    data = models.DateField('Data')
+    cliente = models.ForeignKey(
+        Cliente,
+        on_delete=models.CASCADE,
+        verbose_name='Cliente',
+        related_name='resumos_vendas'
+    )
+
+    class Meta:
+        db_table = 'tb_resumo_vendas_cliente_diario'
+        verbose_name = 'Resumo Diário de Vendas por Cliente'
+        verbose_name_plural = 'Resumos Diários de Vendas por Cliente'
+        ordering = ['data']
+        constraints = [
+            models.UniqueConstraint(fields=['cliente', 'data'], name='uniq_resumo_cliente_data'),
+        ]
+
+    def __str__(self):
+        return f'{self.data} - {self.cliente_id} - {self.qtd_vendas} vendas'
+
+
+class TerminalVenda(models.Model):
+    """
+    Store terminal (POS) allowed to post sales to the sync endpoint.
+    Only the SHA-256 of its token is stored (see sales.terminais).
+    """
+    nome = models.CharField('Nome', max_length=100, unique=True)
+    usuario = models.ForeignKey(
+        User,
+        on_delete=models.PROTECT,
+        verbose_name='Usuário',
+        related_name='terminais_venda',
+        help_text='Usuário em nome do qual o terminal registra as vendas'
+    )
+    chave_hash = models.CharField('Hash do Token', max_length=64, unique=True, editable=False)
+    ativo = models.BooleanField('Ativo', default=True)
+    criado_em = models.DateTimeField('Criado em', auto_now_add=True)
+    ultimo_uso = models.DateTimeField('Último Uso', null=True, blank=True, editable=False)
+
+    class Meta:
+        db_table = 'tb_terminais_venda'
+        verbose_name = 'Terminal de Venda'
+        verbose_name_plural = 'Terminais de Venda'
+        ordering = ['nome']
+
+    def __str__(self):
+        return self.nome
@@ -0,0 +1,199 @@
+"""
+Daily sales rollups (tb_resumo_vendas_diario / tb_resumo_vendas_cliente_diario).
+
+Sale writers call atualizar_resumo inside their transaction, so the rollups
+always match tb_vendas. Reports then aggregate one row per day instead of
+one row per sale, and their results are cached in the `resumo_vendas`
+namespace (core.cache) until a rollup write invalidates it.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import models, transaction
+from django.db.models import Case, Count, F, Q, Sum, Value, When
+from django.db.models.functions import TruncMonth, TruncWeek
+
+from core.cache import em_cache, invalidar
+from inventory.models import LOTE_SQL
+from .models import ItemVenda, ResumoVendaClienteDiario, ResumoVendaDiario, Venda
+
+
+CACHE_RESUMO = 'resumo_vendas'
+TEMPO_CACHE = 60 * 60
+
+AGRUPAMENTOS = {
+    'dia': None,
+    'semana': TruncWeek,
+    'mes': TruncMonth,
+}
+
+
+def atualizar_resumo(vendas, sinal=1):
+    """
+    Apply sales to the rollups. Must run inside the transaction that
+    creates (sinal=1) or deletes (sinal=-1) the sales.
+
+    Args:
+        vendas: iterable of (data_venda, cliente_id, total_venda, unidades)
+    """
+    por_dia = defaultdict(lambda: [0, Decimal('0'), 0])
+    por_cliente = defaultdict(lambda: [0, Decimal('0'), 0])
+
+    for data_venda, cliente_id, total, unidades in vendas:
+        for acumulado in (por_dia[(data_venda,)], por_cliente[(data_venda, cliente_id)]):
+            acumulado[0] += sinal
+            acumulado[1] += sinal * Decimal(total)
+            acumulado[2] += sinal * unidades
+
+    _aplicar(ResumoVendaDiario, ('data',), por_dia)
+    _aplicar(ResumoVendaClienteDiario, ('data', 'cliente_id'), por_cliente)
+
+
+def transferir_resumo_cliente(origens, destino):
+    """
+    Add the per-customer rollups of the customers `origens` to customer
+    `destino` (when merging customers); the daily totals do not change.
+    The rows of `origens` are left for the caller to delete.
+    """
+    deltas = {
+        (linha['data'], destino): [linha['qtd_vendas'], linha['receita'], linha['unidades']]
+        for linha in ResumoVendaClienteDiario.objects.filter(cliente_id__in=origens)
+        .values('data').annotate(qtd_vendas=Sum('qtd_vendas'), receita=Sum('receita'), unidades=Sum('unidades'))
+        .order_by()
+    }
+    _aplicar(ResumoVendaClienteDiario, ('data', 'cliente_id'), deltas)
+
+
+def _aplicar(modelo, campos, deltas):
+    """
+    Increment rollup rows with one INSERT IGNORE (creates missing keys)
+    and one CASE-based UPDATE per LOTE_SQL keys. Keys are sorted so
+    concurrent writers lock rows in the same order.
+    """
+    if not deltas:
+        return
+
+    invalidar(CACHE_RESUMO)
+    chaves = sorted(deltas)
+    modelo.objects.bulk_create(
+        [modelo(**dict(zip(campos, chave))) for chave in chaves],
+        ignore_conflicts=True,
+        batch_size=LOTE_SQL,
+    )
+
+    for inicio in range(0, len(chaves), LOTE_SQL):
+        lote = chaves[inicio:inicio + LOTE_SQL]
+        condicoes = [Q(**dict(zip(campos, chave))) for chave in lote]
+
+        def incremento(indice, output_field):
+            return Case(
+                *[When(condicao, then=Value(deltas[chave][indice]))
+                  for condicao, chave in zip(condicoes, lote)],
+                default=Value(0),
+                output_field=output_field,
+            )
+
+        filtro = Q()
+        for condicao in condicoes:
+            filtro |= condicao
+
+        modelo.objects.filter(filtro).update(
+            qtd_vendas=F('qtd_vendas') + incremento(0, models.IntegerField()),
+            receita=F('receita') + incremento(1, models.DecimalField(max_digits=14, decimal_places=2)),
+            unidades=F('unidades') + incremento(2, models.IntegerField()),
+        )
+
+
+def resumo_queryset(data_inicio=None, data_fim=None, cliente_id=None):
+    """Rollup rows for a period, per customer when cliente_id is given"""
+    if cliente_id:
+        queryset = ResumoVendaClienteDiario.objects.filter(cliente_id=cliente_id)
+    else:
+        queryset = ResumoVendaDiario.objects.all()
+
+    if data_inicio:
+        queryset = queryset.filter(data__gte=data_inicio)
+    if data_fim:
+        queryset = queryset.filter(data__lte=data_fim)
+
+    return queryset
+
+
+def totais(data_inicio=None, data_fim=None, cliente_id=None):
+    """Sale count, revenue and units for a period"""
+    resultado = resumo_queryset(data_inicio, data_fim, cliente_id).aggregate(
+        qtd_vendas=Sum('qtd_vendas'),
+        receita=Sum('receita'),
+        unidades=Sum('unidades'),
+    )
+    return {campo: valor or 0 for campo, valor in resultado.items()}
+
+
+def totais_agrupados(data_inicio=None, data_fim=None, agrupamento='dia', cliente_id=None):
+    """Period totals grouped by day, week or month, oldest first"""
+    queryset = resumo_queryset(data_inicio, data_fim, cliente_id)
+    truncar = AGRUPAMENTOS[agrupamento]
+    periodo = truncar('data') if truncar else F('data')
+
+    return (
+        queryset.annotate(periodo=periodo)
+        .values('periodo')
+        .annotate(
+            qtd_vendas=Sum('qtd_vendas'),
+            receita=Sum('receita'),
+            unidades=Sum('unidades'),
+        )
+        .filter(qtd_vendas__gt=0)
+        .order_by('periodo')
+    )
+
+
+def periodos_agrupados(data_inicio=None, data_fim=None, agrupamento='dia', cliente_id=None):
+    """totais_agrupados() as a list, cached until the rollups change"""
+    return em_cache(
+        CACHE_RESUMO, (data_inicio, data_fim, agrupamento, cliente_id),
+        lambda: list(totais_agrupados(data_inicio, data_fim, agrupamento, cliente_id)), TEMPO_CACHE,
+    )
+
+
+@transaction.atomic
+def reconstruir_periodo(data_inicio, data_fim):
+    """
+    Rebuild the rollups for [data_inicio, data_fim] from tb_vendas.
+    Returns the number of daily rows written.
+    """
+    invalidar(CACHE_RESUMO)
+    ResumoVendaDiario.objects.filter(data__range=(data_inicio, data_fim)).delete()
+    ResumoVendaClienteDiario.objects.filter(data__range=(data_inicio, data_fim)).delete()
+
+    vendas = Venda.objects.filter(data_venda__range=(data_inicio, data_fim))
+    itens = ItemVenda.objects.filter(venda__data_venda__range=(data_inicio, data_fim))
+
+    unidades_cliente = {
+        (linha['venda__data_venda'], linha['venda__cliente_id']): linha['unidades']
+        for linha in itens.values('venda__data_venda', 'venda__cliente_id')
+        .annotate(unidades=Sum('qtd')).order_by()
+    }
+    por_cliente = [
+        ResumoVendaClienteDiario(
+            data=linha['data_venda'],
+            cliente_id=linha['cliente_id'],
+            qtd_vendas=linha['qtd_vendas'],
+            receita=linha['receita'],
+            unidades=unidades_cliente.get((linha['data_venda'], linha['cliente_id']), 0),
+        )
+        for linha in vendas.values('data_venda', 'cliente_id')
+        .annotate(qtd_vendas=Count('id'), receita=Sum('total_venda')).order_by()
+    ]
+
+    por_dia = {}
+    for resumo in por_cliente:
+        dia = por_dia.setdefault(resumo.data, ResumoVendaDiario(data=resumo.data, receita=Decimal('0')))
+        dia.qtd_vendas += resumo.qtd_vendas
+        dia.receita += resumo.receita
+        dia.unidades += resumo.unidades
+
+    ResumoVendaClienteDiario.objects.bulk_create(por_cliente, batch_size=LOTE_SQL)
+    ResumoVendaDiario.objects.bulk_create(por_dia.values(), batch_size=LOTE_SQL)
+
+    return len(por_dia)
@@ -0,0 +1,114 @@
+"""
+Sale processing services shared by the views and management commands.
+"""
+from collections import defaultdict
+
+from django.db import transaction
+
+from core.eventos import publicar_vendas
+from inventory.models import LOTE_SQL, Produto
+from .models import ItemVenda, Venda
+from .resumo import atualizar_resumo
+
+
+@transaction.atomic
+def registrar_venda(venda, itens, usuario=None):
+    """
+    Persist a sale, its items and the stock movements with a constant
+    number of queries, whatever the number of lines in the basket.
+
+    Args:
+        venda: unsaved Venda instance (cliente, data_venda, observacoes)
+        itens: list of (produto_id, qtd) pairs
+        usuario: user recorded on the stock movements
+
+    Raises:
+        ValueError: if any product has insufficient stock (nothing is saved)
+    """
+    if not itens:
+        raise ValueError('A venda deve possuir ao menos um item')
+
+    venda.total_venda = 0
+    venda.save()
+
+    produtos = Produto.remover_estoque_em_lote(
+        [(produto_id, qtd, f'Venda #{venda.id}') for produto_id, qtd in itens],
+        usuario=usuario,
+    )
+
+    itens_venda = [
+        ItemVenda(
+            venda=venda,
+            produto_id=produto_id,
+            qtd=qtd,
+            subtotal=produtos[produto_id].preco * qtd,
+        )
+        for produto_id, qtd in itens
+    ]
+    ItemVenda.objects.bulk_create(itens_venda)
+
+    venda.total_venda = sum(item.subtotal for item in itens_venda)
+    venda.save(update_fields=['total_venda'])
+
+    atualizar_resumo([
+        (venda.data_venda, venda.cliente_id, venda.total_venda, sum(qtd for _, qtd in itens))
+    ])
+    publicar_vendas([(venda.pk, venda.data_venda, venda.cliente_id, venda.total_venda)])
+
+    return venda
+
+
+@transaction.atomic
+def cancelar_vendas(venda_ids, usuario=None):
+    """
+    Cancel (delete) many sales at once, restoring their stock.
+
+    Per chunk of LOTE_SQL sales the number of queries is fixed: the sales
+    are locked, their items read in one query, stock is restored with the
+    set-based batch update of Produto and one ENTRADA ledger row is
+    inserted per (sale, product), then rollups and rows are updated in bulk.
+
+    Returns:
+        list of ids of the sales that were cancelled (unknown ids are ignored)
+    """
+    ids = sorted({int(venda_id) for venda_id in venda_ids})
+    canceladas = []
+
+    for inicio in range(0, len(ids), LOTE_SQL):
+        lote = ids[inicio:inicio + LOTE_SQL]
+        vendas = list(
+            Venda.objects.select_for_update().filter(pk__in=lote).order_by('pk')
+            .values_list('pk', 'data_venda', 'cliente_id', 'total_venda')
+        )
+        if not vendas:
+            continue
+        lote = [venda[0] for venda in vendas]
+
+        quantidades = defaultdict(int)
+        unidades = defaultdict(int)
+        for venda_id, produto_id, qtd in (
+            ItemVenda.objects.filter(venda_id__in=lote).values_list('venda_id', 'produto_id', 'qtd')
+        ):
+            quantidades[(venda_id, produto_id)] += qtd
+            unidades[venda_id] += qtd
+
+        if quantidades:
+            Produto.adicionar_estoque_em_lote(
+                [
+                    (produto_id, qtd, f'Cancelamento da venda #{venda_id}')
+                    for (venda_id, produto_id), qtd in sorted(quantidades.items())
+                ],
+                usuario=usuario,
+            )
+
+        atualizar_resumo(
+            [(data, cliente_id, total, unidades[pk]) for pk, data, cliente_id, total in vendas],
+            sinal=-1,
+        )
+        publicar_vendas(vendas, sinal=-1)
+
+        ItemVenda.objects.filter(venda_id__in=lote).delete()
+        Venda.objects.filter(pk__in=lote).delete()
+        canceladas.extend(lote)
+
+    return canceladas
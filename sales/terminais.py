@@ -0,0 +1,50 @@
+"""
+Token authentication of the store terminals (POS) that post sales to
+VendaImportacaoView.
+
+A terminal sends its token in every request:
+
+    Authorization: Token <token>
+
+The token is shown once, when the terminal is created (criar_terminal or
+the criar_terminal_venda command); only its SHA-256 is stored. A terminal
+acts as its TerminalVenda.usuario, which needs the sales.add_venda
+permission. Deactivating the terminal in the admin revokes the token.
+"""
+import hashlib
+import secrets
+
+from django.utils import timezone
+
+from .models import TerminalVenda
+
+
+PREFIXO_AUTORIZACAO = 'Token '
+
+
+def hash_chave(chave):
+    return hashlib.sha256(chave.encode('utf-8')).hexdigest()
+
+
+def criar_terminal(nome, usuario):
+    """Create a terminal; returns (terminal, token) - the token is not stored"""
+    chave = secrets.token_urlsafe(32)
+    terminal = TerminalVenda.objects.create(nome=nome, usuario=usuario, chave_hash=hash_chave(chave))
+    return terminal, chave
+
+
+def autenticar_terminal(request):
+    """Active TerminalVenda of the request's Authorization header, or None"""
+    cabecalho = request.headers.get('Authorization', '')
+    if not cabecalho.startswith(PREFIXO_AUTORIZACAO):
+        return None
+    chave = cabecalho[len(PREFIXO_AUTORIZACAO):].strip()
+    if not chave:
+        return None
+
+    terminal = TerminalVenda.objects.select_related('usuario').filter(
+        chave_hash=hash_chave(chave), ativo=True, usuario__is_active=True,
+    ).first()
+    if terminal is not None:
+        TerminalVenda.objects.filter(pk=terminal.pk).update(ultimo_uso=timezone.now())
+    return terminal
@@ -0,0 +1,375 @@
+import csv
+import io
+import json
+import zipfile
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.models import Permission, User
+from django.db import connection
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from unittest import mock
+
+from customers.models import Cliente
+from inventory.models import MovimentacaoEstoque, Produto
+from suppliers.models import Fornecedor
+from .models import ItemVenda, ResumoVendaClienteDiario, ResumoVendaDiario, TerminalVenda, Venda
+from .importacao import importar_vendas
+from .resumo import reconstruir_periodo, totais
+from .services import cancelar_vendas, registrar_venda
+from .terminais import criar_terminal
+
+
+ENDERECO = {
+    'telefone': '1140041000', 'celular': '11987654321', 'cep': '13345325',
+    'endereco': 'Rua A', 'numero': 1, 'bairro': 'Centro', 'cidade': 'Campinas', 'estado': 'SP',
+}
+
+
+class VendaTestMixin:
+    """Common fixtures for sales tests"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.fornecedor = Fornecedor.objects.create(nome='Fornecedor', cnpj='12345678901234', **ENDERECO)
+        cls.cliente = Cliente.objects.create(nome='Cliente', cpf='12345678901', **ENDERECO)
+
+    def criar_produtos(self, quantidade, estoque=100, preco='10.00'):
+        return [
+            Produto.objects.create(
+                descricao=f'Produto {i}', preco=Decimal(preco),
+                qtd_estoque=estoque, fornecedor=self.fornecedor,
+            )
+            for i in range(quantidade)
+        ]
+
+    def nova_venda(self):
+        return Venda(cliente=self.cliente, data_venda=date.today())
+
+
+class RegistrarVendaTestCase(VendaTestMixin, TestCase):
+    """Test the batched checkout service"""
+
+    def test_registra_itens_estoque_e_movimentacoes(self):
+        p1, p2 = self.criar_produtos(2)
+        venda = registrar_venda(self.nova_venda(), [(p1.pk, 3), (p2.pk, 2)])
+
+        self.assertEqual(venda.total_venda, Decimal('50.00'))
+        self.assertEqual(ItemVenda.objects.filter(venda=venda).count(), 2)
+        p1.refresh_from_db()
+        self.assertEqual(p1.qtd_estoque, 97)
+        mov = MovimentacaoEstoque.objects.get(produto=p1)
+        self.assertEqual((mov.tipo, mov.quantidade_anterior, mov.quantidade_atual), ('SAIDA', 100, 97))
+
+    def test_numero_de_consultas_constante(self):
+        produtos = self.criar_produtos(40)
+
+        with CaptureQueriesContext(connection) as uma_linha:
+            registrar_venda(self.nova_venda(), [(produtos[0].pk, 1)])
+        with CaptureQueriesContext(connection) as quarenta_linhas:
+            registrar_venda(self.nova_venda(), [(p.pk, 1) for p in produtos])
+
+        self.assertEqual(len(uma_linha), len(quarenta_linhas))
+
+    def test_estoque_insuficiente_desfaz_venda(self):
+        p1, p2 = self.criar_produtos(2, estoque=5)
+
+        with self.assertRaises(ValueError):
+            registrar_venda(self.nova_venda(), [(p1.pk, 3), (p2.pk, 2), (p1.pk, 3)])
+
+        self.assertFalse(Venda.objects.exists())
+        p1.refresh_from_db()
+        self.assertEqual(p1.qtd_estoque, 5)
+
+
+class EstoqueDistribuidoTestCase(VendaTestMixin, TestCase):
+    """Test checkouts of products whose stock is spread across slots"""
+
+    def setUp(self):
+        self.produto, = self.criar_produtos(1)
+        self.produto.distribuir_estoque(4)
+
+    def test_distribui_e_mantem_total(self):
+        self.assertEqual(self.produto.qtd_estoque, 0)
+        self.assertEqual(sorted(self.produto.slots.values_list('quantidade', flat=True)), [25] * 4)
+
+        registrar_venda(self.nova_venda(), [(self.produto.pk, 3), (self.produto.pk, 60)])
+
+        self.assertEqual(Produto.objects.get(pk=self.produto.pk).estoque_atual, 37)
+        self.assertEqual(Produto.objects.com_estoque_total().get(pk=self.produto.pk).estoque_total, 37)
+        saldos = list(MovimentacaoEstoque.objects.order_by('id').values_list('quantidade_anterior', 'quantidade_atual'))
+        self.assertEqual(saldos, [(100, 97), (97, 37)])
+
+    def test_estoque_insuficiente(self):
+        with self.assertRaises(ValueError):
+            registrar_venda(self.nova_venda(), [(self.produto.pk, 101)])
+        self.assertEqual(Produto.objects.get(pk=self.produto.pk).estoque_atual, 100)
+
+    def test_ajuste_e_concentracao(self):
+        self.produto.ajustar_estoque(10)
+        self.assertEqual(self.produto.estoque_atual, 10)
+
+        self.produto.distribuir_estoque(0)
+        self.assertEqual((self.produto.qtd_estoque, self.produto.slots.count()), (10, 0))
+
+
+class CancelarVendasTestCase(VendaTestMixin, TestCase):
+    """Test bulk cancellation of sales"""
+
+    def test_restaura_estoque_resumo_e_ledger(self):
+        p1, p2 = self.criar_produtos(2)
+        vendas = [registrar_venda(self.nova_venda(), [(p1.pk, 2), (p2.pk, 1), (p1.pk, 1)]) for _ in range(3)]
+        mantida = registrar_venda(self.nova_venda(), [(p1.pk, 5)])
+
+        canceladas = cancelar_vendas([venda.pk for venda in vendas] + [999999])
+
+        self.assertEqual(sorted(canceladas), sorted(venda.pk for venda in vendas))
+        self.assertEqual(list(Venda.objects.values_list('pk', flat=True)), [mantida.pk])
+        p1.refresh_from_db()
+        p2.refresh_from_db()
+        self.assertEqual((p1.qtd_estoque, p2.qtd_estoque), (95, 100))
+        self.assertEqual(MovimentacaoEstoque.objects.filter(tipo='ENTRADA').count(), 6)
+        resumo = ResumoVendaDiario.objects.get()
+        self.assertEqual((resumo.qtd_vendas, resumo.receita, resumo.unidades), (1, Decimal('50.00'), 5))
+
+    def test_admin_so_cancela_pelo_servico(self):
+        produto, = self.criar_produtos(1)
+        venda = registrar_venda(self.nova_venda(), [(produto.pk, 4)])
+        self.client.force_login(User.objects.create_superuser('admin'))
+
+        lista = self.client.get('/admin/sales/venda/')
+        acoes = [nome for nome, _ in lista.context['action_form'].fields['action'].choices]
+        self.assertEqual(acoes, ['', 'cancelar_selecionadas'])
+        self.assertEqual(self.client.get(f'/admin/sales/venda/{venda.pk}/change/').status_code, 200)
+        self.assertEqual(self.client.post(f'/admin/sales/venda/{venda.pk}/delete/', {'post': 'yes'}).status_code, 403)
+        item = ItemVenda.objects.get()
+        self.assertEqual(self.client.post(f'/admin/sales/itemvenda/{item.pk}/change/', {'qtd': 1}).status_code, 403)
+
+        self.client.post('/admin/sales/venda/', {'action': 'cancelar_selecionadas', '_selected_action': [venda.pk]})
+        produto.refresh_from_db()
+        self.assertEqual((Venda.objects.count(), produto.qtd_estoque), (0, 100))
+        self.assertFalse(ResumoVendaDiario.objects.filter(qtd_vendas__gt=0).exists())
+
+    def test_numero_de_consultas_constante(self):
+        produtos = self.criar_produtos(10)
+
+        def consultas_para(n):
+            ids = [
+                registrar_venda(self.nova_venda(), [(produto.pk, 1) for produto in produtos]).pk
+                for _ in range(n)
+            ]
+            with CaptureQueriesContext(connection) as consultas:
+                cancelar_vendas(ids)
+            return len(consultas)
+
+        self.assertEqual(consultas_para(1), consultas_para(8))
+
+
+class ImportarVendasTestCase(VendaTestMixin, TestCase):
+    """Test bulk sales ingestion"""
+
+    def lote(self, produto, *quantidades):
+        return [
+            {'chave': f'pdv-{i}', 'cliente': self.cliente.pk, 'data_venda': '2025-11-03',
+             'itens': [{'produto': produto.pk, 'qtd': qtd}]}
+            for i, qtd in enumerate(quantidades)
+        ]
+
+    def test_reenvio_nao_duplica_baixa_de_estoque(self):
+        produto, = self.criar_produtos(1, estoque=10)
+        lote = self.lote(produto, 2, 3)
+
+        primeiro = importar_vendas(lote)
+        segundo = importar_vendas(lote)
+
+        self.assertEqual([r['status'] for r in primeiro], ['criada', 'criada'])
+        self.assertEqual([r['status'] for r in segundo], ['duplicada', 'duplicada'])
+        self.assertEqual([r['venda_id'] for r in primeiro], [r['venda_id'] for r in segundo])
+        produto.refresh_from_db()
+        self.assertEqual(produto.qtd_estoque, 5)
+
+    def test_estoque_validado_para_o_lote_inteiro(self):
+        produto, = self.criar_produtos(1, estoque=10)
+
+        resultados = importar_vendas(self.lote(produto, 6, 6, 4), tamanho_lote=2)
+
+        self.assertEqual([r['status'] for r in resultados], ['criada', 'erro', 'criada'])
+        self.assertIn('Estoque insuficiente', resultados[1]['erro'])
+        self.assertEqual(Venda.objects.get(chave_idempotencia='pdv-2').total_venda, Decimal('40.00'))
+        produto.refresh_from_db()
+        self.assertEqual(produto.qtd_estoque, 0)
+
+    def test_endpoint_autenticado_pelo_token_do_terminal(self):
+        produto, = self.criar_produtos(1, estoque=10)
+        caixa = User.objects.create_user('caixa')
+        caixa.user_permissions.add(Permission.objects.get(codename='add_venda'))
+        terminal, chave = criar_terminal('loja01-pdv01', caixa)
+        cliente = Client(enforce_csrf_checks=True)
+
+        def enviar(lote, chave=None):
+            cabecalhos = {'Authorization': f'Token {chave}'} if chave else {}
+            return cliente.post(reverse('sales:importar'), json.dumps(lote), content_type='application/json',
+                                headers=cabecalhos)
+
+        # A browser session is not enough: the endpoint only accepts tokens
+        cliente.force_login(User.objects.create_superuser('gerente'))
+        self.assertEqual(enviar(self.lote(produto, 1)).status_code, 401)
+        self.assertEqual(enviar(self.lote(produto, 1), 'outro').status_code, 401)
+
+        resposta = enviar(self.lote(produto, 2), chave)
+        self.assertEqual(resposta.status_code, 200)
+        self.assertEqual(resposta.json()['resultados'][0]['status'], 'criada')
+        self.assertEqual(MovimentacaoEstoque.objects.get(tipo='SAIDA').usuario, caixa)
+
+        _, chave_sem_permissao = criar_terminal('loja01-pdv02', User.objects.create_user('visitante'))
+        self.assertEqual(enviar(self.lote(produto, 1), chave_sem_permissao).status_code, 403)
+
+        TerminalVenda.objects.filter(pk=terminal.pk).update(ativo=False)
+        self.assertEqual(enviar(self.lote(produto, 1), chave).status_code, 401)
+        produto.refresh_from_db()
+        self.assertEqual(produto.qtd_estoque, 8)
+
+
+class ResumoVendaTestCase(VendaTestMixin, TestCase):
+    """Test the daily sales rollup"""
+
+    def resumo_atual(self):
+        return (
+            list(ResumoVendaDiario.objects.values_list('data', 'qtd_vendas', 'receita', 'unidades')),
+            list(ResumoVendaClienteDiario.objects.values_list('data', 'cliente_id', 'qtd_vendas', 'receita', 'unidades')),
+        )
+
+    def test_resumo_incremental_igual_a_reconstrucao(self):
+        p1, p2 = self.criar_produtos(2)
+        registrar_venda(self.nova_venda(), [(p1.pk, 2), (p2.pk, 1)])
+        registrar_venda(self.nova_venda(), [(p1.pk, 4)])
+        importar_vendas([{'chave': 'pdv-1', 'cliente': self.cliente.pk, 'data_venda': '2025-01-10',
+                          'itens': [{'produto': p2.pk, 'qtd': 5}]}])
+
+        incremental = self.resumo_atual()
+        reconstruir_periodo(date(2025, 1, 1), date.today())
+
+        self.assertEqual(incremental, self.resumo_atual())
+        self.assertEqual(
+            totais(data_inicio=date.today()),
+            {'qtd_vendas': 2, 'receita': Decimal('70.00'), 'unidades': 7},
+        )
+
+    def test_exclusao_remove_venda_do_resumo(self):
+        produto, = self.criar_produtos(1)
+        venda = registrar_venda(self.nova_venda(), [(produto.pk, 2)])
+        self.client.force_login(User.objects.create_user('gerente'))
+
+        self.client.post(f'/vendas/excluir/{venda.pk}/')
+
+        self.assertEqual(totais(cliente_id=self.cliente.pk), {'qtd_vendas': 0, 'receita': 0, 'unidades': 0})
+        produto.refresh_from_db()
+        self.assertEqual(produto.qtd_estoque, 100)
+
+
+class VendaListPaginacaoTestCase(VendaTestMixin, TestCase):
+    """Test keyset pagination of the sales list"""
+
+    def test_percorre_paginas_sem_repetir_ou_pular(self):
+        Venda.objects.bulk_create([
+            Venda(cliente=self.cliente, data_venda=date(2025, 1, 1) + timedelta(days=i % 7), total_venda=1)
+            for i in range(45)
+        ])
+        self.client.force_login(User.objects.create_user('gerente'))
+
+        vistos, url, paginas = [], '/vendas/', []
+        while url:
+            response = self.client.get(url)
+            pagina = response.context['page_obj']
+            paginas.append([venda.pk for venda in pagina])
+            vistos.extend(paginas[-1])
+            url = pagina.url_proxima and '/vendas/' + pagina.url_proxima
+
+        esperado = list(Venda.objects.order_by('-data_venda', '-id').values_list('pk', flat=True))
+        self.assertEqual(vistos, esperado)
+        self.assertEqual([len(p) for p in paginas], [20, 20, 5])
+
+        anterior = self.client.get('/vendas/' + pagina.url_anterior).context['page_obj']
+        self.assertEqual([venda.pk for venda in anterior], paginas[1])
+
+
+class ExportacaoVendasTestCase(VendaTestMixin, TestCase):
+    """Test the streaming export of the sales list"""
+
+    def setUp(self):
+        p1, p2 = self.criar_produtos(2)
+        for _ in range(5):
+            registrar_venda(self.nova_venda(), [(p1.pk, 1), (p2.pk, 2)])
+        self.client.force_login(User.objects.create_user('contador'))
+
+    def exportar(self, consulta):
+        response = self.client.get('/vendas/' + consulta)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_csv_com_itens_em_consultas_por_lote(self):
+        with mock.patch('sales.views.VendaListView.exportar_tamanho_lote', 2):
+            with CaptureQueriesContext(connection) as consultas:
+                conteudo = self.exportar('?exportar=csv&itens=1')
+
+        linhas = list(csv.reader(io.StringIO(conteudo.decode('utf-8-sig')), delimiter=';'))
+        self.assertEqual(linhas[0][:2], ['Venda', 'Data'])
+        self.assertEqual(len(linhas), 1 + 10)
+        self.assertEqual(len({linha[0] for linha in linhas[1:]}), 5)
+        # 3 chunks of sales, each with a single query for its items
+        consultas_itens = [q for q in consultas.captured_queries if 'FROM "tb_itensvendas"' in q['sql']]
+        self.assertEqual(len(consultas_itens), 3)
+
+    async def test_asgi_transmite_sem_acumular(self):
+        await self.async_client.aforce_login(await User.objects.aget(username='contador'))
+        response = await self.async_client.get('/vendas/?exportar=csv')
+
+        # A sync body would be read whole into memory by the ASGI handler
+        self.assertTrue(response.is_async)
+        conteudo = b''.join([parte async for parte in response.streaming_content])
+        self.assertEqual(len(conteudo.decode('utf-8-sig').splitlines()), 1 + 5)
+
+    def test_xlsx_valido(self):
+        conteudo = self.exportar('?exportar=xlsx&cliente=%d' % self.cliente.pk)
+
+        with zipfile.ZipFile(io.BytesIO(conteudo)) as arquivo:
+            self.assertIsNone(arquivo.testzip())
+            planilha = arquivo.read('xl/worksheets/sheet1.xml').decode('utf-8')
+        self.assertEqual(planilha.count('<row>'), 6)
+
+
+class AutocompletarTestCase(VendaTestMixin, TestCase):
+    """Test the typeahead endpoints and the lazy select widget"""
+
+    def setUp(self):
+        self.client.force_login(User.objects.create_user('vendedor'))
+
+    def buscar(self, url, termo):
+        response = self.client.get(url, {'q': termo})
+        self.assertEqual(response.status_code, 200)
+        return [item['id'] for item in response.json()['resultados']]
+
+    def test_prefixo_ordenado_por_popularidade(self):
+        cafe, cafe_moido, cha = [
+            Produto.objects.create(descricao=descricao, preco=Decimal('5.00'), qtd_estoque=50, fornecedor=self.fornecedor)
+            for descricao in ('Café', 'Café Moído', 'Chá')
+        ]
+        registrar_venda(self.nova_venda(), [(cafe_moido.pk, 3)])
+
+        self.assertEqual(self.buscar('/vendas/buscar/produtos/', 'caf'), [cafe_moido.pk, cafe.pk])
+        self.assertEqual(self.buscar('/vendas/buscar/produtos/', str(cha.pk)), [cha.pk])
+
+        outro = Cliente.objects.create(nome='Clara', cpf='987.654.321-00', **ENDERECO)
+        self.assertEqual(self.buscar('/vendas/buscar/clientes/', 'cl'), [self.cliente.pk, outro.pk])
+        self.assertEqual(self.buscar('/vendas/buscar/clientes/', '9876'), [outro.pk])
+
+    def test_formulario_renderiza_apenas_opcao_selecionada(self):
+        self.criar_produtos(30)
+        html = self.client.get('/vendas/nova/').content.decode()
+        self.assertIn('data-autocompletar="/vendas/buscar/produtos/"', html)
+        self.assertNotIn('Produto 1', html)
+
+        html = self.client.get('/vendas/', {'cliente': self.cliente.pk}).content.decode()
+        self.assertIn(f'<option value="{self.cliente.pk}" selected>Cliente</option>', html)
@@ -9,4 +9,7 @@ urlpatterns = [
     path('detalhes/<int:pk>/', views.VendaDetailView.as_view(), name='detail'),
     path('excluir/<int:pk>/', views.VendaDeleteView.as_view(), name='delete'),
     path('total/', views.TotalVendaView.as_view(), name='total'),
+    path('importar/', views.VendaImportacaoView.as_view(), name='importar'),
+    path('buscar/produtos/', views.ProdutoAutocompletarView.as_view(), name='buscar_produtos'),
+    path('buscar/clientes/', views.ClienteAutocompletarView.as_view(), name='buscar_clientes'),
 ]
@@ -1,24 +1,82 @@
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.shortcuts import render, redirect, get_object_or_404
+from django.http import JsonResponse
 from django.views import View
 from django.views.generic import ListView, DetailView, DeleteView
 from django.urls import reverse_lazy
-from django.db import transaction
+from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_exempt
 from django.db.models import Q, Sum
 from datetime import datetime
 
-from .models import Venda, ItemVenda
-from .forms import VendaForm, ItemVendaFormSet, VendaSearchForm
+from .models import ItemVenda, ResumoVendaClienteDiario, Venda
+from .forms import VendaForm, ItemVendaFormSet, VendaSearchForm, TotalVendaForm
+from .services import cancelar_vendas, registrar_venda
+from .resumo import periodos_agrupados, totais
+from .importacao import contar_resultados, importar_vendas, ler_lote
+from .terminais import autenticar_terminal
+from core.autocompletar import AutocompletarView
+from core.exportacao import ExportacaoMixin
+from core.paginacao import KeysetPaginationMixin
+from customers.models import Cliente
 from inventory.models import Produto
 
 
-class VendaListView(LoginRequiredMixin, ListView):
+class VendaListView(LoginRequiredMixin, ExportacaoMixin, KeysetPaginationMixin, ListView):
     """List all sales - equivalent to FrmHistorico.java"""
     model = Venda
     template_name = 'sales/venda_list.html'
     context_object_name = 'vendas'
     paginate_by = 20
+    keyset_campos = ('-data_venda', '-id')
+    exportar_nome = 'vendas'
+    exportar_colunas = [
+        ('id', 'Venda'),
+        ('data_venda', 'Data'),
+        ('cliente_id', 'Cliente ID'),
+        ('cliente__nome', 'Cliente'),
+        ('cliente__cpf', 'CPF'),
+        ('total_venda', 'Total'),
+        ('observacoes', 'Observações'),
+    ]
+    exportar_colunas_itens = [
+        ('produto_id', 'Produto ID'),
+        ('produto__descricao', 'Produto'),
+        ('qtd', 'Quantidade'),
+        ('subtotal', 'Subtotal'),
+    ]
+
+    @property
+    def exportar_itens(self):
+        return bool(self.request.GET.get('itens'))
+
+    def get_exportar_colunas(self):
+        colunas = super().get_exportar_colunas()
+        if self.exportar_itens:
+            colunas += self.exportar_colunas_itens
+        return colunas
+
+    def exportar_linhas(self, lote):
+        """With ?itens=1, one row per item line; items are fetched per chunk"""
+        if not self.exportar_itens:
+            return lote
+
+        itens = {}
+        consulta = ItemVenda.objects.filter(
+            venda_id__in=[linha[0] for linha in lote]
+        ).order_by('venda_id', 'id').values_list(
+            'venda_id', *[campo for campo, _ in self.exportar_colunas_itens]
+        )
+        for venda_id, *item in consulta:
+            itens.setdefault(venda_id, []).append(tuple(item))
+
+        vazio = (None,) * len(self.exportar_colunas_itens)
+        return [
+            linha + item
+            for linha in lote
+            for item in itens.get(linha[0], [vazio])
+        ]
     
     def get_queryset(self):
         queryset = super().get_queryset().select_related('cliente')
@@ -40,9 +98,15 @@ class VendaListView(LoginRequiredMixin, ListView):
         context = super().get_context_data(**kwargs)
         context['search_form'] = VendaSearchForm(self.request.GET)
         
-        # Calculate total
-        vendas = self.get_queryset()
-        context['total_vendas'] = vendas.aggregate(total=Sum('total_venda'))['total'] or 0
+        # Totals from the daily rollup: cost depends on the period length,
+        # not on the number of sales
+        resumo = totais(
+            self.request.GET.get('data_inicio'),
+            self.request.GET.get('data_fim'),
+            self.request.GET.get('cliente'),
+        )
+        context['total_vendas'] = resumo['receita']
+        context['total_registros'] = resumo['qtd_vendas']
         
         return context
 
@@ -65,57 +129,28 @@ class VendaCreateView(LoginRequiredMixin, View):
         }
         return render(request, self.template_name, context)
     
-    @transaction.atomic
     def post(self, request):
         form = VendaForm(request.POST)
         formset = ItemVendaFormSet(request.POST)
-        
+
         if form.is_valid() and formset.is_valid():
+            itens = [
+                (item_form.cleaned_data['produto'].pk, item_form.cleaned_data['qtd'])
+                for item_form in formset
+                if item_form.cleaned_data and not item_form.cleaned_data.get('DELETE')
+            ]
+
             try:
-                # Save sale
-                venda = form.save(commit=False)
-                venda.total_venda = 0
-                venda.save()
-                
-                # Save items and update stock
-                total = 0
-                for item_form in formset:
-                    if item_form.cleaned_data and not item_form.cleaned_data.get('DELETE'):
-                        item = item_form.save(commit=False)
-                        item.venda = venda
-                        
-                        # Calculate subtotal
-                        item.subtotal = item.produto.preco * item.qtd
-                        total += item.subtotal
-                        
-                        # Update stock with proper error handling
-                        try:
-                            item.produto.remover_estoque(
-                                item.qtd,
-                                observacao=f'Venda #{venda.id}'
-                            )
-                        except ValueError as e:
-                            messages.error(request, str(e))
-                            transaction.set_rollback(True)
-                            context = {
-                                'form': form,
-                                'formset': formset,
-                                'title': 'Nova Venda',
-                            }
-                            return render(request, self.template_name, context)
-                        
-                        item.save()
-                
-                # Update sale total
-                venda.total_venda = total
-                venda.save()
-                
+                # Save sale, items and stock movements in one transaction
+                venda = registrar_venda(form.save(commit=False), itens, usuario=request.user)
+
                 messages.success(request, f'Venda #{venda.id} cadastrada com sucesso!')
                 return redirect('sales:detail', pk=venda.pk)
-                
+
+            except ValueError as e:
+                messages.error(request, str(e))
             except Exception as e:
                 messages.error(request, f'Erro ao processar venda: {str(e)}')
-                transaction.set_rollback(True)
         
         context = {
             'form': form,
@@ -143,42 +178,129 @@ class VendaDeleteView(LoginRequiredMixin, DeleteView):
     template_name = 'sales/venda_confirm_delete.html'
     success_url = reverse_lazy('sales:list')
     
-    @transaction.atomic
-    def delete(self, request, *args, **kwargs):
-        venda = self.get_object()
-        
-        # Restore stock for all items
-        for item in venda.itens.all():
-            item.produto.adicionar_estoque(item.qtd)
-        
-        messages.success(request, f'Venda #{venda.id} excluída com sucesso!')
-        return super().delete(request, *args, **kwargs)
+    def form_valid(self, form):
+        # Since Django 4.0 DeleteView handles POST through form_valid()
+        cancelar_vendas([self.object.pk], usuario=self.request.user)
+
+        messages.success(self.request, f'Venda #{self.object.id} excluída com sucesso!')
+        return redirect(self.get_success_url())
 
 
 class TotalVendaView(LoginRequiredMixin, View):
     """
     View total sales by period - equivalent to FrmTotalVenda.java
+    Reads the daily rollup, grouped by day, week or month
     """
     template_name = 'sales/total_venda.html'
     
     def get(self, request):
-        form = VendaSearchForm(request.GET)
-        vendas = Venda.objects.all()
+        form = TotalVendaForm(request.GET)
+        data_inicio = data_fim = cliente = None
+        agrupamento = 'dia'
         
         if form.is_valid():
             data_inicio = form.cleaned_data.get('data_inicio')
             data_fim = form.cleaned_data.get('data_fim')
-            
-            if data_inicio:
-                vendas = vendas.filter(data_venda__gte=data_inicio)
-            if data_fim:
-                vendas = vendas.filter(data_venda__lte=data_fim)
+            cliente = form.cleaned_data.get('cliente')
+            agrupamento = form.cleaned_data.get('agrupamento') or 'dia'
         
-        total = vendas.aggregate(total=Sum('total_venda'))['total'] or 0
+        periodos = periodos_agrupados(data_inicio, data_fim, agrupamento, cliente.pk if cliente else None)
         
         context = {
             'form': form,
-            'total': total,
-            'vendas': vendas.select_related('cliente'),
+            'agrupamento': agrupamento,
+            'periodos': periodos,
+            'total': sum(periodo['receita'] for periodo in periodos),
+            'qtd_vendas': sum(periodo['qtd_vendas'] for periodo in periodos),
+            'unidades': sum(periodo['unidades'] for periodo in periodos),
         }
         return render(request, self.template_name, context)
+
+
+@method_decorator(csrf_exempt, name='dispatch')
+class VendaImportacaoView(View):
+    """
+    Bulk sales ingestion for POS terminal sync.
+    Accepts a JSON array, {"vendas": [...]} or JSON lines and reports the
+    outcome of each sale. Terminals authenticate with their token
+    (sales.terminais), not with a session, so there is no CSRF check.
+    """
+    limite_vendas = 5000
+
+    def post(self, request):
+        terminal = autenticar_terminal(request)
+        if terminal is None:
+            resposta = JsonResponse({'erro': 'Token de terminal ausente ou inválido'}, status=401)
+            resposta['WWW-Authenticate'] = 'Token'
+            return resposta
+        if not terminal.usuario.has_perm('sales.add_venda'):
+            return JsonResponse({'erro': 'O terminal não tem permissão para registrar vendas'}, status=403)
+
+        try:
+            lote = ler_lote(request.body.decode('utf-8'))
+        except (UnicodeDecodeError, ValueError, KeyError):
+            return JsonResponse({'erro': 'Conteúdo JSON inválido'}, status=400)
+
+        if len(lote) > self.limite_vendas:
+            return JsonResponse(
+                {'erro': f'O lote excede o limite de {self.limite_vendas} vendas'},
+                status=413
+            )
+
+        resultados = importar_vendas(lote, usuario=terminal.usuario)
+
+        return JsonResponse({**contar_resultados(resultados), 'resultados': resultados})
+
+
+class ProdutoAutocompletarView(AutocompletarView):
+    """Product typeahead for the sale form: description prefix or code"""
+    model = Produto
+    campo_busca = 'descricao'
+
+    def get_queryset(self):
+        return Produto.objects.com_estoque_total()
+
+    def filtrar(self, queryset, termo):
+        condicao = Q(descricao__istartswith=termo)
+        if termo.isdigit():
+            condicao |= Q(pk=int(termo))
+        return queryset.filter(condicao), ('descricao', 'pk')
+
+    def populares(self, queryset, desde, limite):
+        """Most units sold since `desde`"""
+        return ItemVenda.objects.filter(
+            venda__data_venda__gte=desde, produto__in=queryset.values('pk')
+        ).values('produto_id').annotate(
+            unidades=Sum('qtd')
+        ).order_by('-unidades', 'produto_id').values_list('produto_id', flat=True)[:limite]
+
+    def resultado(self, obj):
+        return {
+            'id': obj.pk,
+            'texto': str(obj),
+            'preco': obj.preco,
+            'estoque': obj.estoque_atual,
+        }
+
+
+class ClienteAutocompletarView(AutocompletarView):
+    """Customer typeahead: name prefix, or CPF/phone prefix when the term is numeric"""
+    model = Cliente
+    campo_busca = 'nome'
+
+    def filtrar(self, queryset, termo):
+        filtro = Cliente.filtro_digitos(termo)
+        if filtro is not None:
+            return queryset.filter(filtro), ('nome', 'pk')
+        return super().filtrar(queryset, termo)
+
+    def populares(self, queryset, desde, limite):
+        """Most sales since `desde`, read from the daily rollup"""
+        return ResumoVendaClienteDiario.objects.filter(
+            data__gte=desde, cliente__in=queryset.values('pk')
+        ).values('cliente_id').annotate(
+            vendas=Sum('qtd_vendas')
+        ).order_by('-vendas', 'cliente_id').values_list('cliente_id', flat=True)[:limite]
+
+    def resultado(self, obj):
+        return {'id': obj.pk, 'texto': f'{obj.nome} - {obj.cpf}'}
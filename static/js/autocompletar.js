@@ -0,0 +1,54 @@
+// Typeahead for selects rendered by core.autocompletar.AutocompletarSelect:
+// the select only carries the chosen option; a search box above it fetches
+// matching options from the URL in data-autocompletar as the user types.
+(function ($) {
+    var ATRASO_MS = 250;
+
+    function criarBusca(select) {
+        var $select = $(select);
+        if ($select.prev('.autocompletar-busca').length) {
+            return;
+        }
+        $('<input type="text" class="form-control form-control-sm mb-1 autocompletar-busca" ' +
+          'autocomplete="off" placeholder="Digite para buscar...">').insertBefore($select);
+    }
+
+    function preencher($select, resultados) {
+        $select.find('option').filter(function () {
+            return this.value !== '';
+        }).remove();
+        $.each(resultados, function (_, item) {
+            $('<option>').val(item.id).text(item.texto).appendTo($select);
+        });
+        if (resultados.length) {
+            $select.val(String(resultados[0].id)).trigger('change');
+        }
+    }
+
+    $(document).on('input', '.autocompletar-busca', function () {
+        var $busca = $(this);
+        var $select = $busca.next('select[data-autocompletar]');
+        var termo = $.trim($busca.val());
+
+        clearTimeout($busca.data('espera'));
+        if (!termo) {
+            return;
+        }
+        $busca.data('espera', setTimeout(function () {
+            // Only the answer to the latest request is applied
+            var sequencia = ($busca.data('sequencia') || 0) + 1;
+            $busca.data('sequencia', sequencia);
+            $.getJSON($select.data('autocompletar'), {q: termo}).done(function (dados) {
+                if ($busca.data('sequencia') === sequencia) {
+                    preencher($select, dados.resultados);
+                }
+            });
+        }, ATRASO_MS));
+    });
+
+    $(function () {
+        $('select[data-autocompletar]').each(function () {
+            criarBusca(this);
+        });
+    });
+})(jQuery);
@@ -1,33 +1,90 @@
 // CEP lookup functionality
+// Answers are memoized for the page and the browser session, so leaving the
+// field again (or reopening the form) does not repeat the request; only the
+// latest lookup fills the address.
+const CEP_CACHE_PREFIXO = 'cep:';
+const cepMemoria = new Map();
+let cepRequisicao = null;
+
+function lerCepSalvo(cep) {
+    if (cepMemoria.has(cep)) {
+        return cepMemoria.get(cep);
+    }
+    try {
+        const salvo = sessionStorage.getItem(CEP_CACHE_PREFIXO + cep);
+        return salvo ? JSON.parse(salvo) : undefined;
+    } catch (e) {
+        return undefined;
+    }
+}
+
+function salvarCep(cep, data) {
+    cepMemoria.set(cep, data);
+    try {
+        sessionStorage.setItem(CEP_CACHE_PREFIXO + cep, JSON.stringify(data));
+    } catch (e) {
+        // Storage full or disabled: the in-page memo is enough
+    }
+}
+
+function preencherEndereco(data) {
+    document.getElementById('endereco').value = data.logradouro;
+    document.getElementById('bairro').value = data.bairro;
+    document.getElementById('cidade').value = data.cidade;
+    document.getElementById('estado').value = data.uf;
+}
+
 function buscarCep() {
     const cep = document.getElementById('cep').value.replace(/\D/g, '');
-    
+
     if (cep.length !== 8) {
         return;
     }
-    
-    // Show loading
+
     const enderecoInput = document.getElementById('endereco');
+    const salvo = lerCepSalvo(cep);
+    if (salvo !== undefined) {
+        if (salvo.erro) {
+            alert('CEP não encontrado!');
+        } else {
+            preencherEndereco(salvo);
+        }
+        return;
+    }
+
+    // Show loading
+    const anterior = enderecoInput.value;
     enderecoInput.value = 'Buscando...';
-    
+
+    if (cepRequisicao) {
+        cepRequisicao.abort();
+    }
+    cepRequisicao = new AbortController();
+
     // Call backend API
-    fetch(`/clientes/buscar-cep/?cep=${cep}`)
-        .then(response => response.json())
+    fetch(`/clientes/buscar-cep/?cep=${cep}`, {signal: cepRequisicao.signal})
+        .then(response => {
+            if (response.status === 503) {
+                throw new Error('indisponivel');
+            }
+            return response.json();
+        })
         .then(data => {
+            salvarCep(cep, data);
             if (data.erro) {
                 alert('CEP não encontrado!');
                 enderecoInput.value = '';
             } else {
-                document.getElementById('endereco').value = data.logradouro;
-                document.getElementById('bairro').value = data.bairro;
-                document.getElementById('cidade').value = data.cidade;
-                document.getElementById('estado').value = data.uf;
+                preencherEndereco(data);
             }
         })
         .catch(error => {
+            if (error.name === 'AbortError') {
+                return;
+            }
             console.error('Erro ao buscar CEP:', error);
-            enderecoInput.value = '';
-            alert('Erro ao buscar CEP. Tente novamente.');
+            enderecoInput.value = anterior;
+            alert('Busca de CEP indisponível no momento. Preencha o endereço manualmente.');
         });
 }
 
@@ -0,0 +1,162 @@
+// Dashboard: the page is a shell whose [data-widget] containers are fetched
+// in parallel, each one replaced as soon as its fragment arrives. The
+// browser revalidates them with their ETag. Once all are in place, the
+// Server-Sent Events of core.eventos keep them live.
+// "estatisticas" carries the whole snapshot; "venda" and "estoque" carry a
+// single change. Without an ASGI server the endpoint answers 204 and the
+// page simply stays as rendered.
+const DASHBOARD_VENDAS_RECENTES = 10;
+const DASHBOARD_ESTOQUE_BAIXO = 5;
+
+function formatarValor(valor) {
+    return Number(valor).toFixed(2).replace('.', ',');
+}
+
+function formatarData(iso) {
+    const [ano, mes, dia] = String(iso).slice(0, 10).split('-');
+    return `${dia}/${mes}/${ano}`;
+}
+
+function celula(linha, texto) {
+    const td = document.createElement('td');
+    td.textContent = texto;
+    linha.appendChild(td);
+}
+
+function estatistica(nome) {
+    return document.querySelector(`[data-estatistica="${nome}"]`);
+}
+
+function definirEstatistica(nome, valor) {
+    const elemento = estatistica(nome);
+    if (!elemento) {
+        return;
+    }
+    if (elemento.dataset.valor !== undefined) {
+        elemento.dataset.valor = valor;
+        elemento.textContent = formatarValor(valor);
+    } else {
+        elemento.textContent = valor;
+    }
+}
+
+function somarEstatistica(nome, delta) {
+    const elemento = estatistica(nome);
+    if (elemento) {
+        const atual = Number(elemento.dataset.valor ?? elemento.textContent) || 0;
+        definirEstatistica(nome, atual + delta);
+    }
+}
+
+function linhaVenda(venda) {
+    const linha = document.createElement('tr');
+    linha.dataset.venda = venda.id;
+    celula(linha, venda.id);
+    celula(linha, venda.cliente_nome);
+    celula(linha, formatarData(venda.data_venda));
+    celula(linha, 'R$ ' + formatarValor(venda.total_venda));
+    return linha;
+}
+
+function linhaProduto(produto) {
+    const linha = document.createElement('tr');
+    linha.dataset.produto = produto.id;
+    linha.dataset.estoque = produto.estoque_total;
+    linha.className = produto.estoque_total <= 0 ? 'table-danger' : 'table-warning';
+    celula(linha, produto.descricao);
+    celula(linha, produto.estoque_total);
+    celula(linha, produto.estoque_minimo);
+    return linha;
+}
+
+function preencherTabela(id, linhas) {
+    const corpo = document.getElementById(id);
+    if (corpo && linhas.length) {
+        corpo.replaceChildren(...linhas);
+    }
+}
+
+function atualizarTotalEstoqueBaixo() {
+    const aviso = document.getElementById('total-estoque-baixo');
+    const total = Number(estatistica('total_estoque_baixo')?.textContent) || 0;
+    if (aviso) {
+        aviso.hidden = total <= document.querySelectorAll('#estoque-baixo tr[data-produto]').length;
+    }
+}
+
+function aplicarEstatisticas(dados) {
+    ['total_clientes', 'total_produtos', 'vendas_mes', 'vendas_mes_valor', 'total_estoque_baixo'].forEach(nome => {
+        if (dados[nome] !== undefined) {
+            definirEstatistica(nome, dados[nome]);
+        }
+    });
+    preencherTabela('vendas-recentes', (dados.vendas_recentes || []).map(linhaVenda));
+    preencherTabela('estoque-baixo', (dados.produtos_estoque_baixo || []).map(linhaProduto));
+    atualizarTotalEstoqueBaixo();
+}
+
+function aplicarVenda(venda) {
+    const hoje = new Date();
+    const mesAtual = `${hoje.getFullYear()}-${String(hoje.getMonth() + 1).padStart(2, '0')}`;
+    if (String(venda.data_venda).startsWith(mesAtual)) {
+        somarEstatistica('vendas_mes', venda.sinal);
+        somarEstatistica('vendas_mes_valor', venda.sinal * Number(venda.total_venda));
+    }
+
+    const corpo = document.getElementById('vendas-recentes');
+    if (!corpo) {
+        return;
+    }
+    corpo.querySelector(`tr[data-venda="${venda.id}"]`)?.remove();
+    if (venda.sinal > 0) {
+        corpo.querySelectorAll('tr:not([data-venda])').forEach(linha => linha.remove());
+        corpo.prepend(linhaVenda(venda));
+        [...corpo.querySelectorAll('tr[data-venda]')].slice(DASHBOARD_VENDAS_RECENTES).forEach(linha => linha.remove());
+    }
+}
+
+function aplicarEstoque(produto) {
+    const corpo = document.getElementById('estoque-baixo');
+    somarEstatistica('total_estoque_baixo', produto.abaixo ? 1 : -1);
+    if (corpo) {
+        corpo.querySelector(`tr[data-produto="${produto.id}"]`)?.remove();
+        if (produto.abaixo) {
+            corpo.querySelectorAll('tr:not([data-produto])').forEach(linha => linha.remove());
+            const linhas = [...corpo.querySelectorAll('tr[data-produto]'), linhaProduto(produto)];
+            linhas.sort((a, b) => Number(a.dataset.estoque) - Number(b.dataset.estoque));
+            corpo.replaceChildren(...linhas.slice(0, DASHBOARD_ESTOQUE_BAIXO));
+        }
+    }
+    atualizarTotalEstoqueBaixo();
+}
+
+function carregarWidget(container) {
+    return fetch(container.dataset.widget, {credentials: 'same-origin'})
+        .then(resposta => {
+            if (!resposta.ok) {
+                throw new Error(resposta.status);
+            }
+            return resposta.text();
+        })
+        .then(html => {
+            container.innerHTML = html;
+        })
+        .catch(() => {
+            container.innerHTML = '<div class="alert alert-warning">Não foi possível carregar este quadro.</div>';
+        });
+}
+
+document.addEventListener('DOMContentLoaded', async function() {
+    const dashboard = document.getElementById('dashboard');
+    if (!dashboard) {
+        return;
+    }
+    await Promise.allSettled([...dashboard.querySelectorAll('[data-widget]')].map(carregarWidget));
+    if (!window.EventSource) {
+        return;
+    }
+    const eventos = new EventSource(dashboard.dataset.eventos);
+    eventos.addEventListener('estatisticas', e => aplicarEstatisticas(JSON.parse(e.data)));
+    eventos.addEventListener('venda', e => aplicarVenda(JSON.parse(e.data)));
+    eventos.addEventListener('estoque', e => aplicarEstoque(JSON.parse(e.data)));
+});
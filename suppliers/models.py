@@ -1,11 +1,15 @@
 from django.db import models
 
+from core.models import CamposDigitosMixin
 
-class Fornecedor(models.Model):
+
+class Fornecedor(CamposDigitosMixin, models.Model):
     """
     Supplier model - equivalent to model/Fornecedor.java
     Maps to tb_fornecedores table
     """
+    # tb_fornecedores.id is an INT column (docker/mysql/init.sql): foreign keys to it must be INT too
+    id = models.AutoField('ID', primary_key=True)
     nome = models.CharField('Nome', max_length=100)
     cnpj = models.CharField('CNPJ', max_length=20, unique=True)
     email = models.EmailField('E-mail', max_length=200, blank=True)
@@ -18,6 +22,16 @@ class Fornecedor(models.Model):
     bairro = models.CharField('Bairro', max_length=100)
     cidade = models.CharField('Cidade', max_length=100)
     estado = models.CharField('Estado', max_length=2)
+    # Digits-only copies for indexed lookups (filled on save)
+    cnpj_digitos = models.CharField('CNPJ (dígitos)', max_length=20, blank=True, editable=False, db_index=True)
+    telefone_digitos = models.CharField('Telefone (dígitos)', max_length=30, blank=True, editable=False, db_index=True)
+    celular_digitos = models.CharField('Celular (dígitos)', max_length=30, blank=True, editable=False, db_index=True)
+
+    campos_digitos = (
+        ('cnpj', 'cnpj_digitos', 14),
+        ('telefone', 'telefone_digitos', None),
+        ('celular', 'celular_digitos', None),
+    )
     
     class Meta:
         db_table = 'tb_fornecedores'
@@ -1,10 +1,12 @@
 from django.urls import path
+from core.views import ImportacaoCadastroView
 from . import views
 
 app_name = 'suppliers'
 
 urlpatterns = [
     path('', views.FornecedorListView.as_view(), name='list'),
+    path('importar/', ImportacaoCadastroView.as_view(tipo='fornecedor', url_lista='suppliers:list'), name='importar'),
     path('novo/', views.FornecedorCreateView.as_view(), name='create'),
     path('editar/<int:pk>/', views.FornecedorUpdateView.as_view(), name='update'),
     path('excluir/<int:pk>/', views.FornecedorDeleteView.as_view(), name='delete'),
@@ -2,29 +2,45 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
-from django.db.models import Q
 
+from core.busca import filtrar_busca
+from core.exportacao import ExportacaoMixin
 from .models import Fornecedor
 from .forms import FornecedorForm, FornecedorSearchForm
 
 
-class FornecedorListView(LoginRequiredMixin, ListView):
+class FornecedorListView(LoginRequiredMixin, ExportacaoMixin, ListView):
     """List all suppliers - equivalent to FrmFornecedor.java"""
     model = Fornecedor
     template_name = 'suppliers/fornecedor_list.html'
     context_object_name = 'fornecedores'
     paginate_by = 20
+    exportar_nome = 'fornecedores'
+    exportar_ordem = ('nome', 'id')
+    exportar_colunas = [
+        ('id', 'ID'),
+        ('nome', 'Nome'),
+        ('cnpj', 'CNPJ'),
+        ('email', 'E-mail'),
+        ('telefone', 'Telefone'),
+        ('celular', 'Celular'),
+        ('cep', 'CEP'),
+        ('endereco', 'Endereço'),
+        ('numero', 'Número'),
+        ('complemento', 'Complemento'),
+        ('bairro', 'Bairro'),
+        ('cidade', 'Cidade'),
+        ('estado', 'Estado'),
+    ]
     
     def get_queryset(self):
         queryset = super().get_queryset()
         search = self.request.GET.get('search')
         
         if search:
-            queryset = queryset.filter(
-                Q(nome__icontains=search) |
-                Q(cnpj__icontains=search) |
-                Q(email__icontains=search)
-            )
+            # Documents and phones: exact or prefix seek on the digits columns
+            filtro = Fornecedor.filtro_digitos(search)
+            queryset = queryset.filter(filtro) if filtro else filtrar_busca(queryset, search)
         
         return queryset
     